@@ -3,47 +3,63 @@ Endpoints para o fluxo de verificação com IA
 Novos endpoints para testar e usar o sistema de agentes especializados
 """
 
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
-from typing import Dict, Any, Optional
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, UploadFile, File
+from fastapi.responses import StreamingResponse
+from typing import Dict, Any, Optional, List, AsyncIterator, Callable
+import os
+import json
+import time
+import asyncio
 import logging
 from pydantic import BaseModel
 
 from ...services.ai_service import AIService
+from ...services.registro_servicos import obter_ai_service
+from ...core.exceptions import SecurityException
+from ...services.fila_verificacoes import fila_verificacoes, validar_callback_url, STATUS_CONCLUIDO, STATUS_ERRO
+from ...services.lote_verificacoes import verificar_lote, MAX_DOCUMENTOS
+from ...services.progresso_verificacao import (
+    SinkProgressoFila, criar_evento, formatar_sse, formatar_ndjson,
+    ETAPA_RESULTADO, ETAPA_ENRIQUECIMENTO
+)
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/verificacao-ia", tags=["Verificação IA"])
 
-# Instância global do serviço de IA
-_ai_service = None
-
 def get_ai_service():
     """
-    Obtém instância do serviço de IA, inicializando se necessário
+    Obtém a instância compartilhada do serviço de IA
     """
-    global _ai_service
-    if _ai_service is None:
-        try:
-            _ai_service = AIService()
-            logger.info("Serviço de IA inicializado com sucesso")
-        except Exception as e:
-            logger.error(f"Erro ao inicializar serviço de IA: {e}")
-            raise HTTPException(
-                status_code=500,
-                detail="Serviço de IA não disponível"
-            )
-    return _ai_service
+    try:
+        return obter_ai_service()
+    except Exception as e:
+        logger.error(f"Erro ao inicializar serviço de IA: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail="Serviço de IA não disponível"
+        )
 
 # Modelos Pydantic para as requisições
 class VerificacaoRequest(BaseModel):
     image_url: Optional[str] = None
     texto_pix: Optional[str] = None
     user_id: str
+    modo_rapido: Optional[bool] = None
+
+class VerificacaoJobRequest(VerificacaoRequest):
+    callback_url: Optional[str] = None
+
+class LoteVerificacaoRequest(BaseModel):
+    documentos: List[VerificacaoRequest]
+    concorrencia: Optional[int] = None
+    modo_rapido: Optional[bool] = None
 
 class RespostaUsuarioRequest(BaseModel):
     user_id: str
     resposta_id: str
     contexto_anterior: Optional[Dict[str, Any]] = None
+    id_verificacao: Optional[str] = None
 
 @router.post("/verificar-cobranca")
 async def verificar_cobranca(
@@ -73,7 +89,8 @@ async def verificar_cobranca(
         resultado = await ai_service.verificar_cobranca_completa(
             image_url=request.image_url,
             texto_pix=request.texto_pix,
-            user_id=request.user_id
+            user_id=request.user_id,
+            modo_rapido=request.modo_rapido
         )
         
         if not resultado.get("sucesso", True):
@@ -94,6 +111,245 @@ async def verificar_cobranca(
             detail=f"Erro interno: {str(e)}"
         )
 
+FORMATOS_STREAM = {
+    "sse": (formatar_sse, "text/event-stream"),
+    "ndjson": (formatar_ndjson, "application/x-ndjson")
+}
+
+async def transmitir_verificacao(ai_service: AIService,
+                                 request: VerificacaoRequest,
+                                 formatar: Callable[[Dict[str, Any]], str]) -> AsyncIterator[str]:
+    """
+    Executa a verificação e produz um evento a cada agente concluído,
+    seguido do resultado completo
+    
+    No modo rápido o stream continua aberto até o enriquecimento com IA
+    terminar (limitado a VERIFICACAO_PRAZO_ENRIQUECIMENTO_SEGUNDOS).
+    """
+    sink = SinkProgressoFila()
+    espera_enriquecimento = float(os.getenv("VERIFICACAO_PRAZO_ENRIQUECIMENTO_SEGUNDOS", "60")) + 5
+    
+    async def executar():
+        inicio = time.perf_counter()
+        try:
+            resultado = await ai_service.verificar_cobranca_completa(
+                image_url=request.image_url,
+                texto_pix=request.texto_pix,
+                user_id=request.user_id,
+                modo_rapido=request.modo_rapido,
+                progresso=sink
+            )
+        except Exception as e:
+            logger.error(f"Erro na verificação em streaming: {e}")
+            resultado = {"erro": f"Erro interno: {str(e)}", "sucesso": False}
+        
+        await sink.emitir(criar_evento(ETAPA_RESULTADO, "fluxo", (time.perf_counter() - inicio) * 1000, resultado))
+        if resultado.get("enriquecimento_ia", {}).get("status") != "pendente":
+            await sink.finalizar()
+    
+    tarefa = asyncio.create_task(executar())
+    resultado_enviado = False
+    enriquecimento_recebido = False
+    try:
+        while True:
+            try:
+                evento = await asyncio.wait_for(
+                    sink.fila.get(),
+                    timeout=espera_enriquecimento if resultado_enviado else None
+                )
+            except asyncio.TimeoutError:
+                break
+            if evento is None:
+                break
+            
+            yield formatar(evento)
+            
+            if evento["etapa"] == ETAPA_ENRIQUECIMENTO:
+                enriquecimento_recebido = True
+            elif evento["etapa"] == ETAPA_RESULTADO:
+                resultado_enviado = True
+            if resultado_enviado and enriquecimento_recebido:
+                break
+    finally:
+        # Cliente desconectado antes do fim: interromper a verificação
+        if not tarefa.done():
+            tarefa.cancel()
+
+@router.post("/verificar-cobranca/stream")
+async def verificar_cobranca_stream(
+    request: VerificacaoRequest,
+    formato: str = "sse",
+    ai_service: AIService = Depends(get_ai_service)
+):
+    """
+    Variante em streaming de /verificar-cobranca
+    
+    Emite um evento por agente concluído (extração, consultor, detetive e
+    veredito do orquestrador) com a duração da etapa e o tempo decorrido,
+    e termina com o evento "resultado" contendo a resposta completa.
+    
+    Args:
+        request: Dados da verificação (image_url ou texto_pix)
+        formato: "sse" (Server-Sent Events) ou "ndjson"
+    """
+    if not request.image_url and not request.texto_pix:
+        raise HTTPException(
+            status_code=400,
+            detail="É necessário fornecer image_url ou texto_pix"
+        )
+    if formato not in FORMATOS_STREAM:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Formato inválido; use {' ou '.join(FORMATOS_STREAM)}"
+        )
+    
+    formatar, media_type = FORMATOS_STREAM[formato]
+    logger.info(f"Iniciando verificação em streaming ({formato}) para usuário {request.user_id}")
+    return StreamingResponse(
+        transmitir_verificacao(ai_service, request, formatar),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _responder_lote(ai_service: AIService,
+                    documentos: List[Dict[str, Any]],
+                    concorrencia: Optional[int],
+                    modo_rapido: Optional[bool]) -> StreamingResponse:
+    """Valida o lote e transmite os resultados em NDJSON na ordem de conclusão"""
+    if not documentos:
+        raise HTTPException(status_code=400, detail="O lote não contém documentos")
+    if len(documentos) > MAX_DOCUMENTOS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"O lote excede o máximo de {MAX_DOCUMENTOS} documentos"
+        )
+    
+    for documento in documentos:
+        if documento.get("modo_rapido") is None:
+            documento["modo_rapido"] = modo_rapido
+    
+    async def linhas():
+        async for item in verificar_lote(ai_service, documentos, concorrencia):
+            yield formatar_ndjson(item)
+    
+    logger.info(f"Iniciando verificação em lote de {len(documentos)} documentos")
+    return StreamingResponse(
+        linhas(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/lote")
+async def verificar_lote_documentos(
+    request: LoteVerificacaoRequest,
+    ai_service: AIService = Depends(get_ai_service)
+):
+    """
+    Verifica uma lista de documentos com concorrência limitada
+    
+    A resposta é NDJSON: uma linha {"tipo": "resultado", "indice", ...} por
+    documento, na ordem em que terminam, e uma linha final {"tipo": "resumo"}
+    com documentos por segundo e latências (média, p50, p95, máx).
+    """
+    documentos = [documento.model_dump() for documento in request.documentos]
+    return _responder_lote(ai_service, documentos, request.concorrencia, request.modo_rapido)
+
+@router.post("/lote/arquivo")
+async def verificar_lote_arquivo(
+    arquivo: UploadFile = File(...),
+    concorrencia: Optional[int] = None,
+    modo_rapido: Optional[bool] = None,
+    ai_service: AIService = Depends(get_ai_service)
+):
+    """
+    Variante de /lote que recebe um arquivo NDJSON, um documento por linha
+    (image_url ou texto_pix, user_id e modo_rapido opcional)
+    """
+    documentos = []
+    conteudo = (await arquivo.read()).decode("utf-8")
+    for numero, linha in enumerate(conteudo.splitlines(), start=1):
+        if not linha.strip():
+            continue
+        try:
+            documento = VerificacaoRequest(**json.loads(linha))
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Linha {numero} inválida: {str(e)}")
+        documentos.append(documento.model_dump())
+    
+    return _responder_lote(ai_service, documentos, concorrencia, modo_rapido)
+
+@router.post("/jobs", status_code=202)
+async def criar_job_verificacao(request: VerificacaoJobRequest):
+    """
+    Enfileira uma verificação para os workers e responde imediatamente
+    
+    O resultado é obtido em GET /jobs/{job_id} ou entregue via POST no
+    callback_url, quando informado (só para hosts em VERIFICACAO_CALLBACK_HOSTS).
+    
+    Returns:
+        Id do job e link para acompanhamento
+    """
+    if not request.image_url and not request.texto_pix:
+        raise HTTPException(
+            status_code=400,
+            detail="É necessário fornecer image_url ou texto_pix"
+        )
+    if request.callback_url:
+        try:
+            validar_callback_url(request.callback_url)
+        except SecurityException as e:
+            raise HTTPException(status_code=400, detail=e.message)
+    
+    try:
+        payload = request.model_dump(exclude={"callback_url"})
+        job_id = fila_verificacoes.enfileirar(payload, callback_url=request.callback_url)
+        return {
+            "job_id": job_id,
+            "status": "pendente",
+            "status_url": f"{router.prefix}/jobs/{job_id}"
+        }
+    except Exception as e:
+        logger.error(f"Erro ao enfileirar verificação: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erro ao enfileirar verificação: {str(e)}"
+        )
+
+@router.get("/jobs/{job_id}")
+async def obter_job_verificacao(job_id: str):
+    """
+    Consulta o estado de um job de verificação
+    
+    Returns:
+        Status do job e, quando concluído, o resultado da verificação
+    """
+    try:
+        job = fila_verificacoes.obter(job_id)
+    except Exception as e:
+        logger.error(f"Erro ao consultar job {job_id}: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erro ao consultar job: {str(e)}"
+        )
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    
+    resposta = {
+        "job_id": job["id"],
+        "status": job["status"],
+        "tentativas": job["tentativas"],
+        "criado_em": job["criado_em"],
+        "iniciado_em": job["iniciado_em"],
+        "concluido_em": job["concluido_em"],
+        "callback_status": job["callback_status"]
+    }
+    if job["status"] == STATUS_CONCLUIDO:
+        resposta["resultado"] = job["resultado"]
+    elif job["status"] == STATUS_ERRO or job["erro"]:
+        resposta["erro"] = job["erro"]
+    return resposta
+
 @router.post("/processar-resposta")
 async def processar_resposta_usuario(
     request: RespostaUsuarioRequest,
@@ -114,7 +370,8 @@ async def processar_resposta_usuario(
         resultado = await ai_service.processar_resposta_usuario(
             user_id=request.user_id,
             resposta_id=request.resposta_id,
-            contexto_anterior=request.contexto_anterior
+            contexto_anterior=request.contexto_anterior,
+            id_verificacao=request.id_verificacao
         )
         
         return resultado
@@ -126,6 +383,30 @@ async def processar_resposta_usuario(
             detail=f"Erro ao processar resposta: {str(e)}"
         )
 
+@router.get("/historico/{user_id}")
+async def listar_verificacoes_recentes(
+    user_id: str,
+    limite: int = 10,
+    ai_service: AIService = Depends(get_ai_service)
+):
+    """
+    Lista as verificações recentes gravadas para o usuário
+    
+    Returns:
+        Verificações da mais recente para a mais antiga
+    """
+    try:
+        return {
+            "user_id": user_id,
+            "verificacoes": ai_service.listar_verificacoes_recentes(user_id, limite)
+        }
+    except Exception as e:
+        logger.error(f"Erro ao listar verificações: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erro ao listar verificações: {str(e)}"
+        )
+
 @router.get("/mensagem-inicial")
 async def obter_mensagem_inicial(
     ai_service: AIService = Depends(get_ai_service)
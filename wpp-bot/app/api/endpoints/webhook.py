@@ -2,7 +2,8 @@ from fastapi import APIRouter, Depends, HTTPException, Request, Response, Backgr
 from fastapi.responses import JSONResponse, HTMLResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy.orm import Session
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List
+import asyncio
 import json
 import logging
 import os
@@ -18,9 +19,14 @@ from app.db.crud.menu import CRUDMenu, CRUDMenuState
 from app.models.user import User
 from app.services.whatsapp import whatsapp_service
 from app.services.projeto_asas_menu import ProjetoAsasMenuService
-from app.services.ai_service import AIService
+from app.services.registro_servicos import obter_ai_service
 from app.services.fluxo_bemobi import FluxoBemobi
 from app.services.fluxo_bemobi_automatico import FluxoBemobiAutomatico
+from app.services.progresso_verificacao import SinkProgressoWhatsApp
+from app.services.controle_admissao import (
+    controle_admissao, mensagem_recusa, Reserva, CUSTO_IMAGEM, CUSTO_TEXTO
+)
+from app.services.agrupador_mensagens import agrupador_mensagens
 from app.utils.helpers import is_greeting, is_business_hours, format_phone_number
 from app.models.menu import Menu, MenuState
 
@@ -35,9 +41,6 @@ projeto_asas_service = ProjetoAsasMenuService(
     log_crud=conversation_log
 )
 
-# Serviço de IA será inicializado quando necessário
-ai_service = None
-
 # Cria o logger
 logger = logging.getLogger(__name__)
 
@@ -171,10 +174,11 @@ async def process_webhook_entries(data: Dict[str, Any], db: Session, background_
                 
                 logger.info(f"Encontradas {len(value['messages'])} mensagens para processamento")
                 
-                # Process each message
-                for msg_index, message in enumerate(value["messages"]):
-                    logger.info(f"Processando mensagem {msg_index+1}/{len(value['messages'])}")
-                    await process_message(db, message, phone_number, name, background_tasks)
+                # Mensagens processadas juntas: as de um mesmo usuário formam uma só rajada
+                await asyncio.gather(*(
+                    process_message(db, message, phone_number, name, background_tasks)
+                    for message in value["messages"]
+                ))
                     
         logger.info("Processamento de entradas do webhook concluído com sucesso")
     except Exception as e:
@@ -245,11 +249,18 @@ async def process_message(
             )
         
         # Sistema Bemobi com fluxo de botões - substitui completamente o Projeto ASAS
-        if await is_verification_request(message_text, message_type, message):
+        if not interactive_data:
+            # Álbuns e mensagens seguidas viram um só turno
+            turno = await agrupador_mensagens.agrupar(str(user.id), (message_text, message_type, message))
+            if turno is None:
+                logger.info(f"Mensagem de {phone_number} agrupada na rajada em andamento")
+                return
+            await process_turn(db, user, turno, background_tasks)
+        elif await is_verification_request(message_text, message_type, message):
             # Verificação de cobrança com agentes especializados
             await handle_verification_request(db, user, message_text, message_type, message, background_tasks)
-        elif interactive_data and interactive_data.get("type") == "button_reply":
-            # Processar clique em botão do fluxo Bemobi
+        elif interactive_data.get("type") == "button_reply":
+            # Processar clique em botão do fluxo Bemobi (respondido na hora, sem agrupar)
             button_id = interactive_data.get("button_reply", {}).get("id")
             await fluxo_bemobi.processar_botao(db, user, button_id)
         else:
@@ -265,6 +276,34 @@ async def process_message(
         logger.error(traceback.format_exc())
 
 
+async def process_turn(db: Session, user: User, turno: List[tuple], background_tasks: BackgroundTasks = None):
+    """
+    Responde a um turno do usuário: uma mensagem (não interativa) ou uma rajada agrupada
+    
+    Fotos e documentos da rajada viram uma única verificação de várias páginas
+    (os textos que as acompanham fazem parte do mesmo pedido); rajadas só de
+    texto viram uma única mensagem.
+    """
+    if len(turno) == 1:
+        message_text, message_type, message = turno[0]
+    else:
+        paginas = [message for _, message_type, message in turno if message_type in ("image", "document")]
+        message_text = "\n".join(texto for texto, message_type, _ in turno if message_type not in ("image", "document"))
+        if paginas:
+            await handle_verification_request(
+                db, user, message_text, paginas[0]["type"], paginas[0], background_tasks, paginas=paginas
+            )
+            return
+        message_type, message = "text", {"type": "text", "text": {"body": message_text}}
+    
+    if await is_verification_request(message_text, message_type, message):
+        # Verificação de cobrança com agentes especializados
+        await handle_verification_request(db, user, message_text, message_type, message, background_tasks)
+    else:
+        # Iniciar fluxo Bemobi padrão
+        await fluxo_bemobi.iniciar_fluxo(db, user, message_text)
+
+
 async def send_terms_message(db: Session, user: User):
     """
     Menssagem de termos e condições
@@ -648,20 +687,16 @@ async def export_flow():
 
 def get_ai_service():
     """
-    Obtém instância do serviço de IA, inicializando se necessário
+    Obtém a instância compartilhada do serviço de IA
     """
-    global ai_service
-    if ai_service is None:
-        try:
-            ai_service = AIService()
-            logger.info("Serviço de IA inicializado com sucesso")
-        except Exception as e:
-            logger.error(f"Erro ao inicializar serviço de IA: {e}")
-            raise HTTPException(
-                status_code=500,
-                detail="Serviço de IA não disponível"
-            )
-    return ai_service
+    try:
+        return obter_ai_service()
+    except Exception as e:
+        logger.error(f"Erro ao inicializar serviço de IA: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail="Serviço de IA não disponível"
+        )
 
 # Inicializar fluxo Bemobi automático
 fluxo_bemobi = FluxoBemobiAutomatico()
@@ -865,32 +900,58 @@ async def send_bemobi_financial_options(db: Session, user: User):
         logger.error(f"Erro ao enviar opções financeiras: {e}")
 
 
-async def handle_verification_request(db: Session, user: User, message_text: str, message_type: str, message: Dict[str, Any], background_tasks: BackgroundTasks):
+async def handle_verification_request(db: Session, user: User, message_text: str, message_type: str, message: Dict[str, Any], background_tasks: BackgroundTasks,
+                                      paginas: Optional[List[Dict[str, Any]]] = None):
     """
     Processa solicitação de verificação de cobrança
+    
+    Várias fotos ou documentos de uma mesma rajada chegam em `paginas` e são
+    verificados juntos, como um documento de várias páginas.
     """
     try:
         logger.info(f"Processando solicitação de verificação para usuário {user.id}")
+        paginas = paginas or [message]
         
-        # Enviar mensagem de confirmação
-        await whatsapp_service.send_message(
-            phone_number=user.phone_number,
-            message="🏦 **Grace - Bemobi Financeiro**\n\nAnalisando sua solicitação de verificação...",
-            log_to_db=True,
-            user_id=user.id,
-            db=db
-        )
-        
-        # Processar baseado no tipo de mensagem
+        # Tipo de verificação pedida
         if message_type == "image":
-            await handle_image_verification(db, user, message, background_tasks)
+            handler, conteudo, custo = handle_image_verification, paginas, CUSTO_IMAGEM * len(paginas)
         elif message_type == "document":
-            await handle_document_verification(db, user, message, background_tasks)
+            handler, conteudo, custo = handle_document_verification, paginas, CUSTO_IMAGEM * len(paginas)
         elif message_text and any(keyword in message_text.lower() for keyword in ["pix", "chave", "valor"]):
-            await handle_text_verification(db, user, message_text, background_tasks)
+            handler, conteudo, custo = handle_text_verification, message_text, CUSTO_TEXTO
         else:
             # Solicitar que envie uma imagem ou dados
             await send_verification_instructions(db, user)
+            return
+        
+        # Limite por usuário: pedidos recusados recebem resposta pronta, sem OCR nem IA
+        admissao = controle_admissao.admitir(str(user.id), custo=custo)
+        if not admissao["admitido"]:
+            await whatsapp_service.send_message(
+                phone_number=user.phone_number,
+                message=mensagem_recusa(admissao),
+                log_to_db=True,
+                user_id=user.id,
+                db=db
+            )
+            return
+        reserva = admissao["reserva"]
+        
+        try:
+            # Enviar mensagem de confirmação
+            await whatsapp_service.send_message(
+                phone_number=user.phone_number,
+                message="🏦 **Grace - Bemobi Financeiro**\n\nAnalisando sua solicitação de verificação...",
+                log_to_db=True,
+                user_id=user.id,
+                db=db
+            )
+            
+            await handler(db, user, conteudo, background_tasks, reserva)
+        finally:
+            # Verificação não agendada (erro ou mídia indisponível): devolver o lugar na fila
+            if not reserva.agendada:
+                controle_admissao.liberar(reserva)
             
     except Exception as e:
         logger.error(f"Erro ao processar solicitação de verificação: {e}")
@@ -903,16 +964,36 @@ async def handle_verification_request(db: Session, user: User, message_text: str
         )
 
 
-async def handle_image_verification(db: Session, user: User, message: Dict[str, Any], background_tasks: BackgroundTasks):
+def agendar_verificacao(background_tasks: BackgroundTasks, reserva: Optional[Reserva], funcao, *args, **kwargs):
+    """
+    Agenda a verificação em background; com reserva, ela espera a vez do usuário
+    nas vagas de verificação (controle de admissão)
+    """
+    if reserva is None:
+        background_tasks.add_task(funcao, *args, **kwargs)
+        return
+    background_tasks.add_task(controle_admissao.executar, reserva, funcao, *args, **kwargs)
+    reserva.agendada = True
+
+
+async def obter_urls_paginas(paginas: List[Dict[str, Any]]) -> Optional[List[str]]:
     """
-    Processa verificação de imagem (boleto/documento)
+    URLs de mídia de todas as páginas (consultadas em paralelo); None se alguma faltar
+    """
+    ids = [pagina.get(pagina.get("type"), {}).get("id") for pagina in paginas]
+    if not all(ids):
+        return None
+    urls = await asyncio.gather(*(get_media_url(media_id) for media_id in ids))
+    return list(urls) if all(urls) else None
+
+
+async def handle_image_verification(db: Session, user: User, paginas: List[Dict[str, Any]], background_tasks: BackgroundTasks,
+                                    reserva: Optional[Reserva] = None):
+    """
+    Processa verificação de imagem (boleto/documento), com uma ou várias fotos
     """
     try:
-        # Obter URL da imagem
-        image_data = message.get("image", {})
-        image_id = image_data.get("id")
-        
-        if not image_id:
+        if not all(pagina.get(pagina.get("type"), {}).get("id") for pagina in paginas):
             await whatsapp_service.send_message(
                 phone_number=user.phone_number,
                 message="❌ **Erro**\n\nNão foi possível obter a imagem. Tente novamente.",
@@ -922,10 +1003,10 @@ async def handle_image_verification(db: Session, user: User, message: Dict[str,
             )
             return
         
-        # Obter URL da imagem da API do WhatsApp
-        image_url = await get_media_url(image_id)
+        # Obter URLs das imagens da API do WhatsApp
+        image_urls = await obter_urls_paginas(paginas)
         
-        if not image_url:
+        if not image_urls:
             await whatsapp_service.send_message(
                 phone_number=user.phone_number,
                 message="❌ **Erro**\n\nNão foi possível acessar a imagem. Tente novamente.",
@@ -936,9 +1017,10 @@ async def handle_image_verification(db: Session, user: User, message: Dict[str,
             return
         
         # Processar com fluxo automático
-        background_tasks.add_task(
-            fluxo_bemobi.processar_imagem,
-            db, user, image_url
+        agendar_verificacao(
+            background_tasks, reserva,
+            fluxo_bemobi.processar_imagens,
+            db, user, image_urls, reserva_admissao=reserva
         )
         
     except Exception as e:
@@ -952,16 +1034,14 @@ async def handle_image_verification(db: Session, user: User, message: Dict[str,
         )
 
 
-async def handle_document_verification(db: Session, user: User, message: Dict[str, Any], background_tasks: BackgroundTasks):
+async def handle_document_verification(db: Session, user: User, paginas: List[Dict[str, Any]], background_tasks: BackgroundTasks,
+                                       reserva: Optional[Reserva] = None):
     """
-    Processa verificação de documento
+    Processa verificação de documento, com uma ou várias páginas
     """
     try:
         # Similar ao handle_image_verification mas para documentos
-        document_data = message.get("document", {})
-        document_id = document_data.get("id")
-        
-        if not document_id:
+        if not all(pagina.get(pagina.get("type"), {}).get("id") for pagina in paginas):
             await whatsapp_service.send_message(
                 phone_number=user.phone_number,
                 message="❌ **Erro**\n\nNão foi possível obter o documento. Tente novamente.",
@@ -971,10 +1051,10 @@ async def handle_document_verification(db: Session, user: User, message: Dict[st
             )
             return
         
-        # Obter URL do documento
-        document_url = await get_media_url(document_id)
+        # Obter URLs dos documentos
+        document_urls = await obter_urls_paginas(paginas)
         
-        if not document_url:
+        if not document_urls:
             await whatsapp_service.send_message(
                 phone_number=user.phone_number,
                 message="❌ **Erro**\n\nNão foi possível acessar o documento. Tente novamente.",
@@ -985,14 +1065,16 @@ async def handle_document_verification(db: Session, user: User, message: Dict[st
             return
         
         # Executar verificação em background
-        background_tasks.add_task(
+        agendar_verificacao(
+            background_tasks, reserva,
             process_verification_background,
-            db, user, image_url=document_url, user_id=str(user.id)
+            db, user, image_urls=document_urls, user_id=str(user.id)
         )
         
+        recebido = "Documento recebido" if len(document_urls) == 1 else f"{len(document_urls)} páginas recebidas"
         await whatsapp_service.send_message(
             phone_number=user.phone_number,
-            message="📄 **Documento recebido - Bemobi**\n\nIniciando análise com nossos agentes especializados da Bemobi...\n\n⏳ Aguarde alguns segundos...",
+            message=f"📄 **{recebido} - Bemobi**\n\nIniciando análise com nossos agentes especializados da Bemobi...\n\n⏳ Aguarde alguns segundos...",
             log_to_db=True,
             user_id=user.id,
             db=db
@@ -1009,15 +1091,17 @@ async def handle_document_verification(db: Session, user: User, message: Dict[st
         )
 
 
-async def handle_text_verification(db: Session, user: User, message_text: str, background_tasks: BackgroundTasks):
+async def handle_text_verification(db: Session, user: User, message_text: str, background_tasks: BackgroundTasks,
+                                   reserva: Optional[Reserva] = None):
     """
     Processa verificação de texto (dados PIX, etc.)
     """
     try:
         # Processar com fluxo automático
-        background_tasks.add_task(
+        agendar_verificacao(
+            background_tasks, reserva,
             fluxo_bemobi.processar_texto_pix,
-            db, user, message_text
+            db, user, message_text, reserva_admissao=reserva
         )
         
     except Exception as e:
@@ -1079,9 +1163,10 @@ async def get_media_url(media_id: str) -> Optional[str]:
         return None
 
 
-async def process_verification_background(db: Session, user: User, image_url: str = None, texto_pix: str = None, user_id: str = None):
+async def process_verification_background(db: Session, user: User, image_url: str = None, texto_pix: str = None, user_id: str = None,
+                                          image_urls: Optional[List[str]] = None):
     """
-    Processa verificação em background
+    Processa verificação em background (image_urls: páginas de um mesmo documento)
     """
     try:
         logger.info(f"Iniciando verificação em background para usuário {user_id}")
@@ -1089,12 +1174,24 @@ async def process_verification_background(db: Session, user: User, image_url: st
         # Obter serviço de IA
         ai_service = get_ai_service()
         
+        # Atualizações incrementais enquanto os agentes terminam
+        progresso = SinkProgressoWhatsApp(db, user)
+        
         # Executar verificação completa
-        resultado = await ai_service.verificar_cobranca_completa(
-            image_url=image_url,
-            texto_pix=texto_pix,
-            user_id=user_id
-        )
+        try:
+            resultado = await ai_service.verificar_cobranca_completa(
+                image_url=image_url,
+                texto_pix=texto_pix,
+                user_id=user_id,
+                progresso=progresso,
+                image_urls=image_urls
+            )
+        finally:
+            await progresso.finalizar()
+        
+        if resultado.get("imagem_recusada"):
+            await send_retake_request(db, user, resultado["erro"])
+            return
         
         if not resultado.get("sucesso", True):
             await send_verification_error(db, user, resultado.get("erro", "Erro na verificação"))
@@ -1153,6 +1250,22 @@ async def send_verification_result(db: Session, user: User, resultado: Dict[str,
         logger.error(f"Erro ao enviar resultado: {e}")
 
 
+async def send_retake_request(db: Session, user: User, motivo: str):
+    """
+    Pede outra foto quando a imagem foi recusada antes da análise
+    """
+    try:
+        await whatsapp_service.send_message(
+            phone_number=user.phone_number,
+            message=f"📷 **Envie outra foto**\n\n{motivo}",
+            log_to_db=True,
+            user_id=user.id,
+            db=db
+        )
+    except Exception as e:
+        logger.error(f"Erro ao pedir nova foto: {e}")
+
+
 async def send_verification_error(db: Session, user: User, erro: str):
     """
     Envia mensagem de erro da verificação
@@ -14,4 +14,10 @@ class ConfigurationException(CoreException):
 
 class SessionException(CoreException):
     """Exception for session issues"""
-    pass
\ No newline at end of file
+    pass
+
+class PrazoEsgotadoException(CoreException):
+    """Exception for verification stages that ran out of time"""
+    def __init__(self, etapa: str):
+        self.etapa = etapa
+        super().__init__(f"Prazo esgotado na etapa {etapa}")
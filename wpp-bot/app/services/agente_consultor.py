@@ -6,13 +6,22 @@ Responsável por verificar se o dado existe e é legítimo nos sistemas internos
 import os
 import json
 import asyncio
-from typing import Dict, Any, Optional, List
-from groq import Groq
+from typing import Dict, Any, Optional, List, Union
 import logging
 from datetime import datetime, timedelta
 import httpx
 from dotenv import load_dotenv
 
+from app.core.exceptions import PrazoEsgotadoException
+from .construtor_prompt import construtor_prompt, json_compacto
+from .prazo_verificacao import PrazoVerificacao, executar_bloqueante
+from .registro_servicos import obter_groq_client
+from .registros_verificacao import DadosDocumento, normalizar_texto, formatar_reais
+from .indice_similaridade import IndiceSimilaridade
+from .perfil_pagamentos import perfil_pagamentos, PerfilCliente
+from .sistemas_bemobi import sistemas_bemobi
+from .indice_cobrancas import IndiceCobrancas
+
 # Carregar variáveis de ambiente
 load_dotenv()
 
@@ -20,76 +29,37 @@ logger = logging.getLogger(__name__)
 
 class AgenteConsultor:
     def __init__(self):
-        self.groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
         self.model = "llama-3.1-8b-instant"
+        self.limiar_imitacao = float(os.getenv("SIMILARIDADE_LIMIAR_IMITACAO", "0.5"))
         
-        # Simulação de sistemas Bemobi (em produção seria APIs reais)
-        self.sistemas_bemobi = {
-            "clientes_ativos": {},
-            "cobrancas_pendentes": {},
-            "beneficiarios_legitimos": {},
-            "historico_pagamentos": {}
-        }
+        # Sistemas Bemobi por adaptador (local ou HTTP), com cache e consultas em lote
+        self.sistemas = sistemas_bemobi
         
-        # Inicializar dados de exemplo
-        self._inicializar_dados_exemplo()
+        # Índice de nomes parecidos para detectar imitações dos beneficiários legítimos
+        self._catalogo_indexado = None
+        self.indice_beneficiarios = IndiceSimilaridade(())
     
-    def _inicializar_dados_exemplo(self):
-        """Inicializa dados de exemplo para simulação"""
-        # Clientes ativos
-        self.sistemas_bemobi["clientes_ativos"] = {
-            "12345678901": {
-                "nome": "João Silva",
-                "servicos": ["streaming", "internet"],
-                "status": "ativo",
-                "ultimo_pagamento": "2024-11-15"
-            },
-            "98765432100": {
-                "nome": "Maria Santos",
-                "servicos": ["streaming"],
-                "status": "ativo", 
-                "ultimo_pagamento": "2024-11-10"
-            }
-        }
-        
-        # Cobranças pendentes
-        self.sistemas_bemobi["cobrancas_pendentes"] = {
-            "12345678901": [
-                {
-                    "valor": 89.90,
-                    "servico": "streaming",
-                    "vencimento": "2024-12-15",
-                    "status": "pendente"
-                }
-            ],
-            "98765432100": [
-                {
-                    "valor": 89.90,
-                    "servico": "streaming", 
-                    "vencimento": "2024-12-10",
-                    "status": "pendente"
-                }
-            ]
-        }
-        
-        # Beneficiários legítimos
-        self.sistemas_bemobi["beneficiarios_legitimos"] = {
-            "Bemobi Tecnologia": {
-                "cnpj": "12.345.678/0001-90",
-                "status": "ativo",
-                "servicos": ["streaming", "internet"]
-            },
-            "Bemobi Streaming": {
-                "cnpj": "98.765.432/0001-10", 
-                "status": "ativo",
-                "servicos": ["streaming"]
-            }
-        }
+    @property
+    def groq_client(self):
+        """Cliente Groq compartilhado, criado no primeiro uso"""
+        return obter_groq_client()
+
+    def _indexar_beneficiarios(self, beneficiarios: Dict[str, Dict[str, Any]]) -> IndiceSimilaridade:
+        """Reconstrói o índice de similaridade quando o catálogo de beneficiários muda"""
+        if beneficiarios is not self._catalogo_indexado:
+            self.indice_beneficiarios = IndiceSimilaridade((nome, nome) for nome in beneficiarios)
+            self._catalogo_indexado = beneficiarios
+        return self.indice_beneficiarios
     
-    async def validar_cobranca(self, dados_extraidos: Dict[str, Any], user_id: str) -> Dict[str, Any]:
+    async def validar_cobranca(self,
+                               dados_extraidos: Union[DadosDocumento, Dict[str, Any]],
+                               user_id: str,
+                               usar_ia: bool = True,
+                               prazo: Optional[PrazoVerificacao] = None) -> Dict[str, Any]:
         """Valida cobrança nos sistemas Bemobi"""
         try:
             logger.info(f"Agente Consultor: Validando cobrança para usuário {user_id}")
+            documento = DadosDocumento.garantir(dados_extraidos)
             
             resultado = {
                 "agente": "consultor",
@@ -100,28 +70,40 @@ class AgenteConsultor:
                 "user_id": user_id
             }
             
-            # 1. Verificar se cliente tem cobrança aberta
-            validacao_cliente = await self._verificar_cliente(user_id, dados_extraidos)
-            resultado["validacoes"]["cliente"] = validacao_cliente
-            
-            # 2. Verificar se beneficiário é legítimo
-            validacao_beneficiario = await self._verificar_beneficiario(dados_extraidos)
-            resultado["validacoes"]["beneficiario"] = validacao_beneficiario
-            
-            # 3. Verificar valor da cobrança
-            validacao_valor = await self._verificar_valor(user_id, dados_extraidos)
-            resultado["validacoes"]["valor"] = validacao_valor
+            # Uma única consulta aos sistemas Bemobi: ficha do cliente e catálogo de beneficiários em paralelo
+            ficha, beneficiarios = await asyncio.gather(
+                self.sistemas.obter_cliente(user_id),
+                self.sistemas.listar_beneficiarios(),
+                return_exceptions=True
+            )
+            perfil = self._obter_perfil(user_id)
+            validacoes = resultado["validacoes"]
+            
+            if isinstance(ficha, BaseException):
+                validacoes["cliente"] = validacoes["valor"] = validacoes["historico"] = self._erro_sistemas(ficha)
+            else:
+                # 1. Verificar se cliente tem cobrança aberta
+                validacoes["cliente"] = await self._verificar_cliente(ficha, documento)
+                
+                # 2. Verificar valor da cobrança (contra cobranças pendentes e o perfil de pagamentos)
+                cobrancas = self.sistemas.indice_cobrancas(user_id, ficha)
+                validacoes["valor"] = await self._verificar_valor(cobrancas, documento, perfil)
+                
+                # 3. Verificar histórico do cliente
+                validacoes["historico"] = await self._verificar_historico(ficha, documento, perfil)
             
-            # 4. Verificar histórico do cliente
-            validacao_historico = await self._verificar_historico(user_id, dados_extraidos)
-            resultado["validacoes"]["historico"] = validacao_historico
+            # 4. Verificar se beneficiário é legítimo
+            if isinstance(beneficiarios, BaseException):
+                validacoes["beneficiario"] = self._erro_sistemas(beneficiarios)
+            else:
+                validacoes["beneficiario"] = await self._verificar_beneficiario(documento, beneficiarios)
             
             # Gerar alertas baseados nas validações
             resultado["alertas"] = self._gerar_alertas(resultado["validacoes"])
             
-            # Análise final com IA
-            analise_final = await self._analisar_validacao_com_ia(resultado)
-            resultado["analise_ia"] = analise_final
+            # Análise final com IA (adiada no modo de veredito rápido)
+            if usar_ia:
+                await self.enriquecer_com_ia(resultado, prazo)
             
             logger.info(f"Agente Consultor: Validação concluída para usuário {user_id}")
             return resultado
@@ -134,11 +116,10 @@ class AgenteConsultor:
                 "sucesso": False
             }
     
-    async def _verificar_cliente(self, user_id: str, dados: Dict[str, Any]) -> Dict[str, Any]:
+    async def _verificar_cliente(self, ficha: Optional[Dict[str, Any]], documento: DadosDocumento) -> Dict[str, Any]:
         """Verifica se o cliente tem cobranças pendentes"""
         try:
-            # Simular consulta ao sistema de clientes
-            cliente = self.sistemas_bemobi["clientes_ativos"].get(user_id)
+            cliente = (ficha or {}).get("cliente")
             
             if not cliente:
                 return {
@@ -147,7 +128,7 @@ class AgenteConsultor:
                     "confiabilidade": 0
                 }
             
-            cobrancas = self.sistemas_bemobi["cobrancas_pendentes"].get(user_id, [])
+            cobrancas = ficha.get("cobrancas") or []
             
             if not cobrancas:
                 return {
@@ -170,12 +151,14 @@ class AgenteConsultor:
                 "confiabilidade": 0
             }
     
-    async def _verificar_beneficiario(self, dados: Dict[str, Any]) -> Dict[str, Any]:
+    async def _verificar_beneficiario(self,
+                                      documento: DadosDocumento,
+                                      beneficiarios: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
         """Verifica se o beneficiário é legítimo"""
         try:
-            beneficiario = dados.get("nome_beneficiario", "")
+            beneficiario = documento.beneficiario
             
-            if not beneficiario:
+            if not documento.beneficiario_normalizado:
                 return {
                     "status": "beneficiario_nao_identificado",
                     "mensagem": "Beneficiário não identificado no documento",
@@ -183,8 +166,8 @@ class AgenteConsultor:
                 }
             
             # Verificar se está na lista de beneficiários legítimos
-            for nome_legitimo, info in self.sistemas_bemobi["beneficiarios_legitimos"].items():
-                if nome_legitimo.lower() in beneficiario.lower():
+            for nome_legitimo, info in beneficiarios.items():
+                if normalizar_texto(nome_legitimo) in documento.beneficiario_normalizado:
                     return {
                         "status": "beneficiario_legitimo",
                         "mensagem": f"Beneficiário {nome_legitimo} é legítimo",
@@ -192,6 +175,21 @@ class AgenteConsultor:
                         "dados_beneficiario": info
                     }
             
+            # Nome quase igual ao de um beneficiário legítimo: provável imitação
+            similares = self._indexar_beneficiarios(beneficiarios).buscar(beneficiario, similaridade_minima=self.limiar_imitacao)
+            if similares:
+                nome_imitado = similares[0]["identificador"]
+                return {
+                    "status": "beneficiario_imitacao",
+                    "mensagem": f"Beneficiário '{beneficiario}' imita '{nome_imitado}' "
+                                f"({similares[0]['similaridade']:.0%} de similaridade)",
+                    "confiabilidade": 0,
+                    "nomes_parecidos": [
+                        {"nome": similar["identificador"], "similaridade": similar["similaridade"]}
+                        for similar in similares
+                    ]
+                }
+            
             return {
                 "status": "beneficiario_nao_legitimo",
                 "mensagem": f"Beneficiário '{beneficiario}' não é legítimo",
@@ -205,51 +203,95 @@ class AgenteConsultor:
                 "confiabilidade": 0
             }
     
-    async def _verificar_valor(self, user_id: str, dados: Dict[str, Any]) -> Dict[str, Any]:
+    def _obter_perfil(self, user_id: str) -> Optional[PerfilCliente]:
+        """Perfil de pagamentos do cliente; sem perfil, as validações usam só os sistemas Bemobi"""
+        try:
+            return perfil_pagamentos.obter(user_id)
+        except Exception as e:
+            logger.warning(f"Agente Consultor: Perfil de pagamentos indisponível - {e}")
+            return None
+    
+    def _erro_sistemas(self, erro: BaseException) -> Dict[str, Any]:
+        """Validação de quando os sistemas Bemobi não responderam"""
+        logger.error(f"Agente Consultor: Sistemas Bemobi indisponíveis - {erro!r}")
+        return {
+            "status": "erro_verificacao",
+            "mensagem": "Sistemas Bemobi indisponíveis no momento",
+            "confiabilidade": 0
+        }
+    
+    async def _verificar_valor(self,
+                               cobrancas: IndiceCobrancas,
+                               documento: DadosDocumento,
+                               perfil: Optional[PerfilCliente] = None) -> Dict[str, Any]:
         """Verifica se o valor da cobrança está correto"""
         try:
-            valor_cobranca = dados.get("valor_cobrado", "")
-            
-            if not valor_cobranca:
+            if not documento.valor_texto:
                 return {
                     "status": "valor_nao_identificado",
                     "mensagem": "Valor não identificado no documento",
                     "confiabilidade": 10
                 }
             
-            # Extrair valor numérico
-            valor_numerico = self._extrair_valor_numerico(valor_cobranca)
+            centavos = documento.valor_centavos
             
-            if not valor_numerico:
+            if not centavos:
                 return {
                     "status": "valor_invalido",
                     "mensagem": "Valor em formato inválido",
                     "confiabilidade": 5
                 }
             
-            # Verificar se valor bate com cobranças pendentes
-            cobrancas = self.sistemas_bemobi["cobrancas_pendentes"].get(user_id, [])
+            # Verificar se valor bate com cobranças pendentes (busca binária no índice por valor)
+            exatas = cobrancas.buscar(centavos, tolerancia_centavos=0, vencimento=documento.data_vencimento)
+            if exatas:
+                return {
+                    "status": "valor_correto",
+                    "mensagem": f"Valor {formatar_reais(centavos)} confere com cobrança pendente",
+                    "confiabilidade": 95,
+                    "cobranca_correspondente": exatas[0]["cobranca"]
+                }
             
-            for cobranca in cobrancas:
-                if abs(cobranca["valor"] - valor_numerico) < 0.01:  # Tolerância de 1 centavo
+            if documento.data_vencimento:
+                # Mesmo valor, mas vencimento distante do documento
+                mesmo_valor = cobrancas.buscar(centavos, tolerancia_centavos=0, limite=1)
+                if mesmo_valor:
+                    cobranca = mesmo_valor[0]["cobranca"]
                     return {
-                        "status": "valor_correto",
-                        "mensagem": f"Valor R$ {valor_numerico:.2f} confere com cobrança pendente",
-                        "confiabilidade": 95,
+                        "status": "valor_correto_vencimento_divergente",
+                        "mensagem": f"Valor {formatar_reais(centavos)} confere com cobrança pendente, "
+                                    f"mas o vencimento difere ({cobranca.get('vencimento')})",
+                        "confiabilidade": 60,
                         "cobranca_correspondente": cobranca
                     }
             
+            proximas = cobrancas.buscar(centavos, vencimento=documento.data_vencimento)
+            if proximas:
+                cobranca = proximas[0]["cobranca"]
+                return {
+                    "status": "valor_aproximado",
+                    "mensagem": f"Valor {formatar_reais(centavos)} difere em "
+                                f"{formatar_reais(proximas[0]['diferenca_centavos'])} de uma cobrança pendente",
+                    "confiabilidade": 50,
+                    "cobranca_correspondente": cobranca
+                }
+            
+            # Comparar com o que o cliente costuma pagar (escore z do perfil)
+            avaliacao_perfil = perfil_pagamentos.avaliar_valor(perfil, centavos)
+            if avaliacao_perfil:
+                return avaliacao_perfil
+            
             # Verificar se valor está dentro de faixa esperada
-            if 50 <= valor_numerico <= 200:  # Faixa típica de serviços Bemobi
+            if 5000 <= centavos <= 20000:  # Faixa típica de serviços Bemobi (R$ 50 a R$ 200)
                 return {
                     "status": "valor_suspeito",
-                    "mensagem": f"Valor R$ {valor_numerico:.2f} não confere com cobranças pendentes",
+                    "mensagem": f"Valor {formatar_reais(centavos)} não confere com cobranças pendentes",
                     "confiabilidade": 30
                 }
             
             return {
                 "status": "valor_muito_alto",
-                "mensagem": f"Valor R$ {valor_numerico:.2f} muito alto para serviços Bemobi",
+                "mensagem": f"Valor {formatar_reais(centavos)} muito alto para serviços Bemobi",
                 "confiabilidade": 10
             }
             
@@ -260,10 +302,18 @@ class AgenteConsultor:
                 "confiabilidade": 0
             }
     
-    async def _verificar_historico(self, user_id: str, dados: Dict[str, Any]) -> Dict[str, Any]:
+    async def _verificar_historico(self,
+                                   ficha: Optional[Dict[str, Any]],
+                                   documento: DadosDocumento,
+                                   perfil: Optional[PerfilCliente] = None) -> Dict[str, Any]:
         """Verifica histórico do cliente"""
         try:
-            cliente = self.sistemas_bemobi["clientes_ativos"].get(user_id)
+            # Beneficiários a quem o cliente já pagou
+            avaliacao_perfil = perfil_pagamentos.avaliar_beneficiario(perfil, documento.beneficiario_normalizado)
+            if avaliacao_perfil:
+                return avaliacao_perfil
+            
+            cliente = (ficha or {}).get("cliente")
             
             if not cliente:
                 return {
@@ -310,19 +360,6 @@ class AgenteConsultor:
                 "confiabilidade": 0
             }
     
-    def _extrair_valor_numerico(self, valor_str: str) -> Optional[float]:
-        """Extrai valor numérico de string"""
-        try:
-            # Remover R$ e espaços
-            valor_limpo = valor_str.replace("R$", "").replace(" ", "").strip()
-            
-            # Substituir vírgula por ponto para conversão
-            valor_limpo = valor_limpo.replace(",", ".")
-            
-            return float(valor_limpo)
-        except (ValueError, AttributeError):
-            return None
-    
     def _gerar_alertas(self, validacoes: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Gera alertas baseados nas validações"""
         alertas = []
@@ -347,25 +384,37 @@ class AgenteConsultor:
         
         return alertas
     
-    async def _analisar_validacao_com_ia(self, resultado: Dict[str, Any]) -> Dict[str, Any]:
+    async def enriquecer_com_ia(self, resultado: Dict[str, Any], prazo: Optional[PrazoVerificacao] = None) -> Dict[str, Any]:
+        """Adiciona a análise da IA a uma validação já concluída"""
+        resultado["analise_ia"] = await self._analisar_validacao_com_ia(resultado, prazo)
+        return resultado
+    
+    async def _analisar_validacao_com_ia(self,
+                                         resultado: Dict[str, Any],
+                                         prazo: Optional[PrazoVerificacao] = None) -> Dict[str, Any]:
         """Análise final usando IA da Groq"""
         try:
-            prompt = f"""
-            Analise os resultados da validação nos sistemas Bemobi:
-            
-            Validações realizadas: {json.dumps(resultado['validacoes'], ensure_ascii=False, indent=2)}
-            Alertas gerados: {json.dumps(resultado['alertas'], ensure_ascii=False, indent=2)}
-            
-            Forneça uma análise consolidada incluindo:
-            1. Pontuação geral de confiabilidade (0-100)
-            2. Principais riscos identificados
-            3. Recomendações para o cliente
-            4. Próximos passos sugeridos
-            
-            Responda em formato JSON estruturado.
-            """
+            prompt = construtor_prompt.montar(
+                "consultor",
+                "Analise os resultados da validação nos sistemas Bemobi (status, confiabilidade).",
+                [
+                    ("Validações", json_compacto(construtor_prompt.compactar_validacoes(resultado["validacoes"])), True),
+                    ("Alertas", json_compacto(construtor_prompt.compactar_alertas(resultado["alertas"])), False)
+                ],
+                """
+                Forneça uma análise consolidada incluindo:
+                1. Pontuação geral de confiabilidade (0-100)
+                2. Principais riscos identificados
+                3. Recomendações para o cliente
+                4. Próximos passos sugeridos
+                
+                Responda em formato JSON estruturado.
+                """
+            )
             
-            response = self.groq_client.chat.completions.create(
+            response = await executar_bloqueante(
+                prazo, "consultor_ia",
+                self.groq_client.chat.completions.create,
                 messages=[{"role": "user", "content": prompt}],
                 model=self.model,
                 temperature=0.1
@@ -378,6 +427,8 @@ class AgenteConsultor:
             except json.JSONDecodeError:
                 return {"analise_texto": analise, "tipo": "texto"}
                 
+        except PrazoEsgotadoException as e:
+            return {"status": "prazo_esgotado", "erro": e.message}
         except Exception as e:
             logger.error(f"Erro na análise com IA: {e}")
             return {"erro": f"Erro na análise IA: {str(e)}"}
@@ -6,13 +6,25 @@ Responsável por identificar padrões de golpe que vão além dos dados internos
 import os
 import json
 import asyncio
-from typing import Dict, Any, Optional, List
-from groq import Groq
+from typing import Dict, Any, Optional, List, Union, Tuple
 import logging
 from datetime import datetime, timedelta
 import re
 from dotenv import load_dotenv
 
+from app.core.exceptions import PrazoEsgotadoException
+from .construtor_prompt import construtor_prompt, json_compacto
+from .prazo_verificacao import PrazoVerificacao, executar_bloqueante
+from .registro_servicos import obter_groq_client
+from .registros_verificacao import DadosDocumento, formatar_reais
+from .base_fraudes import base_fraudes, CATEGORIA_BENEFICIARIO, CATEGORIA_RECLAMACAO
+from .denuncias_fraude import armazem_denuncias, chaves_denuncia, TIPOS_INSTRUMENTO
+from .lista_bloqueio import lista_bloqueio
+from .tendencias_golpes import monitor_tendencias
+from .grafo_entidades import grafo_entidades
+from .motor_regras import motor_regras
+from .sistemas_bemobi import sistemas_bemobi
+
 # Carregar variáveis de ambiente
 load_dotenv()
 
@@ -20,93 +32,28 @@ logger = logging.getLogger(__name__)
 
 class AgenteDetetive:
     def __init__(self):
-        self.groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
         self.model = "llama-3.1-8b-instant"
+        self.limiar_similaridade = float(os.getenv("SIMILARIDADE_LIMIAR_SUSPEITO", "0.6"))
         
-        # Bases de dados de fraudes (em produção seria APIs reais)
-        self.bases_fraudes = {
-            "golpes_reportados": {},
-            "beneficiarios_suspeitos": {},
-            "padroes_anomalos": {},
-            "reclamacoes_mercado": {}
-        }
-        
-        # Inicializar dados de exemplo
-        self._inicializar_bases_fraudes()
-    
-    def _inicializar_bases_fraudes(self):
-        """Inicializa bases de dados de fraudes com exemplos"""
-        # Golpes reportados por usuários
-        self.bases_fraudes["golpes_reportados"] = {
-            "12345678901": [
-                {
-                    "tipo": "boleto_falso",
-                    "valor": 150.00,
-                    "beneficiario": "Empresa Falsa LTDA",
-                    "data_reportado": "2024-11-20",
-                    "status": "confirmado"
-                }
-            ],
-            "98765432100": [
-                {
-                    "tipo": "pix_suspeito",
-                    "chave": "golpista@email.com",
-                    "valor": 200.00,
-                    "data_reportado": "2024-11-15",
-                    "status": "confirmado"
-                }
-            ]
-        }
-        
-        # Beneficiários suspeitos
-        self.bases_fraudes["beneficiarios_suspeitos"] = {
-            "Empresa Falsa LTDA": {
-                "cnpj": "00.000.000/0001-00",
-                "motivo": "CNPJ inválido",
-                "relatos": 5,
-                "status": "bloqueado"
-            },
-            "Golpista Silva": {
-                "cpf": "000.000.000-00",
-                "motivo": "Nome falso",
-                "relatos": 3,
-                "status": "bloqueado"
-            }
-        }
-        
-        # Padrões anômalos conhecidos
-        self.bases_fraudes["padroes_anomalos"] = {
-            "valores_suspeitos": [300.00, 500.00, 1000.00],  # Valores típicos de golpes
-            "horarios_suspeitos": ["03:00", "04:00", "05:00"],  # Horários de madrugada
-            "palavras_suspeitas": [
-                "urgente", "imediato", "bloqueio", "suspensão",
-                "multa", "juros", "desconto", "promoção",
-                "limite", "bloqueio", "suspensão"
-            ]
-        }
-        
-        # Reclamações do mercado
-        self.bases_fraudes["reclamacoes_mercado"] = {
-            "procon": [
-                {
-                    "empresa": "Empresa Falsa LTDA",
-                    "reclamacoes": 15,
-                    "motivo": "Cobrança indevida"
-                }
-            ],
-            "bacen": [
-                {
-                    "cnpj": "00.000.000/0001-00",
-                    "status": "irregular",
-                    "motivo": "CNPJ cancelado"
-                }
-            ]
-        }
+        # Beneficiários suspeitos e reclamações do mercado ficam na base de
+        # fraudes indexada (base_fraudes), as denúncias dos usuários no armazém
+        # de denúncias e os padrões anômalos e pesos no motor de regras
     
-    async def detectar_fraudes(self, dados_extraidos: Dict[str, Any], user_id: str) -> Dict[str, Any]:
+    @property
+    def groq_client(self):
+        """Cliente Groq compartilhado, criado no primeiro uso"""
+        return obter_groq_client()
+
+    async def detectar_fraudes(self,
+                               dados_extraidos: Union[DadosDocumento, Dict[str, Any]],
+                               user_id: str,
+                               usar_ia: bool = True,
+                               prazo: Optional[PrazoVerificacao] = None) -> Dict[str, Any]:
         """Detecta padrões de fraude nos dados"""
         try:
             logger.info(f"Agente Detetive: Analisando fraudes para usuário {user_id}")
+            documento = DadosDocumento.garantir(dados_extraidos)
+            texto_ocr = dados_extraidos.get("texto_ocr", "") if isinstance(dados_extraidos, dict) else ""
             
             resultado = {
                 "agente": "detetive",
@@ -118,35 +65,55 @@ class AgenteDetetive:
                 "user_id": user_id
             }
             
-            # 1. Verificar golpes reportados pelo usuário
-            analise_golpes_usuario = await self._verificar_golpes_usuario(user_id, dados_extraidos)
-            resultado["analises"]["golpes_usuario"] = analise_golpes_usuario
+            # Identificadores do meio de pagamento (chave PIX, código de barras, CNPJ/CPF),
+            # sem os dos beneficiários legítimos que boletos falsos copiam
+            chaves = chaves_denuncia(
+                dados_extraidos if isinstance(dados_extraidos, dict) else documento,
+                await sistemas_bemobi.identificadores_legitimos()
+            )
+            
+            # 1. Verificar denúncias de golpe feitas por qualquer usuário
+            analise_denuncias = await self._verificar_denuncias(user_id, chaves)
+            resultado["analises"]["denuncias"] = analise_denuncias
             
             # 2. Verificar beneficiários suspeitos
-            analise_beneficiario = await self._verificar_beneficiario_suspeito(dados_extraidos)
+            analise_beneficiario = await self._verificar_beneficiario_suspeito(documento)
             resultado["analises"]["beneficiario"] = analise_beneficiario
             
-            # 3. Detectar padrões anômalos
-            analise_padroes = await self._detectar_padroes_anomalos(dados_extraidos)
+            # 3. Detectar padrões anômalos (e o horário, avaliado pelas mesmas regras)
+            analise_padroes, analise_horario = self._aplicar_regras(documento, texto_ocr)
             resultado["analises"]["padroes"] = analise_padroes
             
             # 4. Verificar reclamações do mercado
-            analise_reclamacoes = await self._verificar_reclamacoes_mercado(dados_extraidos)
+            analise_reclamacoes = await self._verificar_reclamacoes_mercado(documento)
             resultado["analises"]["reclamacoes"] = analise_reclamacoes
             
             # 5. Análise de horário suspeito
-            analise_horario = await self._analisar_horario_suspeito()
             resultado["analises"]["horario"] = analise_horario
             
+            # 6. Listas externas de golpes conhecidos
+            resultado["analises"]["lista_bloqueio"] = self._verificar_lista_bloqueio(chaves)
+            
+            # 7. Rede de identificadores ligados a denúncias e bloqueios
+            resultado["analises"]["rede"] = self._verificar_rede(
+                chaves, bool(resultado["analises"]["lista_bloqueio"].get("identificadores"))
+            )
+            
+            # 8. Velocidade: muitos usuários verificando o mesmo identificador
+            usuarios_na_janela = monitor_tendencias.registrar(
+                monitor_tendencias.chaves_documento(documento, chaves), user_id
+            )
+            resultado["analises"]["tendencia"] = monitor_tendencias.avaliar(usuarios_na_janela)
+            
             # Calcular pontuação de risco
             resultado["pontuacao_risco"] = self._calcular_pontuacao_risco(resultado["analises"])
             
             # Gerar alertas de fraude
             resultado["alertas_fraude"] = self._gerar_alertas_fraude(resultado["analises"])
             
-            # Análise final com IA
-            analise_final = await self._analisar_fraude_com_ia(resultado)
-            resultado["analise_ia"] = analise_final
+            # Análise final com IA (adiada no modo de veredito rápido)
+            if usar_ia:
+                await self.enriquecer_com_ia(resultado, prazo)
             
             logger.info(f"Agente Detetive: Análise concluída - Risco: {resultado['pontuacao_risco']}%")
             return resultado
@@ -159,67 +126,114 @@ class AgenteDetetive:
                 "sucesso": False
             }
     
-    async def _verificar_golpes_usuario(self, user_id: str, dados: Dict[str, Any]) -> Dict[str, Any]:
-        """Verifica se o usuário já reportou golpes similares"""
+    async def reavaliar_instrumentos(self,
+                                     dados_extraidos: Union[DadosDocumento, Dict[str, Any]],
+                                     user_id: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Sinais atuais dos identificadores do documento (denúncias, lista de
+        bloqueio e rede), sem OCR, regras nem IA
+        
+        Usado antes de repetir um veredito gravado: denúncias e bloqueios
+        posteriores à verificação original precisam valer para a repetição.
+        Só devolve as análises com risco.
+        """
+        chaves = chaves_denuncia(dados_extraidos, await sistemas_bemobi.identificadores_legitimos())
+        analises = {
+            "denuncias": await self._verificar_denuncias(user_id, chaves),
+            "lista_bloqueio": self._verificar_lista_bloqueio(chaves)
+        }
+        try:
+            grafo_entidades.sincronizar()
+            analises["rede"] = grafo_entidades.avaliar(chaves)
+        except Exception as e:
+            logger.warning(f"Agente Detetive: Falha ao consultar a rede na reavaliação - {e}")
+        return {nome: analise for nome, analise in analises.items() if analise.get("risco", 0) > 0}
+    
+    def _verificar_lista_bloqueio(self, chaves: Dict[str, str]) -> Dict[str, Any]:
+        """Verifica os identificadores do meio de pagamento na lista de bloqueio"""
         try:
-            golpes_usuario = self.bases_fraudes["golpes_reportados"].get(user_id, [])
-            
-            if not golpes_usuario:
+            encontrados = lista_bloqueio.verificar(
+                {tipo: chave for tipo, chave in chaves.items() if tipo in TIPOS_INSTRUMENTO}
+            )
+            if encontrados:
+                descricoes = {"codigo_barras": "código de barras", "chave_pix": "chave PIX", "documento": "CNPJ/CPF"}
                 return {
-                    "status": "sem_historico_golpes",
-                    "mensagem": "Usuário sem histórico de golpes reportados",
-                    "risco": 0
+                    "status": "identificador_bloqueado",
+                    "mensagem": f"Documento com {', '.join(descricoes[tipo] for tipo in encontrados)} "
+                                f"em lista de golpes conhecidos",
+                    "risco": 95,
+                    "identificadores": encontrados
                 }
+            return {
+                "status": "fora_da_lista",
+                "mensagem": "Nenhum identificador em listas de golpes conhecidos",
+                "risco": 0
+            }
+        except Exception as e:
+            return {
+                "status": "erro_verificacao",
+                "mensagem": f"Erro ao consultar lista de bloqueio: {str(e)}",
+                "risco": 0
+            }
+    
+    def _verificar_rede(self, chaves: Dict[str, str], bloqueado: bool) -> Dict[str, Any]:
+        """Lê o risco da rede dos identificadores (só documentos bloqueados entram no grafo)"""
+        try:
+            grafo_entidades.sincronizar()
+            if bloqueado:
+                grafo_entidades.registrar_bloqueio(chaves)
+            return grafo_entidades.avaliar(chaves)
+        except Exception as e:
+            return {
+                "status": "erro_verificacao",
+                "mensagem": f"Erro ao consultar rede de entidades: {str(e)}",
+                "risco": 0
+            }
+    
+    async def _verificar_denuncias(self, user_id: str, chaves: Dict[str, str]) -> Dict[str, Any]:
+        """Verifica se o documento já foi denunciado como golpe por algum usuário"""
+        try:
+            consulta = armazem_denuncias.consultar(
+                {tipo: chave for tipo, chave in chaves.items() if tipo in TIPOS_INSTRUMENTO}, user_id
+            )
+            contagens = consulta["contagens"]
             
-            # Verificar padrões similares
-            valor_atual = self._extrair_valor_numerico(dados.get("valor_cobrado", ""))
-            beneficiario_atual = dados.get("nome_beneficiario", "")
-            
-            golpes_similares = []
-            for golpe in golpes_usuario:
-                similaridade = 0
-                
-                # Verificar valor similar
-                if valor_atual and golpe.get("valor"):
-                    if abs(valor_atual - golpe["valor"]) < 10:  # Diferença menor que R$ 10
-                        similaridade += 40
-                
-                # Verificar beneficiário similar
-                if beneficiario_atual and golpe.get("beneficiario"):
-                    if beneficiario_atual.lower() in golpe["beneficiario"].lower():
-                        similaridade += 60
-                
-                if similaridade > 50:
-                    golpes_similares.append({
-                        "golpe": golpe,
-                        "similaridade": similaridade
-                    })
-            
-            if golpes_similares:
+            if not contagens:
                 return {
-                    "status": "golpes_similares_encontrados",
-                    "mensagem": f"Encontrados {len(golpes_similares)} golpe(s) similar(es)",
-                    "risco": 90,
-                    "golpes_similares": golpes_similares
+                    "status": "sem_denuncias",
+                    "mensagem": "Nenhuma denúncia de golpe para este documento",
+                    "risco": 0
                 }
             
+            # Só a chave PIX, o código de barras ou o CNPJ/CPF denunciados identificam o golpe
+            tipo = max(contagens, key=lambda t: contagens[t]["usuarios"])
+            risco = 95 if contagens[tipo]["usuarios"] >= 2 else 85
+            
+            descricoes = {
+                "codigo_barras": "Código de barras",
+                "chave_pix": "Chave PIX",
+                "documento": "CNPJ/CPF do beneficiário"
+            }
             return {
-                "status": "historico_diferente",
-                "mensagem": "Histórico de golpes não similar ao atual",
-                "risco": 20
+                "status": "documento_denunciado",
+                "mensagem": f"{descricoes[tipo]} denunciado(a) como golpe por "
+                            f"{contagens[tipo]['usuarios']} usuário(s)",
+                "risco": risco,
+                "denuncias": contagens,
+                "denunciado_pelo_usuario": consulta["denunciado_pelo_usuario"]
             }
             
         except Exception as e:
             return {
                 "status": "erro_verificacao",
-                "mensagem": f"Erro ao verificar golpes: {str(e)}",
+                "mensagem": f"Erro ao verificar denúncias: {str(e)}",
                 "risco": 0
             }
     
-    async def _verificar_beneficiario_suspeito(self, dados: Dict[str, Any]) -> Dict[str, Any]:
+    async def _verificar_beneficiario_suspeito(self, documento: DadosDocumento) -> Dict[str, Any]:
         """Verifica se o beneficiário está na lista de suspeitos"""
         try:
-            beneficiario = dados.get("nome_beneficiario", "")
+            beneficiario = documento.beneficiario_normalizado
             
             if not beneficiario:
                 return {
@@ -229,14 +243,28 @@ class AgenteDetetive:
                 }
             
             # Verificar se está na lista de suspeitos
-            for nome_suspeito, info in self.bases_fraudes["beneficiarios_suspeitos"].items():
-                if nome_suspeito.lower() in beneficiario.lower():
-                    return {
-                        "status": "beneficiario_suspeito",
-                        "mensagem": f"Beneficiário '{nome_suspeito}' está na lista de suspeitos",
-                        "risco": 95,
-                        "dados_suspeito": info
-                    }
+            suspeitos = base_fraudes.buscar_nome(CATEGORIA_BENEFICIARIO, beneficiario)
+            if suspeitos:
+                return {
+                    "status": "beneficiario_suspeito",
+                    "mensagem": f"Beneficiário '{suspeitos[0]['nome']}' está na lista de suspeitos",
+                    "risco": 95,
+                    "dados_suspeito": suspeitos[0]["dados"]
+                }
+            
+            # Nome quase igual ao de um suspeito (variação para escapar da lista)
+            similares = base_fraudes.buscar_similares(beneficiario, similaridade_minima=self.limiar_similaridade)
+            if similares:
+                return {
+                    "status": "beneficiario_similar_suspeito",
+                    "mensagem": f"Beneficiário parecido com '{similares[0]['nome']}' da lista de suspeitos "
+                                f"({similares[0]['similaridade']:.0%} de similaridade)",
+                    "risco": 80,
+                    "dados_suspeito": similares[0]["dados"],
+                    "nomes_parecidos": [
+                        {"nome": similar["nome"], "similaridade": similar["similaridade"]} for similar in similares
+                    ]
+                }
             
             return {
                 "status": "beneficiario_nao_suspeito",
@@ -251,74 +279,44 @@ class AgenteDetetive:
                 "risco": 0
             }
     
-    async def _detectar_padroes_anomalos(self, dados: Dict[str, Any]) -> Dict[str, Any]:
-        """Detecta padrões anômalos nos dados"""
+    def _aplicar_regras(self, documento: DadosDocumento, texto_ocr: str = "") -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Detecta padrões anômalos e horário suspeito com as regras configuradas"""
         try:
-            anomalias = []
-            risco_total = 0
-            
-            # Verificar valor suspeito
-            valor = self._extrair_valor_numerico(dados.get("valor_cobrado", ""))
-            if valor:
-                if valor in self.bases_fraudes["padroes_anomalos"]["valores_suspeitos"]:
-                    anomalias.append({
-                        "tipo": "valor_suspeito",
-                        "descricao": f"Valor R$ {valor:.2f} é típico de golpes",
-                        "risco": 70
-                    })
-                    risco_total += 70
-                elif valor > 500:  # Valores muito altos
-                    anomalias.append({
-                        "tipo": "valor_muito_alto",
-                        "descricao": f"Valor R$ {valor:.2f} muito alto para serviços Bemobi",
-                        "risco": 50
-                    })
-                    risco_total += 50
-            
-            # Verificar palavras suspeitas no texto
-            texto_completo = dados.get("texto_ocr", "")
-            palavras_suspeitas = self.bases_fraudes["padroes_anomalos"]["palavras_suspeitas"]
-            
-            palavras_encontradas = []
-            for palavra in palavras_suspeitas:
-                if palavra.lower() in texto_completo.lower():
-                    palavras_encontradas.append(palavra)
-            
-            if palavras_encontradas:
-                anomalias.append({
-                    "tipo": "palavras_suspeitas",
-                    "descricao": f"Palavras suspeitas encontradas: {', '.join(palavras_encontradas)}",
-                    "risco": 60
-                })
-                risco_total += 60
-            
-            # Verificar qualidade da imagem
-            if dados.get("qualidade_imagem") == "ruim":
-                anomalias.append({
-                    "tipo": "qualidade_imagem",
-                    "descricao": "Imagem de baixa qualidade pode indicar falsificação",
-                    "risco": 40
-                })
-                risco_total += 40
-            
-            return {
-                "status": "analise_concluida",
-                "anomalias": anomalias,
-                "risco_total": min(risco_total, 100),
-                "mensagem": f"Encontradas {len(anomalias)} anomalia(s)"
-            }
-            
+            disparadas = motor_regras.avaliar({
+                "valor_centavos": documento.valor_centavos,
+                "valor_reais": formatar_reais(documento.valor_centavos or 0),
+                "qualidade_imagem": documento.qualidade_imagem,
+                "tipo_documento": documento.tipo_documento,
+                "logotipo_suspeito": documento.logotipo_suspeito,
+                "fonte_suspeita": documento.fonte_suspeita,
+                "hora": datetime.now().hour,
+                "texto": texto_ocr
+            })
         except Exception as e:
-            return {
-                "status": "erro_analise",
-                "mensagem": f"Erro na análise: {str(e)}",
-                "risco_total": 0
-            }
+            erro = {"status": "erro_analise", "mensagem": f"Erro na análise: {str(e)}"}
+            return {**erro, "risco_total": 0}, {**erro, "risco": 0}
+        
+        anomalias = disparadas.get("padroes", [])
+        padroes = {
+            "status": "analise_concluida",
+            "anomalias": anomalias,
+            "risco_total": min(sum(anomalia["risco"] for anomalia in anomalias), 100),
+            "mensagem": f"Encontradas {len(anomalias)} anomalia(s)",
+            "versao_regras": motor_regras.versao
+        }
+        
+        regras_horario = disparadas.get("horario", [])
+        if regras_horario:
+            regra = max(regras_horario, key=lambda r: r["risco"])
+            horario = {"status": regra["tipo"], "mensagem": regra["descricao"], "risco": regra["risco"]}
+        else:
+            horario = {"status": "horario_normal", "mensagem": "Nenhuma regra de horário aplicável", "risco": 0}
+        return padroes, horario
     
-    async def _verificar_reclamacoes_mercado(self, dados: Dict[str, Any]) -> Dict[str, Any]:
+    async def _verificar_reclamacoes_mercado(self, documento: DadosDocumento) -> Dict[str, Any]:
         """Verifica reclamações no mercado"""
         try:
-            beneficiario = dados.get("nome_beneficiario", "")
+            beneficiario = documento.beneficiario_normalizado
             
             if not beneficiario:
                 return {
@@ -328,15 +326,17 @@ class AgenteDetetive:
                 }
             
             # Verificar reclamações no Procon
-            reclamacoes_procon = self.bases_fraudes["reclamacoes_mercado"]["procon"]
-            for reclamacao in reclamacoes_procon:
-                if reclamacao["empresa"].lower() in beneficiario.lower():
-                    return {
-                        "status": "reclamacoes_encontradas",
-                        "mensagem": f"Empresa com {reclamacao['reclamacoes']} reclamações no Procon",
-                        "risco": 80,
-                        "dados_reclamacao": reclamacao
-                    }
+            reclamacoes = [
+                registro["dados"] for registro in base_fraudes.buscar_nome(CATEGORIA_RECLAMACAO, beneficiario)
+                if registro["dados"].get("fonte") == "procon"
+            ]
+            if reclamacoes:
+                return {
+                    "status": "reclamacoes_encontradas",
+                    "mensagem": f"Empresa com {reclamacoes[0].get('reclamacoes', 0)} reclamações no Procon",
+                    "risco": 80,
+                    "dados_reclamacao": reclamacoes[0]
+                }
             
             return {
                 "status": "sem_reclamacoes",
@@ -351,59 +351,10 @@ class AgenteDetetive:
                 "risco": 0
             }
     
-    async def _analisar_horario_suspeito(self) -> Dict[str, Any]:
-        """Analisa se o horário é suspeito"""
-        try:
-            hora_atual = datetime.now().hour
-            horarios_suspeitos = [3, 4, 5]  # 3h, 4h, 5h da manhã
-            
-            if hora_atual in horarios_suspeitos:
-                return {
-                    "status": "horario_suspeito",
-                    "mensagem": f"Horário suspeito: {hora_atual:02d}:00",
-                    "risco": 60
-                }
-            
-            return {
-                "status": "horario_normal",
-                "mensagem": f"Horário normal: {hora_atual:02d}:00",
-                "risco": 5
-            }
-            
-        except Exception as e:
-            return {
-                "status": "erro_analise",
-                "mensagem": f"Erro na análise de horário: {str(e)}",
-                "risco": 0
-            }
-    
     def _calcular_pontuacao_risco(self, analises: Dict[str, Any]) -> int:
-        """Calcula pontuação total de risco"""
+        """Calcula pontuação total de risco com os pesos configurados"""
         try:
-            pontuacao = 0
-            
-            # Golpes do usuário
-            if analises.get("golpes_usuario", {}).get("risco"):
-                pontuacao += analises["golpes_usuario"]["risco"] * 0.3
-            
-            # Beneficiário suspeito
-            if analises.get("beneficiario", {}).get("risco"):
-                pontuacao += analises["beneficiario"]["risco"] * 0.25
-            
-            # Padrões anômalos
-            if analises.get("padroes", {}).get("risco_total"):
-                pontuacao += analises["padroes"]["risco_total"] * 0.2
-            
-            # Reclamações
-            if analises.get("reclamacoes", {}).get("risco"):
-                pontuacao += analises["reclamacoes"]["risco"] * 0.15
-            
-            # Horário
-            if analises.get("horario", {}).get("risco"):
-                pontuacao += analises["horario"]["risco"] * 0.1
-            
-            return min(int(pontuacao), 100)
-            
+            return motor_regras.pontuar(analises)
         except Exception as e:
             logger.error(f"Erro ao calcular pontuação: {e}")
             return 0
@@ -411,11 +362,12 @@ class AgenteDetetive:
     def _gerar_alertas_fraude(self, analises: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Gera alertas de fraude baseados nas análises"""
         alertas = []
+        limite_critica, limite_alta, limite_media = motor_regras.limites_alerta()
         
         for tipo, analise in analises.items():
             risco = analise.get("risco", 0)
             
-            if risco >= 80:
+            if risco >= limite_critica:
                 alertas.append({
                     "tipo": "fraude_alta",
                     "categoria": tipo,
@@ -423,7 +375,7 @@ class AgenteDetetive:
                     "prioridade": "critica",
                     "risco": risco
                 })
-            elif risco >= 50:
+            elif risco >= limite_alta:
                 alertas.append({
                     "tipo": "fraude_media",
                     "categoria": tipo,
@@ -431,7 +383,7 @@ class AgenteDetetive:
                     "prioridade": "alta",
                     "risco": risco
                 })
-            elif risco >= 20:
+            elif risco >= limite_media:
                 alertas.append({
                     "tipo": "fraude_baixa",
                     "categoria": tipo,
@@ -442,42 +394,38 @@ class AgenteDetetive:
         
         return alertas
     
-    def _extrair_valor_numerico(self, valor_str: str) -> Optional[float]:
-        """Extrai valor numérico de string"""
-        try:
-            if not valor_str:
-                return None
-                
-            # Remover R$ e espaços
-            valor_limpo = valor_str.replace("R$", "").replace(" ", "").strip()
-            
-            # Substituir vírgula por ponto para conversão
-            valor_limpo = valor_limpo.replace(",", ".")
-            
-            return float(valor_limpo)
-        except (ValueError, AttributeError):
-            return None
+    async def enriquecer_com_ia(self, resultado: Dict[str, Any], prazo: Optional[PrazoVerificacao] = None) -> Dict[str, Any]:
+        """Adiciona a análise da IA a uma detecção já concluída"""
+        resultado["analise_ia"] = await self._analisar_fraude_com_ia(resultado, prazo)
+        return resultado
     
-    async def _analisar_fraude_com_ia(self, resultado: Dict[str, Any]) -> Dict[str, Any]:
+    async def _analisar_fraude_com_ia(self,
+                                      resultado: Dict[str, Any],
+                                      prazo: Optional[PrazoVerificacao] = None) -> Dict[str, Any]:
         """Análise final usando IA da Groq"""
         try:
-            prompt = f"""
-            Analise os resultados da detecção de fraudes:
-            
-            Análises realizadas: {json.dumps(resultado['analises'], ensure_ascii=False, indent=2)}
-            Pontuação de risco: {resultado['pontuacao_risco']}%
-            Alertas gerados: {json.dumps(resultado['alertas_fraude'], ensure_ascii=False, indent=2)}
-            
-            Forneça uma análise consolidada incluindo:
-            1. Nível de risco geral (baixo/médio/alto/crítico)
-            2. Principais indicadores de fraude
-            3. Recomendações específicas
-            4. Ações preventivas sugeridas
-            
-            Responda em formato JSON estruturado.
-            """
+            prompt = construtor_prompt.montar(
+                "detetive",
+                "Analise os resultados da detecção de fraudes (status, risco).",
+                [
+                    ("Pontuação de risco", f"{resultado['pontuacao_risco']}%", True),
+                    ("Análises realizadas", json_compacto(construtor_prompt.compactar_analises(resultado["analises"])), True),
+                    ("Alertas", json_compacto(construtor_prompt.compactar_alertas(resultado["alertas_fraude"])), False)
+                ],
+                """
+                Forneça uma análise consolidada incluindo:
+                1. Nível de risco geral (baixo/médio/alto/crítico)
+                2. Principais indicadores de fraude
+                3. Recomendações específicas
+                4. Ações preventivas sugeridas
+                
+                Responda em formato JSON estruturado.
+                """
+            )
             
-            response = self.groq_client.chat.completions.create(
+            response = await executar_bloqueante(
+                prazo, "detetive_ia",
+                self.groq_client.chat.completions.create,
                 messages=[{"role": "user", "content": prompt}],
                 model=self.model,
                 temperature=0.1
@@ -490,33 +438,31 @@ class AgenteDetetive:
             except json.JSONDecodeError:
                 return {"analise_texto": analise, "tipo": "texto"}
                 
+        except PrazoEsgotadoException as e:
+            return {"status": "prazo_esgotado", "erro": e.message}
         except Exception as e:
             logger.error(f"Erro na análise com IA: {e}")
             return {"erro": f"Erro na análise IA: {str(e)}"}
     
     async def reportar_fraude(self, user_id: str, dados_fraude: Dict[str, Any]) -> Dict[str, Any]:
-        """Reporta nova fraude para alimentar a base de dados"""
+        """Registra a denúncia no armazém compartilhado, protegendo os demais usuários"""
         try:
-            # Adicionar à base de golpes reportados
-            if user_id not in self.bases_fraudes["golpes_reportados"]:
-                self.bases_fraudes["golpes_reportados"][user_id] = []
-            
-            fraude_reportada = {
-                "tipo": dados_fraude.get("tipo", "desconhecido"),
-                "valor": dados_fraude.get("valor"),
-                "beneficiario": dados_fraude.get("beneficiario"),
-                "data_reportado": datetime.now().isoformat(),
-                "status": "reportado"
-            }
-            
-            self.bases_fraudes["golpes_reportados"][user_id].append(fraude_reportada)
+            resultado = armazem_denuncias.registrar(
+                user_id, dados_fraude, await sistemas_bemobi.identificadores_legitimos()
+            )
+            if not resultado["sucesso"]:
+                return resultado
             
-            logger.info(f"Fraude reportada por usuário {user_id}: {fraude_reportada}")
+            logger.info(f"Fraude reportada por usuário {user_id}: {resultado['tipo']} "
+                        f"({', '.join(resultado['identificadores'])})")
+            # Liga os identificadores denunciados à rede imediatamente neste processo
+            grafo_entidades.sincronizar(forcar=True)
             
             return {
                 "sucesso": True,
                 "mensagem": "Fraude reportada com sucesso",
-                "fraude_id": len(self.bases_fraudes["golpes_reportados"][user_id])
+                "fraude_id": resultado["id_denuncia"],
+                "identificadores": resultado["identificadores"]
             }
             
         except Exception as e:
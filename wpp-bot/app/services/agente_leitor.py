@@ -8,17 +8,17 @@ import re
 import tempfile
 import requests
 from typing import Dict, Any, Optional, List
-from groq import Groq
-import pytesseract
-from PIL import Image
-import cv2
-import numpy as np
-from io import BytesIO
 import logging
 import json
 from datetime import datetime
 from dotenv import load_dotenv
 
+from app.core.exceptions import PrazoEsgotadoException
+from .construtor_prompt import construtor_prompt, json_compacto, FRACAO_OCR
+from .prazo_verificacao import PrazoVerificacao, executar_bloqueante
+from .registro_servicos import obter_groq_client, importar_modulo
+from .pre_validacao_imagem import MENSAGENS, MOTIVO_SEM_TEXTO
+
 # Carregar variáveis de ambiente
 load_dotenv()
 
@@ -26,9 +26,13 @@ logger = logging.getLogger(__name__)
 
 class AgenteLeitor:
     def __init__(self):
-        self.groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
         self.model = "llama-3.1-8b-instant"
         
+    @property
+    def groq_client(self):
+        """Cliente Groq compartilhado, criado no primeiro uso"""
+        return obter_groq_client()
+
     def extrair_dados_estruturados(self, texto_ocr: str) -> Dict[str, Any]:
         """Extrai dados essenciais do documento usando regex e IA"""
         dados = {
@@ -36,6 +40,7 @@ class AgenteLeitor:
             "chave_pix": None,
             "valor_cobrado": None,
             "nome_beneficiario": None,
+            "documento_beneficiario": None,
             "data_vencimento": None,
             "logotipo_suspeito": False,
             "fonte_suspeita": False,
@@ -66,6 +71,12 @@ class AgenteLeitor:
                 r"favorecido.*?([A-Za-zÀ-ÿ\s]{10,50})",
                 r"recebedor.*?([A-Za-zÀ-ÿ\s]{10,50})"
             ],
+            # CNPJ/CPF na linha do beneficiário; senão o primeiro CNPJ rotulado (o pagador costuma ter CPF)
+            "documento_beneficiario": [
+                r"(?:benefici[aá]rio|cedente|favorecido|recebedor)[^\n]{0,120}?(?<!\d)"
+                r"(\d{2}\.?\d{3}\.?\d{3}/?\d{4}-?\d{2}|\d{3}\.?\d{3}\.?\d{3}-?\d{2})(?!\d)",
+                r"cnpj[^\d\n]{0,10}(\d{2}\.?\d{3}\.?\d{3}/?\d{4}-?\d{2})(?!\d)"
+            ],
             "data_vencimento": [
                 r"(\d{2}/\d{2}/\d{4})",
                 r"vencimento.*?(\d{2}/\d{2}/\d{4})",
@@ -119,51 +130,101 @@ class AgenteLeitor:
         
         return suspeitas
     
-    async def processar_imagem(self, image_url: str, user_id: str) -> Dict[str, Any]:
-        """Processa imagem usando OCR e extrai dados estruturados"""
+    async def baixar_imagem(self, image_url: str, prazo: Optional[PrazoVerificacao] = None) -> Dict[str, Any]:
+        """Baixa a imagem (limitado ao prazo da etapa) e retorna seu conteúdo"""
         try:
-            logger.info(f"Agente Leitor: Processando imagem para usuário {user_id}")
-            
-            # Download da imagem
-            response = requests.get(image_url, timeout=30)
+            timeout_download = prazo.timeout(30, "leitor_download") if prazo else 30
+            response = await executar_bloqueante(
+                prazo, "leitor_download", requests.get, image_url, timeout=timeout_download
+            )
             if response.status_code != 200:
-                return {"erro": "Falha ao baixar imagem", "agente": "leitor"}
+                return {"erro": "Falha ao baixar imagem", "agente": "leitor", "sucesso": False}
             
-            # Salvar imagem temporariamente
-            with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as temp_file:
-                temp_file.write(response.content)
-                temp_file_path = temp_file.name
+            return {"sucesso": True, "conteudo": response.content}
             
-            try:
-                # Processar com OCR
-                texto_ocr = await self._extrair_texto_ocr(temp_file_path)
-                
-                # Extrair dados estruturados
-                dados_extraidos = self.extrair_dados_estruturados(texto_ocr)
-                
-                # Análise adicional com IA
-                analise_ia = await self._analisar_com_ia(texto_ocr, dados_extraidos)
-                
-                resultado = {
+        except PrazoEsgotadoException as e:
+            return {
+                "agente": "leitor",
+                "erro": e.message,
+                "prazo_esgotado": True,
+                "sucesso": False
+            }
+        except Exception as e:
+            logger.error(f"Agente Leitor: Erro ao baixar imagem - {e}")
+            return {
+                "agente": "leitor",
+                "erro": f"Erro ao baixar imagem: {str(e)}",
+                "sucesso": False
+            }
+    
+    async def processar_imagem(self,
+                               image_url: str,
+                               user_id: str,
+                               usar_ia: bool = True,
+                               prazo: Optional[PrazoVerificacao] = None,
+                               conteudo: Optional[bytes] = None,
+                               paginas: Optional[List[bytes]] = None) -> Dict[str, Any]:
+        """
+        Processa imagem usando OCR e extrai dados estruturados
+        
+        Se o conteúdo da imagem já tiver sido baixado, o download é evitado.
+        As páginas de um mesmo documento (paginas) são lidas uma a uma e o
+        texto de todas é interpretado junto.
+        """
+        try:
+            logger.info(f"Agente Leitor: Processando imagem para usuário {user_id}")
+            
+            if paginas is None:
+                if conteudo is None:
+                    download = await self.baixar_imagem(image_url, prazo)
+                    if not download.get("sucesso"):
+                        return download
+                    conteudo = download["conteudo"]
+                paginas = [conteudo]
+            
+            # Processar com OCR
+            textos = []
+            for conteudo_pagina in paginas:
+                texto_pagina = await self._ler_pagina(conteudo_pagina, prazo)
+                if texto_pagina.strip():
+                    textos.append(texto_pagina)
+            texto_ocr = "\n\n".join(textos)
+            if not texto_ocr:
+                return {
                     "agente": "leitor",
-                    "sucesso": True,
-                    "texto_ocr": texto_ocr,
-                    "dados_extraidos": dados_extraidos,
-                    "analise_ia": analise_ia,
-                    "timestamp": datetime.now().isoformat(),
-                    "user_id": user_id
+                    "erro": MENSAGENS[MOTIVO_SEM_TEXTO],
+                    "imagem_recusada": True,
+                    "motivo_recusa": MOTIVO_SEM_TEXTO,
+                    "sucesso": False
                 }
-                
-                logger.info(f"Agente Leitor: Dados extraídos com sucesso para usuário {user_id}")
-                return resultado
-                
-            finally:
-                # Limpar arquivo temporário
-                try:
-                    os.unlink(temp_file_path)
-                except Exception:
-                    pass
+            
+            # Extrair dados estruturados
+            dados_extraidos = self.extrair_dados_estruturados(texto_ocr)
+            
+            resultado = {
+                "agente": "leitor",
+                "sucesso": True,
+                "texto_ocr": texto_ocr,
+                "dados_extraidos": dados_extraidos,
+                "paginas": len(paginas),
+                "timestamp": datetime.now().isoformat(),
+                "user_id": user_id
+            }
+            
+            # Análise adicional com IA (adiada no modo de veredito rápido)
+            if usar_ia:
+                await self.enriquecer_com_ia(resultado, prazo)
+            
+            logger.info(f"Agente Leitor: Dados extraídos com sucesso para usuário {user_id}")
+            return resultado
                     
+        except PrazoEsgotadoException as e:
+            return {
+                "agente": "leitor",
+                "erro": e.message,
+                "prazo_esgotado": True,
+                "sucesso": False
+            }
         except Exception as e:
             logger.error(f"Agente Leitor: Erro no processamento - {e}")
             return {
@@ -172,64 +233,100 @@ class AgenteLeitor:
                 "sucesso": False
             }
     
-    async def _extrair_texto_ocr(self, image_path: str) -> str:
+    async def _ler_pagina(self, conteudo: bytes, prazo: Optional[PrazoVerificacao] = None) -> str:
+        """Texto de uma página, via arquivo temporário para o OCR"""
+        # Salvar imagem temporariamente
+        with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as temp_file:
+            temp_file.write(conteudo)
+            temp_file_path = temp_file.name
+        
+        try:
+            return await self._extrair_texto_ocr(temp_file_path, prazo)
+        finally:
+            # Limpar arquivo temporário
+            try:
+                os.unlink(temp_file_path)
+            except Exception:
+                pass
+    
+    async def _extrair_texto_ocr(self, image_path: str, prazo: Optional[PrazoVerificacao] = None) -> str:
         """Extrai texto da imagem usando OCR"""
         try:
-            # Carregar imagem
-            img = cv2.imread(image_path)
-            if img is None:
-                raise ValueError("Não foi possível carregar a imagem")
-            
-            # Pré-processamento da imagem
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            
-            # Aplicar threshold para melhorar a qualidade
-            processed = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
-            
-            # OCR com Tesseract
-            texto_ocr = pytesseract.image_to_string(processed, lang='por')
-            
-            # Se OCR falhou, tentar com imagem original
-            if not texto_ocr.strip():
-                img_pil = Image.open(image_path)
-                texto_ocr = pytesseract.image_to_string(img_pil, lang='por')
-            
+            texto_ocr = await executar_bloqueante(prazo, "leitor_ocr", self._executar_ocr, image_path)
             logger.info(f"OCR extraiu {len(texto_ocr)} caracteres")
-            return texto_ocr.strip()
+            return texto_ocr
             
+        except PrazoEsgotadoException:
+            raise
         except Exception as e:
+            # Sem texto não há o que verificar: nunca analisar um boleto inventado
             logger.warning(f"OCR falhou: {e}")
-            # Fallback: retornar texto simulado para testes
-            return """
-            BANCO DO BRASIL S.A.
-            Vencimento: 15/12/2024
-            Valor: R$ 150,00
-            Nosso Número: 123456789
-            Beneficiário: Bemobi Tecnologia
-            Pagador: João Silva
-            """
+            return ""
+    
+    def _executar_ocr(self, image_path: str) -> str:
+        """Pré-processa a imagem e roda o Tesseract (bloqueante)"""
+        cv2 = importar_modulo("cv2")
+        pytesseract = importar_modulo("pytesseract")
+        
+        # Carregar imagem
+        img = cv2.imread(image_path)
+        if img is None:
+            raise ValueError("Não foi possível carregar a imagem")
+        
+        # Pré-processamento da imagem
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        
+        # Aplicar threshold para melhorar a qualidade
+        processed = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+        
+        # OCR com Tesseract
+        texto_ocr = pytesseract.image_to_string(processed, lang='por')
+        
+        # Se OCR falhou, tentar com imagem original
+        if not texto_ocr.strip():
+            img_pil = importar_modulo("PIL.Image").open(image_path)
+            texto_ocr = pytesseract.image_to_string(img_pil, lang='por')
+        
+        return texto_ocr.strip()
     
-    async def _analisar_com_ia(self, texto_ocr: str, dados_extraidos: Dict[str, Any]) -> Dict[str, Any]:
+    async def enriquecer_com_ia(self, resultado: Dict[str, Any], prazo: Optional[PrazoVerificacao] = None) -> Dict[str, Any]:
+        """Adiciona a análise da IA a um resultado já extraído"""
+        resultado["analise_ia"] = await self._analisar_com_ia(
+            resultado.get("texto_ocr", ""),
+            resultado.get("dados_extraidos", {}),
+            prazo
+        )
+        return resultado
+    
+    async def _analisar_com_ia(self,
+                               texto_ocr: str,
+                               dados_extraidos: Dict[str, Any],
+                               prazo: Optional[PrazoVerificacao] = None) -> Dict[str, Any]:
         """Análise adicional usando IA da Groq"""
         try:
-            prompt = f"""
-            Analise este documento financeiro extraído por OCR e forneça uma análise detalhada:
-            
-            Texto OCR: {texto_ocr}
-            
-            Dados já extraídos: {json.dumps(dados_extraidos, ensure_ascii=False, indent=2)}
-            
-            Forneça uma análise estruturada incluindo:
-            1. Tipo de documento identificado
-            2. Confiabilidade da extração (0-100)
-            3. Elementos suspeitos encontrados
-            4. Qualidade da imagem
-            5. Recomendações para validação
-            
-            Responda em formato JSON estruturado.
-            """
+            orcamento_ocr = int(construtor_prompt.orcamentos["leitor"] * FRACAO_OCR)
+            prompt = construtor_prompt.montar(
+                "leitor",
+                "Analise este documento financeiro extraído por OCR.",
+                [
+                    ("Dados já extraídos", json_compacto(construtor_prompt.compactar_dados_extraidos(dados_extraidos)), True),
+                    ("Texto OCR", construtor_prompt.truncar_texto_ocr(texto_ocr, orcamento_ocr), True)
+                ],
+                """
+                Forneça uma análise estruturada incluindo:
+                1. Tipo de documento identificado
+                2. Confiabilidade da extração (0-100)
+                3. Elementos suspeitos encontrados
+                4. Qualidade da imagem
+                5. Recomendações para validação
+                
+                Responda em formato JSON estruturado.
+                """
+            )
             
-            response = self.groq_client.chat.completions.create(
+            response = await executar_bloqueante(
+                prazo, "leitor_ia",
+                self.groq_client.chat.completions.create,
                 messages=[{"role": "user", "content": prompt}],
                 model=self.model,
                 temperature=0.1
@@ -243,6 +340,8 @@ class AgenteLeitor:
             except json.JSONDecodeError:
                 return {"analise_texto": analise, "tipo": "texto"}
                 
+        except PrazoEsgotadoException as e:
+            return {"status": "prazo_esgotado", "erro": e.message}
         except Exception as e:
             logger.error(f"Erro na análise com IA: {e}")
             return {"erro": f"Erro na análise IA: {str(e)}"}
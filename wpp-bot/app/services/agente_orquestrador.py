@@ -7,12 +7,17 @@ import os
 import json
 import asyncio
 from typing import Dict, Any, Optional, List
-from groq import Groq
 import logging
 from datetime import datetime
 from enum import Enum
 from dotenv import load_dotenv
 
+from app.core.exceptions import PrazoEsgotadoException
+from .construtor_prompt import construtor_prompt, json_compacto
+from .prazo_verificacao import PrazoVerificacao, executar_bloqueante
+from .registro_servicos import obter_groq_client
+from .registros_verificacao import VereditoAgente, PRIORIDADES, resumir_resultado_agente
+
 # Carregar variáveis de ambiente
 load_dotenv()
 
@@ -25,7 +30,6 @@ class StatusVerificacao(Enum):
 
 class AgenteOrquestrador:
     def __init__(self):
-        self.groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
         self.model = "llama-3.1-8b-instant"
         
         # Pesos para cálculo da pontuação final
@@ -34,40 +38,81 @@ class AgenteOrquestrador:
             "consultor": 0.4,   # 40% - Validação nos sistemas
             "detetive": 0.4     # 40% - Detecção de fraudes
         }
+        
+        # Pontuação mínima para cada status (abaixo de "suspeito" é golpe).
+        # Ficam em 90/60, os valores que o sistema sempre usou: baixar para 80/50
+        # marca como seguros mais documentos, e nenhum backtest com rótulos reais
+        # (utils_project/backtest_pontuacao.py) sustentou a troca até agora.
+        # Ajustáveis por ambiente para aplicar o resultado de um backtest
+        self.limiares = {
+            "seguro": int(os.getenv("ORQUESTRADOR_LIMIAR_SEGURO", "90")),
+            "suspeito": int(os.getenv("ORQUESTRADOR_LIMIAR_SUSPEITO", "60"))
+        }
     
+    @property
+    def groq_client(self):
+        """Cliente Groq compartilhado, criado no primeiro uso"""
+        return obter_groq_client()
+
     async def orquestrar_analise(self, 
                                 resultado_leitor: Dict[str, Any],
                                 resultado_consultor: Dict[str, Any], 
                                 resultado_detetive: Dict[str, Any],
-                                user_id: str) -> Dict[str, Any]:
+                                user_id: str,
+                                usar_ia: bool = True,
+                                prazo: Optional[PrazoVerificacao] = None) -> Dict[str, Any]:
         """Orquestra a análise final consolidando todos os agentes"""
         try:
             logger.info(f"Agente Orquestrador: Consolidando análise para usuário {user_id}")
             
+            resultados = {
+                "leitor": resultado_leitor,
+                "consultor": resultado_consultor,
+                "detetive": resultado_detetive
+            }
+            vereditos = {
+                nome: VereditoAgente.de_resultado(nome, resultado) for nome, resultado in resultados.items()
+            }
+            
+            # O resultado final guarda apenas o resumo de cada agente; as análises
+            # de IA ficam num único bloco, sem o texto OCR nem os dados de cadastro
             resultado_final = {
                 "agente": "orquestrador",
                 "sucesso": True,
                 "user_id": user_id,
                 "timestamp": datetime.now().isoformat(),
                 "resultados_agentes": {
-                    "leitor": resultado_leitor,
-                    "consultor": resultado_consultor,
-                    "detetive": resultado_detetive
+                    nome: resumir_resultado_agente(nome, resultado) for nome, resultado in resultados.items()
                 }
             }
+            analises_ia = {
+                nome: resultado["analise_ia"] for nome, resultado in resultados.items() if "analise_ia" in resultado
+            }
+            if analises_ia:
+                resultado_final["analises_ia"] = analises_ia
+            
+            # Agentes que não concluíram dentro do prazo tornam o resultado parcial
+            agentes_expirados = [nome for nome, veredito in vereditos.items() if veredito.prazo_esgotado]
+            resultado_final["resultado_parcial"] = bool(agentes_expirados)
+            resultado_final["agentes_expirados"] = agentes_expirados
             
             # 1. Calcular pontuação de confiança
-            pontuacao_confianca = self._calcular_pontuacao_confianca(
-                resultado_leitor, resultado_consultor, resultado_detetive
-            )
+            pontuacao_confianca = self._calcular_pontuacao_confianca(vereditos)
             resultado_final["pontuacao_confianca"] = pontuacao_confianca
             
-            # 2. Determinar status da verificação
+            # 2. Determinar status da verificação (um resultado parcial nunca é declarado seguro)
             status_verificacao = self._determinar_status_verificacao(pontuacao_confianca)
+            if agentes_expirados and status_verificacao == StatusVerificacao.SEGURO:
+                status_verificacao = StatusVerificacao.SUSPEITO
             resultado_final["status_verificacao"] = status_verificacao.value
             
             # 3. Gerar mensagem para o usuário
             mensagem_usuario = self._gerar_mensagem_usuario(status_verificacao, pontuacao_confianca)
+            if agentes_expirados:
+                mensagem_usuario += (
+                    f"\n\n⏱️ *Análise parcial:* a etapa de {', '.join(agentes_expirados)} "
+                    f"não concluiu a tempo. A confiança considera apenas as etapas concluídas."
+                )
             resultado_final["mensagem_usuario"] = mensagem_usuario
             
             # 4. Gerar recomendações
@@ -75,12 +120,12 @@ class AgenteOrquestrador:
             resultado_final["recomendacoes"] = recomendacoes
             
             # 5. Gerar alertas consolidados
-            alertas_consolidados = self._consolidar_alertas(resultado_final)
+            alertas_consolidados = self._consolidar_alertas(vereditos)
             resultado_final["alertas_consolidados"] = alertas_consolidados
             
-            # 6. Análise final com IA
-            analise_final_ia = await self._analise_final_com_ia(resultado_final)
-            resultado_final["analise_final_ia"] = analise_final_ia
+            # 6. Análise final com IA (adiada no modo de veredito rápido)
+            if usar_ia:
+                await self.enriquecer_com_ia(resultado_final, prazo)
             
             # 7. Gerar dados para interface visual
             dados_visuais = self._gerar_dados_visuais(status_verificacao, pontuacao_confianca)
@@ -97,51 +142,23 @@ class AgenteOrquestrador:
                 "sucesso": False
             }
     
-    def _calcular_pontuacao_confianca(self, 
-                                    resultado_leitor: Dict[str, Any],
-                                    resultado_consultor: Dict[str, Any],
-                                    resultado_detetive: Dict[str, Any]) -> int:
+    def _calcular_pontuacao_confianca(self, vereditos: Dict[str, VereditoAgente]) -> int:
         """Calcula pontuação final de confiança (0-100)"""
         try:
-            pontuacao_total = 0
-            
-            # Pontuação do Agente Leitor (20%)
-            if resultado_leitor.get("sucesso"):
-                qualidade_imagem = resultado_leitor.get("dados_extraidos", {}).get("qualidade_imagem", "boa")
-                if qualidade_imagem == "boa":
-                    pontuacao_total += 20
-                elif qualidade_imagem == "ruim":
-                    pontuacao_total += 5
-                else:
-                    pontuacao_total += 10
-            else:
-                pontuacao_total += 0
-            
-            # Pontuação do Agente Consultor (40%)
-            if resultado_consultor.get("sucesso"):
-                validacoes = resultado_consultor.get("validacoes", {})
-                pontuacao_consultor = 0
-                
-                for tipo, validacao in validacoes.items():
-                    confiabilidade = validacao.get("confiabilidade", 0)
-                    pontuacao_consultor += confiabilidade
-                
-                # Média das validações
-                if validacoes:
-                    pontuacao_consultor = pontuacao_consultor / len(validacoes)
-                
-                pontuacao_total += int(pontuacao_consultor * 0.4)
-            else:
-                pontuacao_total += 0
+            # Leitor 20% (qualidade da extração), consultor 40% (média das
+            # validações) e detetive 40% (inverso do risco de fraude)
+            pontuacao_total = sum(
+                int(veredito.confianca * self.pesos[nome])
+                for nome, veredito in vereditos.items() if veredito.sucesso
+            )
             
-            # Pontuação do Agente Detetive (40%)
-            if resultado_detetive.get("sucesso"):
-                risco_fraude = resultado_detetive.get("pontuacao_risco", 0)
-                # Inverter a pontuação de risco (100 - risco = confiança)
-                confianca_detetive = max(0, 100 - risco_fraude)
-                pontuacao_total += int(confianca_detetive * 0.4)
-            else:
-                pontuacao_total += 0
+            # Agentes que estouraram o prazo não entram na conta: a pontuação é
+            # reescalada sobre o peso dos agentes que concluíram
+            peso_expirado = sum(
+                self.pesos[nome] for nome, veredito in vereditos.items() if veredito.prazo_esgotado
+            )
+            if 0 < peso_expirado < 1:
+                pontuacao_total = int(pontuacao_total / (1 - peso_expirado))
             
             return min(pontuacao_total, 100)
             
@@ -151,9 +168,9 @@ class AgenteOrquestrador:
     
     def _determinar_status_verificacao(self, pontuacao_confianca: int) -> StatusVerificacao:
         """Determina o status da verificação baseado na pontuação"""
-        if pontuacao_confianca >= 90:
+        if pontuacao_confianca >= self.limiares["seguro"]:
             return StatusVerificacao.SEGURO
-        elif pontuacao_confianca >= 60:
+        elif pontuacao_confianca >= self.limiares["suspeito"]:
             return StatusVerificacao.SUSPEITO
         else:
             return StatusVerificacao.GOLPE
@@ -229,35 +246,11 @@ class AgenteOrquestrador:
         
         return recomendacoes
     
-    def _consolidar_alertas(self, resultado: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Consolida alertas de todos os agentes"""
-        alertas = []
-        
-        # Alertas do Consultor
-        if resultado["resultados_agentes"]["consultor"].get("alertas"):
-            for alerta in resultado["resultados_agentes"]["consultor"]["alertas"]:
-                alertas.append({
-                    "fonte": "consultor",
-                    "tipo": alerta.get("tipo", "alerta"),
-                    "mensagem": alerta.get("mensagem", ""),
-                    "prioridade": alerta.get("prioridade", "media")
-                })
-        
-        # Alertas do Detetive
-        if resultado["resultados_agentes"]["detetive"].get("alertas_fraude"):
-            for alerta in resultado["resultados_agentes"]["detetive"]["alertas_fraude"]:
-                alertas.append({
-                    "fonte": "detetive",
-                    "tipo": alerta.get("tipo", "alerta"),
-                    "mensagem": alerta.get("mensagem", ""),
-                    "prioridade": alerta.get("prioridade", "media")
-                })
-        
-        # Ordenar por prioridade
-        prioridades = {"critica": 0, "alta": 1, "media": 2, "baixa": 3}
-        alertas.sort(key=lambda x: prioridades.get(x.get("prioridade", "media"), 2))
-        
-        return alertas
+    def _consolidar_alertas(self, vereditos: Dict[str, VereditoAgente]) -> List[Dict[str, Any]]:
+        """Consolida alertas de todos os agentes, dos mais prioritários aos menos"""
+        alertas = [alerta for veredito in vereditos.values() for alerta in veredito.alertas]
+        alertas.sort(key=lambda alerta: PRIORIDADES.get(alerta.prioridade, 2))
+        return [alerta.para_dict() for alerta in alertas]
     
     def _gerar_dados_visuais(self, status: StatusVerificacao, pontuacao: int) -> Dict[str, Any]:
         """Gera dados para interface visual"""
@@ -290,32 +283,45 @@ class AgenteOrquestrador:
             }
         }
     
-    async def _analise_final_com_ia(self, resultado: Dict[str, Any]) -> Dict[str, Any]:
+    async def enriquecer_com_ia(self, resultado: Dict[str, Any], prazo: Optional[PrazoVerificacao] = None) -> Dict[str, Any]:
+        """Adiciona a análise final da IA a um resultado já consolidado"""
+        resultado["analise_final_ia"] = await self._analise_final_com_ia(resultado, prazo)
+        return resultado
+    
+    async def _analise_final_com_ia(self,
+                                    resultado: Dict[str, Any],
+                                    prazo: Optional[PrazoVerificacao] = None) -> Dict[str, Any]:
         """Análise final consolidada usando IA da Groq"""
         try:
-            prompt = f"""
-            Analise os resultados consolidados da verificação de cobrança:
-            
-            Status: {resultado['status_verificacao']}
-            Pontuação de confiança: {resultado['pontuacao_confianca']}%
-            Mensagem para usuário: {resultado['mensagem_usuario']}
-            
-            Resultados dos agentes:
-            - Leitor: {json.dumps(resultado['resultados_agentes']['leitor'], ensure_ascii=False, indent=2)}
-            - Consultor: {json.dumps(resultado['resultados_agentes']['consultor'], ensure_ascii=False, indent=2)}
-            - Detetive: {json.dumps(resultado['resultados_agentes']['detetive'], ensure_ascii=False, indent=2)}
-            
-            Forneça uma análise final consolidada incluindo:
-            1. Resumo executivo da verificação
-            2. Principais pontos de atenção
-            3. Justificativa para a decisão tomada
-            4. Próximos passos recomendados
-            5. Lições aprendidas para melhorias futuras
-            
-            Responda em formato JSON estruturado.
-            """
+            agentes = resultado['resultados_agentes']
+            prompt = construtor_prompt.montar(
+                "orquestrador",
+                f"""
+                Analise os resultados consolidados da verificação de cobrança:
+                Status: {resultado['status_verificacao']}
+                Pontuação de confiança: {resultado['pontuacao_confianca']}%
+                """,
+                [
+                    ("Detetive", json_compacto(construtor_prompt.compactar_detetive(agentes['detetive'])), True),
+                    ("Consultor", json_compacto(construtor_prompt.compactar_consultor(agentes['consultor'])), True),
+                    ("Leitor", json_compacto(construtor_prompt.compactar_leitor(agentes['leitor'])), True),
+                    ("Alertas consolidados", json_compacto(construtor_prompt.compactar_alertas(resultado.get('alertas_consolidados', []))), False)
+                ],
+                """
+                Forneça uma análise final consolidada incluindo:
+                1. Resumo executivo da verificação
+                2. Principais pontos de atenção
+                3. Justificativa para a decisão tomada
+                4. Próximos passos recomendados
+                5. Lições aprendidas para melhorias futuras
+                
+                Responda em formato JSON estruturado.
+                """
+            )
             
-            response = self.groq_client.chat.completions.create(
+            response = await executar_bloqueante(
+                prazo, "orquestrador_ia",
+                self.groq_client.chat.completions.create,
                 messages=[{"role": "user", "content": prompt}],
                 model=self.model,
                 temperature=0.1
@@ -328,13 +334,19 @@ class AgenteOrquestrador:
             except json.JSONDecodeError:
                 return {"analise_texto": analise, "tipo": "texto"}
                 
+        except PrazoEsgotadoException as e:
+            return {"status": "prazo_esgotado", "erro": e.message}
         except Exception as e:
             logger.error(f"Erro na análise final com IA: {e}")
             return {"erro": f"Erro na análise final IA: {str(e)}"}
     
-    async def gerar_relatorio_detalhado(self, resultado: Dict[str, Any]) -> Dict[str, Any]:
-        """Gera relatório detalhado da verificação"""
+    def gerar_relatorio_detalhado(self, resultado: Dict[str, Any]) -> Dict[str, Any]:
+        """Gera relatório detalhado da verificação (sob demanda, a partir do resultado gravado)"""
         try:
+            agentes = resultado.get("resultados_agentes", {})
+            leitor = agentes.get("leitor", {})
+            consultor = agentes.get("consultor", {})
+            detetive = agentes.get("detetive", {})
             relatorio = {
                 "resumo_executivo": {
                     "status": resultado["status_verificacao"],
@@ -344,24 +356,25 @@ class AgenteOrquestrador:
                 },
                 "detalhamento_agentes": {
                     "leitor": {
-                        "sucesso": resultado["resultados_agentes"]["leitor"].get("sucesso", False),
-                        "dados_extraidos": resultado["resultados_agentes"]["leitor"].get("dados_extraidos", {}),
-                        "qualidade_ocr": resultado["resultados_agentes"]["leitor"].get("dados_extraidos", {}).get("qualidade_imagem", "desconhecida")
+                        "sucesso": leitor.get("sucesso", False),
+                        "dados_extraidos": leitor.get("dados_extraidos", {}),
+                        "qualidade_ocr": leitor.get("dados_extraidos", {}).get("qualidade_imagem", "desconhecida")
                     },
                     "consultor": {
-                        "sucesso": resultado["resultados_agentes"]["consultor"].get("sucesso", False),
-                        "validacoes": resultado["resultados_agentes"]["consultor"].get("validacoes", {}),
-                        "alertas": resultado["resultados_agentes"]["consultor"].get("alertas", [])
+                        "sucesso": consultor.get("sucesso", False),
+                        "validacoes": consultor.get("validacoes", {}),
+                        "alertas": consultor.get("alertas", [])
                     },
                     "detetive": {
-                        "sucesso": resultado["resultados_agentes"]["detetive"].get("sucesso", False),
-                        "pontuacao_risco": resultado["resultados_agentes"]["detetive"].get("pontuacao_risco", 0),
-                        "alertas_fraude": resultado["resultados_agentes"]["detetive"].get("alertas_fraude", [])
+                        "sucesso": detetive.get("sucesso", False),
+                        "pontuacao_risco": detetive.get("pontuacao_risco", 0),
+                        "alertas_fraude": detetive.get("alertas_fraude", [])
                     }
                 },
                 "recomendacoes": resultado.get("recomendacoes", []),
                 "alertas_consolidados": resultado.get("alertas_consolidados", []),
                 "dados_visuais": resultado.get("dados_visuais", {}),
+                "analises_ia": resultado.get("analises_ia", {}),
                 "analise_final_ia": resultado.get("analise_final_ia", {})
             }
             
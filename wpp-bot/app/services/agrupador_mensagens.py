@@ -0,0 +1,106 @@
+"""
+Agrupador de Mensagens - Junta rajadas de mensagens do mesmo usuário num único turno
+Um álbum de fotos ou várias mensagens curtas seguidas chegam ao webhook como
+mensagens independentes, e cada uma gerava sua própria confirmação,
+verificação e menu. A primeira mensagem de uma rajada abre uma janela por
+usuário que se estende a cada nova mensagem (até uma espera máxima); as
+seguintes entram na rajada aberta e quem a abriu recebe todas juntas quando a
+janela fecha, para tratá-las como um só turno
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, Any, Optional, List
+
+logger = logging.getLogger(__name__)
+
+# Silêncio que encerra a rajada e espera total máxima da primeira mensagem
+JANELA_SEGUNDOS = float(os.getenv("AGRUPAMENTO_JANELA_SEGUNDOS", "1.0"))
+ESPERA_MAXIMA_SEGUNDOS = float(os.getenv("AGRUPAMENTO_ESPERA_MAXIMA_SEGUNDOS", "4.0"))
+MAX_MENSAGENS = int(os.getenv("AGRUPAMENTO_MAX_MENSAGENS", "10"))
+
+
+class Rajada:
+    """Mensagens de um usuário acumuladas enquanto a janela está aberta"""
+
+    __slots__ = ("itens", "aberta_em", "ultima_em", "cheia")
+
+    def __init__(self, agora: float):
+        self.itens: List[Any] = []
+        self.aberta_em = agora
+        self.ultima_em = agora
+        self.cheia = asyncio.Event()
+
+
+class AgrupadorMensagens:
+    def __init__(self,
+                 janela: float = JANELA_SEGUNDOS,
+                 espera_maxima: float = ESPERA_MAXIMA_SEGUNDOS,
+                 max_mensagens: int = MAX_MENSAGENS):
+        self.janela = janela
+        self.espera_maxima = max(espera_maxima, janela)
+        self.max_mensagens = max(1, max_mensagens)
+        self._rajadas: Dict[str, Rajada] = {}
+        self.estatisticas = {"turnos": 0, "mensagens": 0, "maior_rajada": 0}
+
+    async def agrupar(self, chave: str, item: Any) -> Optional[List[Any]]:
+        """
+        Entrega a mensagem à rajada do usuário
+
+        Quem abre a rajada espera a janela fechar e recebe todas as mensagens,
+        na ordem de chegada; as demais recebem None (já fazem parte do turno
+        de outra mensagem)
+        """
+        self.estatisticas["mensagens"] += 1
+        agora = time.monotonic()
+        rajada = self._rajadas.get(chave)
+        if rajada is not None:
+            rajada.itens.append(item)
+            rajada.ultima_em = agora
+            if len(rajada.itens) >= self.max_mensagens:
+                rajada.cheia.set()
+            return None
+
+        rajada = Rajada(agora)
+        rajada.itens.append(item)
+        if self.janela > 0 and self.max_mensagens > 1:
+            self._rajadas[chave] = rajada
+            try:
+                await self._aguardar_fechamento(rajada)
+            finally:
+                self._rajadas.pop(chave, None)
+
+        self.estatisticas["turnos"] += 1
+        self.estatisticas["maior_rajada"] = max(self.estatisticas["maior_rajada"], len(rajada.itens))
+        if len(rajada.itens) > 1:
+            logger.info(f"{len(rajada.itens)} mensagens do usuário {chave} agrupadas em um turno")
+        return rajada.itens
+
+    async def _aguardar_fechamento(self, rajada: Rajada):
+        """Espera até a janela ficar em silêncio, a espera máxima acabar ou a rajada encher"""
+        while not rajada.cheia.is_set():
+            restante = min(rajada.ultima_em + self.janela, rajada.aberta_em + self.espera_maxima) - time.monotonic()
+            if restante <= 0:
+                return
+            try:
+                await asyncio.wait_for(rajada.cheia.wait(), restante)
+            except asyncio.TimeoutError:
+                pass
+
+    def obter_estatisticas(self) -> Dict[str, Any]:
+        """Mensagens recebidas, turnos gerados e rajadas abertas"""
+        turnos = self.estatisticas["turnos"]
+        return {
+            **self.estatisticas,
+            "mensagens_agrupadas": self.estatisticas["mensagens"] - turnos - sum(
+                len(r.itens) for r in self._rajadas.values()
+            ),
+            "rajadas_abertas": len(self._rajadas),
+            "janela_segundos": self.janela
+        }
+
+
+# Instância global compartilhada pelo webhook do WhatsApp
+agrupador_mensagens = AgrupadorMensagens()
@@ -9,26 +9,27 @@ import re
 import tempfile
 import requests
 from typing import Dict, Any, Optional, List
-from groq import Groq
-import pytesseract
-from PIL import Image
-import cv2
-import numpy as np
-from io import BytesIO
 import logging
 
 # Importar o novo fluxo de verificação
 from .fluxo_verificacao_ia import FluxoVerificacaoIA
+from .progresso_verificacao import SinkProgresso
+from .registro_servicos import obter_groq_client, importar_modulo
+from .pre_validacao_imagem import pre_validacao_imagem, MENSAGENS, MOTIVO_SEM_TEXTO
 
 logger = logging.getLogger(__name__)
 
 class AIService:
     def __init__(self):
-        self.groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
         self.model = "llama-3.1-8b-instant"
         
         # Inicializar o fluxo de verificação com agentes especializados
         self.fluxo_verificacao = FluxoVerificacaoIA()
+    
+    @property
+    def groq_client(self):
+        """Cliente Groq compartilhado com os agentes"""
+        return obter_groq_client()
         
     def extrair_dados_boleto_ocr(self, texto_ocr: str) -> Dict[str, Any]:
         """Extrai dados específicos do boleto usando regex"""
@@ -86,6 +87,10 @@ class AIService:
             if response.status_code != 200:
                 return {"erro": "Falha ao baixar imagem"}
             
+            triagem = pre_validacao_imagem.avaliar(response.content, user_id)
+            if not triagem["aprovada"]:
+                return {"erro": triagem["mensagem"], "imagem_recusada": True, "motivo_recusa": triagem["motivo"]}
+            
             # Salvar imagem temporariamente
             with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as temp_file:
                 temp_file.write(response.content)
@@ -95,6 +100,9 @@ class AIService:
                 # Tentar OCR com Tesseract
                 texto_ocr = ""
                 try:
+                    cv2 = importar_modulo("cv2")
+                    pytesseract = importar_modulo("pytesseract")
+                    
                     # Carregar imagem
                     img = cv2.imread(temp_file_path)
                     if img is not None:
@@ -109,22 +117,18 @@ class AIService:
                     logger.warning(f"OCR falhou: {e}")
                     # Fallback: usar imagem original
                     try:
-                        img_pil = Image.open(temp_file_path)
-                        texto_ocr = pytesseract.image_to_string(img_pil, lang='por')
+                        img_pil = importar_modulo("PIL.Image").open(temp_file_path)
+                        texto_ocr = importar_modulo("pytesseract").image_to_string(img_pil, lang='por')
                     except Exception:
                         texto_ocr = ""
                 
-                # Se OCR falhou, usar análise baseada em padrões
+                # Sem texto não há o que analisar: pedir outra foto em vez de inventar um boleto
                 if not texto_ocr.strip():
-                    logger.info("OCR falhou, usando análise baseada em padrões")
-                    # Simular análise baseada em padrões comuns de boleto
-                    texto_ocr = """
-                    BANCO DO BRASIL
-                    Vencimento: 15/12/2024
-                    Valor: R$ 150,00
-                    Nosso Número: 123456789
-                    Beneficiário: Empresa XYZ
-                    """
+                    return {
+                        "erro": MENSAGENS[MOTIVO_SEM_TEXTO],
+                        "imagem_recusada": True,
+                        "motivo_recusa": MOTIVO_SEM_TEXTO
+                    }
                 
                 # Extrair dados específicos
                 dados_boleto = self.extrair_dados_boleto_ocr(texto_ocr)
@@ -264,7 +268,10 @@ class AIService:
     async def verificar_cobranca_completa(self, 
                                         image_url: str = None,
                                         texto_pix: str = None,
-                                        user_id: str = None) -> Dict[str, Any]:
+                                        user_id: str = None,
+                                        modo_rapido: Optional[bool] = None,
+                                        progresso: Optional[SinkProgresso] = None,
+                                        image_urls: Optional[List[str]] = None) -> Dict[str, Any]:
         """
         Executa verificação completa usando o fluxo de agentes especializados
         
@@ -272,6 +279,9 @@ class AIService:
             image_url: URL da imagem do boleto/documento
             texto_pix: Texto contendo dados de PIX
             user_id: ID do usuário
+            modo_rapido: Retorna o veredito por regras e adia as análises de IA
+            progresso: Recebe um evento a cada agente concluído
+            image_urls: Páginas de um mesmo documento, no lugar de image_url
             
         Returns:
             Resultado consolidado da verificação
@@ -282,7 +292,10 @@ class AIService:
             resultado = await self.fluxo_verificacao.verificar_cobranca_completa(
                 image_url=image_url,
                 texto_pix=texto_pix,
-                user_id=user_id
+                user_id=user_id,
+                modo_rapido=modo_rapido,
+                progresso=progresso,
+                image_urls=image_urls
             )
             
             return resultado
@@ -297,14 +310,16 @@ class AIService:
     async def processar_resposta_usuario(self, 
                                        user_id: str, 
                                        resposta_id: str, 
-                                       contexto_anterior: Dict[str, Any] = None) -> Dict[str, Any]:
+                                       contexto_anterior: Dict[str, Any] = None,
+                                       id_verificacao: Optional[str] = None) -> Dict[str, Any]:
         """
         Processa resposta do usuário aos botões de interação
         
         Args:
             user_id: ID do usuário
             resposta_id: ID da resposta selecionada
-            contexto_anterior: Contexto da verificação anterior
+            contexto_anterior: Contexto da verificação anterior (opcional)
+            id_verificacao: Verificação gravada à qual a resposta se refere
             
         Returns:
             Resposta processada
@@ -313,7 +328,8 @@ class AIService:
             return await self.fluxo_verificacao.processar_resposta_usuario(
                 user_id=user_id,
                 resposta_id=resposta_id,
-                contexto_anterior=contexto_anterior
+                contexto_anterior=contexto_anterior,
+                id_verificacao=id_verificacao
             )
             
         except Exception as e:
@@ -323,6 +339,10 @@ class AIService:
                 "mensagem": "❌ **Erro**\n\nOcorreu um erro ao processar sua resposta. Tente novamente."
             }
     
+    def listar_verificacoes_recentes(self, user_id: str, limite: int = 10) -> List[Dict[str, Any]]:
+        """Verificações recentes gravadas para o usuário"""
+        return self.fluxo_verificacao.listar_verificacoes_recentes(user_id, limite)
+    
     def obter_mensagem_inicial(self) -> str:
         """Obtém mensagem inicial do Grace"""
         return self.fluxo_verificacao.criar_mensagem_inicial()
@@ -0,0 +1,231 @@
+"""
+Armazém de Verificações - Resultados persistidos por impressão do documento
+Guarda cada veredito em SQLite indexado pela impressão do documento (hash da
+imagem, texto PIX normalizado ou código de barras) e por usuário, permitindo
+responder verificações repetidas sem rodar o pipeline e consultar o resultado
+anterior nos botões de acompanhamento
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import sqlite3
+import hashlib
+import threading
+import logging
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Iterable
+
+from .registros_verificacao import normalizar_texto, extrair_valor_centavos, canonicalizar_chave_pix
+
+logger = logging.getLogger(__name__)
+
+CAMINHO_PADRAO = Path(__file__).resolve().parents[2] / "data" / "verificacoes.db"
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS verificacoes (
+    id TEXT PRIMARY KEY,
+    user_id TEXT,
+    status TEXT,
+    criado_em REAL NOT NULL,
+    atualizado_em REAL NOT NULL,
+    resultado TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_verificacoes_usuario ON verificacoes (user_id, criado_em DESC);
+CREATE INDEX IF NOT EXISTS idx_verificacoes_criado_em ON verificacoes (criado_em);
+CREATE TABLE IF NOT EXISTS impressoes (
+    impressao TEXT NOT NULL,
+    id_verificacao TEXT NOT NULL REFERENCES verificacoes (id) ON DELETE CASCADE,
+    PRIMARY KEY (impressao, id_verificacao)
+);
+CREATE INDEX IF NOT EXISTS idx_impressoes_verificacao ON impressoes (id_verificacao);
+"""
+
+
+def _hash(prefixo: str, conteudo: bytes) -> str:
+    return f"{prefixo}:{hashlib.sha256(conteudo).hexdigest()}"
+
+
+def impressao_imagem(conteudo: bytes) -> str:
+    """Impressão dos bytes da imagem"""
+    return _hash("img", conteudo)
+
+
+def impressao_texto_pix(texto_pix: str) -> str:
+    """Impressão do texto PIX normalizado"""
+    return _hash("pix", normalizar_texto(texto_pix).encode("utf-8"))
+
+
+def impressoes_documento(dados_extraidos: Dict[str, Any]) -> List[str]:
+    """
+    Impressões derivadas dos dados extraídos, que reconhecem o mesmo documento
+    em fotos ou textos diferentes
+    """
+    impressoes = []
+    digitos = re.sub(r"\D", "", dados_extraidos.get("codigo_barras") or "")
+    if len(digitos) >= 44:
+        impressoes.append(_hash("barras", digitos.encode()))
+
+    chave_pix = canonicalizar_chave_pix(dados_extraidos.get("chave_pix"))
+    valor = dados_extraidos.get("valor_centavos")
+    if valor is None:
+        valor = extrair_valor_centavos(dados_extraidos.get("valor_cobrado"))
+    if chave_pix and valor:
+        impressoes.append(_hash("chave", f"{chave_pix}|{valor}".encode("utf-8")))
+    return impressoes
+
+
+class ArmazemVerificacoes:
+    def __init__(self, caminho: Optional[str] = None):
+        self.caminho = Path(caminho or os.getenv("VERIFICACAO_ARMAZEM_PATH", str(CAMINHO_PADRAO)))
+        self.ttl_segundos = float(os.getenv("VERIFICACAO_ARMAZEM_TTL_SEGUNDOS", str(24 * 3600)))
+        self.max_por_usuario = int(os.getenv("VERIFICACAO_ARMAZEM_MAX_POR_USUARIO", "20"))
+        self._lock = threading.Lock()
+        self._conexao: Optional[sqlite3.Connection] = None
+        self.estatisticas = {"acertos": 0, "falhas": 0, "gravacoes": 0}
+
+    def _conectar(self) -> sqlite3.Connection:
+        """Abre a conexão no primeiro uso"""
+        if self._conexao is None:
+            if str(self.caminho) != ":memory:":
+                self.caminho.parent.mkdir(parents=True, exist_ok=True)
+            conexao = sqlite3.connect(str(self.caminho), check_same_thread=False, isolation_level=None)
+            conexao.row_factory = sqlite3.Row
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            conexao.execute("PRAGMA foreign_keys=ON")
+            conexao.executescript(_ESQUEMA)
+            self._conexao = conexao
+        return self._conexao
+
+    # ===== LEITURA =====
+
+    def buscar(self, impressoes: Iterable[str], user_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        Procura um veredito válido do usuário para alguma das impressões
+
+        Só o próprio usuário reaproveita um veredito: mesmo o de golpe depende
+        das consultas do Consultor para aquele cliente. O veredito devolvido
+        ainda não considera denúncias e bloqueios posteriores à gravação; quem
+        o repete deve reavaliar os identificadores do documento antes.
+        """
+        impressoes = list(dict.fromkeys(i for i in impressoes if i))
+        if not impressoes:
+            return None
+
+        marcadores = ",".join("?" for _ in impressoes)
+        consulta = f"""
+            SELECT v.id, v.resultado, v.criado_em FROM impressoes i
+            JOIN verificacoes v ON v.id = i.id_verificacao
+            WHERE i.impressao IN ({marcadores})
+              AND v.criado_em >= ?
+              AND v.user_id IS ?
+            ORDER BY v.criado_em DESC
+            LIMIT 1
+        """
+        parametros = [*impressoes, time.time() - self.ttl_segundos, user_id]
+
+        with self._lock:
+            linha = self._conectar().execute(consulta, parametros).fetchone()
+            self.estatisticas["acertos" if linha else "falhas"] += 1
+        return self._decodificar(linha)
+
+    def obter(self, id_verificacao: str, user_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Resultado pelo identificador da verificação (restrito ao usuário, se informado)"""
+        consulta = "SELECT id, resultado, criado_em FROM verificacoes WHERE id = ?"
+        parametros: List[Any] = [id_verificacao]
+        if user_id is not None:
+            consulta += " AND user_id = ?"
+            parametros.append(user_id)
+        with self._lock:
+            linha = self._conectar().execute(consulta, parametros).fetchone()
+        return self._decodificar(linha)
+
+    def ultima_do_usuario(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Verificação mais recente do usuário"""
+        recentes = self.listar_recentes(user_id, limite=1)
+        return recentes[0] if recentes else None
+
+    def listar_recentes(self, user_id: str, limite: int = 10) -> List[Dict[str, Any]]:
+        """Verificações recentes do usuário, da mais nova para a mais antiga"""
+        with self._lock:
+            linhas = self._conectar().execute(
+                "SELECT id, resultado, criado_em FROM verificacoes WHERE user_id = ? "
+                "ORDER BY criado_em DESC LIMIT ?",
+                (user_id, limite)
+            ).fetchall()
+        return [self._decodificar(linha) for linha in linhas]
+
+    def _decodificar(self, linha: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if linha is None:
+            return None
+        resultado = json.loads(linha["resultado"])
+        resultado["id_verificacao"] = linha["id"]
+        return resultado
+
+    # ===== ESCRITA =====
+
+    def salvar(self, resultado: Dict[str, Any], impressoes: Iterable[str], user_id: Optional[str]) -> str:
+        """Persiste o resultado e associa as impressões; retorna o id da verificação"""
+        id_verificacao = resultado.get("id_verificacao") or uuid.uuid4().hex
+        agora = time.time()
+        conteudo = json.dumps(resultado, ensure_ascii=False, default=str)
+
+        with self._lock:
+            conexao = self._conectar()
+            conexao.execute("BEGIN")
+            try:
+                conexao.execute(
+                    "INSERT OR REPLACE INTO verificacoes (id, user_id, status, criado_em, atualizado_em, resultado) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (id_verificacao, user_id, resultado.get("status_verificacao"), agora, agora, conteudo)
+                )
+                conexao.executemany(
+                    "INSERT OR IGNORE INTO impressoes (impressao, id_verificacao) VALUES (?, ?)",
+                    [(impressao, id_verificacao) for impressao in dict.fromkeys(impressoes) if impressao]
+                )
+                self._podar(conexao, user_id, agora)
+                conexao.execute("COMMIT")
+            except Exception:
+                conexao.execute("ROLLBACK")
+                raise
+            self.estatisticas["gravacoes"] += 1
+        return id_verificacao
+
+    def associar(self, id_verificacao: str, impressoes: Iterable[str]):
+        """Associa novas impressões a uma verificação já gravada"""
+        with self._lock:
+            self._conectar().executemany(
+                "INSERT OR IGNORE INTO impressoes (impressao, id_verificacao) VALUES (?, ?)",
+                [(impressao, id_verificacao) for impressao in dict.fromkeys(impressoes) if impressao]
+            )
+
+    def atualizar(self, id_verificacao: str, resultado: Dict[str, Any]):
+        """Regrava o resultado (por exemplo, após o enriquecimento com IA)"""
+        conteudo = json.dumps(resultado, ensure_ascii=False, default=str)
+        with self._lock:
+            self._conectar().execute(
+                "UPDATE verificacoes SET resultado = ?, status = ?, atualizado_em = ? WHERE id = ?",
+                (conteudo, resultado.get("status_verificacao"), time.time(), id_verificacao)
+            )
+
+    def _podar(self, conexao: sqlite3.Connection, user_id: Optional[str], agora: float):
+        """Remove resultados expirados e os excedentes do índice do usuário"""
+        conexao.execute("DELETE FROM verificacoes WHERE criado_em < ?", (agora - self.ttl_segundos,))
+        if user_id is not None:
+            conexao.execute(
+                "DELETE FROM verificacoes WHERE user_id = ? AND id NOT IN "
+                "(SELECT id FROM verificacoes WHERE user_id = ? ORDER BY criado_em DESC LIMIT ?)",
+                (user_id, user_id, self.max_por_usuario)
+            )
+
+    def obter_estatisticas(self) -> Dict[str, Any]:
+        """Acertos, falhas e gravações desde o início do processo"""
+        with self._lock:
+            return dict(self.estatisticas)
+
+
+# Instância global compartilhada pelo fluxo de verificação
+armazem_verificacoes = ArmazemVerificacoes()
@@ -0,0 +1,485 @@
+"""
+Base de Fraudes - Snapshot indexado de beneficiários suspeitos e reclamações
+Os dados ficam num arquivo SQLite somente leitura, com índices por nome
+normalizado e por documento, e os nomes são carregados num autômato
+Aho-Corasick por palavras que encontra todos os suspeitos citados no nome do
+beneficiário numa única passada. Um novo snapshot publicado no mesmo caminho
+(os.replace) é carregado em segundo plano e substitui o atual atomicamente; o
+anterior só é fechado quando a última consulta em andamento nele termina
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+import logging
+from array import array
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Iterable, Iterator, Tuple
+
+from .registros_verificacao import normalizar_texto
+from .indice_similaridade import IndiceSimilaridade
+
+logger = logging.getLogger(__name__)
+
+CAMINHO_PADRAO = Path(__file__).resolve().parents[2] / "data" / "base_fraudes.db"
+
+CATEGORIA_BENEFICIARIO = "beneficiario"
+CATEGORIA_RECLAMACAO = "reclamacao"
+CATEGORIAS = (CATEGORIA_BENEFICIARIO, CATEGORIA_RECLAMACAO)
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS suspeitos (
+    id INTEGER PRIMARY KEY,
+    categoria TEXT NOT NULL,
+    nome TEXT NOT NULL,
+    nome_normalizado TEXT NOT NULL,
+    documento TEXT,
+    dados TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_suspeitos_nome ON suspeitos (categoria, nome_normalizado);
+CREATE INDEX IF NOT EXISTS idx_suspeitos_documento ON suspeitos (documento) WHERE documento IS NOT NULL;
+CREATE TABLE IF NOT EXISTS metadados (
+    chave TEXT PRIMARY KEY,
+    valor TEXT
+);
+"""
+
+# Dados usados quando nenhum snapshot foi publicado (ambiente de desenvolvimento)
+DADOS_EXEMPLO = {
+    CATEGORIA_BENEFICIARIO: [
+        {
+            "nome": "Empresa Falsa LTDA",
+            "dados": {"cnpj": "00.000.000/0001-00", "motivo": "CNPJ inválido", "relatos": 5, "status": "bloqueado"}
+        },
+        {
+            "nome": "Golpista Silva",
+            "dados": {"cpf": "000.000.000-00", "motivo": "Nome falso", "relatos": 3, "status": "bloqueado"}
+        }
+    ],
+    CATEGORIA_RECLAMACAO: [
+        {
+            "nome": "Empresa Falsa LTDA",
+            "dados": {"fonte": "procon", "empresa": "Empresa Falsa LTDA", "reclamacoes": 15,
+                      "motivo": "Cobrança indevida"}
+        },
+        {
+            "nome": "",
+            "dados": {"fonte": "bacen", "cnpj": "00.000.000/0001-00", "status": "irregular",
+                      "motivo": "CNPJ cancelado"}
+        }
+    ]
+}
+
+
+def _documento(dados: Dict[str, Any]) -> Optional[str]:
+    digitos = re.sub(r"\D", "", str(dados.get("cnpj") or dados.get("cpf") or dados.get("documento") or ""))
+    return digitos or None
+
+
+# ===== AUTÔMATO =====
+
+class AutomatoNomes:
+    """
+    Aho-Corasick sobre palavras: encontra, em tempo linear no número de
+    palavras do texto, todos os nomes cadastrados que aparecem nele como
+    sequência contígua de palavras
+
+    As transições ficam num único dicionário de inteiros (estado * vocabulário
+    + palavra), o que mantém o autômato compacto mesmo com milhões de nomes.
+    """
+
+    __slots__ = ("_vocabulario", "_fator", "_transicoes", "_falha", "_saida", "_terminais", "total_nomes")
+
+    def __init__(self, nomes: Iterable[Tuple[str, int]]):
+        padroes = []
+        self._vocabulario: Dict[str, int] = {}
+        for nome_normalizado, identificador in nomes:
+            palavras = nome_normalizado.split()
+            if palavras:
+                padroes.append(([self._vocabulario.setdefault(p, len(self._vocabulario)) for p in palavras],
+                                identificador))
+        self.total_nomes = len(padroes)
+        self._fator = len(self._vocabulario) + 1
+
+        # 1. Trie: transições, pai/palavra de cada estado e profundidade
+        self._transicoes: Dict[int, int] = {}
+        pais = array("l", [0])
+        palavras_estado = array("l", [0])
+        profundidades = array("l", [0])
+        self._terminais: Dict[int, Tuple[int, ...]] = {}
+        for palavras, identificador in padroes:
+            estado = 0
+            for palavra in palavras:
+                chave = estado * self._fator + palavra
+                proximo = self._transicoes.get(chave)
+                if proximo is None:
+                    proximo = len(pais)
+                    self._transicoes[chave] = proximo
+                    pais.append(estado)
+                    palavras_estado.append(palavra)
+                    profundidades.append(profundidades[estado] + 1)
+                estado = proximo
+            self._terminais[estado] = self._terminais.get(estado, ()) + (identificador,)
+
+        # 2. Links de falha e de saída, em ordem de profundidade (equivale à BFS)
+        total_estados = len(pais)
+        self._falha = array("l", [0]) * total_estados
+        self._saida = array("l", [0]) * total_estados
+        for estado in sorted(range(1, total_estados), key=profundidades.__getitem__):
+            pai = pais[estado]
+            if pai == 0:
+                continue
+            palavra = palavras_estado[estado]
+            falha = self._falha[pai]
+            while falha and (falha * self._fator + palavra) not in self._transicoes:
+                falha = self._falha[falha]
+            falha = self._transicoes.get(falha * self._fator + palavra, 0)
+            self._falha[estado] = falha
+            self._saida[estado] = falha if falha in self._terminais else self._saida[falha]
+
+    def buscar(self, texto_normalizado: str) -> List[int]:
+        """Identificadores dos nomes encontrados, na ordem em que terminam no texto"""
+        encontrados: List[int] = []
+        estado = 0
+        for termo in texto_normalizado.split():
+            palavra = self._vocabulario.get(termo)
+            if palavra is None:
+                estado = 0
+                continue
+            while estado and (estado * self._fator + palavra) not in self._transicoes:
+                estado = self._falha[estado]
+            estado = self._transicoes.get(estado * self._fator + palavra, 0)
+
+            saida = estado if estado in self._terminais else self._saida[estado]
+            while saida:
+                encontrados.extend(self._terminais[saida])
+                saida = self._saida[saida]
+        return encontrados
+
+
+# ===== SNAPSHOT =====
+
+def criar_snapshot(caminho: str,
+                   registros: Iterable[Dict[str, Any]],
+                   versao: Optional[str] = None) -> int:
+    """
+    Grava um novo snapshot e o publica atomicamente no caminho indicado
+
+    Args:
+        caminho: Destino do snapshot (o arquivo atual é substituído com os.replace)
+        registros: Itens com categoria, nome e dados (cnpj/cpf viram o documento indexado)
+        versao: Identificador do snapshot (padrão: horário da geração)
+
+    Returns:
+        Quantidade de registros gravados
+    """
+    destino = Path(caminho)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    temporario = destino.with_name(f".{destino.name}.{os.getpid()}.tmp")
+    if temporario.exists():
+        temporario.unlink()
+
+    conexao = sqlite3.connect(str(temporario))
+    total = 0
+    try:
+        conexao.execute("PRAGMA journal_mode=OFF")
+        conexao.execute("PRAGMA synchronous=OFF")
+        # Índices criados depois da carga: inserção em massa bem mais rápida
+        conexao.execute(_ESQUEMA.split(";")[0])
+
+        def linhas():
+            nonlocal total
+            for registro in registros:
+                if registro.get("categoria") not in CATEGORIAS:
+                    continue
+                dados = registro.get("dados") or {}
+                total += 1
+                yield (
+                    registro["categoria"],
+                    registro.get("nome") or "",
+                    normalizar_texto(registro.get("nome") or ""),
+                    _documento(dados),
+                    json.dumps(dados, ensure_ascii=False)
+                )
+
+        conexao.executemany(
+            "INSERT INTO suspeitos (categoria, nome, nome_normalizado, documento, dados) VALUES (?, ?, ?, ?, ?)",
+            linhas()
+        )
+        conexao.executescript(_ESQUEMA)
+        conexao.executemany(
+            "INSERT INTO metadados (chave, valor) VALUES (?, ?)",
+            [("versao", versao or time.strftime("%Y%m%d%H%M%S")), ("total", str(total))]
+        )
+        conexao.commit()
+    finally:
+        conexao.close()
+
+    os.replace(temporario, destino)
+    logger.info(f"Snapshot da base de fraudes publicado em {destino} ({total} registros)")
+    return total
+
+
+def registros_exemplo() -> List[Dict[str, Any]]:
+    """DADOS_EXEMPLO no formato aceito por criar_snapshot"""
+    return [
+        {"categoria": categoria, **registro}
+        for categoria, registros in DADOS_EXEMPLO.items()
+        for registro in registros
+    ]
+
+
+class _Snapshot:
+    """Conexão somente leitura e autômatos de um snapshot carregado"""
+
+    def __init__(self, caminho: Path, assinatura: Tuple[int, int]):
+        self.assinatura = assinatura
+        self.lock = threading.Lock()
+        # Consultas em andamento; um snapshot substituído fecha quando a última termina
+        self._lock_uso = threading.Lock()
+        self._leitores = 0
+        self._aposentado = False
+        # immutable=1: o arquivo publicado nunca é alterado, apenas substituído
+        self.conexao = sqlite3.connect(
+            f"file:{caminho}?mode=ro&immutable=1", uri=True, check_same_thread=False
+        )
+        self.conexao.row_factory = sqlite3.Row
+        metadados = dict(self.conexao.execute("SELECT chave, valor FROM metadados").fetchall())
+        self.versao = metadados.get("versao")
+
+        inicio = time.perf_counter()
+        self.automatos = {
+            categoria: AutomatoNomes(
+                (linha[0], linha[1]) for linha in self.conexao.execute(
+                    "SELECT nome_normalizado, id FROM suspeitos WHERE categoria = ? AND nome_normalizado != '' "
+                    "ORDER BY id",
+                    (categoria,)
+                )
+            )
+            for categoria in CATEGORIAS
+        }
+        self.total_nomes = sum(automato.total_nomes for automato in self.automatos.values())
+        self.similaridade = self._indexar_similaridade()
+        self.tempo_carga_ms = round((time.perf_counter() - inicio) * 1000, 1)
+
+    def _indexar_similaridade(self) -> Optional[IndiceSimilaridade]:
+        """Índice de nomes parecidos dos beneficiários suspeitos (limitado em tamanho)"""
+        limite = int(os.getenv("BASE_FRAUDES_SIMILARIDADE_MAX_NOMES", "200000"))
+        total = self.automatos[CATEGORIA_BENEFICIARIO].total_nomes
+        if total > limite:
+            logger.warning(f"Base de fraudes com {total} beneficiários excede BASE_FRAUDES_SIMILARIDADE_MAX_NOMES "
+                           f"({limite}); busca por nomes parecidos desativada")
+            return None
+        return IndiceSimilaridade(
+            (linha[0], linha[1]) for linha in self.conexao.execute(
+                "SELECT nome_normalizado, id FROM suspeitos WHERE categoria = ? AND nome_normalizado != ''",
+                (CATEGORIA_BENEFICIARIO,)
+            )
+        )
+
+    def consultar(self, sql: str, parametros: Tuple) -> List[sqlite3.Row]:
+        with self.lock:
+            return self.conexao.execute(sql, parametros).fetchall()
+
+    def adquirir(self) -> bool:
+        """Registra um leitor; False se o snapshot já foi substituído"""
+        with self._lock_uso:
+            if self._aposentado:
+                return False
+            self._leitores += 1
+            return True
+
+    def liberar(self):
+        with self._lock_uso:
+            self._leitores -= 1
+            fechar = self._aposentado and not self._leitores
+        if fechar:
+            self.fechar()
+
+    def aposentar(self):
+        """Marca o snapshot como substituído e o fecha assim que não houver leitores"""
+        with self._lock_uso:
+            self._aposentado = True
+            fechar = not self._leitores
+        if fechar:
+            self.fechar()
+
+    def fechar(self):
+        with self.lock:
+            self.conexao.close()
+
+
+class BaseFraudes:
+    def __init__(self, caminho: Optional[str] = None):
+        self.caminho = Path(caminho or os.getenv("BASE_FRAUDES_PATH", str(CAMINHO_PADRAO)))
+        self.intervalo_verificacao = float(os.getenv("BASE_FRAUDES_INTERVALO_VERIFICACAO", "30"))
+        self._snapshot: Optional[_Snapshot] = None
+        self._lock = threading.Lock()
+        self._lock_carga = threading.RLock()
+        self._recarregando = False
+        self._proxima_verificacao = 0.0
+        self.estatisticas = {"consultas": 0, "acertos": 0, "trocas": 0}
+
+    # ===== CARGA E TROCA =====
+
+    def _assinatura(self) -> Tuple[int, int]:
+        estado = os.stat(self.caminho)
+        return estado.st_ino, estado.st_mtime_ns
+
+    def carregar(self) -> Dict[str, Any]:
+        """Carrega o snapshot publicado e o coloca em uso (cria o de exemplo se não existir)"""
+        with self._lock_carga:
+            if not self.caminho.exists():
+                logger.warning(f"Base de fraudes não encontrada em {self.caminho}; usando dados de exemplo")
+                criar_snapshot(str(self.caminho), registros_exemplo(), versao="exemplo")
+            novo = _Snapshot(self.caminho, self._assinatura())
+
+        with self._lock:
+            anterior, self._snapshot = self._snapshot, novo
+            self.estatisticas["trocas"] += 1
+        if anterior is not None:
+            anterior.aposentar()
+
+        logger.info(f"Base de fraudes {novo.versao} carregada: {novo.total_nomes} nomes "
+                   f"em {novo.tempo_carga_ms}ms")
+        return {"versao": novo.versao, "total_nomes": novo.total_nomes, "tempo_carga_ms": novo.tempo_carga_ms}
+
+    def _obter_snapshot(self) -> _Snapshot:
+        """Snapshot em uso; verifica periodicamente se um novo foi publicado"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock_carga:
+                if self._snapshot is None:
+                    self.carregar()
+            return self._snapshot
+
+        agora = time.monotonic()
+        if agora >= self._proxima_verificacao:
+            self._proxima_verificacao = agora + self.intervalo_verificacao
+            try:
+                publicado = self._assinatura() != snapshot.assinatura
+            except OSError:
+                publicado = False
+            if publicado:
+                self._recarregar_em_segundo_plano()
+        return snapshot
+
+    @contextmanager
+    def _usar_snapshot(self) -> Iterator[_Snapshot]:
+        """Snapshot em uso, que uma troca concorrente não fecha antes do fim da consulta"""
+        while True:
+            snapshot = self._obter_snapshot()
+            # Substituído entre a leitura e o registro: o novo já está em self._snapshot
+            if snapshot.adquirir():
+                break
+        try:
+            yield snapshot
+        finally:
+            snapshot.liberar()
+
+    def _recarregar_em_segundo_plano(self):
+        """Monta o novo snapshot fora do caminho da requisição; o atual segue atendendo"""
+        with self._lock:
+            if self._recarregando:
+                return
+            self._recarregando = True
+
+        def recarregar():
+            try:
+                self.carregar()
+            except Exception as e:
+                logger.error(f"Erro ao recarregar base de fraudes: {e}")
+            finally:
+                self._recarregando = False
+
+        threading.Thread(target=recarregar, name="recarga-base-fraudes", daemon=True).start()
+
+    # ===== CONSULTAS =====
+
+    def buscar_nome(self, categoria: str, nome: str) -> List[Dict[str, Any]]:
+        """
+        Registros da categoria cujo nome aparece no nome informado
+
+        Equivale a "nome_cadastrado in nome", mas respeitando as fronteiras de
+        palavras e sem percorrer a base.
+        """
+        normalizado = normalizar_texto(nome)
+        if not normalizado:
+            return []
+        with self._usar_snapshot() as snapshot:
+            identificadores = list(dict.fromkeys(snapshot.automatos[categoria].buscar(normalizado)))
+            if not identificadores:
+                self.estatisticas["consultas"] += 1
+                return []
+            linhas = snapshot.consultar(
+                f"SELECT * FROM suspeitos WHERE id IN ({','.join('?' for _ in identificadores)}) ORDER BY id",
+                tuple(identificadores)
+            )
+        self.estatisticas["consultas"] += 1
+        self.estatisticas["acertos"] += 1
+        return [self._decodificar(linha) for linha in linhas]
+
+    def buscar_similares(self, nome: str, k: int = 3, similaridade_minima: float = 0.5) -> List[Dict[str, Any]]:
+        """Beneficiários suspeitos com nome parecido (erros de digitação, letras trocadas por números)"""
+        with self._usar_snapshot() as snapshot:
+            if snapshot.similaridade is None:
+                return []
+            similares = snapshot.similaridade.buscar(nome, k=k, similaridade_minima=similaridade_minima)
+            if not similares:
+                return []
+            linhas = snapshot.consultar(
+                f"SELECT * FROM suspeitos WHERE id IN ({','.join('?' for _ in similares)})",
+                tuple(similar["identificador"] for similar in similares)
+            )
+        registros = {linha["id"]: self._decodificar(linha) for linha in linhas}
+        return [
+            {**registros[similar["identificador"]], "similaridade": similar["similaridade"]}
+            for similar in similares if similar["identificador"] in registros
+        ]
+
+    def obter_por_nome(self, categoria: str, nome: str) -> Optional[Dict[str, Any]]:
+        """Registro com exatamente esse nome normalizado (índice por nome)"""
+        with self._usar_snapshot() as snapshot:
+            linhas = snapshot.consultar(
+                "SELECT * FROM suspeitos WHERE categoria = ? AND nome_normalizado = ? ORDER BY id LIMIT 1",
+                (categoria, normalizar_texto(nome))
+            )
+        return self._decodificar(linhas[0]) if linhas else None
+
+    def buscar_documento(self, documento: str) -> List[Dict[str, Any]]:
+        """Registros com o CNPJ/CPF informado (índice por documento)"""
+        digitos = re.sub(r"\D", "", documento or "")
+        if not digitos:
+            return []
+        with self._usar_snapshot() as snapshot:
+            linhas = snapshot.consultar(
+                "SELECT * FROM suspeitos WHERE documento = ? ORDER BY id", (digitos,)
+            )
+        return [self._decodificar(linha) for linha in linhas]
+
+    def _decodificar(self, linha: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "id": linha["id"],
+            "categoria": linha["categoria"],
+            "nome": linha["nome"],
+            "dados": json.loads(linha["dados"])
+        }
+
+    def obter_estatisticas(self) -> Dict[str, Any]:
+        """Versão carregada, tamanho e contadores de consultas"""
+        snapshot = self._snapshot
+        return {
+            **self.estatisticas,
+            "versao": snapshot.versao if snapshot else None,
+            "total_nomes": snapshot.total_nomes if snapshot else 0,
+            "tempo_carga_ms": snapshot.tempo_carga_ms if snapshot else None,
+            "nomes_similaridade": len(snapshot.similaridade) if snapshot and snapshot.similaridade else 0
+        }
+
+
+# Instância global compartilhada pelo Agente Detetive
+base_fraudes = BaseFraudes()
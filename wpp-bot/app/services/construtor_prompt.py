@@ -0,0 +1,250 @@
+"""
+Construtor de Prompts - Prompts compactos com orçamento de tokens
+Seleciona apenas os campos relevantes para a decisão, limita o tamanho de cada
+prompt por agente e registra a quantidade de tokens enviada a cada chamada
+"""
+
+import os
+import re
+import json
+import math
+import textwrap
+import threading
+import logging
+from typing import Dict, Any, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Orçamento padrão de tokens por agente (sobrescrito por PROMPT_ORCAMENTO_TOKENS_<AGENTE>)
+ORCAMENTO_PADRAO = {
+    "leitor": 600,
+    "consultor": 400,
+    "detetive": 450,
+    "orquestrador": 700
+}
+
+# Parte do orçamento do leitor reservada ao texto OCR
+FRACAO_OCR = 0.6
+
+# Termos que tornam uma linha do OCR relevante para a decisão
+TERMOS_RELEVANTES = (
+    "r$", "valor", "total", "vencimento", "validade", "beneficiário", "beneficiario",
+    "favorecido", "recebedor", "cedente", "pagador", "cnpj", "cpf", "pix", "chave",
+    "código", "codigo", "banco", "urgente", "imediato", "bloqueio", "suspensão",
+    "multa", "juros", "desconto", "promoção"
+)
+
+_PADRAO_TOKEN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+_PADRAO_DIGITOS = re.compile(r"\d{4,}")
+_PADRAO_ESPACOS = re.compile(r"[ \t]+")
+
+
+def contar_tokens(texto: str) -> int:
+    """
+    Conta tokens localmente, aproximando um tokenizador BPE
+    (palavras longas e números viram vários tokens, pontuação conta um cada)
+    """
+    if not texto:
+        return 0
+    total = 0
+    for parte in _PADRAO_TOKEN.findall(texto):
+        total += max(1, math.ceil(len(parte) / 4))
+    return total
+
+
+def json_compacto(dados: Any) -> str:
+    """Serializa JSON sem indentação nem espaços supérfluos"""
+    return json.dumps(dados, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+class ConstrutorPrompt:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.orcamentos = {
+            agente: int(os.getenv(f"PROMPT_ORCAMENTO_TOKENS_{agente.upper()}", padrao))
+            for agente, padrao in ORCAMENTO_PADRAO.items()
+        }
+        self.estatisticas: Dict[str, Dict[str, Any]] = {}
+
+    # ===== SELEÇÃO E COMPACTAÇÃO DE CAMPOS =====
+
+    def truncar_texto_ocr(self, texto_ocr: str, max_tokens: int) -> str:
+        """
+        Reduz o texto OCR ao orçamento mantendo primeiro as linhas com valores,
+        datas, documentos e nomes, preservando a ordem original
+        """
+        if not texto_ocr:
+            return ""
+
+        linhas = []
+        vistas = set()
+        for linha in texto_ocr.splitlines():
+            linha = _PADRAO_ESPACOS.sub(" ", linha).strip()
+            if len(linha) < 3 or linha.lower() in vistas:
+                continue
+            vistas.add(linha.lower())
+            linhas.append(linha)
+
+        texto_limpo = "\n".join(linhas)
+        if contar_tokens(texto_limpo) <= max_tokens:
+            return texto_limpo
+
+        def relevancia(linha: str) -> int:
+            linha_lower = linha.lower()
+            pontos = sum(3 for termo in TERMOS_RELEVANTES if termo in linha_lower)
+            if _PADRAO_DIGITOS.search(linha):
+                pontos += 2
+            return pontos
+
+        # Ordenar por relevância (empate: linhas do início do documento primeiro)
+        candidatas = sorted(range(len(linhas)), key=lambda i: (-relevancia(linhas[i]), i))
+
+        selecionadas = []
+        usados = 1  # marcador de omissão
+        for indice in candidatas:
+            custo = contar_tokens(linhas[indice]) + 1
+            if usados + custo > max_tokens:
+                continue
+            selecionadas.append(indice)
+            usados += custo
+
+        selecionadas.sort()
+        return "\n".join(linhas[i] for i in selecionadas) + "\n[...]"
+
+    def compactar_dados_extraidos(self, dados_extraidos: Dict[str, Any]) -> Dict[str, Any]:
+        """Mantém apenas campos preenchidos e sinalizadores verdadeiros"""
+        return {
+            campo: valor for campo, valor in (dados_extraidos or {}).items()
+            if valor not in (None, "", False, [], {}) and campo != "texto_ocr"
+        }
+
+    def compactar_leitor(self, resultado_leitor: Dict[str, Any]) -> Dict[str, Any]:
+        """Resumo do Agente Leitor relevante para a decisão"""
+        return {
+            "sucesso": resultado_leitor.get("sucesso", False),
+            "dados": self.compactar_dados_extraidos(resultado_leitor.get("dados_extraidos", {}))
+        }
+
+    def compactar_validacoes(self, validacoes: Dict[str, Any]) -> Dict[str, Any]:
+        """Reduz cada validação do consultor a status e confiabilidade"""
+        return {
+            tipo: [validacao.get("status"), validacao.get("confiabilidade", 0)]
+            for tipo, validacao in (validacoes or {}).items()
+        }
+
+    def compactar_analises(self, analises: Dict[str, Any]) -> Dict[str, Any]:
+        """Reduz cada análise do detetive a status e risco"""
+        return {
+            tipo: [analise.get("status"), analise.get("risco", analise.get("risco_total", 0))]
+            for tipo, analise in (analises or {}).items()
+        }
+
+    def compactar_alertas(self, alertas: List[Dict[str, Any]], limite: int = 5) -> List[str]:
+        """Mantém apenas as mensagens dos alertas mais relevantes"""
+        return [alerta.get("mensagem", "") for alerta in (alertas or [])[:limite]]
+
+    def compactar_consultor(self, resultado_consultor: Dict[str, Any]) -> Dict[str, Any]:
+        """Resumo do Agente Consultor relevante para a decisão"""
+        return {
+            "sucesso": resultado_consultor.get("sucesso", False),
+            "validacoes": self.compactar_validacoes(resultado_consultor.get("validacoes", {})),
+            "alertas": self.compactar_alertas(resultado_consultor.get("alertas", []))
+        }
+
+    def compactar_detetive(self, resultado_detetive: Dict[str, Any]) -> Dict[str, Any]:
+        """Resumo do Agente Detetive relevante para a decisão"""
+        return {
+            "sucesso": resultado_detetive.get("sucesso", False),
+            "risco": resultado_detetive.get("pontuacao_risco", 0),
+            "analises": self.compactar_analises(resultado_detetive.get("analises", {})),
+            "alertas": self.compactar_alertas(resultado_detetive.get("alertas_fraude", []))
+        }
+
+    # ===== MONTAGEM COM ORÇAMENTO =====
+
+    def montar(self,
+               agente: str,
+               cabecalho: str,
+               secoes: List[Tuple[str, str, bool]],
+               instrucoes: str) -> str:
+        """
+        Monta o prompt respeitando o orçamento de tokens do agente
+
+        Args:
+            agente: Nome do agente (define o orçamento)
+            cabecalho: Texto inicial do prompt
+            secoes: Lista de (titulo, conteudo, obrigatoria) em ordem de prioridade
+            instrucoes: Instruções finais de formato da resposta
+
+        Returns:
+            Prompt pronto para envio
+        """
+        orcamento = self.orcamentos.get(agente, ORCAMENTO_PADRAO["orquestrador"])
+        secoes = [list(secao) for secao in secoes]
+
+        def renderizar() -> str:
+            corpo = "\n".join(f"{titulo}: {conteudo}" for titulo, conteudo, _ in secoes)
+            return f"{textwrap.dedent(cabecalho).strip()}\n{corpo}\n{textwrap.dedent(instrucoes).strip()}"
+
+        prompt = renderizar()
+
+        # 1. Descartar seções opcionais, da menos prioritária para a mais prioritária
+        while contar_tokens(prompt) > orcamento:
+            opcionais = [i for i, secao in enumerate(secoes) if not secao[2]]
+            if not opcionais:
+                break
+            secoes.pop(opcionais[-1])
+            prompt = renderizar()
+
+        # 2. Cortar a maior seção restante até caber no orçamento
+        excesso = contar_tokens(prompt) - orcamento
+        if excesso > 0 and secoes:
+            maior = max(secoes, key=lambda secao: contar_tokens(secao[1]))
+            limite = max(0, contar_tokens(maior[1]) - excesso - 1)
+            maior[1] = self._cortar(maior[1], limite) + "…"
+            prompt = renderizar()
+
+        self.registrar_tokens(agente, contar_tokens(prompt))
+        return prompt
+
+    def _cortar(self, texto: str, max_tokens: int) -> str:
+        """Corta o texto no último fragmento que ainda cabe em max_tokens"""
+        usados = 0
+        for match in _PADRAO_TOKEN.finditer(texto):
+            usados += max(1, math.ceil(len(match.group()) / 4))
+            if usados > max_tokens:
+                return texto[:match.start()].rstrip()
+        return texto
+
+    # ===== ESTATÍSTICAS =====
+
+    def registrar_tokens(self, agente: str, tokens: int):
+        """Registra a quantidade de tokens do prompt enviado por um agente"""
+        with self._lock:
+            estatistica = self.estatisticas.setdefault(agente, {
+                "chamadas": 0,
+                "tokens_total": 0,
+                "tokens_max": 0,
+                "ultimo": 0
+            })
+            estatistica["chamadas"] += 1
+            estatistica["tokens_total"] += tokens
+            estatistica["tokens_max"] = max(estatistica["tokens_max"], tokens)
+            estatistica["ultimo"] = tokens
+        logger.debug(f"Prompt do agente {agente}: {tokens} tokens")
+
+    def obter_estatisticas(self) -> Dict[str, Any]:
+        """Resumo de tokens de prompt por agente"""
+        with self._lock:
+            return {
+                agente: {
+                    **estatistica,
+                    "orcamento": self.orcamentos.get(agente),
+                    "tokens_medio": round(estatistica["tokens_total"] / max(1, estatistica["chamadas"]), 1)
+                }
+                for agente, estatistica in self.estatisticas.items()
+            }
+
+
+# Instância global compartilhada pelos agentes
+construtor_prompt = ConstrutorPrompt()
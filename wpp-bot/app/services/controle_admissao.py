@@ -0,0 +1,258 @@
+"""
+Controle de Admissão - Limite por usuário e escalonamento justo das verificações
+Cada verificação (OCR + agentes com LLM) custa segundos de CPU e chamadas
+pagas. Um balde de fichas por usuário limita a taxa de pedidos, um teto de
+pedidos pendentes por usuário impede que um só usuário encha a fila, e as
+verificações admitidas disputam um número fixo de vagas por enfileiramento
+justo ponderado (marcas de início virtuais): quem mandou dez imagens espera a
+vez dele sem atrasar quem mandou uma. Pedidos recusados recebem uma resposta
+pronta, sem passar pela IA
+"""
+
+import os
+import time
+import heapq
+import asyncio
+import itertools
+import logging
+from typing import Dict, Any, List, Callable, Awaitable, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Balde de fichas: rajada permitida e reposição por minuto
+RAJADA = float(os.getenv("VERIFICACAO_RAJADA", "5"))
+POR_MINUTO = float(os.getenv("VERIFICACAO_POR_MINUTO", "6"))
+MAX_SIMULTANEAS = int(os.getenv("VERIFICACAO_MAX_SIMULTANEAS", "8"))
+MAX_SIMULTANEAS_POR_USUARIO = int(os.getenv("VERIFICACAO_MAX_SIMULTANEAS_POR_USUARIO", "2"))
+MAX_PENDENTES_POR_USUARIO = int(os.getenv("VERIFICACAO_MAX_PENDENTES_POR_USUARIO", "4"))
+MAX_FILA = int(os.getenv("VERIFICACAO_MAX_FILA", "200"))
+MAX_BALDES = 100_000
+
+MOTIVO_TAXA = "limite_taxa"
+MOTIVO_PENDENTES = "muitas_pendentes"
+MOTIVO_SOBRECARGA = "sistema_sobrecarregado"
+
+# Custo relativo de cada tipo de verificação na divisão das vagas
+CUSTO_IMAGEM = 1.0
+CUSTO_TEXTO = 0.5
+
+
+class Reserva:
+    """Lugar na fila concedido pela admissão, consumido por executar()"""
+
+    __slots__ = ("user_id", "custo", "peso", "criada_em", "agendada", "liberada", "em_vaga", "retida")
+
+    def __init__(self, user_id: str, custo: float, peso: float):
+        self.user_id = user_id
+        self.custo = custo
+        self.peso = peso
+        self.criada_em = time.monotonic()
+        self.agendada = False
+        self.liberada = False
+        self.em_vaga = False
+        # Vaga mantida depois da função, até a entrega do resultado agendado (reter)
+        self.retida = False
+
+
+def mensagem_recusa(recusa: Dict[str, Any]) -> str:
+    """Resposta pronta do WhatsApp para um pedido recusado"""
+    if recusa["motivo"] == MOTIVO_TAXA:
+        espera = max(1, int(recusa.get("tentar_em_segundos", 0) + 0.999))
+        return ("⏳ **Muitas verificações seguidas**\n\n"
+                f"Você atingiu o limite de verificações por minuto. Tente novamente em {espera} segundos.")
+    if recusa["motivo"] == MOTIVO_PENDENTES:
+        return ("⏳ **Verificações em andamento**\n\n"
+                "Ainda estamos analisando os documentos que você enviou. "
+                "Aguarde os resultados antes de enviar novos.")
+    return ("⏳ **Sistema ocupado**\n\n"
+            "Estamos com muitas verificações no momento. Tente novamente em alguns minutos.")
+
+
+class ControleAdmissao:
+    def __init__(self,
+                 rajada: float = RAJADA,
+                 por_minuto: float = POR_MINUTO,
+                 max_simultaneas: int = MAX_SIMULTANEAS,
+                 max_simultaneas_por_usuario: int = MAX_SIMULTANEAS_POR_USUARIO,
+                 max_pendentes_por_usuario: int = MAX_PENDENTES_POR_USUARIO,
+                 max_fila: int = MAX_FILA):
+        self.rajada = rajada
+        self.reposicao_por_segundo = por_minuto / 60
+        self.max_simultaneas = max_simultaneas
+        self.max_simultaneas_por_usuario = max_simultaneas_por_usuario
+        self.max_pendentes_por_usuario = max_pendentes_por_usuario
+        self.max_fila = max_fila
+
+        self._baldes: Dict[str, Tuple[float, float]] = {}
+        self._pendentes: Dict[str, int] = {}
+        self._em_execucao: Dict[str, int] = {}
+        self._ativas = 0
+        # Enfileiramento justo: (marca de início, sequência, reserva, futuro da vaga)
+        self._fila: List[Tuple[float, int, Reserva, asyncio.Future]] = []
+        self._sequencia = itertools.count()
+        self._tempo_virtual = 0.0
+        self._ultima_marca_fim: Dict[str, float] = {}
+        self.estatisticas = {
+            "admitidas": 0, "iniciadas": 0, "concluidas": 0, "espera_total_ms": 0.0,
+            "recusadas": {MOTIVO_TAXA: 0, MOTIVO_PENDENTES: 0, MOTIVO_SOBRECARGA: 0}
+        }
+
+    # ===== ADMISSÃO =====
+
+    def _consumir_ficha(self, user_id: str, agora: float) -> float:
+        """Retira uma ficha do balde do usuário; retorna 0 ou os segundos até a próxima ficha"""
+        fichas, ultimo = self._baldes.get(user_id, (self.rajada, agora))
+        fichas = min(self.rajada, fichas + (agora - ultimo) * self.reposicao_por_segundo)
+        if fichas < 1:
+            self._baldes[user_id] = (fichas, agora)
+            return (1 - fichas) / self.reposicao_por_segundo if self.reposicao_por_segundo else float("inf")
+        self._baldes[user_id] = (fichas - 1, agora)
+        if len(self._baldes) > MAX_BALDES:
+            self._podar_baldes(agora)
+        return 0.0
+
+    def _podar_baldes(self, agora: float):
+        """Esquece os baldes já cheios (equivalem a um usuário novo)"""
+        for user_id, (fichas, ultimo) in list(self._baldes.items()):
+            if fichas + (agora - ultimo) * self.reposicao_por_segundo >= self.rajada:
+                del self._baldes[user_id]
+
+    def admitir(self, user_id: str, custo: float = CUSTO_IMAGEM, peso: float = 1.0) -> Dict[str, Any]:
+        """
+        Decide se a verificação do usuário entra na fila
+
+        Returns:
+            {"admitido": True, "reserva"} ou {"admitido": False, "motivo", "tentar_em_segundos"?}
+        """
+        user_id = str(user_id)
+        if len(self._fila) >= self.max_fila:
+            return self._recusar(user_id, MOTIVO_SOBRECARGA)
+        if self._pendentes.get(user_id, 0) >= self.max_pendentes_por_usuario:
+            return self._recusar(user_id, MOTIVO_PENDENTES)
+        espera = self._consumir_ficha(user_id, time.monotonic())
+        if espera:
+            return self._recusar(user_id, MOTIVO_TAXA, tentar_em_segundos=round(espera, 1))
+
+        self._pendentes[user_id] = self._pendentes.get(user_id, 0) + 1
+        self.estatisticas["admitidas"] += 1
+        return {"admitido": True, "reserva": Reserva(user_id, custo, peso)}
+
+    def _recusar(self, user_id: str, motivo: str, **extras) -> Dict[str, Any]:
+        self.estatisticas["recusadas"][motivo] += 1
+        logger.info(f"Verificação do usuário {user_id} recusada: {motivo}")
+        return {"admitido": False, "motivo": motivo, **extras}
+
+    def liberar(self, reserva: Reserva):
+        """Devolve o lugar de uma reserva que não será executada"""
+        if reserva.liberada:
+            return
+        reserva.liberada = True
+        restantes = self._pendentes.get(reserva.user_id, 0) - 1
+        if restantes > 0:
+            self._pendentes[reserva.user_id] = restantes
+        else:
+            self._pendentes.pop(reserva.user_id, None)
+
+    # ===== ESCALONAMENTO =====
+
+    async def executar(self, reserva: Reserva, funcao: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """Espera a vez da reserva (enfileiramento justo) e executa a verificação numa vaga"""
+        try:
+            await self._aguardar_vaga(reserva)
+            self.estatisticas["iniciadas"] += 1
+            self.estatisticas["espera_total_ms"] += (time.monotonic() - reserva.criada_em) * 1000
+            try:
+                return await funcao(*args, **kwargs)
+            except BaseException:
+                # Falhou: não há resultado a esperar
+                reserva.retida = False
+                raise
+            finally:
+                if not reserva.retida:
+                    self._devolver_vaga(reserva)
+        finally:
+            if not reserva.retida:
+                self.liberar(reserva)
+
+    def reter(self, reserva: Reserva) -> Callable[[], None]:
+        """
+        Mantém a vaga da reserva depois que a função de executar() retornar
+
+        Para fluxos que agendam o resultado (envios_agendados) em vez de
+        esperá-lo: a vaga e o pendente do usuário só voltam quando a função
+        devolvida for chamada, tipicamente na entrega da última mensagem.
+        """
+        reserva.retida = True
+
+        def concluir():
+            reserva.retida = False
+            self._devolver_vaga(reserva)
+            self.liberar(reserva)
+        return concluir
+
+    async def _aguardar_vaga(self, reserva: Reserva):
+        user_id = reserva.user_id
+        inicio = max(self._tempo_virtual, self._ultima_marca_fim.get(user_id, 0.0))
+        self._ultima_marca_fim[user_id] = inicio + reserva.custo / reserva.peso
+        futuro = asyncio.get_event_loop().create_future()
+        heapq.heappush(self._fila, (inicio, next(self._sequencia), reserva, futuro))
+        self._despachar()
+        try:
+            await futuro
+        except asyncio.CancelledError:
+            if futuro.done() and not futuro.cancelled():
+                # A vaga já tinha sido concedida: devolvê-la
+                self._devolver_vaga(reserva)
+            raise
+
+    def _despachar(self):
+        """Concede as vagas livres às reservas de menor marca de início, respeitando o teto por usuário"""
+        adiadas = []
+        while self._fila and self._ativas < self.max_simultaneas:
+            item = heapq.heappop(self._fila)
+            inicio, _, reserva, futuro = item
+            if futuro.done():
+                continue
+            if self._em_execucao.get(reserva.user_id, 0) >= self.max_simultaneas_por_usuario:
+                adiadas.append(item)
+                continue
+            self._tempo_virtual = max(self._tempo_virtual, inicio)
+            self._ativas += 1
+            self._em_execucao[reserva.user_id] = self._em_execucao.get(reserva.user_id, 0) + 1
+            reserva.em_vaga = True
+            futuro.set_result(None)
+        for item in adiadas:
+            heapq.heappush(self._fila, item)
+        if not self._fila:
+            # Fila vazia: as marcas antigas não dão mais prioridade a ninguém
+            self._ultima_marca_fim.clear()
+
+    def _devolver_vaga(self, reserva: Reserva):
+        if not reserva.em_vaga:
+            return
+        reserva.em_vaga = False
+        self._ativas -= 1
+        restantes = self._em_execucao.get(reserva.user_id, 0) - 1
+        if restantes > 0:
+            self._em_execucao[reserva.user_id] = restantes
+        else:
+            self._em_execucao.pop(reserva.user_id, None)
+        self.estatisticas["concluidas"] += 1
+        self._despachar()
+
+    def obter_estatisticas(self) -> Dict[str, Any]:
+        """Vagas em uso, fila, admissões, recusas por motivo e espera média"""
+        iniciadas = self.estatisticas["iniciadas"]
+        return {
+            "admitidas": self.estatisticas["admitidas"],
+            "concluidas": self.estatisticas["concluidas"],
+            "recusadas": dict(self.estatisticas["recusadas"]),
+            "em_execucao": self._ativas,
+            "na_fila": len(self._fila),
+            "usuarios_com_pendentes": len(self._pendentes),
+            "espera_media_ms": round(self.estatisticas["espera_total_ms"] / iniciadas, 1) if iniciadas else 0.0
+        }
+
+
+# Instância global compartilhada pelo webhook do WhatsApp
+controle_admissao = ControleAdmissao()
@@ -0,0 +1,285 @@
+"""
+Denúncias de Fraude - Golpes reportados pelos usuários, compartilhados entre workers
+Persiste cada denúncia em SQLite indexada pelos identificadores do documento
+(chave PIX, código de barras e CNPJ/CPF) e mantém contadores agregados por
+identificador, de modo que a denúncia de um usuário passe a proteger todos os
+outros; as gravações são agrupadas em lotes
+
+O nome do beneficiário não identifica o golpe: golpistas usam o nome de
+empresas legítimas, e denúncias agregadas pelo nome marcariam os boletos
+verdadeiros delas
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import sqlite3
+import threading
+import logging
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Union, Tuple, AbstractSet
+
+from .registros_verificacao import DadosDocumento, chave_identificador
+
+logger = logging.getLogger(__name__)
+
+CAMINHO_PADRAO = Path(__file__).resolve().parents[2] / "data" / "denuncias_fraude.db"
+
+# Identificadores do meio de pagamento, os únicos que agregam denúncias
+TIPOS_INSTRUMENTO = ("codigo_barras", "chave_pix", "documento")
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS denuncias (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    criado_em REAL NOT NULL,
+    dados TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_denuncias_usuario ON denuncias (user_id, criado_em DESC);
+CREATE TABLE IF NOT EXISTS denunciantes (
+    chave TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    PRIMARY KEY (chave, user_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS contagens (
+    chave TEXT PRIMARY KEY,
+    total INTEGER NOT NULL,
+    usuarios INTEGER NOT NULL,
+    primeira_em REAL NOT NULL,
+    ultima_em REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def chaves_denuncia(dados: Union[DadosDocumento, Dict[str, Any]],
+                    legitimos: AbstractSet[str] = frozenset()) -> Dict[str, str]:
+    """
+    Identificadores do documento usados para agregar as denúncias
+
+    Os que pertencem a um beneficiário legítimo (`legitimos`, do catálogo Bemobi)
+    ficam de fora: boletos falsos copiam o CNPJ da empresa que imitam.
+
+    Returns:
+        Tipo do identificador (codigo_barras, chave_pix, documento) -> chave
+    """
+    documento = DadosDocumento.garantir(dados)
+    chaves = {}
+    if documento.codigo_barras and len(documento.codigo_barras) >= 44:
+        chaves["codigo_barras"] = chave_identificador("codigo_barras", documento.codigo_barras)
+
+    chave_pix = chave_identificador("chave_pix", documento.chave_pix)
+    if chave_pix:
+        chaves["chave_pix"] = chave_pix
+
+    # CNPJ/CPF informado na denúncia, extraído pelo leitor ou usado como chave PIX
+    extras = dados if isinstance(dados, dict) else {}
+    pix_documento = chave_pix[len("pix:"):] if chave_pix and chave_pix[len("pix:"):].isdigit() else None
+    for candidato in (extras.get("cnpj"), extras.get("cpf"), documento.documento_beneficiario, pix_documento):
+        if candidato and not re.search(r"[a-z@]", str(candidato).lower()):
+            digitos = re.sub(r"\D", "", str(candidato))
+            if len(digitos) in (11, 14):
+                chaves["documento"] = chave_identificador("documento", digitos)
+                break
+    return {tipo: chave for tipo, chave in chaves.items() if chave not in legitimos}
+
+
+class ArmazemDenuncias:
+    def __init__(self, caminho: Optional[str] = None):
+        self.caminho = Path(caminho or os.getenv("DENUNCIAS_PATH", str(CAMINHO_PADRAO)))
+        self.intervalo_descarga = float(os.getenv("DENUNCIAS_INTERVALO_DESCARGA_MS", "200")) / 1000
+        self.max_lote = int(os.getenv("DENUNCIAS_MAX_LOTE", "100"))
+        self._lock = threading.Lock()
+        self._conexao: Optional[sqlite3.Connection] = None
+        self._lock_pendentes = threading.Lock()
+        self._pendentes: List[Dict[str, Any]] = []
+        self._evento_descarga = threading.Event()
+        self._thread_descarga: Optional[threading.Thread] = None
+        self.estatisticas = {"denuncias": 0, "lotes": 0, "consultas": 0}
+
+    def _conectar(self) -> sqlite3.Connection:
+        """Abre a conexão no primeiro uso"""
+        if self._conexao is None:
+            if str(self.caminho) != ":memory:":
+                self.caminho.parent.mkdir(parents=True, exist_ok=True)
+            conexao = sqlite3.connect(str(self.caminho), check_same_thread=False, isolation_level=None, timeout=10)
+            conexao.row_factory = sqlite3.Row
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            conexao.executescript(_ESQUEMA)
+            self._conexao = conexao
+        return self._conexao
+
+    # ===== ESCRITA =====
+
+    def registrar(self, user_id: str, dados: Dict[str, Any],
+                  legitimos: AbstractSet[str] = frozenset()) -> Dict[str, Any]:
+        """
+        Enfileira a denúncia para a próxima gravação em lote
+
+        Args:
+            user_id: Usuário que denunciou
+            dados: Dados do documento (campos do leitor; opcionalmente tipo, cnpj, cpf)
+            legitimos: Identificadores de beneficiários legítimos, que não são denunciados
+        """
+        chaves = chaves_denuncia(dados, legitimos)
+        if not chaves:
+            return {"sucesso": False, "erro": "Documento sem chave PIX, código de barras ou CNPJ/CPF para denunciar"}
+
+        documento = DadosDocumento.garantir(dados)
+        tipo = dados.get("tipo") or ("pix_suspeito" if documento.chave_pix else
+                                     "boleto_falso" if documento.codigo_barras else "desconhecido")
+        denuncia = {
+            "id": uuid.uuid4().hex,
+            "user_id": str(user_id or ""),
+            "tipo": tipo,
+            "criado_em": time.time(),
+            "dados": {**documento.para_dict(), "chaves": chaves},
+        }
+
+        with self._lock_pendentes:
+            self._pendentes.append(denuncia)
+            lote_cheio = len(self._pendentes) >= self.max_lote
+        if lote_cheio:
+            self.descarregar()
+        else:
+            self._agendar_descarga()
+        return {"sucesso": True, "id_denuncia": denuncia["id"], "tipo": tipo, "identificadores": sorted(chaves)}
+
+    def _agendar_descarga(self):
+        """Acorda a thread de gravação, criando-a no primeiro uso"""
+        if self._thread_descarga is None or not self._thread_descarga.is_alive():
+            self._thread_descarga = threading.Thread(
+                target=self._laco_descarga, name="descarga-denuncias", daemon=True
+            )
+            self._thread_descarga.start()
+        self._evento_descarga.set()
+
+    def _laco_descarga(self):
+        while True:
+            self._evento_descarga.wait()
+            # Espera o intervalo para juntar as denúncias que chegarem no meio tempo
+            time.sleep(self.intervalo_descarga)
+            self._evento_descarga.clear()
+            try:
+                self.descarregar()
+            except Exception as e:
+                logger.error(f"Erro ao gravar denúncias: {e}")
+
+    def descarregar(self) -> int:
+        """Grava as denúncias pendentes numa única transação; retorna quantas foram gravadas"""
+        with self._lock:
+            with self._lock_pendentes:
+                lote, self._pendentes = self._pendentes, []
+            if not lote:
+                return 0
+
+            conexao = self._conectar()
+            conexao.execute("BEGIN IMMEDIATE")
+            try:
+                for denuncia in lote:
+                    conexao.execute(
+                        "INSERT OR IGNORE INTO denuncias (id, user_id, tipo, criado_em, dados) VALUES (?, ?, ?, ?, ?)",
+                        (denuncia["id"], denuncia["user_id"], denuncia["tipo"], denuncia["criado_em"],
+                         json.dumps(denuncia["dados"], ensure_ascii=False))
+                    )
+                    for chave in denuncia["dados"]["chaves"].values():
+                        # Cada usuário conta uma vez por identificador
+                        novo_usuario = conexao.execute(
+                            "INSERT OR IGNORE INTO denunciantes (chave, user_id) VALUES (?, ?)",
+                            (chave, denuncia["user_id"])
+                        ).rowcount
+                        conexao.execute(
+                            "INSERT INTO contagens (chave, total, usuarios, primeira_em, ultima_em) "
+                            "VALUES (?, 1, ?, ?, ?) ON CONFLICT (chave) DO UPDATE SET "
+                            "total = total + 1, usuarios = usuarios + excluded.usuarios, ultima_em = excluded.ultima_em",
+                            (chave, novo_usuario, denuncia["criado_em"], denuncia["criado_em"])
+                        )
+                conexao.execute("COMMIT")
+            except Exception:
+                conexao.execute("ROLLBACK")
+                with self._lock_pendentes:
+                    self._pendentes[:0] = lote
+                raise
+            self.estatisticas["denuncias"] += len(lote)
+            self.estatisticas["lotes"] += 1
+        return len(lote)
+
+    # ===== LEITURA =====
+
+    def consultar(self, chaves: Dict[str, str], user_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Contadores agregados dos identificadores do documento
+
+        Returns:
+            {"contagens": {tipo: {"total", "usuarios", "ultima_em"}}, "denunciado_pelo_usuario": bool}
+        """
+        if not chaves:
+            return {"contagens": {}, "denunciado_pelo_usuario": False}
+        # Denúncias deste processo ainda na fila já valem para a consulta
+        if self._pendentes:
+            self.descarregar()
+
+        tipos = {chave: tipo for tipo, chave in chaves.items()}
+        marcadores = ",".join("?" for _ in tipos)
+        with self._lock:
+            conexao = self._conectar()
+            linhas = conexao.execute(
+                f"SELECT chave, total, usuarios, ultima_em FROM contagens WHERE chave IN ({marcadores})",
+                tuple(tipos)
+            ).fetchall()
+            proprio = user_id is not None and linhas and conexao.execute(
+                f"SELECT 1 FROM denunciantes WHERE user_id = ? AND chave IN ({marcadores}) LIMIT 1",
+                (str(user_id), *tipos)
+            ).fetchone() is not None
+            self.estatisticas["consultas"] += 1
+
+        return {
+            "contagens": {
+                tipos[linha["chave"]]: {
+                    "total": linha["total"],
+                    "usuarios": linha["usuarios"],
+                    "ultima_em": linha["ultima_em"]
+                }
+                for linha in linhas
+            },
+            "denunciado_pelo_usuario": bool(proprio)
+        }
+
+    def listar_do_usuario(self, user_id: str, limite: int = 20) -> List[Dict[str, Any]]:
+        """Denúncias do usuário, da mais nova para a mais antiga"""
+        if self._pendentes:
+            self.descarregar()
+        with self._lock:
+            linhas = self._conectar().execute(
+                "SELECT id, tipo, criado_em, dados FROM denuncias WHERE user_id = ? ORDER BY criado_em DESC LIMIT ?",
+                (str(user_id), limite)
+            ).fetchall()
+        return [
+            {"id_denuncia": linha["id"], "tipo": linha["tipo"], "criado_em": linha["criado_em"],
+             **json.loads(linha["dados"])}
+            for linha in linhas
+        ]
+
+    def listar_desde(self, ultima_posicao: int, limite: int = 1000) -> List[Tuple[int, Dict[str, str]]]:
+        """Denúncias gravadas após a posição informada, como (posição, chaves), em ordem de gravação"""
+        if self._pendentes:
+            self.descarregar()
+        with self._lock:
+            linhas = self._conectar().execute(
+                "SELECT rowid, dados FROM denuncias WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                (ultima_posicao, limite)
+            ).fetchall()
+        return [(linha[0], json.loads(linha["dados"]).get("chaves", {})) for linha in linhas]
+
+    def obter_estatisticas(self) -> Dict[str, Any]:
+        """Denúncias gravadas, lotes, consultas e fila pendente"""
+        with self._lock_pendentes:
+            pendentes = len(self._pendentes)
+        return {**self.estatisticas, "pendentes": pendentes}
+
+
+# Instância global compartilhada pelo Agente Detetive
+armazem_denuncias = ArmazemDenuncias()
@@ -0,0 +1,305 @@
+"""
+Envios Agendados - Mensagens do WhatsApp com atraso, numa roda de temporizadores
+Os fluxos que cadenciam respostas ("processando...", depois o resultado)
+esperavam com asyncio.sleep, prendendo uma corrotina, uma sessão do banco e
+uma tarefa em background por usuário. Agora eles agendam "enviar X daqui a
+3s" e retornam; uma roda de temporizadores hierárquica (níveis de 64
+posições, tique de ENVIOS_TIQUE_MS) guarda dezenas de milhares de envios
+pendentes com custo constante por envio, e uma única tarefa-relógio entrega
+os vencidos à fila de saída, que envia na ordem de agendamento de cada usuário
+"""
+
+import os
+import time
+import asyncio
+import itertools
+import logging
+from typing import Dict, Any, Optional, List, Callable
+
+from .whatsapp import whatsapp_service
+
+logger = logging.getLogger(__name__)
+
+TIQUE_MS = int(os.getenv("ENVIOS_TIQUE_MS", "100"))
+MAX_SIMULTANEOS = int(os.getenv("ENVIOS_MAX_SIMULTANEOS", "20"))
+
+BITS_POR_NIVEL = 6
+NIVEIS = 4
+
+TIPO_TEXTO = "texto"
+TIPO_BOTOES = "botoes"
+
+
+class RodaTemporizadores:
+    """
+    Roda de temporizadores hierárquica (Varghese & Lauck)
+
+    O nível n tem 64 posições de 64^n tiques cada. Um item entra no nível
+    mais baixo que alcança seu vencimento e desce de nível quando o relógio
+    chega à posição dele, até vencer no nível 0. Agendar custa O(1) e cada
+    tique percorre só as posições que vencem nele. Os itens precisam dos
+    atributos `vencimento` (tique) e `sequencia` (desempate na ordem de agendamento).
+    """
+
+    def __init__(self, bits_por_nivel: int = BITS_POR_NIVEL, niveis: int = NIVEIS):
+        self._bits = bits_por_nivel
+        self._mascara = (1 << bits_por_nivel) - 1
+        self._alcance = 1 << (bits_por_nivel * niveis)
+        self._niveis: List[List[list]] = [
+            [[] for _ in range(1 << bits_por_nivel)] for _ in range(niveis)
+        ]
+        self.tique_atual = 0
+        self.pendentes = 0
+
+    def __len__(self) -> int:
+        return self.pendentes
+
+    def agendar(self, item, tiques: int):
+        """Agenda o item para daqui a `tiques` tiques (no mínimo um)"""
+        item.vencimento = self.tique_atual + max(1, tiques)
+        self._inserir(item)
+        self.pendentes += 1
+
+    def _inserir(self, item):
+        # Além do alcance da roda: estaciona no último nível e é reposicionado ao descer
+        distancia = min(item.vencimento - self.tique_atual, self._alcance - 1)
+        alvo = self.tique_atual + max(0, distancia)
+        for nivel, posicoes in enumerate(self._niveis):
+            if distancia < 1 << (self._bits * (nivel + 1)):
+                posicoes[(alvo >> (self._bits * nivel)) & self._mascara].append(item)
+                return
+
+    def avancar(self, ate_tique: int) -> List[Any]:
+        """Avança o relógio até `ate_tique` e retorna os itens vencidos, em ordem"""
+        vencidos: List[Any] = []
+        if not self.pendentes:
+            # Roda vazia: nada a percorrer
+            self.tique_atual = max(self.tique_atual, ate_tique)
+            return vencidos
+        while self.tique_atual < ate_tique and self.pendentes:
+            self.tique_atual += 1
+            # Na virada de um nível, a posição correspondente do nível acima desce
+            for nivel in range(1, len(self._niveis)):
+                deslocamento = self._bits * nivel
+                if self.tique_atual & ((1 << deslocamento) - 1):
+                    break
+                posicoes = self._niveis[nivel]
+                indice = (self.tique_atual >> deslocamento) & self._mascara
+                descendo, posicoes[indice] = posicoes[indice], []
+                for item in descendo:
+                    self._inserir(item)
+            posicoes = self._niveis[0]
+            indice = self.tique_atual & self._mascara
+            if posicoes[indice]:
+                vencendo, posicoes[indice] = posicoes[indice], []
+                vencendo.sort(key=lambda item: item.sequencia)
+                vencidos.extend(vencendo)
+                self.pendentes -= len(vencendo)
+        self.tique_atual = max(self.tique_atual, ate_tique)
+        return vencidos
+
+    def esvaziar(self) -> List[Any]:
+        """Retira todos os itens pendentes, em qualquer nível"""
+        itens = [item for posicoes in self._niveis for posicao in posicoes for item in posicao]
+        for posicoes in self._niveis:
+            for indice in range(len(posicoes)):
+                posicoes[indice] = []
+        self.pendentes = 0
+        return itens
+
+
+class EnvioAgendado:
+    """Mensagem pendente: o que enviar, para quem e quando"""
+
+    __slots__ = ("vencimento", "sequencia", "telefone", "tipo", "conteudo", "botoes",
+                 "user_id", "registrar", "previsto_em", "ao_entregar")
+
+    def __init__(self, sequencia: int, telefone: str, tipo: str, conteudo: str,
+                 botoes: Optional[List[Dict[str, str]]], user_id: Optional[int], registrar: bool,
+                 previsto_em: float, ao_entregar: Optional[Callable[[], None]] = None):
+        self.vencimento = 0
+        self.sequencia = sequencia
+        self.telefone = telefone
+        self.tipo = tipo
+        self.conteudo = conteudo
+        self.botoes = botoes
+        self.user_id = user_id
+        self.registrar = registrar
+        self.previsto_em = previsto_em
+        # Chamado depois da tentativa de envio (ou do descarte no encerramento)
+        self.ao_entregar = ao_entregar
+
+
+class EnviosAgendados:
+    def __init__(self, tique_ms: int = TIQUE_MS, max_simultaneos: int = MAX_SIMULTANEOS):
+        self.tique = tique_ms / 1000
+        self.max_simultaneos = max_simultaneos
+        self._roda = RodaTemporizadores()
+        self._sequencia = itertools.count()
+        self._origem = time.monotonic()
+        self._relogio: Optional[asyncio.Task] = None
+        self._despertar: Optional[asyncio.Event] = None
+        self._vagas: Optional[asyncio.Semaphore] = None
+        # Último lote em envio de cada telefone: o próximo espera por ele
+        self._cadeias: Dict[str, asyncio.Task] = {}
+        self.estatisticas = {"agendados": 0, "enviados": 0, "falhas": 0, "atraso_total_ms": 0.0}
+
+    # ===== AGENDAMENTO =====
+
+    def agendar_mensagem(self, telefone: str, mensagem: str, atraso: float,
+                         user_id: Optional[int] = None, registrar: bool = True,
+                         ao_entregar: Optional[Callable[[], None]] = None):
+        """Envia a mensagem de texto daqui a `atraso` segundos, sem bloquear quem agendou"""
+        self._agendar(telefone, TIPO_TEXTO, mensagem, None, atraso, user_id, registrar, ao_entregar)
+
+    def agendar_botoes(self, telefone: str, texto: str, botoes: List[Dict[str, str]], atraso: float,
+                       user_id: Optional[int] = None, registrar: bool = True,
+                       ao_entregar: Optional[Callable[[], None]] = None):
+        """Envia a mensagem com botões daqui a `atraso` segundos"""
+        self._agendar(telefone, TIPO_BOTOES, texto, botoes, atraso, user_id, registrar, ao_entregar)
+
+    def _agendar(self, telefone: str, tipo: str, conteudo: str, botoes: Optional[List[Dict[str, str]]],
+                 atraso: float, user_id: Optional[int], registrar: bool,
+                 ao_entregar: Optional[Callable[[], None]]):
+        self._garantir_relogio()
+        agora = time.monotonic()
+        # Alinhar a roda ao relógio antes de medir o atraso a partir do tique atual
+        self._entregar(self._roda.avancar(self._tique_em(agora)))
+        envio = EnvioAgendado(
+            next(self._sequencia), telefone, tipo, conteudo, botoes, user_id, registrar, agora + atraso,
+            ao_entregar
+        )
+        self._roda.agendar(envio, int(atraso / self.tique + 0.999))
+        self.estatisticas["agendados"] += 1
+        self._despertar.set()
+
+    def _tique_em(self, instante: float) -> int:
+        return int((instante - self._origem) / self.tique)
+
+    # ===== RELÓGIO =====
+
+    def _garantir_relogio(self):
+        if self._relogio is None or self._relogio.done():
+            self._despertar = asyncio.Event()
+            self._vagas = asyncio.Semaphore(self.max_simultaneos)
+            self._relogio = asyncio.get_event_loop().create_task(self._girar())
+
+    async def _girar(self):
+        """Tarefa-relógio: avança a roda a cada tique enquanto houver envios pendentes"""
+        while True:
+            if not self._roda.pendentes:
+                self._despertar.clear()
+                await self._despertar.wait()
+            await asyncio.sleep(self.tique)
+            try:
+                self._entregar(self._roda.avancar(self._tique_em(time.monotonic())))
+            except Exception as e:
+                logger.error(f"Erro ao entregar envios agendados: {e}")
+
+    def _entregar(self, vencidos: List[EnvioAgendado]):
+        """Passa os envios vencidos à fila de saída, um lote ordenado por telefone"""
+        if not vencidos:
+            return
+        lotes: Dict[str, List[EnvioAgendado]] = {}
+        for envio in vencidos:
+            lotes.setdefault(envio.telefone, []).append(envio)
+        for telefone, lote in lotes.items():
+            anterior = self._cadeias.get(telefone)
+            tarefa = asyncio.get_event_loop().create_task(self._enviar_lote(lote, anterior))
+            self._cadeias[telefone] = tarefa
+            tarefa.add_done_callback(
+                lambda t, telefone=telefone: self._cadeias.pop(telefone, None) if self._cadeias.get(telefone) is t else None
+            )
+
+    # ===== SAÍDA =====
+
+    async def _enviar_lote(self, lote: List[EnvioAgendado], anterior: Optional[asyncio.Task]):
+        if anterior is not None:
+            # Mantém a ordem de agendamento do usuário entre lotes de tiques diferentes
+            await asyncio.wait([anterior])
+        async with self._vagas:
+            db = self._abrir_sessao() if any(envio.registrar and envio.user_id for envio in lote) else None
+            try:
+                for envio in lote:
+                    await self._enviar(envio, db)
+            finally:
+                if db is not None:
+                    db.close()
+
+    @staticmethod
+    def _abrir_sessao():
+        """Sessão própria para registrar as mensagens: a do webhook já foi fechada"""
+        try:
+            from config.database import SessionLocal
+            return SessionLocal()
+        except Exception as e:
+            logger.warning(f"Envios agendados sem registro no banco: {e}")
+            return None
+
+    async def _enviar(self, envio: EnvioAgendado, db):
+        self.estatisticas["atraso_total_ms"] += max(0.0, time.monotonic() - envio.previsto_em) * 1000
+        registrar = envio.registrar and db is not None
+        try:
+            if envio.tipo == TIPO_BOTOES:
+                await whatsapp_service.send_button_message(
+                    phone_number=envio.telefone,
+                    body_text=envio.conteudo,
+                    buttons=envio.botoes,
+                    log_to_db=registrar,
+                    user_id=envio.user_id,
+                    db=db
+                )
+            else:
+                await whatsapp_service.send_message(
+                    phone_number=envio.telefone,
+                    message=envio.conteudo,
+                    log_to_db=registrar,
+                    user_id=envio.user_id,
+                    db=db
+                )
+            self.estatisticas["enviados"] += 1
+        except Exception as e:
+            self.estatisticas["falhas"] += 1
+            logger.error(f"Falha no envio agendado para {envio.telefone}: {e}")
+        finally:
+            self._concluir(envio)
+
+    @staticmethod
+    def _concluir(envio: EnvioAgendado):
+        if envio.ao_entregar is None:
+            return
+        try:
+            envio.ao_entregar()
+        except Exception as e:
+            logger.error(f"Erro no retorno de entrega do envio agendado: {e}")
+
+    async def fechar(self):
+        """Para o relógio; envios ainda pendentes são descartados (e seus retornos de entrega chamados)"""
+        if self._roda.pendentes:
+            logger.warning(f"{self._roda.pendentes} envios agendados descartados no encerramento")
+        for envio in self._roda.esvaziar():
+            self._concluir(envio)
+        if self._relogio is not None and not self._relogio.done():
+            self._relogio.cancel()
+            try:
+                await self._relogio
+            except asyncio.CancelledError:
+                pass
+        self._relogio = None
+        self._roda = RodaTemporizadores()
+
+    def obter_estatisticas(self) -> Dict[str, Any]:
+        """Envios agendados, pendentes, enviados, falhas e atraso médio em relação ao previsto"""
+        concluidos = self.estatisticas["enviados"] + self.estatisticas["falhas"]
+        return {
+            "agendados": self.estatisticas["agendados"],
+            "pendentes": self._roda.pendentes,
+            "enviados": self.estatisticas["enviados"],
+            "falhas": self.estatisticas["falhas"],
+            "usuarios_enviando": len(self._cadeias),
+            "atraso_medio_ms": round(self.estatisticas["atraso_total_ms"] / concluidos, 1) if concluidos else 0.0
+        }
+
+
+# Instância global compartilhada pelos fluxos de mensagens
+envios_agendados = EnviosAgendados()
@@ -0,0 +1,215 @@
+"""
+Fila de Verificações - Fila durável de jobs de verificação em SQLite
+A API enfileira os jobs e responde imediatamente; workers independentes
+(worker_verificacao.py) reservam os jobs com prazo de posse, executam o
+pipeline de agentes e gravam o resultado para consulta ou callback
+
+API e workers precisam estar no mesmo host: o modo WAL do SQLite depende de
+memória compartilhada e não funciona com o arquivo num sistema de arquivos
+de rede (NFS, SMB)
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+import logging
+from pathlib import Path
+from typing import Dict, Any, Optional
+from urllib.parse import urlsplit
+
+from app.core.exceptions import SecurityException
+
+logger = logging.getLogger(__name__)
+
+CAMINHO_PADRAO = Path(__file__).resolve().parents[2] / "data" / "fila_verificacoes.db"
+
+STATUS_PENDENTE = "pendente"
+STATUS_PROCESSANDO = "processando"
+STATUS_CONCLUIDO = "concluido"
+STATUS_ERRO = "erro"
+
+# Destinos aceitos para o callback: hosts exatos ou sufixos de domínio (".exemplo.com")
+HOSTS_CALLBACK = tuple(
+    host.strip().lower() for host in os.getenv("VERIFICACAO_CALLBACK_HOSTS", "").split(",") if host.strip()
+)
+ESQUEMAS_CALLBACK = tuple(
+    esquema.strip().lower() for esquema in os.getenv("VERIFICACAO_CALLBACK_ESQUEMAS", "https").split(",")
+    if esquema.strip()
+)
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    callback_url TEXT,
+    resultado TEXT,
+    erro TEXT,
+    tentativas INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    posse_ate REAL,
+    criado_em REAL NOT NULL,
+    iniciado_em REAL,
+    concluido_em REAL,
+    callback_status TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_fila ON jobs (status, criado_em);
+"""
+
+
+def validar_callback_url(url: str):
+    """
+    Recusa callbacks fora de VERIFICACAO_CALLBACK_HOSTS ou com esquema não permitido
+
+    Sem hosts configurados nenhum callback é aceito: o worker faria POST em
+    qualquer endereço informado pelo cliente, inclusive da rede interna.
+
+    Raises:
+        SecurityException: destino não permitido
+    """
+    partes = urlsplit(url or "")
+    host = (partes.hostname or "").lower()
+    if partes.scheme.lower() not in ESQUEMAS_CALLBACK:
+        raise SecurityException(f"Esquema de callback não permitido: {partes.scheme or 'ausente'}")
+    if not host or not any(
+        host == permitido or (permitido.startswith(".") and host.endswith(permitido))
+        for permitido in HOSTS_CALLBACK
+    ):
+        raise SecurityException(f"Host de callback não permitido: {host or 'ausente'}")
+
+
+class FilaVerificacoes:
+    def __init__(self, caminho: Optional[str] = None):
+        self.caminho = Path(caminho or os.getenv("VERIFICACAO_FILA_PATH", str(CAMINHO_PADRAO)))
+        self.max_tentativas = int(os.getenv("VERIFICACAO_FILA_MAX_TENTATIVAS", "3"))
+        self.posse_segundos = float(os.getenv("VERIFICACAO_FILA_POSSE_SEGUNDOS", "120"))
+        self.retencao_segundos = float(os.getenv("VERIFICACAO_FILA_RETENCAO_SEGUNDOS", str(7 * 24 * 3600)))
+        self._lock = threading.Lock()
+        self._conexao: Optional[sqlite3.Connection] = None
+
+    def _conectar(self) -> sqlite3.Connection:
+        """Abre a conexão no primeiro uso (uma por processo)"""
+        if self._conexao is None:
+            self.caminho.parent.mkdir(parents=True, exist_ok=True)
+            conexao = sqlite3.connect(
+                str(self.caminho), check_same_thread=False, isolation_level=None, timeout=30
+            )
+            conexao.row_factory = sqlite3.Row
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            conexao.executescript(_ESQUEMA)
+            self._conexao = conexao
+        return self._conexao
+
+    def enfileirar(self, payload: Dict[str, Any], callback_url: Optional[str] = None) -> str:
+        """Grava um novo job pendente e retorna seu id"""
+        job_id = uuid.uuid4().hex
+        agora = time.time()
+        with self._lock:
+            conexao = self._conectar()
+            conexao.execute(
+                "INSERT INTO jobs (id, status, payload, callback_url, criado_em) VALUES (?, ?, ?, ?, ?)",
+                (job_id, STATUS_PENDENTE, json.dumps(payload, ensure_ascii=False), callback_url, agora)
+            )
+            conexao.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND concluido_em < ?",
+                (STATUS_CONCLUIDO, STATUS_ERRO, agora - self.retencao_segundos)
+            )
+        logger.info(f"Job de verificação {job_id} enfileirado")
+        return job_id
+
+    def reservar(self, worker: str) -> Optional[Dict[str, Any]]:
+        """
+        Reserva o job pendente mais antigo para o worker
+
+        Jobs em processamento cuja posse expirou (worker morto ou travado) voltam
+        a ser elegíveis. A transação IMMEDIATE garante que dois workers, mesmo em
+        processos diferentes, nunca reservem o mesmo job.
+        """
+        agora = time.time()
+        with self._lock:
+            conexao = self._conectar()
+            conexao.execute("BEGIN IMMEDIATE")
+            try:
+                linha = conexao.execute(
+                    "SELECT * FROM jobs WHERE status = ? OR (status = ? AND posse_ate < ?) "
+                    "ORDER BY criado_em LIMIT 1",
+                    (STATUS_PENDENTE, STATUS_PROCESSANDO, agora)
+                ).fetchone()
+                if linha is None:
+                    conexao.execute("COMMIT")
+                    return None
+                conexao.execute(
+                    "UPDATE jobs SET status = ?, worker = ?, posse_ate = ?, iniciado_em = ?, "
+                    "tentativas = tentativas + 1 WHERE id = ?",
+                    (STATUS_PROCESSANDO, worker, agora + self.posse_segundos, agora, linha["id"])
+                )
+                conexao.execute("COMMIT")
+            except Exception:
+                conexao.execute("ROLLBACK")
+                raise
+
+        job = self._decodificar(linha)
+        job["tentativas"] += 1
+        job["status"] = STATUS_PROCESSANDO
+        return job
+
+    def concluir(self, job_id: str, resultado: Dict[str, Any]):
+        """Grava o resultado do job"""
+        with self._lock:
+            self._conectar().execute(
+                "UPDATE jobs SET status = ?, resultado = ?, erro = NULL, concluido_em = ?, posse_ate = NULL "
+                "WHERE id = ?",
+                (STATUS_CONCLUIDO, json.dumps(resultado, ensure_ascii=False, default=str), time.time(), job_id)
+            )
+
+    def falhar(self, job_id: str, erro: str, tentativas: int, definitivo: bool = False) -> bool:
+        """
+        Registra a falha do job; devolve à fila enquanto houver tentativas,
+        exceto quando a falha é definitiva (por exemplo, documento ilegível)
+
+        Returns:
+            True se o job voltou para a fila
+        """
+        reprocessar = not definitivo and tentativas < self.max_tentativas
+        with self._lock:
+            self._conectar().execute(
+                "UPDATE jobs SET status = ?, erro = ?, posse_ate = NULL, concluido_em = ? WHERE id = ?",
+                (
+                    STATUS_PENDENTE if reprocessar else STATUS_ERRO,
+                    erro,
+                    None if reprocessar else time.time(),
+                    job_id
+                )
+            )
+        return reprocessar
+
+    def registrar_callback(self, job_id: str, status: str):
+        """Registra o resultado da entrega do callback"""
+        with self._lock:
+            self._conectar().execute("UPDATE jobs SET callback_status = ? WHERE id = ?", (status, job_id))
+
+    def obter(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Estado do job, com o resultado quando concluído"""
+        with self._lock:
+            linha = self._conectar().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._decodificar(linha) if linha else None
+
+    def contar_por_status(self) -> Dict[str, int]:
+        """Quantidade de jobs em cada status"""
+        with self._lock:
+            linhas = self._conectar().execute("SELECT status, COUNT(*) AS total FROM jobs GROUP BY status").fetchall()
+        return {linha["status"]: linha["total"] for linha in linhas}
+
+    def _decodificar(self, linha: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(linha)
+        job["payload"] = json.loads(job["payload"])
+        job["resultado"] = json.loads(job["resultado"]) if job["resultado"] else None
+        return job
+
+
+# Instância global (cada processo, API ou worker, abre sua própria conexão)
+fila_verificacoes = FilaVerificacoes()
@@ -9,10 +9,18 @@ from datetime import datetime
 from sqlalchemy.orm import Session
 
 from .whatsapp import whatsapp_service
-from .ai_service import AIService
+from .envios_agendados import envios_agendados
+from .registro_servicos import obter_ai_service
 
 logger = logging.getLogger(__name__)
 
+# Botões de ação enviados com o resultado simulado
+BOTOES_RESULTADO_SIMULADO = [
+    {"id": "ver_relatorio", "title": "Relatório"},
+    {"id": "nova_verificacao", "title": "Nova Verificação"},
+    {"id": "voltar_menu", "title": "Voltar"}
+]
+
 class FluxoBemobi:
     def __init__(self):
         self.ai_service = None
@@ -28,7 +36,7 @@ class FluxoBemobi:
     
     def get_ai_service(self):
         """
-        Obtém instância do serviço de IA, inicializando se necessário
+        Obtém a instância compartilhada do serviço de IA
         """
         if self.ai_service is None:
             try:
@@ -36,8 +44,7 @@ class FluxoBemobi:
                 from dotenv import load_dotenv
                 load_dotenv()
                 
-                self.ai_service = AIService()
-                logger.info("Serviço de IA inicializado no fluxo Bemobi")
+                self.ai_service = obter_ai_service()
             except Exception as e:
                 logger.error(f"Erro ao inicializar serviço de IA no fluxo: {e}")
                 return None
@@ -692,17 +699,31 @@ class FluxoBemobi:
                 db=db
             )
             
-            # Simular tempo de processamento
-            import asyncio
-            await asyncio.sleep(2)
-            
-            # Enviar resultado simulado
-            await self.enviar_resultado_simulado(db, user, dados_simulados)
+            # Simular tempo de processamento: resultado agendado, sem prender a tarefa
+            envios_agendados.agendar_mensagem(
+                user.phone_number, self._mensagem_resultado_simulado(dados_simulados), 2, user_id=user.id
+            )
+            envios_agendados.agendar_botoes(
+                user.phone_number, "Escolha uma ação:", BOTOES_RESULTADO_SIMULADO, 2, user_id=user.id
+            )
             
         except Exception as e:
             logger.error(f"Erro na simulação: {e}")
             await self.enviar_erro(db, user, f"Erro na simulação: {str(e)}")
     
+    @staticmethod
+    def _mensagem_resultado_simulado(dados: Dict[str, Any]) -> str:
+        return ("✅ **Verificação Concluída**\n\n"
+                f"📊 **Resultado:** {dados['status'].upper()}\n"
+                f"💰 **Valor:** {dados['valor']}\n"
+                f"🏢 **Beneficiário:** {dados['beneficiario']}\n"
+                f"📅 **Vencimento:** {dados['vencimento']}\n\n"
+                "**Análise dos Agentes:**\n"
+                "🔍 Leitor: Dados extraídos com sucesso\n"
+                "🏦 Consultor: Validação nos sistemas OK\n"
+                "🛡️ Detetive: Nenhuma fraude detectada\n"
+                "📊 Orquestrador: Confiança 95%")
+    
     async def enviar_resultado_simulado(self, db: Session, user, dados: Dict[str, Any]):
         """
         Envia resultado simulado da verificação
@@ -710,32 +731,17 @@ class FluxoBemobi:
         try:
             await whatsapp_service.send_message(
                 phone_number=user.phone_number,
-                message="✅ **Verificação Concluída**\n\n"
-                       f"📊 **Resultado:** {dados['status'].upper()}\n"
-                       f"💰 **Valor:** {dados['valor']}\n"
-                       f"🏢 **Beneficiário:** {dados['beneficiario']}\n"
-                       f"📅 **Vencimento:** {dados['vencimento']}\n\n"
-                       "**Análise dos Agentes:**\n"
-                       "🔍 Leitor: Dados extraídos com sucesso\n"
-                       "🏦 Consultor: Validação nos sistemas OK\n"
-                       "🛡️ Detetive: Nenhuma fraude detectada\n"
-                       "📊 Orquestrador: Confiança 95%",
+                message=self._mensagem_resultado_simulado(dados),
                 log_to_db=True,
                 user_id=user.id,
                 db=db
             )
             
             # Botões de ação
-            buttons = [
-                {"id": "ver_relatorio", "title": "Relatório"},
-                {"id": "nova_verificacao", "title": "Nova Verificação"},
-                {"id": "voltar_menu", "title": "Voltar"}
-            ]
-            
             await whatsapp_service.send_button_message(
                 phone_number=user.phone_number,
                 body_text="Escolha uma ação:",
-                buttons=buttons,
+                buttons=BOTOES_RESULTADO_SIMULADO,
                 log_to_db=True,
                 user_id=user.id,
                 db=db
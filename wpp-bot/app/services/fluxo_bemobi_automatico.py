@@ -3,21 +3,27 @@ Fluxo Bemobi Automático - Respostas Pré-definidas
 Sistema que responde automaticamente com mensagens já prontas
 """
 
-import asyncio
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List
 from datetime import datetime
 import random
 
 from sqlalchemy.orm import Session
 from .whatsapp import whatsapp_service
-from .ai_service import AIService
+from .envios_agendados import envios_agendados
+from .controle_admissao import controle_admissao, Reserva
 
 logger = logging.getLogger(__name__)
 
+# Botões enviados após cada resultado
+BOTOES_RESULTADO = [
+    {"id": "nova_verificacao", "title": "🔄 Nova Verificação"},
+    {"id": "relatorio_detalhado", "title": "📊 Relatório"},
+    {"id": "voltar_menu", "title": "🔙 Menu"}
+]
+
 class FluxoBemobiAutomatico:
     def __init__(self):
-        self.ai_service = None
         self.respostas_predefinidas = {
             "inicial": """
 🤖 **Grace - Assistente de Verificação de Cobranças**
@@ -318,35 +324,11 @@ Ocorreu um erro ao analisar sua cobrança. Isso pode acontecer por:
                 db=db
             )
             
-            # Simular processamento
-            await asyncio.sleep(2)
-            
-            # Enviar mensagem de processamento
-            await whatsapp_service.send_message(
-                phone_number=user.phone_number,
-                message=self.respostas_predefinidas["processando"],
-                log_to_db=True,
-                user_id=user.id,
-                db=db
+            # Simular processamento: mensagens agendadas, sem prender a tarefa
+            envios_agendados.agendar_mensagem(
+                user.phone_number, self.respostas_predefinidas["processando"], 2, user_id=user.id
             )
-            
-            # Simular processamento mais longo
-            await asyncio.sleep(3)
-            
-            # Escolher resultado aleatório
-            resultado = random.choice(self.resultados_possiveis)
-            
-            # Enviar resultado
-            await whatsapp_service.send_message(
-                phone_number=user.phone_number,
-                message=self.respostas_predefinidas[resultado],
-                log_to_db=True,
-                user_id=user.id,
-                db=db
-            )
-            
-            # Enviar botões de resultado
-            await self.enviar_botoes_resultado(db, user)
+            self.agendar_resultado(user, 5)
             
         except Exception as e:
             logger.error(f"Erro ao processar demo: {e}")
@@ -429,43 +411,39 @@ Aguardo sua cobrança para análise! 🤖"""
         """
         Processa imagem com resposta automática
         """
+        await self.processar_imagens(db, user, [image_url])
+    
+    async def processar_imagens(self, db: Session, user, image_urls: List[str],
+                                reserva_admissao: Optional[Reserva] = None):
+        """
+        Processa as fotos de um mesmo envio (álbum) com uma única resposta automática
+
+        Com reserva de admissão, a vaga fica ocupada até o resultado agendado ser entregue.
+        """
         try:
-            logger.info(f"Processando imagem automaticamente para usuário {user.id}")
+            logger.info(f"Processando {len(image_urls)} imagem(ns) automaticamente para usuário {user.id}")
+            analisando = "imagem" if len(image_urls) == 1 else f"{len(image_urls)} imagens"
             
             # Enviar mensagem de processamento
             await whatsapp_service.send_message(
                 phone_number=user.phone_number,
-                message="🔍 **Analisando imagem...**\n\n🤖 Agente Leitor: Extraindo dados...\n📊 Agente Consultor: Verificando sistemas...\n🛡️ Agente Detetive: Detectando fraudes...",
-                log_to_db=True,
-                user_id=user.id,
-                db=db
-            )
-            
-            # Simular processamento
-            await asyncio.sleep(4)
-            
-            # Escolher resultado aleatório
-            resultado = random.choice(self.resultados_possiveis)
-            
-            # Enviar resultado
-            await whatsapp_service.send_message(
-                phone_number=user.phone_number,
-                message=self.respostas_predefinidas[resultado],
+                message=f"🔍 **Analisando {analisando}...**\n\n🤖 Agente Leitor: Extraindo dados...\n📊 Agente Consultor: Verificando sistemas...\n🛡️ Agente Detetive: Detectando fraudes...",
                 log_to_db=True,
                 user_id=user.id,
                 db=db
             )
             
-            # Enviar botões de resultado
-            await self.enviar_botoes_resultado(db, user)
+            # Simular processamento: resultado agendado, sem prender a tarefa
+            self.agendar_resultado(user, 4, self._reter(reserva_admissao))
             
         except Exception as e:
             logger.error(f"Erro ao processar imagem: {e}")
             await self.enviar_erro(db, user, f"Erro ao processar imagem: {str(e)}")
     
-    async def processar_texto_pix(self, db: Session, user, texto_pix: str):
+    async def processar_texto_pix(self, db: Session, user, texto_pix: str,
+                                  reserva_admissao: Optional[Reserva] = None):
         """
-        Processa texto PIX com resposta automática
+        Processa texto PIX com resposta automática (a reserva, se houver, é retida até a entrega)
         """
         try:
             logger.info(f"Processando PIX automaticamente para usuário {user.id}")
@@ -479,47 +457,50 @@ Aguardo sua cobrança para análise! 🤖"""
                 db=db
             )
             
-            # Simular processamento
-            await asyncio.sleep(3)
-            
-            # Escolher resultado aleatório
-            resultado = random.choice(self.resultados_possiveis)
-            
-            # Enviar resultado
-            await whatsapp_service.send_message(
-                phone_number=user.phone_number,
-                message=self.respostas_predefinidas[resultado],
-                log_to_db=True,
-                user_id=user.id,
-                db=db
-            )
-            
-            # Enviar botões de resultado
-            await self.enviar_botoes_resultado(db, user)
+            # Simular processamento: resultado agendado, sem prender a tarefa
+            self.agendar_resultado(user, 3, self._reter(reserva_admissao))
             
         except Exception as e:
             logger.error(f"Erro ao processar PIX: {e}")
             await self.enviar_erro(db, user, f"Erro ao processar PIX: {str(e)}")
     
+    def agendar_resultado(self, user, atraso: float, ao_entregar=None):
+        """
+        Agenda um resultado aleatório e os botões de resultado para daqui a `atraso` segundos
+
+        `ao_entregar` é chamado depois do envio dos botões, a última parte do resultado.
+        Texto e botões vão para o mesmo telefone: a ordem dos envios agendados só
+        vale dentro de um telefone, e o número de testes recebe os botões em outro.
+        """
+        resultado = random.choice(self.resultados_possiveis)
+        telefone = self._telefone_botoes(user)
+        envios_agendados.agendar_mensagem(
+            telefone, self.respostas_predefinidas[resultado], atraso, user_id=user.id
+        )
+        envios_agendados.agendar_botoes(
+            telefone, "Escolha uma ação:", BOTOES_RESULTADO, atraso, registrar=False,
+            ao_entregar=ao_entregar
+        )
+    
+    @staticmethod
+    def _reter(reserva: Optional[Reserva]):
+        """Retém a vaga da verificação até a entrega do resultado agendado"""
+        return controle_admissao.reter(reserva) if reserva is not None else None
+    
+    @staticmethod
+    def _telefone_botoes(user) -> str:
+        # Usar número permitido para testes
+        return "5591981960045" if user.phone_number == "559181960045" else user.phone_number
+    
     async def enviar_botoes_resultado(self, db: Session, user):
         """
         Envia botões de resultado
         """
         try:
-            # Usar número permitido para testes
-            phone_number = "5591981960045" if user.phone_number == "559181960045" else user.phone_number
-            
-            # Botões de resultado
-            buttons = [
-                {"id": "nova_verificacao", "title": "🔄 Nova Verificação"},
-                {"id": "relatorio_detalhado", "title": "📊 Relatório"},
-                {"id": "voltar_menu", "title": "🔙 Menu"}
-            ]
-            
             await whatsapp_service.send_button_message(
-                phone_number=phone_number,
+                phone_number=self._telefone_botoes(user),
                 body_text="Escolha uma ação:",
-                buttons=buttons,
+                buttons=BOTOES_RESULTADO,
                 log_to_db=False
             )
             
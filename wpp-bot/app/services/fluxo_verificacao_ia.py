@@ -3,29 +3,72 @@ Fluxo de Verificação com IA - Integração completa dos agentes
 Orquestra todo o processo de verificação de cobranças usando os agentes especializados
 """
 
+import os
+import time
 import asyncio
 import logging
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Set
 from datetime import datetime
 
 from .agente_leitor import AgenteLeitor
 from .agente_consultor import AgenteConsultor
 from .agente_detetive import AgenteDetetive
 from .agente_orquestrador import AgenteOrquestrador, StatusVerificacao
+from app.core.exceptions import PrazoEsgotadoException
+from .construtor_prompt import construtor_prompt
+from .prazo_verificacao import PrazoVerificacao, FOLGA_ETAPA_SEGUNDOS, obter_estouros
+from .registro_servicos import obter_estatisticas_registro
+from .fila_verificacoes import fila_verificacoes
+from .base_fraudes import base_fraudes
+from .denuncias_fraude import armazem_denuncias
+from .lista_bloqueio import lista_bloqueio
+from .tendencias_golpes import monitor_tendencias
+from .grafo_entidades import grafo_entidades
+from .motor_regras import motor_regras
+from .perfil_pagamentos import perfil_pagamentos
+from .sistemas_bemobi import sistemas_bemobi
+from .controle_admissao import controle_admissao
+from .pre_validacao_imagem import pre_validacao_imagem
+from .agrupador_mensagens import agrupador_mensagens
+from .envios_agendados import envios_agendados
+from .registros_verificacao import DadosDocumento
+from .armazem_verificacoes import (
+    armazem_verificacoes, impressao_imagem, impressao_texto_pix, impressoes_documento
+)
+from .progresso_verificacao import (
+    SinkProgresso, criar_evento, resumir_etapa,
+    ETAPA_EXTRACAO, ETAPA_CONSULTOR, ETAPA_DETETIVE, ETAPA_VEREDITO, ETAPA_ENRIQUECIMENTO
+)
 
 logger = logging.getLogger(__name__)
 
+AGENTES_IA = ("leitor", "consultor", "detetive", "orquestrador")
+
 class FluxoVerificacaoIA:
     def __init__(self):
         self.agente_leitor = AgenteLeitor()
         self.agente_consultor = AgenteConsultor()
         self.agente_detetive = AgenteDetetive()
         self.agente_orquestrador = AgenteOrquestrador()
+        
+        # Modo de veredito rápido: pontuação por regras primeiro, IA depois
+        self.modo_rapido = os.getenv("VERIFICACAO_MODO_RAPIDO", "false").lower() in ("1", "true", "sim")
+        agentes_enriquecimento = os.getenv("VERIFICACAO_ENRIQUECIMENTO_IA", ",".join(AGENTES_IA))
+        self.agentes_enriquecimento = {
+            agente.strip() for agente in agentes_enriquecimento.split(",") if agente.strip() in AGENTES_IA
+        }
+        
+        # Referências às tarefas de enriquecimento em andamento
+        self._tarefas_enriquecimento: Set[asyncio.Task] = set()
     
     async def verificar_cobranca_completa(self, 
                                         image_url: str = None,
                                         texto_pix: str = None,
-                                        user_id: str = None) -> Dict[str, Any]:
+                                        user_id: str = None,
+                                        modo_rapido: Optional[bool] = None,
+                                        progresso: Optional[SinkProgresso] = None,
+                                        prazo: Optional[PrazoVerificacao] = None,
+                                        image_urls: Optional[List[str]] = None) -> Dict[str, Any]:
         """
         Executa o fluxo completo de verificação de cobrança
         
@@ -33,6 +76,11 @@ class FluxoVerificacaoIA:
             image_url: URL da imagem do boleto/documento
             texto_pix: Texto contendo dados de PIX
             user_id: ID do usuário
+            modo_rapido: Retorna o veredito por regras e adia as análises de IA
+                (None usa VERIFICACAO_MODO_RAPIDO)
+            progresso: Recebe um evento a cada agente concluído
+            prazo: Orçamento de tempo da verificação (padrão: VERIFICACAO_PRAZO_SEGUNDOS)
+            image_urls: Páginas de um mesmo documento (fotos de um álbum), no lugar de image_url
             
         Returns:
             Resultado consolidado da verificação
@@ -41,11 +89,49 @@ class FluxoVerificacaoIA:
             logger.info(f"Iniciando verificação completa para usuário {user_id}")
             inicio_processo = datetime.now()
             
+            if modo_rapido is None:
+                modo_rapido = self.modo_rapido
+            usar_ia = not modo_rapido
+            progresso = progresso or SinkProgresso()
+            prazo = prazo or PrazoVerificacao()
+            tempos_etapas: Dict[str, float] = {}
+            impressoes: List[str] = []
+            paginas_url = image_urls or ([image_url] if image_url else [])
+            
             # 1. Agente Leitor - Extração de dados
             logger.info("Etapa 1: Agente Leitor - Extraindo dados")
-            if image_url:
-                resultado_leitor = await self.agente_leitor.processar_imagem(image_url, user_id)
+            inicio_etapa = time.perf_counter()
+            if paginas_url:
+                fatia = prazo.fatia("leitor")
+                resultado_leitor = await self._executar_etapa(
+                    fatia, "leitor", self._baixar_paginas(paginas_url, fatia)
+                )
+                if resultado_leitor.get("sucesso"):
+                    paginas = resultado_leitor["paginas"]
+                    # Uma página: hash da imagem; várias: hash do conjunto, na ordem de envio
+                    impressoes.append(impressao_imagem(b"".join(paginas)))
+                    repeticao = await self._repetir_verificacao(impressoes, user_id, inicio_processo, progresso)
+                    if repeticao:
+                        return repeticao
+                    
+                    # Filtro barato antes do OCR e dos LLMs: foto ruim pede outra foto.
+                    # Foto parecida com uma recente não reaproveita veredito: só o código de
+                    # barras / chave PIX extraídos abaixo confirmam que é o mesmo documento
+                    recusa = self._triar_paginas(paginas, user_id, impressoes[0])
+                    if recusa:
+                        return recusa
+                    
+                    resultado_leitor = await self._executar_etapa(
+                        fatia, "leitor",
+                        self.agente_leitor.processar_imagem(
+                            paginas_url[0], user_id, usar_ia=usar_ia, prazo=fatia, paginas=paginas
+                        )
+                    )
             elif texto_pix:
+                impressoes.append(impressao_texto_pix(texto_pix))
+                repeticao = await self._repetir_verificacao(impressoes, user_id, inicio_processo, progresso)
+                if repeticao:
+                    return repeticao
                 dados_pix = self.agente_leitor.processar_texto_pix(texto_pix)
                 resultado_leitor = {
                     "agente": "leitor",
@@ -61,60 +147,118 @@ class FluxoVerificacaoIA:
                     "sucesso": False
                 }
             
+            if resultado_leitor.get("imagem_recusada"):
+                return {
+                    "erro": resultado_leitor["erro"],
+                    "imagem_recusada": True,
+                    "motivo_recusa": resultado_leitor.get("motivo_recusa"),
+                    "sucesso": False
+                }
+            
             if not resultado_leitor.get("sucesso"):
                 return {
                     "erro": "Falha na extração de dados",
                     "detalhes": resultado_leitor.get("erro"),
+                    "prazo_esgotado": resultado_leitor.get("prazo_esgotado", False),
                     "sucesso": False
                 }
             
+            await self._emitir(progresso, ETAPA_EXTRACAO, "leitor", inicio_etapa, resultado_leitor, tempos_etapas)
+            
+            # Dados interpretados uma única vez e compartilhados por consultor e detetive
+            documento = DadosDocumento.de_dados_extraidos(resultado_leitor.get("dados_extraidos", {}))
+            
+            # O mesmo documento pode chegar em outra foto ou texto: procurar pelo código de barras / chave PIX
+            impressoes_doc = impressoes_documento(documento.para_dict())
+            repeticao = await self._repetir_verificacao(impressoes_doc, user_id, inicio_processo, progresso, impressoes)
+            if repeticao:
+                return repeticao
+            impressoes.extend(impressoes_doc)
+            
             # 2. Agente Consultor - Validação nos sistemas Bemobi
             logger.info("Etapa 2: Agente Consultor - Validando nos sistemas")
-            resultado_consultor = await self.agente_consultor.validar_cobranca(
-                resultado_leitor.get("dados_extraidos", {}), 
-                user_id
+            inicio_etapa = time.perf_counter()
+            fatia = prazo.fatia("consultor")
+            resultado_consultor = await self._executar_etapa(
+                fatia, "consultor",
+                self.agente_consultor.validar_cobranca(
+                    documento,
+                    user_id,
+                    usar_ia=usar_ia,
+                    prazo=fatia
+                )
             )
             
             if not resultado_consultor.get("sucesso"):
                 logger.warning("Agente Consultor falhou, continuando com dados disponíveis")
             
+            await self._emitir(progresso, ETAPA_CONSULTOR, "consultor", inicio_etapa, resultado_consultor, tempos_etapas)
+            
             # 3. Agente Detetive - Detecção de fraudes
             logger.info("Etapa 3: Agente Detetive - Detectando fraudes")
-            resultado_detetive = await self.agente_detetive.detectar_fraudes(
-                resultado_leitor.get("dados_extraidos", {}), 
-                user_id
+            inicio_etapa = time.perf_counter()
+            fatia = prazo.fatia("detetive")
+            resultado_detetive = await self._executar_etapa(
+                fatia, "detetive",
+                self.agente_detetive.detectar_fraudes(
+                    documento,
+                    user_id,
+                    usar_ia=usar_ia,
+                    prazo=fatia
+                )
             )
             
             if not resultado_detetive.get("sucesso"):
                 logger.warning("Agente Detetive falhou, continuando com dados disponíveis")
             
+            await self._emitir(progresso, ETAPA_DETETIVE, "detetive", inicio_etapa, resultado_detetive, tempos_etapas)
+            
             # 4. Agente Orquestrador - Consolidação final
             logger.info("Etapa 4: Agente Orquestrador - Consolidando análise")
+            inicio_etapa = time.perf_counter()
             resultado_final = await self.agente_orquestrador.orquestrar_analise(
                 resultado_leitor,
                 resultado_consultor,
                 resultado_detetive,
-                user_id
+                user_id,
+                usar_ia=usar_ia,
+                prazo=prazo.fatia("orquestrador")
             )
+            tempos_etapas["orquestrador"] = round((time.perf_counter() - inicio_etapa) * 1000, 1)
             
             # 5. Adicionar métricas de tempo
             tempo_total = (datetime.now() - inicio_processo).total_seconds()
             resultado_final["metricas"] = {
                 "tempo_total_segundos": tempo_total,
                 "tempo_total_formatado": f"{tempo_total:.1f}s",
+                "tempos_etapas_ms": tempos_etapas,
+                "prazo_segundos": prazo.total,
+                "etapas_expiradas": prazo.etapas_expiradas,
                 "inicio_processo": inicio_processo.isoformat(),
                 "fim_processo": datetime.now().isoformat()
             }
             
-            # 6. Gerar relatório detalhado
-            relatorio_detalhado = await self.agente_orquestrador.gerar_relatorio_detalhado(resultado_final)
-            resultado_final["relatorio_detalhado"] = relatorio_detalhado
-            
-            # 7. Criar botões de interação
+            # 6. Criar botões de interação (o relatório detalhado é gerado sob demanda)
             status = StatusVerificacao(resultado_final["status_verificacao"])
             botoes_interacao = self.agente_orquestrador.criar_botoes_interacao(status)
             resultado_final["botoes_interacao"] = botoes_interacao
             
+            await progresso.emitir(criar_evento(
+                ETAPA_VEREDITO, "orquestrador", tempos_etapas["orquestrador"],
+                resumir_etapa(ETAPA_VEREDITO, resultado_final)
+            ))
+            
+            # 7. Persistir para repetições e botões de acompanhamento
+            self._persistir(resultado_final, impressoes, user_id)
+            
+            # 8. Modo rápido: agendar análises de IA como enriquecimento posterior
+            if modo_rapido:
+                self._agendar_enriquecimento(resultado_final, progresso, {
+                    "leitor": resultado_leitor,
+                    "consultor": resultado_consultor,
+                    "detetive": resultado_detetive
+                })
+            
             logger.info(f"Verificação concluída - Status: {resultado_final['status_verificacao']}, "
                        f"Confiança: {resultado_final['pontuacao_confianca']}%, "
                        f"Tempo: {tempo_total:.1f}s")
@@ -129,17 +273,243 @@ class FluxoVerificacaoIA:
                 "timestamp": datetime.now().isoformat()
             }
     
+    async def _executar_etapa(self, fatia: PrazoVerificacao, agente: str, etapa) -> Dict[str, Any]:
+        """
+        Executa a etapa de um agente dentro da sua fatia de prazo
+        
+        Se a etapa não terminar a tempo ela é cancelada e substituída por um
+        resultado marcado como expirado, que o orquestrador trata como parcial.
+        """
+        try:
+            return await fatia.executar(etapa, folga=FOLGA_ETAPA_SEGUNDOS)
+        except PrazoEsgotadoException as e:
+            return {
+                "agente": agente,
+                "sucesso": False,
+                "prazo_esgotado": True,
+                "erro": e.message
+            }
+    
+    async def _baixar_paginas(self, urls: List[str], fatia: PrazoVerificacao) -> Dict[str, Any]:
+        """Baixa as páginas em paralelo; a primeira falha representa o download todo"""
+        downloads = await asyncio.gather(*(self.agente_leitor.baixar_imagem(url, fatia) for url in urls))
+        falha = next((download for download in downloads if not download.get("sucesso")), None)
+        if falha:
+            return falha
+        return {"sucesso": True, "paginas": [download["conteudo"] for download in downloads]}
+    
+    def _triar_paginas(self,
+                       paginas: List[bytes],
+                       user_id: Optional[str],
+                       impressao: str) -> Optional[Dict[str, Any]]:
+        """
+        Pré-validação de cada página; retorna a recusa, se alguma página for recusada
+        
+        Só uma foto avulsa é comparada com as recentes do usuário; num álbum,
+        a recusa indica qual página precisa ser refeita.
+        """
+        avulsa = len(paginas) == 1
+        for numero, conteudo in enumerate(paginas, 1):
+            triagem = pre_validacao_imagem.avaliar(
+                conteudo, user_id if avulsa else None, impressao if avulsa else None
+            )
+            if not triagem["aprovada"]:
+                return {
+                    "erro": triagem["mensagem"] if avulsa else f"Página {numero}: {triagem['mensagem']}",
+                    "imagem_recusada": True,
+                    "motivo_recusa": triagem["motivo"],
+                    "sucesso": False
+                }
+            if triagem["semelhante_a"]:
+                logger.info(f"Foto do usuário {user_id} parecida com uma recente; verificação completa mesmo assim")
+        return None
+    
+    async def _repetir_verificacao(self,
+                                   impressoes: List[str],
+                                   user_id: Optional[str],
+                                   inicio_processo: datetime,
+                                   progresso: SinkProgresso,
+                                   impressoes_novas: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Devolve o veredito gravado para o mesmo documento, se houver
+        
+        Impressões ainda desconhecidas (por exemplo, o hash de uma nova foto do
+        mesmo boleto) são associadas ao resultado para que a próxima repetição
+        seja reconhecida logo no início. Antes de repetir, os identificadores do
+        documento são reavaliados contra denúncias, lista de bloqueio e rede;
+        um sinal mais forte que o gravado descarta a repetição e o documento
+        passa pelo fluxo completo.
+        """
+        try:
+            anterior = armazem_verificacoes.buscar(impressoes, user_id)
+            if not anterior:
+                return None
+            
+            agentes = anterior.get("resultados_agentes", {})
+            analises_gravadas = agentes.get("detetive", {}).get("analises", {})
+            sinais = await self.agente_detetive.reavaliar_instrumentos(
+                agentes.get("leitor", {}).get("dados_extraidos", {}), user_id
+            )
+            novos = [
+                nome for nome, analise in sinais.items()
+                if analise["risco"] > analises_gravadas.get(nome, {}).get("risco", 0)
+            ]
+            if novos:
+                logger.info(f"Veredito gravado {anterior['id_verificacao']} não repetido para usuário {user_id}: "
+                           f"novos sinais em {', '.join(novos)}")
+                return None
+            
+            if impressoes_novas:
+                armazem_verificacoes.associar(anterior["id_verificacao"], impressoes_novas)
+        except Exception as e:
+            logger.warning(f"Falha ao consultar o armazém de verificações: {e}")
+            return None
+        
+        tempo_total = (datetime.now() - inicio_processo).total_seconds()
+        anterior["repeticao"] = {
+            "verificado_em": anterior.get("metricas", {}).get("fim_processo"),
+            "tempo_consulta_ms": round(tempo_total * 1000, 1)
+        }
+        anterior["metricas"] = {
+            **anterior.get("metricas", {}),
+            "tempo_total_segundos": tempo_total,
+            "tempo_total_formatado": f"{tempo_total:.1f}s"
+        }
+        
+        try:
+            await progresso.emitir(criar_evento(
+                ETAPA_VEREDITO, "armazem", tempo_total * 1000, resumir_etapa(ETAPA_VEREDITO, anterior)
+            ))
+        except Exception as e:
+            logger.warning(f"Falha ao emitir progresso da repetição: {e}")
+        
+        logger.info(f"Verificação repetida para usuário {user_id} respondida pelo armazém "
+                   f"({anterior['id_verificacao']}) em {tempo_total * 1000:.1f}ms")
+        return anterior
+    
+    def _persistir(self, resultado_final: Dict[str, Any], impressoes: List[str], user_id: Optional[str]):
+        """
+        Grava o resultado no armazém sem interromper o fluxo
+        
+        Resultados parciais ficam disponíveis para os botões, mas não são
+        reaproveitados em repetições.
+        """
+        try:
+            if resultado_final.get("resultado_parcial"):
+                impressoes = []
+            resultado_final["id_verificacao"] = armazem_verificacoes.salvar(resultado_final, impressoes, user_id)
+        except Exception as e:
+            logger.warning(f"Falha ao gravar verificação no armazém: {e}")
+    
+    async def _emitir(self,
+                      progresso: SinkProgresso,
+                      etapa: str,
+                      agente: str,
+                      inicio_etapa: float,
+                      resultado: Dict[str, Any],
+                      tempos_etapas: Dict[str, float]):
+        """Registra o tempo da etapa e envia o evento ao sink sem interromper o fluxo"""
+        duracao_ms = (time.perf_counter() - inicio_etapa) * 1000
+        tempos_etapas[agente] = round(duracao_ms, 1)
+        try:
+            await progresso.emitir(criar_evento(etapa, agente, duracao_ms, resumir_etapa(etapa, resultado)))
+        except Exception as e:
+            logger.warning(f"Falha ao emitir progresso da etapa {etapa}: {e}")
+    
+    def _agendar_enriquecimento(self,
+                                resultado_final: Dict[str, Any],
+                                progresso: SinkProgresso,
+                                resultados_agentes: Dict[str, Dict[str, Any]]):
+        """
+        Agenda as análises de IA configuradas sem bloquear o veredito
+
+        Os resultados completos dos agentes (com o texto OCR) ficam só com a
+        tarefa de enriquecimento; o resultado final guarda apenas os resumos.
+        """
+        if not self.agentes_enriquecimento:
+            resultado_final["enriquecimento_ia"] = {"status": "desativado", "agentes": []}
+            return
+        
+        resultado_final["enriquecimento_ia"] = {
+            "status": "pendente",
+            "agentes": sorted(self.agentes_enriquecimento)
+        }
+        tarefa = asyncio.create_task(self._enriquecer_resultado(resultado_final, progresso, resultados_agentes))
+        self._tarefas_enriquecimento.add(tarefa)
+        tarefa.add_done_callback(self._tarefas_enriquecimento.discard)
+    
+    async def _enriquecer_resultado(self,
+                                    resultado_final: Dict[str, Any],
+                                    progresso: SinkProgresso,
+                                    agentes: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Executa as análises de IA adiadas e as anexa ao resultado
+        
+        Os agentes de extração, validação e fraude rodam em paralelo; o orquestrador
+        roda por último porque resume os demais.
+        """
+        inicio = datetime.now()
+        prazo = PrazoVerificacao(
+            total_segundos=float(os.getenv("VERIFICACAO_PRAZO_ENRIQUECIMENTO_SEGUNDOS", "60")),
+            etapa="enriquecimento"
+        )
+        try:
+            enriquecimentos = []
+            if "leitor" in self.agentes_enriquecimento and agentes["leitor"].get("texto_ocr"):
+                enriquecimentos.append(self.agente_leitor.enriquecer_com_ia(agentes["leitor"], prazo))
+            if "consultor" in self.agentes_enriquecimento and agentes["consultor"].get("sucesso"):
+                enriquecimentos.append(self.agente_consultor.enriquecer_com_ia(agentes["consultor"], prazo))
+            if "detetive" in self.agentes_enriquecimento and agentes["detetive"].get("sucesso"):
+                enriquecimentos.append(self.agente_detetive.enriquecer_com_ia(agentes["detetive"], prazo))
+            
+            await asyncio.gather(*enriquecimentos, return_exceptions=True)
+            analises_ia = {
+                nome: resultado["analise_ia"] for nome, resultado in agentes.items() if "analise_ia" in resultado
+            }
+            if analises_ia:
+                resultado_final.setdefault("analises_ia", {}).update(analises_ia)
+            
+            if "orquestrador" in self.agentes_enriquecimento:
+                await self.agente_orquestrador.enriquecer_com_ia(resultado_final, prazo)
+            
+            resultado_final["enriquecimento_ia"]["status"] = "concluido"
+            
+        except Exception as e:
+            logger.error(f"Erro no enriquecimento com IA: {e}")
+            resultado_final["enriquecimento_ia"]["status"] = "erro"
+            resultado_final["enriquecimento_ia"]["erro"] = str(e)
+        
+        tempo = (datetime.now() - inicio).total_seconds()
+        resultado_final["enriquecimento_ia"]["tempo_segundos"] = tempo
+        if resultado_final.get("id_verificacao"):
+            try:
+                armazem_verificacoes.atualizar(resultado_final["id_verificacao"], resultado_final)
+            except Exception as e:
+                logger.warning(f"Falha ao atualizar verificação no armazém: {e}")
+        try:
+            await progresso.emitir(criar_evento(
+                ETAPA_ENRIQUECIMENTO, "orquestrador", tempo * 1000,
+                resumir_etapa(ETAPA_ENRIQUECIMENTO, resultado_final)
+            ))
+        except Exception as e:
+            logger.warning(f"Falha ao emitir progresso do enriquecimento: {e}")
+        logger.info(f"Enriquecimento com IA finalizado em {tempo:.1f}s para usuário {resultado_final.get('user_id')}")
+        return resultado_final
+    
     async def processar_resposta_usuario(self, 
                                        user_id: str, 
                                        resposta_id: str, 
-                                       contexto_anterior: Dict[str, Any] = None) -> Dict[str, Any]:
+                                       contexto_anterior: Dict[str, Any] = None,
+                                       id_verificacao: Optional[str] = None) -> Dict[str, Any]:
         """
         Processa resposta do usuário aos botões de interação
         
         Args:
             user_id: ID do usuário
             resposta_id: ID da resposta selecionada
-            contexto_anterior: Contexto da verificação anterior
+            contexto_anterior: Contexto da verificação anterior (opcional; se ausente,
+                a verificação é buscada no armazém)
+            id_verificacao: Verificação à qual a resposta se refere (padrão: a mais recente do usuário)
             
         Returns:
             Resposta processada
@@ -147,7 +517,14 @@ class FluxoVerificacaoIA:
         try:
             logger.info(f"Processando resposta do usuário {user_id}: {resposta_id}")
             
+            if contexto_anterior is None:
+                contexto_anterior = self.obter_verificacao(user_id, id_verificacao)
+            
             if resposta_id == "pagar_agora":
+                # Estado persistente só a partir da verificação gravada: o contexto vem do cliente
+                await self._registrar_pagamento(
+                    user_id, id_verificacao or (contexto_anterior or {}).get("id_verificacao")
+                )
                 return {
                     "mensagem": "💳 **Pagamento Seguro**\n\nVocê pode proceder com o pagamento. O documento foi verificado e é legítimo.",
                     "acoes": [
@@ -184,9 +561,23 @@ class FluxoVerificacaoIA:
                 }
             
             elif resposta_id == "reportar_fraude":
-                # Reportar fraude para o Agente Detetive
-                dados_fraude = contexto_anterior.get("resultados_agentes", {}).get("leitor", {}).get("dados_extraidos", {})
+                # A denúncia vai para o armazém compartilhado: só a partir da verificação gravada do usuário
+                verificacao = self.obter_verificacao(
+                    user_id, id_verificacao or (contexto_anterior or {}).get("id_verificacao")
+                )
+                if not verificacao:
+                    return {
+                        "mensagem": "❌ **Erro**\n\nNão encontramos a verificação a ser reportada. Tente fazer uma nova verificação.",
+                        "acoes": ["Iniciar nova verificação"]
+                    }
+                dados_fraude = verificacao.get("resultados_agentes", {}).get("leitor", {}).get("dados_extraidos", {})
                 resultado_report = await self.agente_detetive.reportar_fraude(user_id, dados_fraude)
+                if not resultado_report.get("sucesso"):
+                    return {
+                        "mensagem": "❌ **Erro**\n\nNão foi possível registrar a denúncia. Tente novamente mais tarde.",
+                        "acoes": ["Contatar suporte"],
+                        "resultado_report": resultado_report
+                    }
                 
                 return {
                     "mensagem": "🚨 **Fraude Reportada**\n\nObrigado por reportar esta fraude. Isso nos ajuda a proteger outros usuários.",
@@ -208,7 +599,10 @@ class FluxoVerificacaoIA:
             
             elif resposta_id == "ver_relatorio":
                 if contexto_anterior:
-                    relatorio = contexto_anterior.get("relatorio_detalhado", {})
+                    relatorio = (
+                        contexto_anterior.get("relatorio_detalhado")
+                        or self.agente_orquestrador.gerar_relatorio_detalhado(contexto_anterior)
+                    )
                     return {
                         "mensagem": "📊 **Relatório Detalhado**\n\nAqui está o relatório completo da verificação:",
                         "relatorio": relatorio,
@@ -236,6 +630,49 @@ class FluxoVerificacaoIA:
                 "mensagem": "❌ **Erro**\n\nOcorreu um erro ao processar sua resposta. Tente novamente."
             }
     
+    async def _registrar_pagamento(self, user_id: str, id_verificacao: Optional[str]):
+        """
+        Alimenta o perfil de pagamentos do cliente e quita a cobrança de um documento verificado como seguro
+        
+        A verificação é lida do armazém pelo usuário e id (padrão: a mais recente
+        do usuário), nunca do contexto enviado na requisição.
+        """
+        verificacao = self.obter_verificacao(user_id, id_verificacao)
+        if not verificacao or verificacao.get("status_verificacao") != StatusVerificacao.SEGURO.value:
+            return
+        try:
+            agentes = verificacao.get("resultados_agentes", {})
+            dados = agentes.get("leitor", {}).get("dados_extraidos", {})
+            perfil_pagamentos.registrar_pagamento(user_id, dados, verificacao.get("id_verificacao"))
+            # A cobrança paga é informada aos sistemas Bemobi e deixa de estar em aberto
+            cobranca = agentes.get("consultor", {}).get("validacoes", {}).get("valor", {}).get("cobranca_correspondente")
+            if cobranca:
+                await sistemas_bemobi.fechar_cobranca(user_id, cobranca)
+        except Exception as e:
+            logger.warning(f"Falha ao atualizar perfil de pagamentos do usuário {user_id}: {e}")
+    
+    def obter_verificacao(self, user_id: str, id_verificacao: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Verificação gravada pelo id ou, na falta dele, a mais recente do usuário"""
+        try:
+            if id_verificacao:
+                return armazem_verificacoes.obter(id_verificacao, user_id)
+            return armazem_verificacoes.ultima_do_usuario(user_id)
+        except Exception as e:
+            logger.error(f"Erro ao consultar verificação no armazém: {e}")
+            return None
+    
+    def listar_verificacoes_recentes(self, user_id: str, limite: int = 10) -> List[Dict[str, Any]]:
+        """Resumo das verificações recentes do usuário"""
+        return [
+            {
+                "id_verificacao": verificacao["id_verificacao"],
+                "status_verificacao": verificacao.get("status_verificacao"),
+                "pontuacao_confianca": verificacao.get("pontuacao_confianca"),
+                "timestamp": verificacao.get("timestamp")
+            }
+            for verificacao in armazem_verificacoes.listar_recentes(user_id, limite)
+        ]
+    
     async def obter_estatisticas_sistema(self) -> Dict[str, Any]:
         """Obtém estatísticas do sistema de verificação"""
         try:
@@ -251,6 +688,23 @@ class FluxoVerificacaoIA:
                     "detetive": "ativo",
                     "orquestrador": "ativo"
                 },
+                "tokens_prompt": construtor_prompt.obter_estatisticas(),
+                "estouros_prazo": obter_estouros(),
+                "registro_servicos": obter_estatisticas_registro(),
+                "armazem_verificacoes": armazem_verificacoes.obter_estatisticas(),
+                "fila_jobs": fila_verificacoes.contar_por_status(),
+                "base_fraudes": base_fraudes.obter_estatisticas(),
+                "denuncias": armazem_denuncias.obter_estatisticas(),
+                "lista_bloqueio": lista_bloqueio.obter_estatisticas(),
+                "tendencias_golpes": monitor_tendencias.obter_estatisticas(),
+                "grafo_entidades": grafo_entidades.obter_estatisticas(),
+                "regras_fraude": motor_regras.obter_estatisticas(),
+                "perfil_pagamentos": perfil_pagamentos.obter_estatisticas(),
+                "sistemas_bemobi": sistemas_bemobi.obter_estatisticas(),
+                "controle_admissao": controle_admissao.obter_estatisticas(),
+                "pre_validacao_imagem": pre_validacao_imagem.obter_estatisticas(),
+                "agrupador_mensagens": agrupador_mensagens.obter_estatisticas(),
+                "envios_agendados": envios_agendados.obter_estatisticas(),
                 "ultima_atualizacao": datetime.now().isoformat()
             }
             
@@ -0,0 +1,183 @@
+"""
+Grafo de Entidades - Redes de golpe que reaproveitam chaves PIX, boletos e CNPJs
+Cada denúncia, e cada verificação com identificador em lista de bloqueio, liga
+entre si os identificadores do meio de pagamento que contém (chave PIX, código
+de barras, CNPJ/CPF). Os componentes
+conexos são mantidos com union-find (união por tamanho e compressão de caminho), e cada componente acumula as
+denúncias e os bloqueios dos seus membros: um identificador novo ligado a
+uma rede já denunciada herda o risco dela numa única consulta
+
+Nomes de beneficiário nunca entram no grafo: um nome imitado (de um
+beneficiário legítimo) juntaria as cobranças verdadeiras à rede do golpista.
+Pelo mesmo motivo, uma verificação comum só consulta o grafo: o documento
+enviado pode combinar uma chave legítima com a do golpista. As denúncias são
+reaplicadas do armazém a cada início; as ligações de verificações bloqueadas
+ficam na memória do processo.
+"""
+
+import os
+import time
+import threading
+import logging
+from array import array
+from typing import Dict, Any, Optional, Iterable
+
+from .denuncias_fraude import armazem_denuncias, TIPOS_INSTRUMENTO
+
+logger = logging.getLogger(__name__)
+
+MAX_ENTIDADES = int(os.getenv("GRAFO_MAX_ENTIDADES", "2000000"))
+INTERVALO_SINCRONIZACAO = float(os.getenv("GRAFO_INTERVALO_SINCRONIZACAO", "5"))
+
+
+class GrafoEntidades:
+    def __init__(self, max_entidades: int = MAX_ENTIDADES):
+        self.max_entidades = max_entidades
+        self._indices: Dict[str, int] = {}
+        self._pai = array("l")
+        # Estatísticas válidas apenas nas raízes dos componentes
+        self._tamanho = array("l")
+        self._denuncias = array("l")
+        self._bloqueios = array("l")
+        self._lock = threading.RLock()
+        self._ultima_denuncia = 0
+        self._proxima_sincronizacao = 0.0
+        self._cheio_avisado = False
+        self.estatisticas = {"unioes": 0, "denuncias_aplicadas": 0}
+
+    # ===== UNION-FIND =====
+
+    def _indice(self, chave: str, criar: bool = True) -> Optional[int]:
+        indice = self._indices.get(chave)
+        if indice is None and criar:
+            if len(self._pai) >= self.max_entidades:
+                if not self._cheio_avisado:
+                    logger.warning(f"Grafo de entidades atingiu GRAFO_MAX_ENTIDADES ({self.max_entidades}); "
+                                   f"novos identificadores não serão ligados")
+                    self._cheio_avisado = True
+                return None
+            indice = self._indices[chave] = len(self._pai)
+            self._pai.append(indice)
+            self._tamanho.append(1)
+            self._denuncias.append(0)
+            self._bloqueios.append(0)
+        return indice
+
+    def _raiz(self, indice: int) -> int:
+        pai = self._pai
+        while pai[indice] != indice:
+            # Compressão por divisão ao meio: cada nó passa a apontar para o avô
+            pai[indice] = pai[pai[indice]]
+            indice = pai[indice]
+        return indice
+
+    def _unir(self, a: int, b: int) -> int:
+        raiz_a, raiz_b = self._raiz(a), self._raiz(b)
+        if raiz_a == raiz_b:
+            return raiz_a
+        if self._tamanho[raiz_a] < self._tamanho[raiz_b]:
+            raiz_a, raiz_b = raiz_b, raiz_a
+        self._pai[raiz_b] = raiz_a
+        self._tamanho[raiz_a] += self._tamanho[raiz_b]
+        self._denuncias[raiz_a] += self._denuncias[raiz_b]
+        self._bloqueios[raiz_a] += self._bloqueios[raiz_b]
+        self.estatisticas["unioes"] += 1
+        return raiz_a
+
+    def _ligar(self, chaves: Iterable[str]) -> Optional[int]:
+        """Liga as chaves num mesmo componente e retorna a raiz"""
+        raiz = None
+        for chave in chaves:
+            indice = self._indice(chave)
+            if indice is None:
+                continue
+            raiz = self._raiz(indice) if raiz is None else self._unir(raiz, indice)
+        return raiz
+
+    # ===== ATUALIZAÇÃO =====
+
+    def registrar_bloqueio(self, chaves: Dict[str, str]):
+        """Liga os identificadores de um documento com algum deles em lista de bloqueio e conta o bloqueio"""
+        instrumentos = [chave for tipo, chave in chaves.items() if tipo in TIPOS_INSTRUMENTO]
+        if not instrumentos:
+            return
+        with self._lock:
+            raiz = self._ligar(instrumentos)
+            if raiz is not None:
+                self._bloqueios[raiz] += 1
+
+    def registrar_denuncia(self, chaves: Dict[str, str]):
+        """Liga os identificadores do meio de pagamento da denúncia e conta a denúncia"""
+        # Denúncias gravadas antes trazem também a chave do beneficiário
+        instrumentos = [chave for tipo, chave in chaves.items() if tipo in TIPOS_INSTRUMENTO]
+        if not instrumentos:
+            return
+        with self._lock:
+            raiz = self._ligar(instrumentos)
+            if raiz is not None:
+                self._denuncias[raiz] += 1
+                self.estatisticas["denuncias_aplicadas"] += 1
+
+    def sincronizar(self, forcar: bool = False) -> int:
+        """Aplica as denúncias gravadas (por qualquer worker) desde a última sincronização"""
+        agora = time.monotonic()
+        if not forcar and agora < self._proxima_sincronizacao:
+            return 0
+        with self._lock:
+            if not forcar and agora < self._proxima_sincronizacao:
+                return 0
+            self._proxima_sincronizacao = agora + INTERVALO_SINCRONIZACAO
+            aplicadas = 0
+            while True:
+                denuncias = armazem_denuncias.listar_desde(self._ultima_denuncia)
+                for posicao, chaves in denuncias:
+                    self.registrar_denuncia(chaves)
+                    self._ultima_denuncia = posicao
+                aplicadas += len(denuncias)
+                if len(denuncias) < 1000:
+                    return aplicadas
+
+    # ===== CONSULTA =====
+
+    def avaliar(self, chaves: Dict[str, str]) -> Dict[str, Any]:
+        """Risco herdado da rede a que pertencem os identificadores do documento"""
+        with self._lock:
+            melhor = None
+            for tipo, chave in chaves.items():
+                indice = self._indice(chave, criar=False) if tipo in TIPOS_INSTRUMENTO else None
+                if indice is None:
+                    continue
+                raiz = self._raiz(indice)
+                candidato = (self._bloqueios[raiz] > 0, self._denuncias[raiz], raiz)
+                if melhor is None or candidato > melhor:
+                    melhor = candidato
+            if melhor is None or not (melhor[0] or melhor[1]):
+                return {
+                    "status": "sem_rede_suspeita",
+                    "mensagem": "Identificadores sem ligação com redes denunciadas",
+                    "risco": 0
+                }
+            bloqueado, denuncias, raiz = melhor
+            tamanho = self._tamanho[raiz]
+
+        if bloqueado:
+            risco = 90
+        else:
+            risco = {1: 50, 2: 70}.get(denuncias, 85)
+        return {
+            "status": "rede_suspeita",
+            "mensagem": f"Documento ligado a uma rede de {tamanho} identificadores com "
+                        f"{denuncias} denúncia(s){' e itens em lista de bloqueio' if bloqueado else ''}",
+            "risco": risco,
+            "tamanho_rede": tamanho,
+            "denuncias_rede": denuncias
+        }
+
+    def obter_estatisticas(self) -> Dict[str, Any]:
+        """Entidades, uniões e denúncias aplicadas"""
+        with self._lock:
+            return {**self.estatisticas, "entidades": len(self._pai)}
+
+
+# Instância global compartilhada pelo Agente Detetive
+grafo_entidades = GrafoEntidades()
@@ -0,0 +1,134 @@
+"""
+Índice de Cobranças - Cobranças em aberto de um cliente ordenadas por valor
+Mantém as cobranças pendentes ordenadas pelo valor em centavos (com o
+vencimento ao lado) e responde "cobranças a ±tolerância de X, vencendo perto
+de D" com busca binária, em vez de percorrer todas as cobranças do cliente;
+clientes empresariais chegam a milhares de cobranças abertas. Cobranças
+abertas e quitadas atualizam o índice sem reconstruí-lo
+"""
+
+import os
+import itertools
+from bisect import bisect_left, bisect_right, insort
+from datetime import date
+from typing import Dict, Any, Optional, List, Tuple
+
+from .registros_verificacao import extrair_valor_centavos, normalizar_data
+
+TOLERANCIA_CENTAVOS = int(os.getenv("COBRANCA_TOLERANCIA_CENTAVOS", "100"))
+JANELA_VENCIMENTO_DIAS = int(os.getenv("COBRANCA_JANELA_VENCIMENTO_DIAS", "10"))
+
+
+def _dia(data_iso: Optional[str]) -> Optional[int]:
+    """Data ISO como número de dias (ordinal), para comparar vencimentos"""
+    return date.fromisoformat(data_iso).toordinal() if data_iso else None
+
+
+class IndiceCobrancas:
+    """Cobranças pendentes de um cliente ordenadas por (centavos, sequência)"""
+
+    def __init__(self, cobrancas: Optional[List[Dict[str, Any]]] = None):
+        self._sequencia = itertools.count()
+        # Chaves ordenadas para a busca binária; vencimento e cobrança de cada chave
+        self._chaves: List[Tuple[int, int]] = []
+        self._itens: Dict[Tuple[int, int], Tuple[Optional[int], Dict[str, Any]]] = {}
+        self._por_id: Dict[str, Tuple[int, int]] = {}
+        itens = []
+        for cobranca in cobrancas or ():
+            chave_item = self._preparar(cobranca)
+            if chave_item:
+                itens.append(chave_item)
+        # Id repetido na lista: vale a última ocorrência, como em abrir()
+        itens = [(chave, item) for chave, item in itens
+                 if item[1].get("id") is None or self._por_id.get(str(item[1]["id"])) == chave]
+        # Construção inicial: uma ordenação em vez de uma inserção por cobrança
+        self._chaves = sorted(chave for chave, _ in itens)
+        self._itens = dict(itens)
+
+    def _preparar(self, cobranca: Dict[str, Any]):
+        centavos = extrair_valor_centavos(cobranca.get("valor"))
+        if not centavos or cobranca.get("status", "pendente") != "pendente":
+            return None
+        chave = (centavos, next(self._sequencia))
+        if cobranca.get("id") is not None:
+            self._por_id[str(cobranca["id"])] = chave
+        return chave, (_dia(normalizar_data(cobranca.get("vencimento"))), cobranca)
+
+    def __len__(self) -> int:
+        return len(self._chaves)
+
+    # ===== ATUALIZAÇÃO =====
+
+    def abrir(self, cobranca: Dict[str, Any]) -> bool:
+        """
+        Inclui uma cobrança aberta; False se não tem valor ou não está pendente
+
+        Uma cobrança cujo id já está no índice (reaberta ou reemitida) substitui
+        a versão anterior, que sai do índice mesmo que a nova não seja incluída.
+        """
+        if cobranca.get("id") is not None and str(cobranca["id"]) in self._por_id:
+            self.fechar(cobranca["id"])
+        chave_item = self._preparar(cobranca)
+        if not chave_item:
+            return False
+        chave, item = chave_item
+        insort(self._chaves, chave)
+        self._itens[chave] = item
+        return True
+
+    def fechar(self, id_cobranca: Optional[str] = None, cobranca: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Remove uma cobrança quitada ou cancelada, pelo id ou por uma cópia dela; retorna a removida"""
+        if id_cobranca is None and cobranca is not None and cobranca.get("id") is not None:
+            id_cobranca = cobranca["id"]
+        if id_cobranca is not None:
+            chave = self._por_id.get(str(id_cobranca))
+        elif cobranca is not None:
+            chave = next((c for c in self._chaves_com_valor(extrair_valor_centavos(cobranca.get("valor")))
+                          if self._itens[c][1] == cobranca), None)
+        else:
+            chave = None
+        if chave is None or chave not in self._itens:
+            return None
+        del self._chaves[bisect_left(self._chaves, chave)]
+        _, removida = self._itens.pop(chave)
+        if removida.get("id") is not None:
+            self._por_id.pop(str(removida["id"]), None)
+        return removida
+
+    def _chaves_com_valor(self, centavos: Optional[int]) -> List[Tuple[int, int]]:
+        if not centavos:
+            return []
+        inicio = bisect_left(self._chaves, (centavos, -1))
+        fim = bisect_left(self._chaves, (centavos + 1, -1))
+        return self._chaves[inicio:fim]
+
+    # ===== CONSULTA =====
+
+    def buscar(self,
+               centavos: int,
+               tolerancia_centavos: int = TOLERANCIA_CENTAVOS,
+               vencimento: Optional[str] = None,
+               janela_dias: int = JANELA_VENCIMENTO_DIAS,
+               limite: int = 5) -> List[Dict[str, Any]]:
+        """
+        Cobranças com valor a até ±tolerância e, se o vencimento for informado, vencendo
+        a até janela_dias dele; da mais próxima (valor, depois vencimento) para a mais distante
+
+        Returns:
+            [{"cobranca", "diferenca_centavos", "diferenca_dias"}]
+        """
+        inicio = bisect_left(self._chaves, (centavos - tolerancia_centavos, -1))
+        fim = bisect_right(self._chaves, (centavos + tolerancia_centavos, float("inf")))
+        dia = _dia(vencimento)
+        candidatas = []
+        for chave in self._chaves[inicio:fim]:
+            dia_cobranca, cobranca = self._itens[chave]
+            diferenca_dias = abs(dia_cobranca - dia) if dia is not None and dia_cobranca is not None else None
+            if diferenca_dias is not None and diferenca_dias > janela_dias:
+                continue
+            candidatas.append((abs(chave[0] - centavos), diferenca_dias or 0, chave[1], cobranca, diferenca_dias))
+        candidatas.sort(key=lambda c: c[:3])
+        return [
+            {"cobranca": cobranca, "diferenca_centavos": diferenca, "diferenca_dias": diferenca_dias}
+            for diferenca, _, _, cobranca, diferenca_dias in candidatas[:limite]
+        ]
@@ -0,0 +1,161 @@
+"""
+Índice de Similaridade - Nomes parecidos por trigramas com MinHash LSH
+Encontra, sem comparar com todos os nomes cadastrados, os mais próximos de um
+nome com erros de digitação ou troca de letras por números ("Bem0bi",
+"Tecnologla"): os trigramas de cada nome viram uma assinatura MinHash,
+dividida em faixas (LSH) que levam direto aos candidatos, e apenas estes
+têm a similaridade de Jaccard calculada
+"""
+
+import os
+import hashlib
+import threading
+from array import array
+from typing import Dict, Any, Optional, List, Iterable, Tuple, FrozenSet, Union
+
+from .registros_verificacao import normalizar_texto
+
+# Assinatura de FAIXAS x LINHAS valores: pares com Jaccard acima de
+# ~(1/FAIXAS)^(1/LINHAS) (≈0,37) quase sempre caem numa mesma faixa
+FAIXAS = int(os.getenv("SIMILARIDADE_FAIXAS", "20"))
+LINHAS_POR_FAIXA = int(os.getenv("SIMILARIDADE_LINHAS_POR_FAIXA", "3"))
+TAMANHO_ASSINATURA = FAIXAS * LINHAS_POR_FAIXA
+# Faixas com mais nomes que isso não distinguem nada e são ignoradas
+MAX_POR_FAIXA = int(os.getenv("SIMILARIDADE_MAX_POR_FAIXA", "64"))
+
+# Trocas comuns de letras por números e símbolos em nomes falsificados
+_SUBSTITUICOES = str.maketrans({"0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t", "@": "a", "$": "s"})
+
+# Sufixos societários presentes em quase todos os nomes
+_SUFIXOS = {"ltda", "me", "epp", "eireli", "sa", "s/a", "s.a", "s.a.", "cia", "mei"}
+
+
+def normalizar_nome(nome: str) -> str:
+    """Nome normalizado para comparação (sem acentos, sufixos societários e números-letra)"""
+    palavras = [palavra for palavra in normalizar_texto(nome).split() if palavra not in _SUFIXOS]
+    return " ".join(palavras).translate(_SUBSTITUICOES)
+
+
+def trigramas(nome_normalizado: str) -> FrozenSet[str]:
+    """Trigramas de caracteres do nome, com bordas marcadas"""
+    texto = f"  {nome_normalizado} "
+    return frozenset(texto[i:i + 3] for i in range(len(texto) - 2))
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+# Os nomes usam poucos milhares de trigramas distintos: os valores de hash de
+# cada trigrama são calculados uma vez e reaproveitados em todas as assinaturas
+_hashes_trigramas: Dict[str, array] = {}
+_lock_hashes = threading.Lock()
+
+
+def _hashes_trigrama(grama: str) -> array:
+    valores = _hashes_trigramas.get(grama)
+    if valores is None:
+        conteudo = grama.encode("utf-8")
+        blocos = b"".join(
+            hashlib.blake2b(conteudo, digest_size=64, salt=bloco.to_bytes(16, "little")).digest()
+            for bloco in range((TAMANHO_ASSINATURA * 4 + 63) // 64)
+        )
+        valores = array("I")
+        valores.frombytes(blocos[:TAMANHO_ASSINATURA * 4])
+        with _lock_hashes:
+            valores = _hashes_trigramas.setdefault(grama, valores)
+    return valores
+
+
+def assinatura_minhash(grams: FrozenSet[str]) -> List[int]:
+    """Menor valor de cada função de hash sobre os trigramas"""
+    return list(map(min, zip(*[_hashes_trigrama(grama) for grama in grams])))
+
+
+def _chaves_faixas(assinatura: List[int]) -> List[int]:
+    return [
+        hash((faixa, *assinatura[faixa * LINHAS_POR_FAIXA:(faixa + 1) * LINHAS_POR_FAIXA]))
+        for faixa in range(FAIXAS)
+    ]
+
+
+class IndiceSimilaridade:
+    def __init__(self, nomes: Optional[Iterable[Tuple[str, Any]]] = None):
+        """
+        Args:
+            nomes: Pares (nome, identificador) para indexar de início
+        """
+        self._nomes: List[str] = []
+        self._identificadores: List[Any] = []
+        self._posicoes: Dict[Any, int] = {}
+        # Faixa -> posição (ou lista de posições, quando há colisão)
+        self._faixas: Dict[int, Union[int, List[int]]] = {}
+        for nome, identificador in nomes or ():
+            self.adicionar(nome, identificador)
+
+    def __len__(self) -> int:
+        return len(self._nomes)
+
+    def adicionar(self, nome: str, identificador: Any):
+        """Indexa o nome; um identificador já indexado é ignorado"""
+        normalizado = normalizar_nome(nome)
+        if not normalizado or identificador in self._posicoes:
+            return
+        posicao = len(self._nomes)
+        self._nomes.append(normalizado)
+        self._identificadores.append(identificador)
+        self._posicoes[identificador] = posicao
+        for chave in _chaves_faixas(assinatura_minhash(trigramas(normalizado))):
+            existente = self._faixas.get(chave)
+            if existente is None:
+                self._faixas[chave] = posicao
+            elif isinstance(existente, list):
+                if len(existente) <= MAX_POR_FAIXA:
+                    existente.append(posicao)
+            else:
+                self._faixas[chave] = [existente, posicao]
+
+    def buscar(self, nome: str, k: int = 5, similaridade_minima: float = 0.3) -> List[Dict[str, Any]]:
+        """
+        Os k nomes indexados mais parecidos com o nome informado
+
+        Returns:
+            Lista de {"identificador", "nome_normalizado", "similaridade"} em ordem
+            decrescente de similaridade (Jaccard dos trigramas)
+        """
+        normalizado = normalizar_nome(nome)
+        if not normalizado or not self._nomes:
+            return []
+        grams = trigramas(normalizado)
+
+        # Quanto mais faixas em comum, maior a similaridade estimada: só os
+        # candidatos mais promissores têm o Jaccard calculado
+        faixas_em_comum: Dict[int, int] = {}
+        for chave in _chaves_faixas(assinatura_minhash(grams)):
+            encontrado = self._faixas.get(chave)
+            if isinstance(encontrado, list):
+                if len(encontrado) > MAX_POR_FAIXA:
+                    continue
+                for posicao in encontrado:
+                    faixas_em_comum[posicao] = faixas_em_comum.get(posicao, 0) + 1
+            elif encontrado is not None:
+                faixas_em_comum[encontrado] = faixas_em_comum.get(encontrado, 0) + 1
+        candidatos = sorted(faixas_em_comum, key=faixas_em_comum.__getitem__, reverse=True)[:max(k * 4, 12)]
+
+        resultados = []
+        for posicao in candidatos:
+            similaridade = jaccard(grams, trigramas(self._nomes[posicao]))
+            if similaridade >= similaridade_minima:
+                resultados.append((similaridade, posicao))
+        resultados.sort(key=lambda item: (-item[0], item[1]))
+
+        return [
+            {
+                "identificador": self._identificadores[posicao],
+                "nome_normalizado": self._nomes[posicao],
+                "similaridade": round(similaridade, 3)
+            }
+            for similaridade, posicao in resultados[:k]
+        ]
@@ -0,0 +1,218 @@
+"""
+Lista de Bloqueio - Chaves PIX, códigos de barras e CNPJs/CPFs de golpe conhecidos
+Consulta listas externas com dezenas de milhões de identificadores num arquivo
+binário mapeado em memória (mmap): um filtro de Bloom descarta quase todos os
+identificadores ausentes sem tocar no restante do arquivo, e os hashes de 64
+bits ordenados, com um diretório pelos bits mais altos, confirmam os presentes.
+As páginas são compartilhadas pelo sistema operacional entre todos os workers
+
+Formato do arquivo (gerado por utils_project/construir_lista_bloqueio.py):
+    cabeçalho | filtro de Bloom (bytes) | diretório (uint64) | hashes ordenados (uint64)
+"""
+
+import os
+import sys
+import mmap
+import time
+import struct
+import bisect
+import hashlib
+import threading
+import logging
+from array import array
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Iterable
+
+logger = logging.getLogger(__name__)
+
+CAMINHO_PADRAO = Path(__file__).resolve().parents[2] / "data" / "lista_bloqueio.bin"
+
+ASSINATURA = b"WPPBLQ01"
+# Valor gravado com a ordem de bytes nativa de quem gerou o arquivo
+MARCADOR_ORDEM = 0x0102030405060708
+# assinatura, marcador, funções de hash, bits do diretório, itens, bits do Bloom, deslocamentos
+_CABECALHO = struct.Struct("<8sQIIQQQQQ")
+_ALINHAMENTO = 8
+
+
+def hash_identificador(chave: str) -> int:
+    """Hash de 64 bits da chave normalizada ("pix:...", "barras:...", "doc:...")"""
+    return int.from_bytes(hashlib.blake2b(chave.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _posicoes_bloom(valor: int, funcoes: int, bits: int) -> Iterable[int]:
+    """Posições do filtro de Bloom por hash duplo sobre as metades do hash"""
+    h1 = valor & 0xFFFFFFFF
+    h2 = (valor >> 32) | 1
+    return ((h1 + i * h2) % bits for i in range(funcoes))
+
+
+def _alinhar(deslocamento: int) -> int:
+    return (deslocamento + _ALINHAMENTO - 1) // _ALINHAMENTO * _ALINHAMENTO
+
+
+def gravar_lista(caminho: str, hashes: Iterable[int], bits_por_item: int = 10) -> Dict[str, Any]:
+    """
+    Gera o arquivo da lista e o publica atomicamente
+
+    Args:
+        caminho: Destino do arquivo
+        hashes: Hashes de 64 bits (hash_identificador); repetidos são ignorados
+        bits_por_item: Tamanho do filtro de Bloom (10 bits/item ≈ 1% de falsos positivos)
+    """
+    # Particionar pelos 8 bits mais altos mantém a ordenação em memória pequena
+    particoes = [array("Q") for _ in range(256)]
+    for valor in hashes:
+        particoes[valor >> 56].append(valor)
+    ordenados = array("Q")
+    for particao in particoes:
+        ordenados.extend(sorted(set(particao)))
+        del particao[:]
+    total = len(ordenados)
+
+    bits_bloom = max(64, total * bits_por_item)
+    funcoes = max(1, round(bits_por_item * 0.693))
+    bits_diretorio = min(24, max(0, (max(total, 1) // 4).bit_length()))
+    deslocamento_diretorio = 64 - bits_diretorio
+
+    bloom = bytearray((bits_bloom + 7) // 8)
+    diretorio = array("Q", bytes(8 * ((1 << bits_diretorio) + 1)))
+    for indice, valor in enumerate(ordenados):
+        for posicao in _posicoes_bloom(valor, funcoes, bits_bloom):
+            bloom[posicao >> 3] |= 1 << (posicao & 7)
+        diretorio[(valor >> deslocamento_diretorio if bits_diretorio else 0) + 1] = indice + 1
+    # Cada entrada do diretório vira o início do seu balde (baldes vazios herdam o anterior)
+    for balde in range(1, len(diretorio)):
+        if diretorio[balde] < diretorio[balde - 1]:
+            diretorio[balde] = diretorio[balde - 1]
+
+    inicio_bloom = _alinhar(_CABECALHO.size)
+    inicio_diretorio = _alinhar(inicio_bloom + len(bloom))
+    inicio_hashes = _alinhar(inicio_diretorio + len(diretorio) * 8)
+    cabecalho = _CABECALHO.pack(
+        ASSINATURA, MARCADOR_ORDEM, funcoes, bits_diretorio, total, bits_bloom,
+        inicio_bloom, inicio_diretorio, inicio_hashes
+    )
+
+    destino = Path(caminho)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    temporario = destino.with_name(f"{destino.name}.{os.getpid()}.tmp")
+    with open(temporario, "wb") as arquivo:
+        arquivo.write(cabecalho)
+        arquivo.write(bytes(inicio_bloom - _CABECALHO.size))
+        arquivo.write(bloom)
+        arquivo.write(bytes(inicio_diretorio - inicio_bloom - len(bloom)))
+        diretorio.tofile(arquivo)
+        arquivo.write(bytes(inicio_hashes - inicio_diretorio - len(diretorio) * 8))
+        ordenados.tofile(arquivo)
+        arquivo.flush()
+        os.fsync(arquivo.fileno())
+    os.replace(temporario, destino)
+
+    return {
+        "itens": total,
+        "bits_bloom": bits_bloom,
+        "funcoes_hash": funcoes,
+        "bits_diretorio": bits_diretorio,
+        "tamanho_bytes": inicio_hashes + total * 8
+    }
+
+
+class _Mapeamento:
+    """Arquivo da lista mapeado em memória (somente leitura)"""
+
+    def __init__(self, caminho: Path):
+        with open(caminho, "rb") as arquivo:
+            self.mapa = mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+        (assinatura, marcador, self.funcoes, self.bits_diretorio, self.total, self.bits_bloom,
+         inicio_bloom, inicio_diretorio, inicio_hashes) = _CABECALHO.unpack_from(self.mapa, 0)
+        if assinatura != ASSINATURA:
+            raise ValueError(f"Arquivo {caminho} não é uma lista de bloqueio")
+        if marcador != MARCADOR_ORDEM:
+            raise ValueError(f"Lista de bloqueio {caminho} gerada com outra ordem de bytes ({sys.byteorder} aqui)")
+
+        visao = memoryview(self.mapa)
+        self.bloom = visao[inicio_bloom:inicio_bloom + (self.bits_bloom + 7) // 8]
+        self.diretorio = visao[inicio_diretorio:inicio_diretorio + ((1 << self.bits_diretorio) + 1) * 8].cast("Q")
+        self.hashes = visao[inicio_hashes:inicio_hashes + self.total * 8].cast("Q")
+        self.deslocamento = 64 - self.bits_diretorio
+
+    def contem(self, valor: int) -> Optional[bool]:
+        """True se presente; False se o Bloom descartou; None se descartado só pela busca"""
+        bloom = self.bloom
+        for posicao in _posicoes_bloom(valor, self.funcoes, self.bits_bloom):
+            if not bloom[posicao >> 3] & (1 << (posicao & 7)):
+                return False
+        balde = valor >> self.deslocamento if self.bits_diretorio else 0
+        inicio, fim = self.diretorio[balde], self.diretorio[balde + 1]
+        indice = bisect.bisect_left(self.hashes, valor, inicio, fim)
+        return True if indice < fim and self.hashes[indice] == valor else None
+
+
+class ListaBloqueio:
+    def __init__(self, caminho: Optional[str] = None):
+        self.caminho = Path(caminho or os.getenv("LISTA_BLOQUEIO_PATH", str(CAMINHO_PADRAO)))
+        self.intervalo_verificacao = float(os.getenv("LISTA_BLOQUEIO_INTERVALO_VERIFICACAO", "30"))
+        self._lock = threading.Lock()
+        self._mapeamento: Optional[_Mapeamento] = None
+        self._assinatura_arquivo = None
+        self._proxima_verificacao = 0.0
+        self.estatisticas = {"consultas": 0, "descartes_bloom": 0, "falsos_positivos_bloom": 0, "encontrados": 0}
+
+    def _obter_mapeamento(self) -> Optional[_Mapeamento]:
+        """Mapeamento atual; remapeia quando o arquivo é substituído"""
+        agora = time.monotonic()
+        if agora < self._proxima_verificacao:
+            return self._mapeamento
+        with self._lock:
+            if agora < self._proxima_verificacao:
+                return self._mapeamento
+            self._proxima_verificacao = agora + self.intervalo_verificacao
+            try:
+                estado = os.stat(self.caminho)
+            except FileNotFoundError:
+                self._mapeamento, self._assinatura_arquivo = None, None
+                return None
+            assinatura = (estado.st_ino, estado.st_mtime_ns, estado.st_size)
+            if assinatura != self._assinatura_arquivo:
+                try:
+                    # O mapeamento anterior é liberado quando as consultas em andamento terminam
+                    self._mapeamento = _Mapeamento(self.caminho)
+                    logger.info(f"Lista de bloqueio carregada: {self._mapeamento.total} identificadores")
+                except Exception as e:
+                    logger.error(f"Erro ao mapear lista de bloqueio {self.caminho}: {e}")
+                self._assinatura_arquivo = assinatura
+            return self._mapeamento
+
+    def contem(self, chave: Optional[str]) -> bool:
+        """Verifica se a chave normalizada está na lista"""
+        mapeamento = self._obter_mapeamento()
+        if mapeamento is None or not chave:
+            return False
+        resultado = mapeamento.contem(hash_identificador(chave))
+        self.estatisticas["consultas"] += 1
+        if resultado is False:
+            self.estatisticas["descartes_bloom"] += 1
+        elif resultado is None:
+            self.estatisticas["falsos_positivos_bloom"] += 1
+        else:
+            self.estatisticas["encontrados"] += 1
+        return bool(resultado)
+
+    def verificar(self, chaves: Dict[str, str]) -> List[str]:
+        """Tipos de identificador (chave_pix, codigo_barras, documento) presentes na lista"""
+        return [tipo for tipo, chave in chaves.items() if self.contem(chave)]
+
+    def obter_estatisticas(self) -> Dict[str, Any]:
+        """Tamanho da lista e contadores de consulta"""
+        mapeamento = self._obter_mapeamento()
+        return {
+            **self.estatisticas,
+            "ativa": mapeamento is not None,
+            "identificadores": mapeamento.total if mapeamento else 0,
+            "tamanho_bytes": len(mapeamento.mapa) if mapeamento else 0
+        }
+
+
+# Instância global compartilhada pelo Agente Detetive
+lista_bloqueio = ListaBloqueio()
@@ -0,0 +1,134 @@
+"""
+Lote de Verificações - Pré-triagem de muitos documentos numa única requisição
+Executa os documentos pelo pipeline com concorrência limitada, reaproveitando
+o AIService e o armazém de verificações compartilhados, e produz os resultados
+na ordem em que terminam, seguidos de um resumo de vazão e latência
+"""
+
+import os
+import time
+import asyncio
+import statistics
+import logging
+from typing import Dict, Any, Optional, List, AsyncIterator, Tuple
+
+from .armazem_verificacoes import normalizar_texto
+
+logger = logging.getLogger(__name__)
+
+CONCORRENCIA_PADRAO = int(os.getenv("VERIFICACAO_LOTE_CONCORRENCIA", "8"))
+CONCORRENCIA_MAXIMA = int(os.getenv("VERIFICACAO_LOTE_CONCORRENCIA_MAXIMA", "32"))
+MAX_DOCUMENTOS = int(os.getenv("VERIFICACAO_LOTE_MAX_DOCUMENTOS", "500"))
+
+
+def _chave_documento(documento: Dict[str, Any]) -> Tuple:
+    """Documentos com a mesma chave são verificados uma única vez no lote"""
+    return (
+        documento.get("user_id"),
+        documento.get("image_url") or "",
+        normalizar_texto(documento.get("texto_pix") or ""),
+        documento.get("modo_rapido")
+    )
+
+
+def _percentil(valores: List[float], percentil: float) -> float:
+    """Percentil por interpolação linear sobre os valores ordenados"""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    posicao = (len(ordenados) - 1) * percentil
+    inferior = int(posicao)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * (posicao - inferior)
+
+
+async def verificar_lote(ai_service,
+                         documentos: List[Dict[str, Any]],
+                         concorrencia: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Verifica os documentos e produz cada resultado assim que fica pronto
+
+    Args:
+        ai_service: AIService compartilhado
+        documentos: Itens com image_url ou texto_pix, user_id e modo_rapido opcional
+        concorrencia: Verificações simultâneas (padrão: VERIFICACAO_LOTE_CONCORRENCIA)
+
+    Yields:
+        {"tipo": "resultado", "indice", ...} por documento e, por último,
+        {"tipo": "resumo", ...} com vazão e latências do lote
+    """
+    concorrencia = max(1, min(concorrencia or CONCORRENCIA_PADRAO, CONCORRENCIA_MAXIMA))
+    semaforo = asyncio.Semaphore(concorrencia)
+    inicio_lote = time.perf_counter()
+
+    # Documentos repetidos dentro do lote compartilham a mesma execução
+    execucoes: Dict[Tuple, asyncio.Task] = {}
+
+    async def verificar(documento: Dict[str, Any]) -> Dict[str, Any]:
+        if not documento.get("image_url") and not documento.get("texto_pix"):
+            return {"erro": "É necessário fornecer image_url ou texto_pix", "sucesso": False}
+        async with semaforo:
+            try:
+                return await ai_service.verificar_cobranca_completa(
+                    image_url=documento.get("image_url"),
+                    texto_pix=documento.get("texto_pix"),
+                    user_id=documento.get("user_id"),
+                    modo_rapido=documento.get("modo_rapido")
+                )
+            except Exception as e:
+                logger.error(f"Erro na verificação em lote: {e}")
+                return {"erro": f"Erro interno: {str(e)}", "sucesso": False}
+
+    async def acompanhar(indice: int, documento: Dict[str, Any]) -> Dict[str, Any]:
+        inicio = time.perf_counter()
+        chave = _chave_documento(documento)
+        execucao = execucoes.get(chave)
+        reaproveitado = execucao is not None
+        if execucao is None:
+            execucao = execucoes[chave] = asyncio.ensure_future(verificar(documento))
+        resultado = await asyncio.shield(execucao)
+        return {
+            "tipo": "resultado",
+            "indice": indice,
+            "user_id": documento.get("user_id"),
+            "sucesso": resultado.get("sucesso", True),
+            "duplicado_no_lote": reaproveitado,
+            "latencia_ms": round((time.perf_counter() - inicio) * 1000, 1),
+            "resultado": resultado
+        }
+
+    tarefas = [asyncio.ensure_future(acompanhar(i, documento)) for i, documento in enumerate(documentos)]
+    latencias: List[float] = []
+    sucessos = 0
+
+    try:
+        for proxima in asyncio.as_completed(tarefas):
+            item = await proxima
+            latencias.append(item["latencia_ms"])
+            sucessos += 1 if item["sucesso"] else 0
+            yield item
+    finally:
+        # Consumidor desistiu (cliente desconectado): cancelar o que ainda não terminou
+        for tarefa in [*tarefas, *execucoes.values()]:
+            if not tarefa.done():
+                tarefa.cancel()
+
+    duracao = time.perf_counter() - inicio_lote
+    logger.info(f"Lote de {len(documentos)} documentos concluído em {duracao:.1f}s "
+               f"(concorrência {concorrencia})")
+    yield {
+        "tipo": "resumo",
+        "total_documentos": len(documentos),
+        "verificacoes_executadas": len(execucoes),
+        "sucessos": sucessos,
+        "falhas": len(documentos) - sucessos,
+        "concorrencia": concorrencia,
+        "duracao_segundos": round(duracao, 3),
+        "documentos_por_segundo": round(len(documentos) / duracao, 2) if duracao > 0 else 0.0,
+        "latencia_ms": {
+            "media": round(statistics.mean(latencias), 1) if latencias else 0.0,
+            "p50": round(_percentil(latencias, 0.50), 1),
+            "p95": round(_percentil(latencias, 0.95), 1),
+            "max": round(max(latencias), 1) if latencias else 0.0
+        }
+    }
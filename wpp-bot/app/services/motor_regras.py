@@ -0,0 +1,252 @@
+"""
+Motor de Regras - Regras de anomalia e pesos do Agente Detetive em arquivo versionado
+As regras (valores, horários e palavras suspeitas, pesos da pontuação e limites
+dos alertas) ficam em config/regras_fraude.json e são compiladas em funções:
+as características derivadas (como as palavras suspeitas do texto, buscadas
+com uma única expressão regular) são calculadas uma vez por avaliação e
+compartilhadas por todas as regras. O arquivo é recarregado sem reinício
+quando muda; uma versão inválida é rejeitada e a anterior continua valendo
+"""
+
+import os
+import re
+import json
+import time
+import operator
+import threading
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Callable, Tuple
+
+from .registros_verificacao import normalizar_texto
+
+logger = logging.getLogger(__name__)
+
+CAMINHO_PADRAO = Path(__file__).resolve().parents[2] / "config" / "regras_fraude.json"
+
+_COMPARACOES = {
+    "==": operator.eq, "!=": operator.ne,
+    ">": operator.gt, ">=": operator.ge,
+    "<": operator.lt, "<=": operator.le
+}
+
+Predicado = Callable[[Dict[str, Any]], bool]
+
+
+class RegrasInvalidasException(Exception):
+    """Arquivo de regras com estrutura ou operador inválido"""
+
+
+@dataclass
+class RegraCompilada:
+    __slots__ = ("id", "grupo", "predicados", "exceto", "risco", "descricao")
+    id: str
+    grupo: str
+    predicados: Tuple[Predicado, ...]
+    exceto: Tuple[str, ...]
+    risco: int
+    descricao: str
+
+
+# ===== COMPILAÇÃO =====
+
+def _compilar_predicado(campo: str, operador: str, argumento: Any, listas: Dict[str, Any]) -> Predicado:
+    """Função que testa uma condição sobre as características"""
+    if operador in _COMPARACOES:
+        comparar = _COMPARACOES[operador]
+        return lambda c: c.get(campo) is not None and comparar(c[campo], argumento)
+    if operador in ("em", "fora"):
+        valores = listas[argumento] if isinstance(argumento, str) else argumento
+        if not isinstance(valores, list):
+            raise RegrasInvalidasException(f"Lista inválida para '{campo}': {argumento}")
+        conjunto = frozenset(valores)
+        if operador == "em":
+            return lambda c: c.get(campo) in conjunto
+        return lambda c: c.get(campo) not in conjunto
+    if operador == "nao_vazio":
+        esperado = bool(argumento)
+        return lambda c: bool(c.get(campo)) == esperado
+    raise RegrasInvalidasException(f"Operador desconhecido '{operador}' em '{campo}'")
+
+
+def _compilar_caracteristica(nome: str, definicao: Dict[str, Any], listas: Dict[str, Any]):
+    """Característica derivada, calculada uma vez por avaliação"""
+    if "palavras_de" in definicao:
+        origem = definicao["palavras_de"]
+        palavras = {normalizar_texto(palavra): palavra for palavra in listas[definicao["lista"]]}
+        padrao = re.compile("|".join(re.escape(p) for p in sorted(palavras, key=len, reverse=True)))
+
+        def palavras_encontradas(caracteristicas: Dict[str, Any]) -> List[str]:
+            texto = normalizar_texto(caracteristicas.get(origem) or "")
+            return [palavras[p] for p in dict.fromkeys(padrao.findall(texto))] if texto else []
+        return nome, palavras_encontradas
+    raise RegrasInvalidasException(f"Característica '{nome}' sem definição reconhecida")
+
+
+class ConjuntoRegras:
+    """Versão compilada do arquivo de regras"""
+
+    def __init__(self, configuracao: Dict[str, Any]):
+        try:
+            self.versao = str(configuracao["versao"])
+            listas = configuracao.get("listas", {})
+            self.caracteristicas = [
+                _compilar_caracteristica(nome, definicao, listas)
+                for nome, definicao in configuracao.get("caracteristicas", {}).items()
+            ]
+            self.regras: List[RegraCompilada] = []
+            ids = set()
+            for regra in configuracao["regras"]:
+                exceto = tuple(regra.get("exceto", ()))
+                desconhecidas = [r for r in exceto if r not in ids]
+                if desconhecidas:
+                    raise RegrasInvalidasException(
+                        f"Regra '{regra['id']}' referencia regras anteriores inexistentes: {desconhecidas}"
+                    )
+                self.regras.append(RegraCompilada(
+                    id=regra["id"],
+                    grupo=regra["grupo"],
+                    predicados=tuple(
+                        _compilar_predicado(campo, operador, argumento, listas)
+                        for campo, condicoes in regra.get("quando", {}).items()
+                        for operador, argumento in condicoes.items()
+                    ),
+                    exceto=exceto,
+                    risco=int(regra["risco"]),
+                    descricao=regra.get("descricao", regra["id"])
+                ))
+                ids.add(regra["id"])
+
+            pontuacao = configuracao["pontuacao"]
+            self.componentes = [
+                (tuple(componente["analises"]), float(componente["peso"]))
+                for componente in pontuacao["componentes"]
+            ]
+            self.decisivas = tuple(pontuacao.get("decisivas", ()))
+            alertas = configuracao.get("alertas", {})
+            self.limites_alerta = (
+                int(alertas.get("critica", 80)), int(alertas.get("alta", 50)), int(alertas.get("media", 20))
+            )
+        except RegrasInvalidasException:
+            raise
+        except (KeyError, TypeError, ValueError, re.error) as e:
+            raise RegrasInvalidasException(f"Arquivo de regras inválido: {e!r}")
+
+
+class MotorRegras:
+    def __init__(self, caminho: Optional[str] = None):
+        self.caminho = Path(caminho or os.getenv("REGRAS_FRAUDE_PATH", str(CAMINHO_PADRAO)))
+        self.intervalo_verificacao = float(os.getenv("REGRAS_INTERVALO_VERIFICACAO", "5"))
+        self._lock = threading.Lock()
+        self._conjunto: Optional[ConjuntoRegras] = None
+        self._assinatura_arquivo = None
+        self._proxima_verificacao = 0.0
+        self.acertos: Dict[str, int] = {}
+        self.estatisticas = {"avaliacoes": 0, "tempo_total_ms": 0.0, "recargas": 0, "erro_ultima_carga": None}
+
+    def _obter_conjunto(self) -> ConjuntoRegras:
+        """Regras em vigor; recompila quando o arquivo muda"""
+        agora = time.monotonic()
+        if self._conjunto is not None and agora < self._proxima_verificacao:
+            return self._conjunto
+        with self._lock:
+            if self._conjunto is not None and agora < self._proxima_verificacao:
+                return self._conjunto
+            self._proxima_verificacao = agora + self.intervalo_verificacao
+            try:
+                estado = os.stat(self.caminho)
+                assinatura = (estado.st_ino, estado.st_mtime_ns, estado.st_size)
+                if assinatura != self._assinatura_arquivo:
+                    self._assinatura_arquivo = assinatura
+                    with open(self.caminho, encoding="utf-8") as arquivo:
+                        conjunto = ConjuntoRegras(json.load(arquivo))
+                    # Troca atômica: avaliações em andamento terminam com a versão anterior
+                    self._conjunto = conjunto
+                    self.acertos = {regra.id: self.acertos.get(regra.id, 0) for regra in conjunto.regras}
+                    self.estatisticas["recargas"] += 1
+                    self.estatisticas["erro_ultima_carga"] = None
+                    logger.info(f"Regras de fraude carregadas: versão {conjunto.versao} ({len(conjunto.regras)} regras)")
+            except Exception as e:
+                self.estatisticas["erro_ultima_carga"] = str(e)
+                if self._conjunto is None:
+                    raise
+                logger.error(f"Regras de fraude não recarregadas, mantendo versão {self._conjunto.versao}: {e}")
+            return self._conjunto
+
+    @property
+    def versao(self) -> str:
+        return self._obter_conjunto().versao
+
+    def avaliar(self, caracteristicas: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Aplica as regras às características do documento
+
+        Returns:
+            Grupo -> regras disparadas ({"tipo", "descricao", "risco"}), na ordem do arquivo
+        """
+        inicio = time.perf_counter()
+        conjunto = self._obter_conjunto()
+        caracteristicas = dict(caracteristicas)
+        for nome, calcular in conjunto.caracteristicas:
+            caracteristicas[nome] = calcular(caracteristicas)
+        formatacao = {
+            chave: ", ".join(valor) if isinstance(valor, list) else valor
+            for chave, valor in caracteristicas.items()
+        }
+
+        disparadas = set()
+        por_grupo: Dict[str, List[Dict[str, Any]]] = {}
+        for regra in conjunto.regras:
+            if any(r in disparadas for r in regra.exceto):
+                continue
+            if all(predicado(caracteristicas) for predicado in regra.predicados):
+                disparadas.add(regra.id)
+                try:
+                    descricao = regra.descricao.format(**formatacao)
+                except (KeyError, ValueError, IndexError):
+                    descricao = regra.descricao
+                por_grupo.setdefault(regra.grupo, []).append(
+                    {"tipo": regra.id, "descricao": descricao, "risco": regra.risco}
+                )
+
+        with self._lock:
+            for regra_id in disparadas:
+                self.acertos[regra_id] = self.acertos.get(regra_id, 0) + 1
+            self.estatisticas["avaliacoes"] += 1
+            self.estatisticas["tempo_total_ms"] += (time.perf_counter() - inicio) * 1000
+        return por_grupo
+
+    def pontuar(self, analises: Dict[str, Any]) -> int:
+        """Pontuação de risco ponderada (0-100) a partir das análises"""
+        conjunto = self._obter_conjunto()
+
+        def risco(nome: str) -> float:
+            analise = analises.get(nome) or {}
+            return analise.get("risco", analise.get("risco_total", 0)) or 0
+
+        pontuacao = sum(max(risco(nome) for nome in nomes) * peso for nomes, peso in conjunto.componentes)
+        # Análises decisivas valem sozinhas (ex.: identificador em lista de bloqueio)
+        for nome in conjunto.decisivas:
+            pontuacao = max(pontuacao, risco(nome))
+        return min(int(pontuacao), 100)
+
+    def limites_alerta(self) -> Tuple[int, int, int]:
+        """Risco mínimo dos alertas (crítica, alta, média)"""
+        return self._obter_conjunto().limites_alerta
+
+    def obter_estatisticas(self) -> Dict[str, Any]:
+        """Versão em vigor, acertos por regra e tempo de avaliação"""
+        conjunto = self._conjunto
+        with self._lock:
+            avaliacoes = self.estatisticas["avaliacoes"]
+            return {
+                **self.estatisticas,
+                "versao": conjunto.versao if conjunto else None,
+                "tempo_medio_us": round(self.estatisticas["tempo_total_ms"] * 1000 / avaliacoes, 1) if avaliacoes else 0.0,
+                "acertos_por_regra": dict(self.acertos)
+            }
+
+
+# Instância global compartilhada pelo Agente Detetive
+motor_regras = MotorRegras()
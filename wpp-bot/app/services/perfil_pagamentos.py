@@ -0,0 +1,280 @@
+"""
+Perfil de Pagamentos - Quanto e para quem cada cliente costuma pagar
+Cada pagamento confirmado atualiza em O(1) o perfil do cliente: média e
+variância do valor (algoritmo de Welford, sobre o logaritmo do valor), um
+buffer circular com os últimos valores e os beneficiários habituais. O perfil
+fica num único registro binário de poucas centenas de bytes por cliente, de
+modo que o Agente Consultor identifica um valor fora do padrão pelo escore z
+sem percorrer o histórico
+"""
+
+import os
+import math
+import time
+import struct
+import hashlib
+import sqlite3
+import threading
+import logging
+from array import array
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Union
+
+from .registros_verificacao import DadosDocumento, formatar_reais
+
+logger = logging.getLogger(__name__)
+
+CAMINHO_PADRAO = Path(__file__).resolve().parents[2] / "data" / "perfil_pagamentos.db"
+
+VALORES_RECENTES = int(os.getenv("PERFIL_VALORES_RECENTES", "8"))
+# Verificações já contadas, para não registrar o mesmo pagamento duas vezes
+VERIFICACOES_RECENTES = int(os.getenv("PERFIL_VERIFICACOES_RECENTES", "16"))
+MAX_BENEFICIARIOS = int(os.getenv("PERFIL_MAX_BENEFICIARIOS", "5"))
+# Pagamentos necessários para o perfil ser usado nas validações
+MIN_PAGAMENTOS = int(os.getenv("PERFIL_MIN_PAGAMENTOS", "3"))
+LIMIAR_ESCORE_Z = float(os.getenv("PERFIL_LIMIAR_Z", "3"))
+# Desvio mínimo no logaritmo do valor (~10%): quem sempre paga o mesmo valor não tem variância zero
+DESVIO_MINIMO = float(os.getenv("PERFIL_DESVIO_MINIMO", "0.1"))
+
+# Pagamentos, média e M2 (Welford) do log do valor, próxima posição do buffer, valores e beneficiários guardados
+_CABECALHO = struct.Struct("<IddHHH")
+_BENEFICIARIO = struct.Struct("<QI")
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS perfis (
+    user_id TEXT PRIMARY KEY,
+    perfil BLOB NOT NULL,
+    verificacoes_recentes TEXT,
+    atualizado_em REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def hash_beneficiario(beneficiario_normalizado: str) -> int:
+    """Hash estável (entre processos) de 64 bits do nome normalizado"""
+    return int.from_bytes(
+        hashlib.blake2b(beneficiario_normalizado.encode("utf-8"), digest_size=8).digest(), "little"
+    )
+
+
+class PerfilCliente:
+    """Estatísticas de pagamento de um cliente, serializadas num registro binário compacto"""
+
+    __slots__ = ("pagamentos", "media", "m2", "posicao", "recentes", "beneficiarios")
+
+    def __init__(self):
+        self.pagamentos = 0
+        self.media = 0.0
+        self.m2 = 0.0
+        self.posicao = 0
+        self.recentes = array("I")
+        self.beneficiarios: Dict[int, int] = {}
+
+    # ===== SERIALIZAÇÃO =====
+
+    @classmethod
+    def de_bytes(cls, dados: bytes) -> "PerfilCliente":
+        perfil = cls()
+        (perfil.pagamentos, perfil.media, perfil.m2, perfil.posicao,
+         quantidade_recentes, quantidade_beneficiarios) = _CABECALHO.unpack_from(dados)
+        inicio = _CABECALHO.size
+        fim = inicio + 4 * quantidade_recentes
+        perfil.recentes.frombytes(dados[inicio:fim])
+        for indice in range(quantidade_beneficiarios):
+            chave, contagem = _BENEFICIARIO.unpack_from(dados, fim + indice * _BENEFICIARIO.size)
+            perfil.beneficiarios[chave] = contagem
+        return perfil
+
+    def para_bytes(self) -> bytes:
+        return b"".join((
+            _CABECALHO.pack(self.pagamentos, self.media, self.m2, self.posicao,
+                            len(self.recentes), len(self.beneficiarios)),
+            self.recentes.tobytes(),
+            *(_BENEFICIARIO.pack(chave, contagem) for chave, contagem in self.beneficiarios.items())
+        ))
+
+    # ===== ATUALIZAÇÃO =====
+
+    def adicionar(self, centavos: int, beneficiario: Optional[int],
+                  valores_recentes: int = VALORES_RECENTES, max_beneficiarios: int = MAX_BENEFICIARIOS):
+        """Inclui um pagamento: Welford para média/variância, buffer circular e beneficiários"""
+        x = math.log(centavos)
+        self.pagamentos += 1
+        delta = x - self.media
+        self.media += delta / self.pagamentos
+        self.m2 += delta * (x - self.media)
+
+        if len(self.recentes) < valores_recentes:
+            self.recentes.append(centavos)
+            self.posicao = len(self.recentes) % valores_recentes
+        else:
+            self.recentes[self.posicao % len(self.recentes)] = centavos
+            self.posicao = (self.posicao + 1) % len(self.recentes)
+
+        if beneficiario is not None:
+            if beneficiario in self.beneficiarios or len(self.beneficiarios) < max_beneficiarios:
+                self.beneficiarios[beneficiario] = self.beneficiarios.get(beneficiario, 0) + 1
+            else:
+                # Cheio: o novo herda a contagem do menos frequente (space-saving)
+                menor = min(self.beneficiarios, key=self.beneficiarios.__getitem__)
+                self.beneficiarios[beneficiario] = self.beneficiarios.pop(menor) + 1
+
+    # ===== CONSULTA =====
+
+    @property
+    def desvio(self) -> float:
+        variancia = self.m2 / (self.pagamentos - 1) if self.pagamentos > 1 else 0.0
+        return max(math.sqrt(variancia), DESVIO_MINIMO)
+
+    @property
+    def valor_tipico(self) -> int:
+        """Média geométrica dos valores pagos, em centavos"""
+        return int(round(math.exp(self.media))) if self.pagamentos else 0
+
+    def escore_z(self, centavos: int) -> float:
+        return (math.log(centavos) - self.media) / self.desvio
+
+    def valores_recentes(self) -> List[int]:
+        """Últimos valores pagos, do mais novo para o mais antigo"""
+        quantidade = len(self.recentes)
+        return [self.recentes[(self.posicao - 1 - i) % quantidade] for i in range(quantidade)]
+
+
+class PerfilPagamentos:
+    def __init__(self, caminho: Optional[str] = None):
+        self.caminho = Path(caminho or os.getenv("PERFIL_PAGAMENTOS_PATH", str(CAMINHO_PADRAO)))
+        self._lock = threading.Lock()
+        self._conexao: Optional[sqlite3.Connection] = None
+        self.estatisticas = {"pagamentos_registrados": 0, "duplicados_ignorados": 0, "consultas": 0}
+
+    def _conectar(self) -> sqlite3.Connection:
+        """Abre a conexão no primeiro uso"""
+        if self._conexao is None:
+            if str(self.caminho) != ":memory:":
+                self.caminho.parent.mkdir(parents=True, exist_ok=True)
+            conexao = sqlite3.connect(str(self.caminho), check_same_thread=False, isolation_level=None, timeout=10)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            conexao.executescript(_ESQUEMA)
+            colunas = {coluna[1] for coluna in conexao.execute("PRAGMA table_info(perfis)")}
+            if "verificacoes_recentes" not in colunas:
+                # Bases anteriores guardavam só a última verificação
+                conexao.execute("ALTER TABLE perfis ADD COLUMN verificacoes_recentes TEXT")
+            self._conexao = conexao
+        return self._conexao
+
+    def registrar_pagamento(self,
+                            user_id: str,
+                            dados: Union[DadosDocumento, Dict[str, Any]],
+                            id_verificacao: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Atualiza o perfil do cliente com um pagamento confirmado
+
+        Args:
+            user_id: Cliente que pagou
+            dados: Dados do documento pago (campos do leitor)
+            id_verificacao: Verificação paga; uma verificação entre as últimas contadas não é contada de novo
+        """
+        documento = DadosDocumento.garantir(dados)
+        if not user_id or not documento.valor_centavos or documento.valor_centavos <= 0:
+            return {"sucesso": False, "erro": "Pagamento sem cliente ou valor para registrar"}
+        beneficiario = (hash_beneficiario(documento.beneficiario_normalizado)
+                        if documento.beneficiario_normalizado else None)
+
+        with self._lock:
+            conexao = self._conectar()
+            # Leitura e gravação na mesma transação: outro worker não perde a atualização
+            conexao.execute("BEGIN IMMEDIATE")
+            try:
+                linha = conexao.execute(
+                    "SELECT perfil, verificacoes_recentes FROM perfis WHERE user_id = ?", (str(user_id),)
+                ).fetchone()
+                contadas = linha[1].split() if linha and linha[1] else []
+                if id_verificacao and id_verificacao in contadas:
+                    conexao.execute("ROLLBACK")
+                    self.estatisticas["duplicados_ignorados"] += 1
+                    return {"sucesso": True, "duplicado": True}
+                if id_verificacao:
+                    contadas = [id_verificacao, *contadas][:VERIFICACOES_RECENTES]
+                perfil = PerfilCliente.de_bytes(linha[0]) if linha else PerfilCliente()
+                perfil.adicionar(documento.valor_centavos, beneficiario)
+                conexao.execute(
+                    "INSERT INTO perfis (user_id, perfil, verificacoes_recentes, atualizado_em) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (user_id) DO UPDATE SET perfil = excluded.perfil, "
+                    "verificacoes_recentes = excluded.verificacoes_recentes, atualizado_em = excluded.atualizado_em",
+                    (str(user_id), perfil.para_bytes(), " ".join(contadas), time.time())
+                )
+                conexao.execute("COMMIT")
+            except Exception:
+                conexao.execute("ROLLBACK")
+                raise
+            self.estatisticas["pagamentos_registrados"] += 1
+        return {"sucesso": True, "duplicado": False, "pagamentos": perfil.pagamentos}
+
+    def obter(self, user_id: str) -> Optional[PerfilCliente]:
+        """Perfil do cliente, ou None se ele nunca confirmou um pagamento"""
+        with self._lock:
+            linha = self._conectar().execute(
+                "SELECT perfil FROM perfis WHERE user_id = ?", (str(user_id),)
+            ).fetchone()
+            self.estatisticas["consultas"] += 1
+        return PerfilCliente.de_bytes(linha[0]) if linha else None
+
+    def avaliar_valor(self, perfil: Optional[PerfilCliente], centavos: int) -> Optional[Dict[str, Any]]:
+        """Compara o valor com o que o cliente costuma pagar; None se o perfil ainda é curto"""
+        if perfil is None or perfil.pagamentos < MIN_PAGAMENTOS:
+            return None
+        escore = perfil.escore_z(centavos)
+        tipico = formatar_reais(perfil.valor_tipico)
+        if centavos in perfil.recentes:
+            return {
+                "status": "valor_recorrente",
+                "mensagem": f"Valor {formatar_reais(centavos)} já foi pago recentemente pelo cliente",
+                "confiabilidade": 85,
+                "escore_z": round(escore, 2)
+            }
+        if abs(escore) >= LIMIAR_ESCORE_Z:
+            direcao = "acima" if escore > 0 else "abaixo"
+            return {
+                "status": "valor_fora_do_perfil",
+                "mensagem": f"Valor {formatar_reais(centavos)} muito {direcao} do que o cliente costuma pagar "
+                            f"(típico {tipico}, escore z {escore:+.1f})",
+                "confiabilidade": 15,
+                "escore_z": round(escore, 2),
+                "valor_tipico": tipico
+            }
+        return {
+            "status": "valor_no_perfil",
+            "mensagem": f"Valor {formatar_reais(centavos)} dentro do padrão do cliente (típico {tipico})",
+            "confiabilidade": 70,
+            "escore_z": round(escore, 2),
+            "valor_tipico": tipico
+        }
+
+    def avaliar_beneficiario(self, perfil: Optional[PerfilCliente], beneficiario_normalizado: str) -> Optional[Dict[str, Any]]:
+        """Indica se o cliente já pagou a este beneficiário; None se o perfil ainda é curto"""
+        if perfil is None or perfil.pagamentos < MIN_PAGAMENTOS or not beneficiario_normalizado:
+            return None
+        pagamentos_beneficiario = perfil.beneficiarios.get(hash_beneficiario(beneficiario_normalizado), 0)
+        if pagamentos_beneficiario:
+            return {
+                "status": "beneficiario_habitual",
+                "mensagem": f"Cliente já pagou {pagamentos_beneficiario} vez(es) a este beneficiário",
+                "confiabilidade": 90,
+                "pagamentos_beneficiario": pagamentos_beneficiario
+            }
+        return {
+            "status": "beneficiario_novo_para_cliente",
+            "mensagem": f"Cliente nunca pagou a este beneficiário em {perfil.pagamentos} pagamentos confirmados",
+            "confiabilidade": 40
+        }
+
+    def obter_estatisticas(self) -> Dict[str, Any]:
+        """Perfis gravados, pagamentos registrados e consultas"""
+        with self._lock:
+            perfis = self._conectar().execute("SELECT COUNT(*) FROM perfis").fetchone()[0]
+        return {**self.estatisticas, "perfis": perfis}
+
+
+# Instância global compartilhada pelo Agente Consultor
+perfil_pagamentos = PerfilPagamentos()
@@ -0,0 +1,150 @@
+"""
+Prazo da Verificação - Orçamento de tempo propagado pelo pipeline de agentes
+Cada verificação recebe um prazo total que é fatiado entre as etapas; etapas que
+estouram sua fatia são canceladas e contabilizadas por etapa
+"""
+
+import os
+import time
+import asyncio
+import functools
+import threading
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List, Callable, Awaitable
+
+from app.core.exceptions import PrazoEsgotadoException
+
+logger = logging.getLogger(__name__)
+
+# Ordem das etapas e fração do tempo total reservada a cada uma
+ETAPAS = ("leitor", "consultor", "detetive", "orquestrador")
+FRACOES_PADRAO = {
+    "leitor": 0.45,
+    "consultor": 0.15,
+    "detetive": 0.15,
+    "orquestrador": 0.25
+}
+
+# Tolerância dada ao cancelamento externo da etapa, para que os limites internos
+# (chamadas à IA, download, OCR) expirem primeiro e a etapa devolva o que já apurou
+FOLGA_ETAPA_SEGUNDOS = 0.5
+
+# Threads das chamadas bloqueantes dos agentes (IA, OCR), separadas do executor
+# padrão do loop para que chamadas presas não esgotem as threads do resto da API
+MAX_THREADS_BLOQUEANTES = int(os.getenv("VERIFICACAO_MAX_THREADS_BLOQUEANTES", "16"))
+
+_lock_estouros = threading.Lock()
+_estouros_por_etapa: Counter = Counter()
+_lock_executor = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def registrar_estouro(etapa: str):
+    """Contabiliza um estouro de prazo na etapa"""
+    with _lock_estouros:
+        _estouros_por_etapa[etapa] += 1
+
+
+def obter_estouros() -> Dict[str, int]:
+    """Contadores de estouro de prazo por etapa"""
+    with _lock_estouros:
+        return dict(_estouros_por_etapa)
+
+
+class PrazoVerificacao:
+    def __init__(self,
+                 total_segundos: Optional[float] = None,
+                 etapa: str = "verificacao",
+                 limite: Optional[float] = None,
+                 pai: Optional["PrazoVerificacao"] = None):
+        self.etapa = etapa
+        self.pai = pai
+        self.total = total_segundos if total_segundos is not None else float(
+            os.getenv("VERIFICACAO_PRAZO_SEGUNDOS", "25")
+        )
+        self.limite = limite if limite is not None else time.monotonic() + self.total
+        self.etapas_expiradas: List[str] = pai.etapas_expiradas if pai else []
+
+    def restante(self) -> float:
+        """Segundos restantes até o limite"""
+        return max(0.0, self.limite - time.monotonic())
+
+    def esgotado(self) -> bool:
+        return self.restante() <= 0
+
+    def fatia(self, etapa: str) -> "PrazoVerificacao":
+        """
+        Cria o prazo de uma etapa
+
+        O tempo restante é dividido proporcionalmente entre a etapa e as que ainda
+        faltam, de modo que a sobra das etapas rápidas passa para as seguintes.
+        """
+        if etapa in ETAPAS:
+            pendentes = ETAPAS[ETAPAS.index(etapa):]
+            proporcao = FRACOES_PADRAO[etapa] / sum(FRACOES_PADRAO[e] for e in pendentes)
+        else:
+            proporcao = 1.0
+        duracao = self.restante() * proporcao
+        return PrazoVerificacao(
+            total_segundos=duracao,
+            etapa=etapa,
+            limite=time.monotonic() + duracao,
+            pai=self
+        )
+
+    def timeout(self, maximo: float, nome: Optional[str] = None) -> float:
+        """Timeout para uma operação, limitado ao tempo restante"""
+        if self.esgotado():
+            self._estourar(nome or self.etapa)
+        return min(maximo, self.restante())
+
+    async def executar(self, aguardavel: Awaitable, nome: Optional[str] = None, folga: float = 0.0) -> Any:
+        """Aguarda a operação até o limite, cancelando-a se o prazo acabar"""
+        nome = nome or self.etapa
+        if self.esgotado():
+            if asyncio.iscoroutine(aguardavel):
+                aguardavel.close()
+            self._estourar(nome)
+        try:
+            return await asyncio.wait_for(aguardavel, timeout=self.restante() + folga)
+        except asyncio.TimeoutError:
+            self._estourar(nome)
+
+    def _estourar(self, nome: str):
+        registrar_estouro(nome)
+        self.etapas_expiradas.append(nome)
+        logger.warning(f"Prazo esgotado na etapa {nome}")
+        raise PrazoEsgotadoException(nome)
+
+
+def _obter_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _lock_executor:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=MAX_THREADS_BLOQUEANTES, thread_name_prefix="bloqueante")
+    return _executor
+
+
+async def executar_bloqueante(prazo: Optional[PrazoVerificacao],
+                              nome: str,
+                              funcao: Callable,
+                              *args,
+                              **kwargs) -> Any:
+    """
+    Executa uma chamada bloqueante numa thread, limitada pelo prazo quando houver
+
+    Uma thread não pode ser interrompida: se o prazo acaba com a chamada já em
+    execução, ela continua até retornar (os timeouts dos clientes de IA e do
+    OCR a limitam) e só o resultado é descartado. Por isso as chamadas rodam
+    num executor próprio de VERIFICACAO_MAX_THREADS_BLOQUEANTES threads: com
+    todas presas, as novas esperam na fila dentro do próprio prazo, e as que
+    expiram ainda na fila são canceladas sem chegar a executar.
+    """
+    loop = asyncio.get_running_loop()
+    chamada = loop.run_in_executor(_obter_executor(), functools.partial(funcao, *args, **kwargs))
+    if prazo is None:
+        return await chamada
+    return await prazo.executar(chamada, nome)
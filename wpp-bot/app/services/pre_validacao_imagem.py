@@ -0,0 +1,208 @@
+"""
+Pré-validação de Imagem - Filtro barato antes do OCR e dos agentes com IA
+Decodifica a imagem já reduzida (miniatura em tons de cinza) e, em poucos
+milissegundos, recusa fotos pequenas, vazias, borradas (variância do
+Laplaciano) ou sem cara de documento (densidade de bordas), pedindo outra
+foto antes de gastar OCR e quatro chamadas de LLM. Uma impressão perceptual
+(dHash) das imagens recentes de cada usuário aponta fotos parecidas, mas é só
+um indício: boletos diferentes do mesmo modelo têm o mesmo dHash, então um
+veredito só é reaproveitado pela impressão exata da imagem ou, depois do OCR,
+pelo código de barras / chave PIX e valor
+"""
+
+import os
+import time
+import threading
+import logging
+from collections import deque
+from typing import Dict, Any, Optional, Deque, Tuple
+
+from .registro_servicos import importar_modulo
+
+logger = logging.getLogger(__name__)
+
+LADO_MINIMO = int(os.getenv("PRE_VALIDACAO_LADO_MINIMO", "400"))
+LADO_MINIATURA = int(os.getenv("PRE_VALIDACAO_LADO_MINIATURA", "512"))
+CONTRASTE_MINIMO = float(os.getenv("PRE_VALIDACAO_CONTRASTE_MINIMO", "8"))
+NITIDEZ_MINIMA = float(os.getenv("PRE_VALIDACAO_NITIDEZ_MINIMA", "60"))
+DENSIDADE_BORDAS_MINIMA = float(os.getenv("PRE_VALIDACAO_DENSIDADE_BORDAS_MINIMA", "0.02"))
+# Distância de Hamming (de 64 bits) até a qual duas imagens são parecidas
+DISTANCIA_SEMELHANTE = int(os.getenv("PRE_VALIDACAO_DISTANCIA_SEMELHANTE", "6"))
+JANELA_SEMELHANCA_SEGUNDOS = float(os.getenv("PRE_VALIDACAO_JANELA_SEMELHANCA_SEGUNDOS", "1800"))
+RECENTES_POR_USUARIO = int(os.getenv("PRE_VALIDACAO_RECENTES_POR_USUARIO", "10"))
+MAX_USUARIOS = 50_000
+
+MOTIVO_INVALIDA = "imagem_invalida"
+MOTIVO_PEQUENA = "imagem_pequena"
+MOTIVO_VAZIA = "imagem_vazia"
+MOTIVO_BORRADA = "imagem_borrada"
+MOTIVO_SEM_TEXTO = "sem_texto"
+
+MENSAGENS = {
+    MOTIVO_INVALIDA: "Não conseguimos abrir a imagem. Envie a foto do boleto novamente em JPG ou PNG.",
+    MOTIVO_PEQUENA: "A imagem está muito pequena para ler os dados. Envie uma foto com o boleto ocupando a tela.",
+    MOTIVO_VAZIA: "A imagem parece estar em branco ou escura demais. Tire outra foto com boa iluminação.",
+    MOTIVO_BORRADA: "A foto está tremida ou fora de foco. Apoie o celular e tire outra foto do boleto.",
+    MOTIVO_SEM_TEXTO: "Não encontramos um documento na imagem. Envie uma foto do boleto ou do comprovante PIX."
+}
+
+# Redução aplicada pelo próprio decodificador (JPEG decodificado em 1/2, 1/4 ou 1/8)
+_REDUCOES = ((8, "IMREAD_REDUCED_GRAYSCALE_8"), (4, "IMREAD_REDUCED_GRAYSCALE_4"), (2, "IMREAD_REDUCED_GRAYSCALE_2"))
+
+
+class PreValidacaoImagem:
+    def __init__(self):
+        self._recentes: Dict[str, Deque[Tuple[int, str, float]]] = {}
+        self._lock = threading.Lock()
+        self._indisponivel_avisado = False
+        self.estatisticas = {
+            "avaliadas": 0, "aprovadas": 0, "semelhantes": 0, "sem_bibliotecas": 0, "tempo_total_ms": 0.0,
+            "recusadas": {motivo: 0 for motivo in MENSAGENS}
+        }
+
+    # ===== MEDIDAS =====
+
+    @staticmethod
+    def _decodificar(conteudo: bytes, cv2, np):
+        """Miniatura em tons de cinza e o tamanho aproximado da imagem original"""
+        dados = np.frombuffer(conteudo, dtype=np.uint8)
+        cabecalho = cv2.imdecode(dados, cv2.IMREAD_REDUCED_GRAYSCALE_8)
+        if cabecalho is None:
+            return None, (0, 0)
+        altura, largura = cabecalho.shape[:2]
+        # Menor redução que ainda gera uma miniatura do tamanho desejado
+        fator, bandeira = next(
+            ((f, b) for f, b in _REDUCOES if max(altura, largura) * 8 // f >= LADO_MINIATURA or f == 2),
+            _REDUCOES[-1]
+        )
+        imagem = cabecalho if fator == 8 else cv2.imdecode(dados, getattr(cv2, bandeira))
+        altura, largura = imagem.shape[:2]
+        original = (altura * fator, largura * fator)
+        escala = LADO_MINIATURA / max(altura, largura)
+        if escala < 1:
+            imagem = cv2.resize(imagem, (max(1, int(largura * escala)), max(1, int(altura * escala))),
+                                interpolation=cv2.INTER_AREA)
+        return imagem, original
+
+    @staticmethod
+    def impressao_perceptual(cinza, cv2) -> int:
+        """dHash de 64 bits: gradiente horizontal de uma redução 9x8"""
+        reduzida = cv2.resize(cinza, (9, 8), interpolation=cv2.INTER_AREA)
+        bits = (reduzida[:, 1:] > reduzida[:, :-1]).flatten()
+        valor = 0
+        for bit in bits:
+            valor = (valor << 1) | int(bit)
+        return valor
+
+    # ===== AVALIAÇÃO =====
+
+    def avaliar(self, conteudo: bytes, user_id: Optional[str] = None, impressao: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Decide se a imagem segue para o OCR
+
+        Args:
+            conteudo: Bytes da imagem baixada
+            user_id: Usuário que enviou (para apontar fotos parecidas com as recentes)
+            impressao: Impressão exata da imagem no armazém de verificações
+
+        Returns:
+            {"aprovada", "motivo", "mensagem", "semelhante_a", "metricas", "tempo_ms"}
+        """
+        inicio = time.perf_counter()
+        try:
+            cv2 = importar_modulo("cv2")
+            np = importar_modulo("numpy")
+        except ImportError as e:
+            # Sem OpenCV não há como medir: a imagem segue (o OCR também dependeria dele)
+            if not self._indisponivel_avisado:
+                logger.warning(f"Pré-validação de imagem desativada: {e}")
+                self._indisponivel_avisado = True
+            self.estatisticas["sem_bibliotecas"] += 1
+            return self._resultado(inicio, None, {})
+
+        try:
+            cinza, (altura, largura) = self._decodificar(conteudo, cv2, np)
+        except Exception as e:
+            logger.warning(f"Pré-validação: falha ao decodificar imagem - {e}")
+            cinza = None
+        if cinza is None or cinza.size == 0:
+            return self._resultado(inicio, MOTIVO_INVALIDA, {})
+
+        metricas: Dict[str, Any] = {"altura": altura, "largura": largura}
+        if min(altura, largura) < LADO_MINIMO:
+            return self._resultado(inicio, MOTIVO_PEQUENA, metricas)
+
+        metricas["contraste"] = round(float(cinza.std()), 1)
+        if metricas["contraste"] < CONTRASTE_MINIMO:
+            return self._resultado(inicio, MOTIVO_VAZIA, metricas)
+
+        metricas["nitidez"] = round(float(cv2.Laplacian(cinza, cv2.CV_64F).var()), 1)
+        if metricas["nitidez"] < NITIDEZ_MINIMA:
+            return self._resultado(inicio, MOTIVO_BORRADA, metricas)
+
+        bordas = cv2.Canny(cinza, 50, 150)
+        metricas["densidade_bordas"] = round(float(np.count_nonzero(bordas)) / bordas.size, 4)
+        if metricas["densidade_bordas"] < DENSIDADE_BORDAS_MINIMA:
+            return self._resultado(inicio, MOTIVO_SEM_TEXTO, metricas)
+
+        dhash = self.impressao_perceptual(cinza, cv2)
+        semelhante_a = self._registrar_recente(user_id, dhash, impressao) if user_id else None
+        if semelhante_a:
+            self.estatisticas["semelhantes"] += 1
+        return self._resultado(inicio, None, metricas, semelhante_a)
+
+    def _registrar_recente(self, user_id: str, dhash: int, impressao: Optional[str]) -> Optional[str]:
+        """Guarda a impressão da imagem; retorna a impressão exata de uma recente parecida, se houver"""
+        agora = time.monotonic()
+        with self._lock:
+            recentes = self._recentes.get(user_id)
+            if recentes is None:
+                if len(self._recentes) >= MAX_USUARIOS:
+                    # Descarta o usuário mais antigo (ordem de inserção do dicionário)
+                    self._recentes.pop(next(iter(self._recentes)))
+                recentes = self._recentes[user_id] = deque(maxlen=RECENTES_POR_USUARIO)
+            semelhante_a = None
+            for hash_recente, impressao_recente, quando in reversed(recentes):
+                if agora - quando > JANELA_SEMELHANCA_SEGUNDOS:
+                    break
+                if impressao_recente != impressao and bin(hash_recente ^ dhash).count("1") <= DISTANCIA_SEMELHANTE:
+                    semelhante_a = impressao_recente
+                    break
+            if impressao:
+                recentes.append((dhash, impressao, agora))
+        return semelhante_a
+
+    def _resultado(self, inicio: float, motivo: Optional[str], metricas: Dict[str, Any],
+                   semelhante_a: Optional[str] = None) -> Dict[str, Any]:
+        tempo_ms = (time.perf_counter() - inicio) * 1000
+        with self._lock:
+            self.estatisticas["avaliadas"] += 1
+            self.estatisticas["tempo_total_ms"] += tempo_ms
+            if motivo:
+                self.estatisticas["recusadas"][motivo] += 1
+            else:
+                self.estatisticas["aprovadas"] += 1
+        if motivo:
+            logger.info(f"Pré-validação recusou a imagem: {motivo} {metricas}")
+        return {
+            "aprovada": motivo is None,
+            "motivo": motivo,
+            "mensagem": MENSAGENS.get(motivo),
+            "semelhante_a": semelhante_a,
+            "metricas": metricas,
+            "tempo_ms": round(tempo_ms, 2)
+        }
+
+    def obter_estatisticas(self) -> Dict[str, Any]:
+        """Imagens avaliadas, aprovadas, recusas por motivo, parecidas com recentes e tempo médio"""
+        with self._lock:
+            avaliadas = self.estatisticas["avaliadas"]
+            return {
+                **self.estatisticas,
+                "recusadas": dict(self.estatisticas["recusadas"]),
+                "tempo_medio_ms": round(self.estatisticas["tempo_total_ms"] / avaliadas, 2) if avaliadas else 0.0
+            }
+
+
+# Instância global compartilhada pelo fluxo de verificação
+pre_validacao_imagem = PreValidacaoImagem()
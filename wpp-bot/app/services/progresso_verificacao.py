@@ -0,0 +1,212 @@
+"""
+Progresso da Verificação - Eventos por etapa do pipeline de agentes
+Define os eventos emitidos a cada agente concluído e os sinks que os entregam:
+atualizações incrementais pelo WhatsApp com limite de frequência e fila para
+respostas em streaming (SSE / NDJSON)
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+from typing import Dict, Any, Optional, List
+from datetime import datetime
+
+from sqlalchemy.orm import Session
+from .whatsapp import whatsapp_service
+
+logger = logging.getLogger(__name__)
+
+# Etapas emitidas pelo FluxoVerificacaoIA
+ETAPA_EXTRACAO = "extracao_concluida"
+ETAPA_CONSULTOR = "consultor_concluido"
+ETAPA_DETETIVE = "detetive_concluido"
+ETAPA_VEREDITO = "veredito"
+ETAPA_ENRIQUECIMENTO = "enriquecimento_concluido"
+# Evento final das respostas em streaming, com o resultado completo
+ETAPA_RESULTADO = "resultado"
+
+
+def criar_evento(etapa: str, agente: str, duracao_ms: float, dados: Dict[str, Any]) -> Dict[str, Any]:
+    """Cria o evento de progresso de uma etapa"""
+    return {
+        "etapa": etapa,
+        "agente": agente,
+        "duracao_ms": round(duracao_ms, 1),
+        "timestamp": datetime.now().isoformat(),
+        "dados": dados
+    }
+
+
+def resumir_etapa(etapa: str, resultado: Dict[str, Any]) -> Dict[str, Any]:
+    """Extrai do resultado de um agente apenas o que é útil para exibir ao usuário"""
+    if etapa == ETAPA_EXTRACAO:
+        dados = resultado.get("dados_extraidos", {})
+        return {
+            "sucesso": resultado.get("sucesso", False),
+            "valor": dados.get("valor_cobrado") or dados.get("valor"),
+            "beneficiario": dados.get("nome_beneficiario") or dados.get("beneficiario"),
+            "vencimento": dados.get("data_vencimento"),
+            "chave_pix": dados.get("chave_pix")
+        }
+    if etapa == ETAPA_CONSULTOR:
+        return {
+            "sucesso": resultado.get("sucesso", False),
+            "validacoes": {
+                tipo: validacao.get("confiabilidade", 0)
+                for tipo, validacao in resultado.get("validacoes", {}).items()
+            },
+            "alertas": [alerta.get("mensagem", "") for alerta in resultado.get("alertas", [])]
+        }
+    if etapa == ETAPA_DETETIVE:
+        return {
+            "sucesso": resultado.get("sucesso", False),
+            "pontuacao_risco": resultado.get("pontuacao_risco", 0),
+            "alertas": [alerta.get("mensagem", "") for alerta in resultado.get("alertas_fraude", [])]
+        }
+    if etapa == ETAPA_VEREDITO:
+        return {
+            "status_verificacao": resultado.get("status_verificacao"),
+            "pontuacao_confianca": resultado.get("pontuacao_confianca"),
+            "mensagem_usuario": resultado.get("mensagem_usuario")
+        }
+    return {"status": resultado.get("enriquecimento_ia", {}).get("status")}
+
+
+class SinkProgresso:
+    """Destino dos eventos de progresso; a implementação padrão descarta tudo"""
+
+    async def emitir(self, evento: Dict[str, Any]):
+        """Recebe o evento de uma etapa concluída"""
+        pass
+
+    async def finalizar(self):
+        """Chamado quando o resultado final está pronto para ser entregue"""
+        pass
+
+
+class SinkProgressoWhatsApp(SinkProgresso):
+    """
+    Envia atualizações incrementais ao usuário pelo WhatsApp
+
+    Eventos que chegam antes do intervalo mínimo entre mensagens são agrupados
+    numa única mensagem; o veredito final descarta as atualizações pendentes,
+    já que o resultado completo é enviado logo em seguida.
+    """
+
+    def __init__(self, db: Session, user, intervalo_minimo: Optional[float] = None):
+        self.db = db
+        self.user = user
+        self.intervalo_minimo = intervalo_minimo if intervalo_minimo is not None else float(
+            os.getenv("PROGRESSO_INTERVALO_MINIMO_SEGUNDOS", "3")
+        )
+        self._pendentes: List[Dict[str, Any]] = []
+        self._ultimo_envio = 0.0
+        self._envio_agendado: Optional[asyncio.Task] = None
+        self._finalizado = False
+        self._lock = asyncio.Lock()
+
+    async def emitir(self, evento: Dict[str, Any]):
+        if self._finalizado or evento["etapa"] == ETAPA_ENRIQUECIMENTO:
+            return
+
+        if evento["etapa"] == ETAPA_VEREDITO:
+            await self.finalizar()
+            return
+
+        self._pendentes.append(evento)
+        espera = self.intervalo_minimo - (time.monotonic() - self._ultimo_envio)
+
+        if espera <= 0:
+            await self._enviar_pendentes()
+        elif self._envio_agendado is None or self._envio_agendado.done():
+            self._envio_agendado = asyncio.create_task(self._enviar_apos(espera))
+
+    async def finalizar(self):
+        self._finalizado = True
+        self._pendentes.clear()
+        if self._envio_agendado and not self._envio_agendado.done():
+            self._envio_agendado.cancel()
+
+    async def _enviar_apos(self, espera: float):
+        await asyncio.sleep(espera)
+        await self._enviar_pendentes()
+
+    async def _enviar_pendentes(self):
+        async with self._lock:
+            if self._finalizado or not self._pendentes:
+                return
+            eventos, self._pendentes = self._pendentes, []
+            self._ultimo_envio = time.monotonic()
+
+        try:
+            await whatsapp_service.send_message(
+                phone_number=self.user.phone_number,
+                message=self._formatar(eventos),
+                log_to_db=True,
+                user_id=self.user.id,
+                db=self.db
+            )
+        except Exception as e:
+            logger.error(f"Erro ao enviar progresso da verificação: {e}")
+
+    def _formatar(self, eventos: List[Dict[str, Any]]) -> str:
+        """Agrupa os eventos pendentes numa única mensagem"""
+        linhas = ["⏳ **Análise em andamento**", ""]
+
+        for evento in eventos:
+            dados = evento["dados"]
+
+            if evento["etapa"] == ETAPA_EXTRACAO:
+                campos = []
+                if dados.get("valor"):
+                    campos.append(f"Valor: R$ {dados['valor']}")
+                if dados.get("beneficiario"):
+                    campos.append(f"Beneficiário: {dados['beneficiario']}")
+                if dados.get("vencimento"):
+                    campos.append(f"Vencimento: {dados['vencimento']}")
+                linhas.append("🤖 **Dados extraídos**" + ("\n• " + "\n• ".join(campos) if campos else ""))
+
+            elif evento["etapa"] == ETAPA_CONSULTOR:
+                alertas = dados.get("alertas", [])
+                linha = f"📊 **Sistemas Bemobi:** {len(dados.get('validacoes', {}))} validações, {len(alertas)} alerta(s)"
+                if alertas:
+                    linha += f"\n{alertas[0]}"
+                linhas.append(linha)
+
+            elif evento["etapa"] == ETAPA_DETETIVE:
+                linhas.append(f"🛡️ **Análise de fraude:** risco {dados.get('pontuacao_risco', 0)}%")
+
+        return "\n".join(linhas)
+
+
+class SinkProgressoFila(SinkProgresso):
+    """
+    Acumula os eventos numa asyncio.Queue para respostas em streaming
+
+    Cada evento recebe o tempo decorrido desde o início da verificação;
+    finalizar() coloca o marcador de fim (None) na fila.
+    """
+
+    def __init__(self):
+        self.fila: asyncio.Queue = asyncio.Queue()
+        self._inicio = time.perf_counter()
+
+    async def emitir(self, evento: Dict[str, Any]):
+        evento = {**evento, "decorrido_ms": round((time.perf_counter() - self._inicio) * 1000, 1)}
+        await self.fila.put(evento)
+
+    async def finalizar(self):
+        await self.fila.put(None)
+
+
+def formatar_sse(evento: Dict[str, Any]) -> str:
+    """Serializa o evento no formato Server-Sent Events"""
+    dados = json.dumps(evento, ensure_ascii=False, default=str)
+    return f"event: {evento['etapa']}\ndata: {dados}\n\n"
+
+
+def formatar_ndjson(evento: Dict[str, Any]) -> str:
+    """Serializa o evento como uma linha JSON"""
+    return json.dumps(evento, ensure_ascii=False, default=str) + "\n"
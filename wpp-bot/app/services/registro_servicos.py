@@ -0,0 +1,98 @@
+"""
+Registro de Serviços - Instâncias compartilhadas no escopo da aplicação
+Cria sob demanda o AIService, o cliente Groq e as bibliotecas pesadas (OpenCV,
+NumPy, Tesseract, PIL), de modo que importar os serviços não custa a inicialização
+"""
+
+import os
+import time
+import importlib
+import threading
+import logging
+from typing import Dict, Any, Callable
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.RLock()
+_modulos: Dict[str, Any] = {}
+_instancias: Dict[str, Any] = {}
+_tempos_ms: Dict[str, float] = {}
+
+
+def importar_modulo(nome: str) -> Any:
+    """Importa um módulo pesado no primeiro uso e reaproveita nas chamadas seguintes"""
+    modulo = _modulos.get(nome)
+    if modulo is not None:
+        return modulo
+
+    with _lock:
+        if nome not in _modulos:
+            inicio = time.perf_counter()
+            _modulos[nome] = importlib.import_module(nome)
+            _tempos_ms[f"import:{nome}"] = round((time.perf_counter() - inicio) * 1000, 1)
+            logger.debug(f"Módulo {nome} carregado em {_tempos_ms[f'import:{nome}']}ms")
+        return _modulos[nome]
+
+
+def obter_instancia(nome: str, fabrica: Callable[[], Any]) -> Any:
+    """Retorna a instância registrada com o nome, criando-a uma única vez"""
+    instancia = _instancias.get(nome)
+    if instancia is not None:
+        return instancia
+
+    with _lock:
+        if nome not in _instancias:
+            inicio = time.perf_counter()
+            _instancias[nome] = fabrica()
+            _tempos_ms[nome] = round((time.perf_counter() - inicio) * 1000, 1)
+            logger.info(f"Serviço {nome} inicializado em {_tempos_ms[nome]}ms")
+        return _instancias[nome]
+
+
+def obter_groq_client():
+    """Cliente Groq único compartilhado por todos os agentes"""
+    def criar():
+        groq = importar_modulo("groq")
+        return groq.Groq(api_key=os.getenv("GROQ_API_KEY"))
+    return obter_instancia("groq_client", criar)
+
+
+def obter_ai_service():
+    """AIService único da aplicação (webhook, fluxos Bemobi e API de verificação)"""
+    def criar():
+        from .ai_service import AIService
+        return AIService()
+    return obter_instancia("ai_service", criar)
+
+
+def pre_aquecer():
+    """
+    Carrega antecipadamente as bibliotecas de OCR, o AIService e a base de fraudes
+
+    Útil para rodar em segundo plano após o startup, evitando que a primeira
+    verificação pague o custo da inicialização.
+    """
+    for nome in ("numpy", "cv2", "PIL.Image", "pytesseract"):
+        try:
+            importar_modulo(nome)
+        except ImportError as e:
+            logger.warning(f"Módulo {nome} indisponível: {e}")
+    try:
+        obter_ai_service()
+    except Exception as e:
+        logger.error(f"Erro ao pré-aquecer serviço de IA: {e}")
+    try:
+        from .base_fraudes import base_fraudes
+        base_fraudes.carregar()
+    except Exception as e:
+        logger.error(f"Erro ao carregar base de fraudes: {e}")
+
+
+def obter_estatisticas_registro() -> Dict[str, Any]:
+    """Módulos carregados, instâncias criadas e tempos de inicialização"""
+    with _lock:
+        return {
+            "modulos_carregados": sorted(_modulos),
+            "instancias": sorted(_instancias),
+            "tempos_inicializacao_ms": dict(_tempos_ms)
+        }
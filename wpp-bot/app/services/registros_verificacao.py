@@ -0,0 +1,322 @@
+"""
+Registros de Verificação - Estruturas tipadas trocadas entre os agentes
+O documento é interpretado uma única vez (valor em centavos, data ISO e nome
+normalizado) e cada agente devolve um veredito enxuto; ambos usam __slots__
+para não carregar um dicionário por instância
+"""
+
+import re
+import unicodedata
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple, Union
+
+_PADRAO_VALOR = re.compile(r"\d[\d.,]*")
+_PADRAO_DATA = re.compile(r"(\d{1,2})[/.-](\d{1,2})[/.-](\d{2,4})")
+_PADRAO_DATA_ISO = re.compile(r"(\d{4})-(\d{2})-(\d{2})")
+_PADRAO_CHAVE_ALEATORIA = re.compile(r"[0-9a-f]{8}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{4}-?[0-9a-f]{12}")
+_PADRAO_CPF_CNPJ = re.compile(r"\d{3}\.\d{3}\.\d{3}-\d{2}|\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2}")
+_PADRAO_NUMERICO = re.compile(r"[\d\s().+/-]+")
+
+# Pontuação do leitor conforme a qualidade da imagem
+CONFIANCA_QUALIDADE = {"boa": 100, "ruim": 25}
+CONFIANCA_QUALIDADE_PADRAO = 50
+
+PRIORIDADES = {"critica": 0, "alta": 1, "media": 2, "baixa": 3}
+
+
+# ===== NORMALIZAÇÃO =====
+
+def normalizar_texto(texto: str) -> str:
+    """Minúsculas, sem acentos e com espaços colapsados"""
+    texto = unicodedata.normalize("NFKD", texto or "")
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return re.sub(r"\s+", " ", texto).strip().lower()
+
+
+def extrair_valor_centavos(valor: Union[str, int, float, None]) -> Optional[int]:
+    """
+    Converte um valor monetário em centavos
+
+    Aceita "R$ 1.234,56", "1234,56", "1,234.56", "89.90" e números; o último
+    separador seguido de até dois dígitos é tratado como decimal.
+    """
+    if valor is None or isinstance(valor, bool):
+        return None
+    if isinstance(valor, (int, float)):
+        return int(round(valor * 100)) if valor >= 0 else None
+
+    match = _PADRAO_VALOR.search(str(valor))
+    if not match:
+        return None
+    numero = match.group().rstrip(".,")
+
+    separador = max(numero.rfind(","), numero.rfind("."))
+    if separador != -1 and len(numero) - separador - 1 <= 2:
+        inteiro, decimal = numero[:separador], numero[separador + 1:]
+    else:
+        inteiro, decimal = numero, ""
+
+    inteiro = re.sub(r"\D", "", inteiro) or "0"
+    return int(inteiro) * 100 + int(decimal.ljust(2, "0") or 0)
+
+
+def normalizar_data(data: Optional[str]) -> Optional[str]:
+    """Converte dd/mm/aaaa (ou aaaa-mm-dd) para ISO; None se a data for inválida"""
+    if not data:
+        return None
+    match = _PADRAO_DATA_ISO.search(data)
+    if match:
+        ano, mes, dia = (int(parte) for parte in match.groups())
+    else:
+        match = _PADRAO_DATA.search(data)
+        if not match:
+            return None
+        dia, mes, ano = (int(parte) for parte in match.groups())
+        if ano < 100:
+            ano += 2000
+    try:
+        return datetime(ano, mes, dia).date().isoformat()
+    except ValueError:
+        return None
+
+
+def cpf_valido(digitos: str) -> bool:
+    """Confere os dígitos verificadores de um CPF (só dígitos)"""
+    if len(digitos) != 11 or not digitos.isdigit() or digitos == digitos[0] * 11:
+        return False
+    for posicao in (9, 10):
+        soma = sum(int(digito) * (posicao + 1 - indice) for indice, digito in enumerate(digitos[:posicao]))
+        if soma * 10 % 11 % 10 != int(digitos[posicao]):
+            return False
+    return True
+
+
+def canonicalizar_chave_pix(valor: Optional[str]) -> str:
+    """
+    Forma canônica de uma chave PIX conforme o tipo dela
+
+    Telefone vira "+55DDNÚMERO" (o formato do DICT), CPF/CNPJ vira só dígitos,
+    chave aleatória vira o UUID em minúsculas com hífens e e-mail vira
+    minúsculas sem espaços. Onze dígitos soltos são CPF se os verificadores
+    conferem e celular sem o código do país caso contrário.
+    """
+    texto = (valor or "").strip()
+    if not texto:
+        return ""
+    if "@" in texto:
+        return re.sub(r"\s+", "", texto).lower()
+    if _PADRAO_CHAVE_ALEATORIA.fullmatch(texto.lower()):
+        hexa = texto.lower().replace("-", "")
+        return f"{hexa[:8]}-{hexa[8:12]}-{hexa[12:16]}-{hexa[16:20]}-{hexa[20:]}"
+    if not _PADRAO_NUMERICO.fullmatch(texto):
+        return normalizar_texto(texto)
+
+    digitos = re.sub(r"\D", "", texto)
+    telefone = "+" + (digitos if len(digitos) > 11 else "55" + digitos)
+    if texto.startswith("+"):
+        return "+" + digitos
+    if _PADRAO_CPF_CNPJ.fullmatch(texto) or len(digitos) == 14:
+        return digitos
+    if "(" in texto or len(digitos) in (10, 12, 13):
+        return telefone
+    if len(digitos) == 11:
+        return digitos if cpf_valido(digitos) else telefone
+    return digitos
+
+
+# Prefixo das chaves de cada tipo de identificador do meio de pagamento
+PREFIXOS_IDENTIFICADOR = {"chave_pix": "pix", "codigo_barras": "barras", "documento": "doc"}
+
+
+def chave_identificador(tipo: str, valor: Optional[str]) -> Optional[str]:
+    """
+    Chave canônica de uma chave PIX, código de barras ou CNPJ/CPF ("pix:...", "barras:...", "doc:...")
+
+    Usada pela lista de bloqueio, pelas denúncias e pelo grafo: a mesma chave
+    escrita de outro jeito precisa gerar o mesmo identificador.
+    """
+    if tipo == "chave_pix":
+        normalizado = canonicalizar_chave_pix(valor)
+    else:
+        normalizado = re.sub(r"\D", "", valor or "")
+    return f"{PREFIXOS_IDENTIFICADOR[tipo]}:{normalizado}" if normalizado else None
+
+
+def formatar_reais(centavos: int) -> str:
+    """Centavos no formato usado nas mensagens dos agentes (R$ 1234.56)"""
+    return f"R$ {centavos / 100:.2f}"
+
+
+# ===== REGISTROS =====
+
+@dataclass
+class DadosDocumento:
+    """Dados extraídos do documento, já normalizados"""
+    __slots__ = (
+        "codigo_barras", "chave_pix", "valor_texto", "valor_centavos",
+        "beneficiario", "beneficiario_normalizado", "documento_beneficiario", "data_vencimento",
+        "tipo_documento", "qualidade_imagem", "logotipo_suspeito", "fonte_suspeita"
+    )
+    codigo_barras: Optional[str]
+    chave_pix: Optional[str]
+    valor_texto: Optional[str]
+    valor_centavos: Optional[int]
+    beneficiario: Optional[str]
+    beneficiario_normalizado: str
+    # CNPJ/CPF do beneficiário, só dígitos
+    documento_beneficiario: Optional[str]
+    data_vencimento: Optional[str]
+    tipo_documento: str
+    qualidade_imagem: str
+    logotipo_suspeito: bool
+    fonte_suspeita: bool
+
+    @classmethod
+    def de_dados_extraidos(cls, dados: Dict[str, Any]) -> "DadosDocumento":
+        """Cria o registro a partir do dicionário do leitor (imagem ou texto PIX)"""
+        dados = dados or {}
+        valor_texto = dados.get("valor_cobrado") or dados.get("valor")
+        beneficiario = dados.get("nome_beneficiario") or dados.get("beneficiario")
+        codigo_barras = re.sub(r"\D", "", dados.get("codigo_barras") or "") or None
+        return cls(
+            codigo_barras=codigo_barras,
+            chave_pix=dados.get("chave_pix") or None,
+            valor_texto=valor_texto,
+            valor_centavos=extrair_valor_centavos(valor_texto),
+            beneficiario=beneficiario,
+            beneficiario_normalizado=normalizar_texto(beneficiario or ""),
+            documento_beneficiario=re.sub(r"\D", "", dados.get("documento_beneficiario") or "") or None,
+            data_vencimento=normalizar_data(dados.get("data_vencimento")),
+            tipo_documento=dados.get("tipo_documento") or "desconhecido",
+            qualidade_imagem=dados.get("qualidade_imagem") or "boa",
+            logotipo_suspeito=bool(dados.get("logotipo_suspeito")),
+            fonte_suspeita=bool(dados.get("fonte_suspeita"))
+        )
+
+    @classmethod
+    def garantir(cls, dados: Union["DadosDocumento", Dict[str, Any]]) -> "DadosDocumento":
+        """Aceita o registro pronto ou o dicionário do leitor"""
+        return dados if isinstance(dados, cls) else cls.de_dados_extraidos(dados)
+
+    def para_dict(self) -> Dict[str, Any]:
+        """Forma serializável, com os nomes de campo usados na API"""
+        return {
+            "codigo_barras": self.codigo_barras,
+            "chave_pix": self.chave_pix,
+            "valor_cobrado": self.valor_texto,
+            "valor_centavos": self.valor_centavos,
+            "nome_beneficiario": self.beneficiario,
+            "documento_beneficiario": self.documento_beneficiario,
+            "data_vencimento": self.data_vencimento,
+            "tipo_documento": self.tipo_documento,
+            "qualidade_imagem": self.qualidade_imagem,
+            "logotipo_suspeito": self.logotipo_suspeito,
+            "fonte_suspeita": self.fonte_suspeita
+        }
+
+
+@dataclass
+class Alerta:
+    """Alerta emitido por um agente"""
+    __slots__ = ("fonte", "tipo", "mensagem", "prioridade")
+    fonte: str
+    tipo: str
+    mensagem: str
+    prioridade: str
+
+    def para_dict(self) -> Dict[str, str]:
+        return {"fonte": self.fonte, "tipo": self.tipo, "mensagem": self.mensagem, "prioridade": self.prioridade}
+
+
+@dataclass
+class VereditoAgente:
+    """Contribuição de um agente para a decisão final"""
+    __slots__ = ("agente", "sucesso", "confianca", "alertas", "prazo_esgotado")
+    agente: str
+    sucesso: bool
+    confianca: float
+    alertas: Tuple[Alerta, ...]
+    prazo_esgotado: bool
+
+    @classmethod
+    def de_resultado(cls, agente: str, resultado: Dict[str, Any]) -> "VereditoAgente":
+        """Resume o resultado de um agente em confiança (0-100) e alertas"""
+        sucesso = bool(resultado.get("sucesso"))
+        confianca = 0.0
+        alertas = ()
+
+        if agente == "leitor" and sucesso:
+            qualidade = resultado.get("dados_extraidos", {}).get("qualidade_imagem", "boa")
+            confianca = CONFIANCA_QUALIDADE.get(qualidade, CONFIANCA_QUALIDADE_PADRAO)
+        elif agente == "consultor":
+            validacoes = resultado.get("validacoes", {})
+            if sucesso and validacoes:
+                confianca = sum(v.get("confiabilidade", 0) for v in validacoes.values()) / len(validacoes)
+            alertas = cls._alertas(agente, resultado.get("alertas"))
+        elif agente == "detetive":
+            if sucesso:
+                confianca = max(0, 100 - resultado.get("pontuacao_risco", 0))
+            alertas = cls._alertas(agente, resultado.get("alertas_fraude"))
+
+        return cls(
+            agente=agente,
+            sucesso=sucesso,
+            confianca=confianca,
+            alertas=alertas,
+            prazo_esgotado=bool(resultado.get("prazo_esgotado"))
+        )
+
+    @staticmethod
+    def _alertas(fonte: str, alertas) -> Tuple[Alerta, ...]:
+        return tuple(
+            Alerta(
+                fonte=fonte,
+                tipo=alerta.get("tipo", "alerta"),
+                mensagem=alerta.get("mensagem", ""),
+                prioridade=alerta.get("prioridade", "media")
+            )
+            for alerta in alertas or []
+        )
+
+
+# ===== RESUMOS PARA O RESULTADO FINAL =====
+
+def resumir_resultado_agente(agente: str, resultado: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Versão enxuta do resultado de um agente guardada no resultado final:
+    sem texto OCR, análises de IA, timestamps ou dados de cadastro
+    """
+    resumo: Dict[str, Any] = {"sucesso": bool(resultado.get("sucesso"))}
+    for campo in ("erro", "prazo_esgotado"):
+        if resultado.get(campo):
+            resumo[campo] = resultado[campo]
+
+    if agente == "leitor":
+        if "dados_extraidos" in resultado:
+            resumo["dados_extraidos"] = DadosDocumento.garantir(resultado["dados_extraidos"]).para_dict()
+    elif agente == "consultor":
+        resumo["validacoes"] = {
+            tipo: {
+                "status": validacao.get("status"),
+                "mensagem": validacao.get("mensagem"),
+                "confiabilidade": validacao.get("confiabilidade", 0),
+                # Cobrança casada com o documento, para quitá-la quando o pagamento for confirmado
+                **({"cobranca_correspondente": validacao["cobranca_correspondente"]}
+                   if validacao.get("cobranca_correspondente") else {})
+            }
+            for tipo, validacao in resultado.get("validacoes", {}).items()
+        }
+        resumo["alertas"] = resultado.get("alertas", [])
+    elif agente == "detetive":
+        resumo["pontuacao_risco"] = resultado.get("pontuacao_risco", 0)
+        resumo["analises"] = {
+            tipo: {
+                "status": analise.get("status"),
+                "mensagem": analise.get("mensagem"),
+                "risco": analise.get("risco", analise.get("risco_total", 0))
+            }
+            for tipo, analise in resultado.get("analises", {}).items()
+        }
+        resumo["alertas_fraude"] = resultado.get("alertas_fraude", [])
+    return resumo
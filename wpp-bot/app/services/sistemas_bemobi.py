@@ -0,0 +1,435 @@
+"""
+Sistemas Bemobi - Consulta de clientes, cobranças e beneficiários legítimos
+O Agente Consultor acessa os sistemas por um adaptador: o local (dados de
+exemplo em memória) ou o HTTP (API Bemobi, com pool de conexões assíncronas).
+Na frente do adaptador fica um cache com validade (TTL) que também guarda as
+respostas "não encontrado" por menos tempo, junta numa única chamada em lote
+os clientes que faltam e faz consultas simultâneas ao mesmo cliente esperarem
+a mesma requisição
+
+Adaptador HTTP (BEMOBI_API_URL definida):
+    POST {url}/clientes/consulta       {"ids": [...]}    -> {"clientes": {id: {"cliente", "cobrancas"} | null}}
+    GET  {url}/beneficiarios                             -> {"beneficiarios": {nome: {"cnpj", "status", "servicos"}}}
+    POST {url}/clientes/{id}/pagamentos {"cobranca": {...}} -> {"registrado": bool}
+"""
+
+import os
+import copy
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Iterable, Tuple, FrozenSet
+
+from app.core.exceptions import CoreException
+from .registro_servicos import importar_modulo
+from .indice_cobrancas import IndiceCobrancas
+from .registros_verificacao import chave_identificador
+
+logger = logging.getLogger(__name__)
+
+TTL_SEGUNDOS = float(os.getenv("BEMOBI_CACHE_TTL", "60"))
+# "Não encontrado" expira antes: um cliente recém-cadastrado aparece logo
+TTL_NEGATIVO_SEGUNDOS = float(os.getenv("BEMOBI_CACHE_TTL_NEGATIVO", "10"))
+TTL_BENEFICIARIOS_SEGUNDOS = float(os.getenv("BEMOBI_CACHE_TTL_BENEFICIARIOS", "300"))
+MAX_ENTRADAS_CACHE = int(os.getenv("BEMOBI_CACHE_MAX_ENTRADAS", "50000"))
+
+# Dados de exemplo do adaptador local (e do servidor simulado em utils_project)
+DADOS_EXEMPLO: Dict[str, Any] = {
+    "clientes": {
+        "12345678901": {
+            "cliente": {
+                "nome": "João Silva",
+                "servicos": ["streaming", "internet"],
+                "status": "ativo",
+                "ultimo_pagamento": "2024-11-15"
+            },
+            "cobrancas": [
+                {"valor": 89.90, "servico": "streaming", "vencimento": "2024-12-15", "status": "pendente"}
+            ]
+        },
+        "98765432100": {
+            "cliente": {
+                "nome": "Maria Santos",
+                "servicos": ["streaming"],
+                "status": "ativo",
+                "ultimo_pagamento": "2024-11-10"
+            },
+            "cobrancas": [
+                {"valor": 89.90, "servico": "streaming", "vencimento": "2024-12-10", "status": "pendente"}
+            ]
+        }
+    },
+    "beneficiarios": {
+        "Bemobi Tecnologia": {"cnpj": "12.345.678/0001-90", "status": "ativo", "servicos": ["streaming", "internet"]},
+        "Bemobi Streaming": {"cnpj": "98.765.432/0001-10", "status": "ativo", "servicos": ["streaming"]}
+    }
+}
+
+
+class SistemaBemobiIndisponivelException(CoreException):
+    """Falha ao consultar os sistemas Bemobi"""
+    pass
+
+
+def marcar_paga(ficha: Optional[Dict[str, Any]], cobranca: Dict[str, Any]) -> bool:
+    """Marca como paga a cobrança pendente da ficha com o mesmo id (ou os mesmos dados); False se não há"""
+    for item in (ficha or {}).get("cobrancas", []):
+        if item.get("status", "pendente") != "pendente":
+            continue
+        if (str(item["id"]) == str(cobranca["id"])) if cobranca.get("id") is not None else item == cobranca:
+            item["status"] = "paga"
+            return True
+    return False
+
+
+# ===== ADAPTADORES =====
+
+class AdaptadorBemobi:
+    """Interface dos adaptadores: consultas em lote de clientes e catálogo de beneficiários"""
+
+    nome = "base"
+
+    async def buscar_clientes(self, ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Ficha ({"cliente", "cobrancas"}) de cada id; None para cliente inexistente"""
+        raise NotImplementedError
+
+    async def listar_beneficiarios(self) -> Dict[str, Dict[str, Any]]:
+        """Beneficiários legítimos por nome"""
+        raise NotImplementedError
+
+    async def informar_pagamento(self, id_cliente: str, cobranca: Dict[str, Any]) -> bool:
+        """Informa ao sistema de origem que a cobrança foi paga; False se ela não foi encontrada"""
+        raise NotImplementedError
+
+    async def fechar(self):
+        pass
+
+
+class AdaptadorLocal(AdaptadorBemobi):
+    """Dados em memória, para desenvolvimento e testes"""
+
+    nome = "local"
+
+    def __init__(self, dados: Optional[Dict[str, Any]] = None):
+        # Cópia dos dados de exemplo: pagamentos informados alteram as cobranças
+        self.dados = dados if dados is not None else copy.deepcopy(DADOS_EXEMPLO)
+
+    async def buscar_clientes(self, ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        clientes = self.dados.get("clientes", {})
+        return {id_cliente: copy.deepcopy(clientes.get(id_cliente)) for id_cliente in ids}
+
+    async def listar_beneficiarios(self) -> Dict[str, Dict[str, Any]]:
+        return copy.deepcopy(self.dados.get("beneficiarios", {}))
+
+    async def informar_pagamento(self, id_cliente: str, cobranca: Dict[str, Any]) -> bool:
+        return marcar_paga(self.dados.get("clientes", {}).get(str(id_cliente)), cobranca)
+
+
+class AdaptadorHTTP(AdaptadorBemobi):
+    """API Bemobi por HTTP, com conexões reaproveitadas entre as consultas"""
+
+    nome = "http"
+
+    def __init__(self, url_base: str, token: Optional[str] = None,
+                 timeout: float = 2.0, max_conexoes: int = 20):
+        self.url_base = url_base.rstrip("/")
+        self.token = token
+        self.timeout = timeout
+        self.max_conexoes = max_conexoes
+        self._cliente = None
+        self._loop_cliente = None
+
+    def _obter_cliente(self):
+        """Cliente httpx do loop atual (o pool de conexões pertence a um loop)"""
+        loop = asyncio.get_event_loop()
+        if self._cliente is None or self._loop_cliente is not loop:
+            httpx = importar_modulo("httpx")
+            self._cliente = httpx.AsyncClient(
+                base_url=self.url_base,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_conexoes,
+                                    max_keepalive_connections=self.max_conexoes),
+                headers={"Authorization": f"Bearer {self.token}"} if self.token else None
+            )
+            self._loop_cliente = loop
+        return self._cliente
+
+    async def _requisitar(self, metodo: str, caminho: str, **kwargs) -> Dict[str, Any]:
+        try:
+            resposta = await self._obter_cliente().request(metodo, caminho, **kwargs)
+            resposta.raise_for_status()
+            return resposta.json()
+        except Exception as e:
+            raise SistemaBemobiIndisponivelException(f"{metodo} {caminho} falhou: {e}")
+
+    async def buscar_clientes(self, ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        dados = await self._requisitar("POST", "/clientes/consulta", json={"ids": ids})
+        clientes = dados.get("clientes", {})
+        return {id_cliente: clientes.get(id_cliente) for id_cliente in ids}
+
+    async def listar_beneficiarios(self) -> Dict[str, Dict[str, Any]]:
+        dados = await self._requisitar("GET", "/beneficiarios")
+        return dados.get("beneficiarios", {})
+
+    async def informar_pagamento(self, id_cliente: str, cobranca: Dict[str, Any]) -> bool:
+        dados = await self._requisitar("POST", f"/clientes/{id_cliente}/pagamentos", json={"cobranca": cobranca})
+        return bool(dados.get("registrado"))
+
+    async def fechar(self):
+        if self._cliente is not None:
+            await self._cliente.aclose()
+            self._cliente = None
+
+
+def criar_adaptador() -> AdaptadorBemobi:
+    """Adaptador HTTP se BEMOBI_API_URL estiver definida; senão o local"""
+    url = os.getenv("BEMOBI_API_URL")
+    if url:
+        return AdaptadorHTTP(
+            url,
+            token=os.getenv("BEMOBI_API_TOKEN"),
+            timeout=float(os.getenv("BEMOBI_API_TIMEOUT", "2")),
+            max_conexoes=int(os.getenv("BEMOBI_API_MAX_CONEXOES", "20"))
+        )
+    return AdaptadorLocal()
+
+
+# ===== CACHE =====
+
+class SistemasBemobi:
+    def __init__(self, adaptador: Optional[AdaptadorBemobi] = None):
+        self._adaptador = adaptador
+        self._cache: "OrderedDict[str, Tuple[float, Optional[Dict[str, Any]]]]" = OrderedDict()
+        self._em_andamento: Dict[str, asyncio.Future] = {}
+        # Índice das cobranças de cada ficha em cache, construído no primeiro uso
+        self._indices: Dict[str, Tuple[Dict[str, Any], IndiceCobrancas]] = {}
+        self._beneficiarios: Optional[Tuple[float, Dict[str, Dict[str, Any]]]] = None
+        self._beneficiarios_em_andamento: Optional[asyncio.Future] = None
+        # Identificadores derivados do catálogo, recalculados quando ele é renovado
+        self._legitimos: Optional[Tuple[Dict[str, Dict[str, Any]], FrozenSet[str]]] = None
+        self.estatisticas = {
+            "acertos": 0, "acertos_negativos": 0, "faltas": 0, "coalescidas": 0,
+            "chamadas_adaptador": 0, "erros": 0
+        }
+
+    @property
+    def adaptador(self) -> AdaptadorBemobi:
+        if self._adaptador is None:
+            self._adaptador = criar_adaptador()
+            logger.info(f"Sistemas Bemobi: adaptador {self._adaptador.nome}")
+        return self._adaptador
+
+    def _do_cache(self, id_cliente: str, agora: float):
+        """(encontrado, ficha) se a entrada ainda vale"""
+        entrada = self._cache.get(id_cliente)
+        if entrada is None:
+            return False, None
+        expira_em, ficha = entrada
+        if agora >= expira_em:
+            del self._cache[id_cliente]
+            self._indices.pop(id_cliente, None)
+            return False, None
+        self._cache.move_to_end(id_cliente)
+        return True, ficha
+
+    def _guardar(self, id_cliente: str, ficha: Optional[Dict[str, Any]], agora: float):
+        ttl = TTL_SEGUNDOS if ficha is not None else TTL_NEGATIVO_SEGUNDOS
+        self._cache[id_cliente] = (agora + ttl, ficha)
+        self._cache.move_to_end(id_cliente)
+        self._indices.pop(id_cliente, None)
+        while len(self._cache) > MAX_ENTRADAS_CACHE:
+            removido, _ = self._cache.popitem(last=False)
+            self._indices.pop(removido, None)
+
+    @staticmethod
+    def _compartilhavel(futuro: asyncio.Future) -> bool:
+        """Só espera requisições do mesmo loop de eventos"""
+        return futuro.get_loop() is asyncio.get_event_loop()
+
+    async def obter_clientes(self, ids: Iterable[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Fichas dos clientes ({"cliente", "cobrancas"}; None se não existe), numa única chamada ao adaptador
+
+        Raises:
+            SistemaBemobiIndisponivelException: o adaptador falhou para clientes fora do cache
+        """
+        agora = time.monotonic()
+        resultado: Dict[str, Optional[Dict[str, Any]]] = {}
+        aguardando: Dict[str, asyncio.Future] = {}
+        faltantes: List[str] = []
+        for id_cliente in dict.fromkeys(str(i) for i in ids):
+            encontrado, ficha = self._do_cache(id_cliente, agora)
+            if encontrado:
+                self.estatisticas["acertos" if ficha is not None else "acertos_negativos"] += 1
+                resultado[id_cliente] = ficha
+                continue
+            futuro = self._em_andamento.get(id_cliente)
+            if futuro is not None and self._compartilhavel(futuro):
+                self.estatisticas["coalescidas"] += 1
+                aguardando[id_cliente] = futuro
+            else:
+                self.estatisticas["faltas"] += 1
+                faltantes.append(id_cliente)
+
+        if faltantes:
+            loop = asyncio.get_event_loop()
+            futuros = {id_cliente: loop.create_future() for id_cliente in faltantes}
+            self._em_andamento.update(futuros)
+            try:
+                self.estatisticas["chamadas_adaptador"] += 1
+                fichas = await self.adaptador.buscar_clientes(faltantes)
+                agora = time.monotonic()
+                for id_cliente in faltantes:
+                    ficha = fichas.get(id_cliente)
+                    self._guardar(id_cliente, ficha, agora)
+                    resultado[id_cliente] = ficha
+                    futuros[id_cliente].set_result(ficha)
+            except asyncio.CancelledError:
+                # Quem estava esperando esta consulta não fica pendurado
+                for futuro in futuros.values():
+                    futuro.cancel()
+                raise
+            except Exception as e:
+                self.estatisticas["erros"] += 1
+                erro = e if isinstance(e, SistemaBemobiIndisponivelException) else \
+                    SistemaBemobiIndisponivelException(f"Consulta de clientes falhou: {e}")
+                for futuro in futuros.values():
+                    if not futuro.done():
+                        futuro.set_exception(erro)
+                        # Quem não estiver esperando não gera aviso de exceção não lida
+                        futuro.exception()
+                raise erro
+            finally:
+                for id_cliente, futuro in futuros.items():
+                    if self._em_andamento.get(id_cliente) is futuro:
+                        del self._em_andamento[id_cliente]
+
+        for id_cliente, futuro in aguardando.items():
+            resultado[id_cliente] = await asyncio.shield(futuro)
+        return resultado
+
+    async def obter_cliente(self, id_cliente: str) -> Optional[Dict[str, Any]]:
+        """Ficha de um cliente ({"cliente", "cobrancas"}) ou None"""
+        return (await self.obter_clientes([id_cliente]))[str(id_cliente)]
+
+    async def listar_beneficiarios(self) -> Dict[str, Dict[str, Any]]:
+        """Catálogo de beneficiários legítimos, renovado a cada BEMOBI_CACHE_TTL_BENEFICIARIOS"""
+        agora = time.monotonic()
+        if self._beneficiarios is not None and agora < self._beneficiarios[0]:
+            return self._beneficiarios[1]
+        futuro = self._beneficiarios_em_andamento
+        if futuro is not None and self._compartilhavel(futuro):
+            self.estatisticas["coalescidas"] += 1
+            return await asyncio.shield(futuro)
+
+        futuro = self._beneficiarios_em_andamento = asyncio.get_event_loop().create_future()
+        try:
+            self.estatisticas["chamadas_adaptador"] += 1
+            beneficiarios = await self.adaptador.listar_beneficiarios()
+            self._beneficiarios = (time.monotonic() + TTL_BENEFICIARIOS_SEGUNDOS, beneficiarios)
+            futuro.set_result(beneficiarios)
+            return beneficiarios
+        except asyncio.CancelledError:
+            futuro.cancel()
+            raise
+        except Exception as e:
+            self.estatisticas["erros"] += 1
+            if self._beneficiarios is not None:
+                # Catálogo vencido é melhor que nenhum: os beneficiários mudam pouco
+                logger.warning(f"Sistemas Bemobi: usando catálogo de beneficiários vencido - {e}")
+                futuro.set_result(self._beneficiarios[1])
+                return self._beneficiarios[1]
+            erro = e if isinstance(e, SistemaBemobiIndisponivelException) else \
+                SistemaBemobiIndisponivelException(f"Consulta de beneficiários falhou: {e}")
+            futuro.set_exception(erro)
+            futuro.exception()
+            raise erro
+        finally:
+            if self._beneficiarios_em_andamento is futuro:
+                self._beneficiarios_em_andamento = None
+
+    async def identificadores_legitimos(self) -> FrozenSet[str]:
+        """Chaves ("doc:...", "pix:...") dos beneficiários do catálogo; vazio se os sistemas estão indisponíveis"""
+        try:
+            beneficiarios = await self.listar_beneficiarios()
+        except SistemaBemobiIndisponivelException:
+            return frozenset()
+        if self._legitimos is None or self._legitimos[0] is not beneficiarios:
+            chaves = set()
+            for dados in beneficiarios.values():
+                for campo in ("cnpj", "cpf", "documento"):
+                    chaves.add(chave_identificador("documento", dados.get(campo)))
+                pix = dados.get("chaves_pix") or [dados.get("chave_pix")]
+                for chave_pix in pix:
+                    chaves.add(chave_identificador("chave_pix", chave_pix))
+            chaves.discard(None)
+            self._legitimos = (beneficiarios, frozenset(chaves))
+        return self._legitimos[1]
+
+    # ===== COBRANÇAS =====
+
+    def indice_cobrancas(self, id_cliente: str, ficha: Optional[Dict[str, Any]]) -> IndiceCobrancas:
+        """Índice das cobranças pendentes da ficha, construído uma vez por versão da ficha"""
+        id_cliente = str(id_cliente)
+        entrada = self._indices.get(id_cliente)
+        if entrada is None or entrada[0] is not ficha:
+            entrada = (ficha, IndiceCobrancas((ficha or {}).get("cobrancas")))
+            if ficha is not None and id_cliente in self._cache:
+                self._indices[id_cliente] = entrada
+        return entrada[1]
+
+    async def fechar_cobranca(self, id_cliente: str, cobranca: Dict[str, Any]) -> bool:
+        """
+        Informa o pagamento de uma cobrança aos sistemas Bemobi; False se não foi registrado
+
+        Registrado no sistema de origem, a ficha em cache é descartada e a
+        próxima consulta já não traz a cobrança. Se o sistema não responde, ela
+        sai só da ficha em cache deste processo, até a ficha expirar.
+        """
+        try:
+            registrado = await self.adaptador.informar_pagamento(str(id_cliente), cobranca)
+        except Exception as e:
+            self.estatisticas["erros"] += 1
+            logger.warning(f"Sistemas Bemobi: pagamento do cliente {id_cliente} não registrado - {e}")
+            return self._retirar_do_cache(id_cliente, cobranca)
+        self.invalidar(id_cliente)
+        return registrado
+
+    def _retirar_do_cache(self, id_cliente: str, cobranca: Dict[str, Any]) -> bool:
+        """Retira da ficha em cache (e do índice dela) uma cobrança paga, pelo id ou por uma cópia dela"""
+        encontrado, ficha = self._do_cache(str(id_cliente), time.monotonic())
+        if not encontrado or ficha is None:
+            return False
+        removida = self.indice_cobrancas(id_cliente, ficha).fechar(cobranca=cobranca)
+        if removida is None:
+            return False
+        ficha["cobrancas"] = [item for item in ficha.get("cobrancas", []) if item is not removida]
+        return True
+
+    def invalidar(self, id_cliente: Optional[str] = None):
+        """Descarta a ficha de um cliente (ou todo o cache)"""
+        if id_cliente is None:
+            self._cache.clear()
+            self._indices.clear()
+            self._beneficiarios = None
+        else:
+            self._cache.pop(str(id_cliente), None)
+            self._indices.pop(str(id_cliente), None)
+
+    async def fechar(self):
+        """Encerra as conexões do adaptador"""
+        if self._adaptador is not None:
+            await self._adaptador.fechar()
+
+    def obter_estatisticas(self) -> Dict[str, Any]:
+        """Adaptador em uso, acertos e faltas do cache e chamadas ao adaptador"""
+        return {
+            **self.estatisticas,
+            "adaptador": self.adaptador.nome,
+            "entradas_cache": len(self._cache)
+        }
+
+
+# Instância global compartilhada pelo Agente Consultor
+sistemas_bemobi = SistemasBemobi()
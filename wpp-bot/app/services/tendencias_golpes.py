@@ -0,0 +1,241 @@
+"""
+Tendências de Golpes - Velocidade de verificações por chave PIX, boleto e CNPJ
+Uma chave PIX ou boleto recém-usado num golpe recebe muitas verificações de
+usuários diferentes em poucos minutos. Contadores count-min em janela
+deslizante (uma fatia por intervalo, somadas num total) estimam quantos
+usuários distintos verificaram cada identificador na janela, em memória fixa,
+e um rastreador dos mais frequentes lista as chaves em alta
+
+Beneficiário e valor entram só na listagem: milhares de clientes verificam
+boletos verdadeiros da mesma empresa, com o mesmo valor, no mesmo dia
+"""
+
+import os
+import time
+import hashlib
+import threading
+import logging
+from array import array
+from typing import Dict, Any, Optional, List
+
+from .registros_verificacao import DadosDocumento
+from .registro_servicos import importar_modulo
+
+logger = logging.getLogger(__name__)
+
+JANELA_SEGUNDOS = float(os.getenv("TENDENCIA_JANELA_SEGUNDOS", "600"))
+FATIAS_JANELA = int(os.getenv("TENDENCIA_FATIAS", "10"))
+LARGURA_ESBOCO = int(os.getenv("TENDENCIA_LARGURA", "4096"))
+PROFUNDIDADE_ESBOCO = int(os.getenv("TENDENCIA_PROFUNDIDADE", "4"))
+MAX_EM_ALTA = int(os.getenv("TENDENCIA_MAX_EM_ALTA", "50"))
+# Usuários distintos na janela para uma chave ser considerada em alta
+MIN_USUARIOS = int(os.getenv("TENDENCIA_MIN_USUARIOS", "5"))
+
+_MASCARA_64 = (1 << 64) - 1
+
+# Segredo dos pseudônimos da listagem (aleatório por processo, se não configurado)
+_SEGREDO_PSEUDONIMO = (os.getenv("TENDENCIA_SEGREDO_PSEUDONIMO", "").encode("utf-8") or os.urandom(16))[:64]
+
+# Risco por identificador do meio de pagamento: (a partir de MIN_USUARIOS, a partir do dobro)
+RISCO_POR_TIPO = {
+    "chave_pix": (70, 90),
+    "codigo_barras": (70, 90),
+    "documento": (60, 80)
+}
+DESCRICOES = {
+    "chave_pix": "a mesma chave PIX",
+    "codigo_barras": "o mesmo código de barras",
+    "documento": "o mesmo CNPJ/CPF"
+}
+
+
+def mascarar_chave(chave: str) -> str:
+    """
+    Tipo do identificador e um pseudônimo do valor (o valor cobrado segue legível)
+
+    Chaves PIX, CPFs e nomes não saem em listagens públicas; o hash tem segredo
+    para não ser revertido por força bruta sobre os CPFs ou telefones possíveis.
+    """
+    prefixo, _, valor = chave.partition(":")
+    if prefixo == "valor":
+        return chave
+    return f"{prefixo}:{hashlib.blake2b(valor.encode('utf-8'), digest_size=6, key=_SEGREDO_PSEUDONIMO).hexdigest()}"
+
+
+class _EsbocoJanela:
+    """Count-min em janela deslizante: uma fatia por intervalo e um total somado"""
+
+    def __init__(self, largura: int, profundidade: int, fatias: int, segundos_fatia: float):
+        self.largura = largura
+        self.profundidade = profundidade
+        self.segundos_fatia = segundos_fatia
+        tamanho = largura * profundidade
+        self.fatias = [array("I", bytes(4 * tamanho)) for _ in range(fatias)]
+        self.total = array("I", bytes(4 * tamanho))
+        self.fatia_atual = int(time.monotonic() // segundos_fatia)
+
+    def _colunas(self, chave) -> List[int]:
+        valor = hash(chave) & _MASCARA_64
+        h1 = valor & 0xFFFFFFFF
+        h2 = (valor >> 32) | 1
+        return [linha * self.largura + (h1 + linha * h2) % self.largura for linha in range(self.profundidade)]
+
+    def avancar(self, agora: float) -> bool:
+        """Descarta as fatias que saíram da janela; True se alguma foi descartada"""
+        fatia = int(agora // self.segundos_fatia)
+        if fatia == self.fatia_atual:
+            return False
+        # Subtração vetorizada sobre os mesmos buffers: o lock do monitor fica
+        # preso microssegundos por fatia, não um laço por contador
+        np = importar_modulo("numpy")
+        total = np.frombuffer(self.total, dtype=np.uint32)
+        if fatia - self.fatia_atual >= len(self.fatias):
+            for contadores in self.fatias:
+                np.frombuffer(contadores, dtype=np.uint32).fill(0)
+            total.fill(0)
+        else:
+            for expirada in range(self.fatia_atual + 1, fatia + 1):
+                contadores = np.frombuffer(self.fatias[expirada % len(self.fatias)], dtype=np.uint32)
+                total -= contadores
+                contadores.fill(0)
+        self.fatia_atual = fatia
+        return True
+
+    def adicionar(self, chave) -> int:
+        """Conta a chave na fatia atual e retorna a nova estimativa na janela"""
+        fatia = self.fatias[self.fatia_atual % len(self.fatias)]
+        estimativa = None
+        for coluna in self._colunas(chave):
+            fatia[coluna] += 1
+            self.total[coluna] += 1
+            if estimativa is None or self.total[coluna] < estimativa:
+                estimativa = self.total[coluna]
+        return estimativa
+
+    def estimar(self, chave) -> int:
+        """Estimativa (nunca abaixo do real) de ocorrências na janela"""
+        return min(self.total[coluna] for coluna in self._colunas(chave))
+
+
+class MonitorTendencias:
+    def __init__(self,
+                 janela_segundos: float = JANELA_SEGUNDOS,
+                 fatias: int = FATIAS_JANELA,
+                 largura: int = LARGURA_ESBOCO,
+                 profundidade: int = PROFUNDIDADE_ESBOCO,
+                 max_em_alta: int = MAX_EM_ALTA):
+        segundos_fatia = janela_segundos / fatias
+        self.janela_segundos = janela_segundos
+        # Pares (chave, usuário) já vistos e usuários distintos por chave
+        self._pares = _EsbocoJanela(largura * 2, profundidade, fatias, segundos_fatia)
+        self._usuarios = _EsbocoJanela(largura, profundidade, fatias, segundos_fatia)
+        self.max_em_alta = max_em_alta
+        self._em_alta: Dict[str, int] = {}
+        self._minimo_em_alta = 0
+        self._lock = threading.Lock()
+        self.estatisticas = {"observacoes": 0}
+
+    @staticmethod
+    def chaves_documento(documento: DadosDocumento, chaves: Dict[str, str]) -> Dict[str, str]:
+        """
+        Identificadores acompanhados: os do meio de pagamento e, só para a listagem, o beneficiário e o valor
+
+        As chaves recebidas já vêm sem os identificadores dos beneficiários do
+        catálogo Bemobi (chaves_denuncia), que boletos verdadeiros repetem.
+        """
+        acompanhadas = dict(chaves)
+        if documento.beneficiario_normalizado:
+            acompanhadas["beneficiario"] = f"benef:{documento.beneficiario_normalizado}"
+        if documento.valor_centavos:
+            acompanhadas["valor"] = f"valor:{documento.valor_centavos}"
+        return acompanhadas
+
+    def registrar(self, chaves: Dict[str, str], user_id: Optional[str]) -> Dict[str, int]:
+        """
+        Conta a verificação e retorna os usuários distintos na janela por tipo de identificador
+
+        Cada usuário conta uma vez por chave na janela, por mais que repita a verificação.
+        """
+        agora = time.monotonic()
+        usuarios_por_tipo = {}
+        with self._lock:
+            if self._pares.avancar(agora) | self._usuarios.avancar(agora):
+                self._atualizar_em_alta()
+            for tipo, chave in chaves.items():
+                par = (chave, user_id)
+                if self._pares.estimar(par):
+                    usuarios = self._usuarios.estimar(chave)
+                else:
+                    self._pares.adicionar(par)
+                    usuarios = self._usuarios.adicionar(chave)
+                    self._acompanhar(chave, usuarios)
+                usuarios_por_tipo[tipo] = usuarios
+            self.estatisticas["observacoes"] += 1
+        return usuarios_por_tipo
+
+    def _acompanhar(self, chave: str, usuarios: int):
+        """Mantém as chaves com mais usuários (substitui a menor quando cheio)"""
+        if chave in self._em_alta or len(self._em_alta) < self.max_em_alta:
+            self._em_alta[chave] = usuarios
+        elif usuarios > self._minimo_em_alta:
+            menor = min(self._em_alta, key=self._em_alta.__getitem__)
+            del self._em_alta[menor]
+            self._em_alta[chave] = usuarios
+            self._minimo_em_alta = min(self._em_alta.values())
+
+    def _atualizar_em_alta(self):
+        """Reestima as chaves acompanhadas após a janela deslizar"""
+        for chave in list(self._em_alta):
+            usuarios = self._usuarios.estimar(chave)
+            if usuarios:
+                self._em_alta[chave] = usuarios
+            else:
+                del self._em_alta[chave]
+        self._minimo_em_alta = min(self._em_alta.values()) if self._em_alta else 0
+
+    def avaliar(self, usuarios_por_tipo: Dict[str, int]) -> Dict[str, Any]:
+        """Sinal de risco pela velocidade dos identificadores do documento"""
+        em_alta = {
+            tipo: usuarios for tipo, usuarios in usuarios_por_tipo.items()
+            if usuarios >= MIN_USUARIOS and tipo in RISCO_POR_TIPO
+        }
+        if not em_alta:
+            return {
+                "status": "sem_tendencia",
+                "mensagem": "Nenhum identificador em alta",
+                "risco": 0
+            }
+        risco, tipo = max(
+            (RISCO_POR_TIPO[tipo][1 if usuarios >= 2 * MIN_USUARIOS else 0], tipo)
+            for tipo, usuarios in em_alta.items()
+        )
+        minutos = round(self.janela_segundos / 60)
+        return {
+            "status": "identificador_em_alta",
+            "mensagem": f"{em_alta[tipo]} usuários verificaram {DESCRICOES[tipo]} nos últimos {minutos} minutos",
+            "risco": risco,
+            "usuarios_na_janela": em_alta
+        }
+
+    def listar_em_alta(self, limite: int = 20, mascarar: bool = True) -> List[Dict[str, Any]]:
+        """Chaves com mais usuários distintos na janela atual (por padrão, com o identificador mascarado)"""
+        with self._lock:
+            if self._pares.avancar(time.monotonic()) | self._usuarios.avancar(time.monotonic()):
+                self._atualizar_em_alta()
+            ordenadas = sorted(self._em_alta.items(), key=lambda item: item[1], reverse=True)[:limite]
+        return [
+            {"chave": mascarar_chave(chave) if mascarar else chave, "usuarios_na_janela": usuarios, "em_alta": usuarios >= MIN_USUARIOS}
+            for chave, usuarios in ordenadas
+        ]
+
+    def obter_estatisticas(self) -> Dict[str, Any]:
+        """Janela, observações e chaves em alta"""
+        return {
+            "janela_segundos": self.janela_segundos,
+            "observacoes": self.estatisticas["observacoes"],
+            "em_alta": self.listar_em_alta(10)
+        }
+
+
+# Instância global compartilhada pelo Agente Detetive (contagem por processo)
+monitor_tendencias = MonitorTendencias()
@@ -7,6 +7,7 @@ from contextlib import asynccontextmanager
 from pathlib import Path
 import datetime
 import platform
+import threading
 import logging
 
 # Filtrar avisos específicos do Pydantic
@@ -25,6 +26,11 @@ from app.api.exceptions import add_exception_handlers
 from app.services.logger import setup_logging, format_whatsapp_message
 from app.utils.logging_middleware import add_logging_middleware
 from app.utils.metrics import metrics, start_metrics_logging
+from app.services.registro_servicos import pre_aquecer
+from app.services.denuncias_fraude import armazem_denuncias
+from app.services.tendencias_golpes import monitor_tendencias
+from app.services.sistemas_bemobi import sistemas_bemobi
+from app.services.envios_agendados import envios_agendados
 from sqlalchemy.orm import Session
 
 # Configuração aprimorada de logging
@@ -63,6 +69,11 @@ async def lifespan(app: FastAPI):
     monitor_thread = start_metrics_logging(interval_minutes=30)
     logger.info(format_whatsapp_message("info", "Monitoramento de métricas iniciado"))
     
+    # Serviços de IA são criados no primeiro uso; opcionalmente pré-aquecer em segundo plano
+    if os.getenv("IA_PRE_AQUECER", "false").lower() == "true":
+        threading.Thread(target=pre_aquecer, name="pre-aquecer-ia", daemon=True).start()
+        logger.info(format_whatsapp_message("info", "Pré-aquecimento dos serviços de IA iniciado"))
+    
     # Registrar a aplicação React
     if REACT_APP_DIR.exists():
         logger.info(format_whatsapp_message("success", f"Aplicação React registrada em /flow-manager"))
@@ -70,6 +81,15 @@ async def lifespan(app: FastAPI):
     logger.info(format_whatsapp_message("success", "Aplicação inicializada com sucesso"))
     yield
     logger.info(format_whatsapp_message("info", "Encerrando a aplicação"))
+    
+    # Gravar denúncias de fraude ainda na fila do lote
+    armazem_denuncias.descarregar()
+    
+    # Encerrar o pool de conexões com os sistemas Bemobi
+    await sistemas_bemobi.fechar()
+    
+    # Parar o relógio dos envios agendados
+    await envios_agendados.fechar()
 
 
 # Criar aplicação FastAPI
@@ -161,7 +181,11 @@ async def get_metrics(detailed: bool = False):
     """
     Endpoint para obter métricas da aplicação
     """
-    return metrics.get_summary(detailed=detailed)
+    return {
+        **metrics.get_summary(detailed=detailed),
+        # Endpoint sem autenticação: identificadores só mascarados
+        "tendencias_golpes": monitor_tendencias.listar_em_alta(mascarar=True)
+    }
 
 
 def display_startup_banner():
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Backtest da Pontuação de Risco
+
+Recalcula, sobre as verificações já gravadas no armazém, a pontuação de
+confiança do orquestrador e o risco do detetive para muitas combinações de
+pesos e limiares de status, e mede precisão e recall de cada uma. As
+características de cada verificação (confiança do leitor e do consultor,
+risco de cada análise do detetive, agentes que falharam ou estouraram o prazo)
+são carregadas uma vez em arrays NumPy; cada combinação de pesos vira uma
+multiplicação de matrizes, e como a pontuação é inteira (0-100), um
+histograma por combinação dá o resultado de todos os limiares de uma vez.
+
+O armazém guarda só o histórico recente: a cada gravação ele descarta os
+resultados com mais de VERIFICACAO_ARMAZEM_TTL_SEGUNDOS (24h) e mantém até
+VERIFICACAO_ARMAZEM_MAX_POR_USUARIO (20) por usuário
+(ArmazemVerificacoes._podar). Para um backtest representativo, use uma cópia
+do banco acumulada com limites maiores ou rode sobre vários instantâneos.
+
+Rótulos (golpe ou não) vêm de um CSV (id_verificacao,golpe) ou, na falta dele,
+das denúncias dos usuários: verificações cuja chave PIX, código de barras ou
+CNPJ/CPF foi denunciado. Nesse caso as análises que já usam as denúncias
+(denuncias, rede) vazam o rótulo e devem ser ignoradas com --ignorar.
+
+Uso:
+    python utils_project/backtest_pontuacao.py --ignorar denuncias,rede
+    python utils_project/backtest_pontuacao.py --rotulos rotulos.csv --top 20 --saida resultados.csv
+    python utils_project/backtest_pontuacao.py --sintetico 200000
+"""
+
+import sys
+import csv
+import json
+import time
+import sqlite3
+import argparse
+import itertools
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+RAIZ_PROJETO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ_PROJETO))
+
+# Import direto dos módulos, sem o __init__ do pacote de serviços
+import types
+
+_pacote = types.ModuleType("app.services")
+_pacote.__path__ = [str(RAIZ_PROJETO / "app" / "services")]
+sys.modules.setdefault("app.services", _pacote)
+
+from app.services.agente_orquestrador import AgenteOrquestrador  # noqa: E402
+from app.services.armazem_verificacoes import CAMINHO_PADRAO as CAMINHO_ARMAZEM  # noqa: E402
+from app.services.denuncias_fraude import ArmazemDenuncias, chaves_denuncia, TIPOS_INSTRUMENTO  # noqa: E402
+from app.services.motor_regras import motor_regras  # noqa: E402
+from app.services.registros_verificacao import VereditoAgente  # noqa: E402
+
+AGENTES = ("leitor", "consultor", "detetive")
+# Multiplicadores aplicados a um peso do detetive por vez
+VARIACOES_PESO = (0.0, 0.5, 1.5, 2.0)
+
+
+# ===== CARGA =====
+
+def carregar_verificacoes(caminho: Path) -> List[Dict[str, Any]]:
+    """Resultados gravados no armazém de verificações (somente leitura)"""
+    conexao = sqlite3.connect(f"file:{caminho}?mode=ro", uri=True)
+    try:
+        linhas = conexao.execute("SELECT id, resultado FROM verificacoes").fetchall()
+    finally:
+        conexao.close()
+    verificacoes = []
+    for id_verificacao, conteudo in linhas:
+        resultado = json.loads(conteudo)
+        if resultado.get("resultados_agentes"):
+            resultado["id_verificacao"] = id_verificacao
+            verificacoes.append(resultado)
+    return verificacoes
+
+
+def rotular_por_csv(verificacoes: List[Dict[str, Any]], caminho: Path) -> np.ndarray:
+    with open(caminho, encoding="utf-8", newline="") as arquivo:
+        rotulos = {linha["id_verificacao"]: linha["golpe"].strip() in ("1", "true", "sim") for linha in csv.DictReader(arquivo)}
+    return np.array([rotulos.get(v["id_verificacao"], False) for v in verificacoes], dtype=bool)
+
+
+def rotular_por_denuncias(verificacoes: List[Dict[str, Any]], caminho: Optional[str]) -> np.ndarray:
+    """Golpe = algum identificador do meio de pagamento denunciado"""
+    denuncias = ArmazemDenuncias(caminho)
+    rotulos = []
+    for verificacao in verificacoes:
+        dados = verificacao["resultados_agentes"].get("leitor", {}).get("dados_extraidos", {})
+        chaves = {tipo: chave for tipo, chave in chaves_denuncia(dados).items() if tipo in TIPOS_INSTRUMENTO}
+        rotulos.append(bool(denuncias.consultar(chaves)["contagens"]))
+    return np.array(rotulos, dtype=bool)
+
+
+def extrair_caracteristicas(verificacoes: List[Dict[str, Any]], analises: List[str]) -> Dict[str, np.ndarray]:
+    """Arrays (uma linha por verificação) com tudo que a pontuação usa"""
+    total = len(verificacoes)
+    confianca = np.zeros((total, 2))
+    sucesso = np.zeros((total, 3), dtype=bool)
+    prazo_esgotado = np.zeros((total, 3), dtype=bool)
+    riscos = np.zeros((total, len(analises)))
+    coluna = {nome: indice for indice, nome in enumerate(analises)}
+
+    for linha, verificacao in enumerate(verificacoes):
+        agentes = verificacao["resultados_agentes"]
+        for indice, agente in enumerate(AGENTES):
+            veredito = VereditoAgente.de_resultado(agente, agentes.get(agente, {}))
+            sucesso[linha, indice] = veredito.sucesso
+            prazo_esgotado[linha, indice] = veredito.prazo_esgotado
+            if indice < 2:
+                confianca[linha, indice] = veredito.confianca
+        for nome, analise in agentes.get("detetive", {}).get("analises", {}).items():
+            if nome in coluna:
+                riscos[linha, coluna[nome]] = analise.get("risco", 0) or 0
+
+    return {"confianca": confianca, "sucesso": sucesso, "prazo_esgotado": prazo_esgotado, "riscos": riscos}
+
+
+def gerar_sinteticas(total: int, analises: List[str], semente: int = 42) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+    """Verificações aleatórias (10% golpes) para medir o tempo do backtest"""
+    aleatorio = np.random.default_rng(semente)
+    rotulos = aleatorio.random(total) < 0.1
+    confianca = np.column_stack([
+        aleatorio.choice([25, 50, 100], size=total, p=[0.1, 0.2, 0.7]),
+        np.clip(aleatorio.normal(np.where(rotulos, 35, 75), 20), 0, 100)
+    ])
+    riscos = np.clip(aleatorio.normal(np.where(rotulos, 55, 15)[:, None], 25, (total, len(analises))), 0, 100)
+    riscos[aleatorio.random((total, len(analises))) < 0.5] = 0
+    sucesso = aleatorio.random((total, 3)) > 0.02
+    prazo_esgotado = ~sucesso & (aleatorio.random((total, 3)) < 0.5)
+    return {"confianca": confianca, "sucesso": sucesso, "prazo_esgotado": prazo_esgotado, "riscos": riscos}, rotulos
+
+
+# ===== CANDIDATOS =====
+
+def candidatos_detetive(pesos_atuais: np.ndarray) -> np.ndarray:
+    """Pesos atuais e variações de um componente por vez"""
+    candidatos = [pesos_atuais]
+    for componente, fator in itertools.product(range(len(pesos_atuais)), VARIACOES_PESO):
+        variacao = pesos_atuais.copy()
+        variacao[componente] *= fator
+        candidatos.append(variacao)
+    return np.unique(np.array(candidatos), axis=0)
+
+
+def candidatos_orquestrador(passo: float) -> np.ndarray:
+    """Pesos (leitor, consultor, detetive) com soma 1"""
+    divisoes = round(1 / passo)
+    return np.array([
+        (leitor * passo, consultor * passo, (divisoes - leitor - consultor) * passo)
+        for leitor in range(divisoes + 1) for consultor in range(divisoes + 1 - leitor)
+    ])
+
+
+# ===== AVALIAÇÃO =====
+
+def pontuar_detetive(caracteristicas: Dict[str, np.ndarray], componentes: List[List[int]],
+                     decisivas: List[int], pesos: np.ndarray) -> np.ndarray:
+    """Confiança do detetive (100 - risco) para cada candidato de pesos: (verificações, candidatos)"""
+    riscos = caracteristicas["riscos"]
+    por_componente = np.column_stack([riscos[:, colunas].max(axis=1) for colunas in componentes])
+    risco = np.floor(por_componente @ pesos.T)
+    if decisivas:
+        risco = np.maximum(risco, riscos[:, decisivas].max(axis=1)[:, None])
+    return np.maximum(0, 100 - np.minimum(risco, 100))
+
+
+def avaliar(caracteristicas: Dict[str, np.ndarray], rotulos: np.ndarray,
+            confianca_detetive: np.ndarray, pesos_orquestrador: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Verdadeiros e falsos positivos de cada combinação para todos os limiares
+
+    Returns:
+        Arrays (orquestrador, detetive, limiar 0-101) com positivos/negativos de
+        pontuação abaixo do limiar, além dos totais de positivos e negativos
+    """
+    confianca = caracteristicas["confianca"]
+    sucesso = caracteristicas["sucesso"]
+    expirado = caracteristicas["prazo_esgotado"]
+    candidatos_detetive = confianca_detetive.shape[1]
+    deslocamento = 101 * np.arange(candidatos_detetive)[None, :]
+
+    abaixo_positivos = np.zeros((len(pesos_orquestrador), candidatos_detetive, 102), dtype=np.int64)
+    abaixo_negativos = np.zeros_like(abaixo_positivos)
+    for indice, (peso_leitor, peso_consultor, peso_detetive) in enumerate(pesos_orquestrador):
+        pontuacao = (
+            np.floor(confianca[:, 0] * peso_leitor) * sucesso[:, 0]
+            + np.floor(confianca[:, 1] * peso_consultor) * sucesso[:, 1]
+        )[:, None] + np.floor(confianca_detetive * peso_detetive) * sucesso[:, 2:3]
+        # Reescala sobre o peso dos agentes que concluíram, como o orquestrador
+        peso_expirado = expirado @ np.array([peso_leitor, peso_consultor, peso_detetive])
+        reescalar = (peso_expirado > 0) & (peso_expirado < 1)
+        pontuacao[reescalar] = np.floor(pontuacao[reescalar] / (1 - peso_expirado[reescalar, None]))
+        pontuacao = np.clip(pontuacao, 0, 100).astype(np.int64) + deslocamento
+
+        for destino, mascara in ((abaixo_positivos, rotulos), (abaixo_negativos, ~rotulos)):
+            histograma = np.bincount(pontuacao[mascara].ravel(), minlength=101 * candidatos_detetive)
+            destino[indice, :, 1:] = np.cumsum(histograma.reshape(candidatos_detetive, 101), axis=1)
+
+    return {
+        "abaixo_positivos": abaixo_positivos,
+        "abaixo_negativos": abaixo_negativos,
+        "positivos": int(rotulos.sum()),
+        "negativos": int((~rotulos).sum())
+    }
+
+
+def metricas(verdadeiros: np.ndarray, falsos: np.ndarray, positivos: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precisao = np.where(verdadeiros + falsos > 0, verdadeiros / (verdadeiros + falsos), 0.0)
+        recall = verdadeiros / positivos if positivos else np.zeros_like(precisao)
+        f1 = np.where(precisao + recall > 0, 2 * precisao * recall / (precisao + recall), 0.0)
+    return precisao, recall, f1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Avalia pesos e limiares de status sobre o histórico")
+    origem = parser.add_mutually_exclusive_group()
+    origem.add_argument("--armazem", type=Path, default=CAMINHO_ARMAZEM, help="Banco do armazém de verificações (só as últimas 24h, até 20 por usuário)")
+    origem.add_argument("--sintetico", type=int, metavar="N", help="Usa N verificações aleatórias")
+    parser.add_argument("--rotulos", type=Path, help="CSV id_verificacao,golpe (padrão: denúncias dos usuários)")
+    parser.add_argument("--denuncias", help="Banco das denúncias (padrão: DENUNCIAS_PATH)")
+    parser.add_argument("--ignorar", default="", help="Análises do detetive a desconsiderar (ex.: denuncias,rede)")
+    parser.add_argument("--passo", type=float, default=0.1, help="Passo da grade de pesos do orquestrador")
+    parser.add_argument("--top", type=int, default=10, help="Configurações exibidas")
+    parser.add_argument("--saida", type=Path, help="CSV com o resultado de todas as configurações")
+    args = parser.parse_args()
+
+    # Componentes da pontuação do detetive conforme o arquivo de regras em vigor
+    regras = motor_regras._obter_conjunto()
+    ignoradas = {nome for nome in args.ignorar.split(",") if nome}
+    componentes_regras = [
+        ([nome for nome in nomes if nome not in ignoradas], peso) for nomes, peso in regras.componentes
+    ]
+    componentes_regras = [(nomes, peso) for nomes, peso in componentes_regras if nomes]
+    decisivas_nomes = [nome for nome in regras.decisivas if nome not in ignoradas]
+    analises = sorted({nome for nomes, _ in componentes_regras for nome in nomes} | set(decisivas_nomes))
+    coluna = {nome: indice for indice, nome in enumerate(analises)}
+    componentes = [[coluna[nome] for nome in nomes] for nomes, _ in componentes_regras]
+    decisivas = [coluna[nome] for nome in decisivas_nomes]
+    pesos_detetive_atuais = np.array([peso for _, peso in componentes_regras])
+
+    orquestrador = AgenteOrquestrador()
+    pesos_atuais = np.array([orquestrador.pesos[agente] for agente in AGENTES])
+    limiares_atuais = (orquestrador.limiares["seguro"], orquestrador.limiares["suspeito"])
+
+    inicio = time.perf_counter()
+    if args.sintetico:
+        caracteristicas, rotulos = gerar_sinteticas(args.sintetico, analises)
+    else:
+        verificacoes = carregar_verificacoes(args.armazem)
+        if not verificacoes:
+            parser.error(f"nenhuma verificação encontrada em {args.armazem}")
+        caracteristicas = extrair_caracteristicas(verificacoes, analises)
+        rotulos = (rotular_por_csv(verificacoes, args.rotulos) if args.rotulos
+                   else rotular_por_denuncias(verificacoes, args.denuncias))
+    carga = time.perf_counter() - inicio
+    print(f"{len(rotulos)} verificações ({int(rotulos.sum())} golpes) carregadas em {carga:.2f}s")
+    if not rotulos.any() or rotulos.all():
+        parser.error("os rótulos precisam ter golpes e não golpes")
+
+    inicio = time.perf_counter()
+    pesos_detetive = candidatos_detetive(pesos_detetive_atuais)
+    pesos_orquestrador = np.unique(np.vstack([candidatos_orquestrador(args.passo), pesos_atuais]), axis=0)
+    confianca_detetive = pontuar_detetive(caracteristicas, componentes, decisivas, pesos_detetive)
+    resultado = avaliar(caracteristicas, rotulos, confianca_detetive, pesos_orquestrador)
+
+    # Golpe: pontuação abaixo do limiar "suspeito"; alerta: abaixo do limiar "seguro"
+    limiares = np.array([(seguro, suspeito) for seguro in range(50, 100, 5) for suspeito in range(20, seguro, 5)]
+                        + [limiares_atuais])
+    limiares = np.unique(limiares, axis=0)
+    positivos = resultado["positivos"]
+    golpe_vp = resultado["abaixo_positivos"][:, :, limiares[:, 1]]
+    golpe_fp = resultado["abaixo_negativos"][:, :, limiares[:, 1]]
+    alerta_vp = resultado["abaixo_positivos"][:, :, limiares[:, 0]]
+    alerta_fp = resultado["abaixo_negativos"][:, :, limiares[:, 0]]
+    precisao, recall, f1 = metricas(golpe_vp, golpe_fp, positivos)
+    precisao_alerta, recall_alerta, _ = metricas(alerta_vp, alerta_fp, positivos)
+    legitimos_alertados = alerta_fp / max(resultado["negativos"], 1)
+    duracao = time.perf_counter() - inicio
+
+    total = f1.size
+    print(f"{total} configurações avaliadas em {duracao:.2f}s "
+          f"({len(pesos_orquestrador)} pesos do orquestrador x {len(pesos_detetive)} do detetive "
+          f"x {len(limiares)} pares de limiares)")
+
+    def descrever(o: int, d: int, l: int) -> str:
+        return (f"orq={'/'.join(f'{p:.2f}' for p in pesos_orquestrador[o])} "
+                f"det={'/'.join(f'{p:.2f}' for p in pesos_detetive[d])} "
+                f"seguro>={limiares[l][0]} suspeito>={limiares[l][1]} | "
+                f"golpe P={precisao[o, d, l]:.3f} R={recall[o, d, l]:.3f} F1={f1[o, d, l]:.3f} | "
+                f"alerta P={precisao_alerta[o, d, l]:.3f} R={recall_alerta[o, d, l]:.3f} "
+                f"legítimos alertados={legitimos_alertados[o, d, l]:.1%}")
+
+    atual = (
+        int(np.flatnonzero((pesos_orquestrador == pesos_atuais).all(axis=1))[0]),
+        int(np.flatnonzero((pesos_detetive == pesos_detetive_atuais).all(axis=1))[0]),
+        int(np.flatnonzero((limiares == limiares_atuais).all(axis=1))[0])
+    )
+    print(f"Atual: {descrever(*atual)}")
+    print(f"Componentes do detetive: {[nomes for nomes, _ in componentes_regras]}")
+    for posicao, indice in enumerate(np.argsort(f1, axis=None)[::-1][:args.top], 1):
+        print(f"{posicao:>3}. {descrever(*np.unravel_index(indice, f1.shape))}")
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8", newline="") as arquivo:
+            escritor = csv.writer(arquivo)
+            escritor.writerow(["pesos_orquestrador", "pesos_detetive", "limiar_seguro", "limiar_suspeito",
+                               "precisao_golpe", "recall_golpe", "f1_golpe", "precisao_alerta",
+                               "recall_alerta", "legitimos_alertados"])
+            for o, d, l in itertools.product(range(f1.shape[0]), range(f1.shape[1]), range(f1.shape[2])):
+                escritor.writerow([
+                    "/".join(f"{p:.2f}" for p in pesos_orquestrador[o]),
+                    "/".join(f"{p:.2f}" for p in pesos_detetive[d]),
+                    limiares[l][0], limiares[l][1],
+                    round(float(precisao[o, d, l]), 4), round(float(recall[o, d, l]), 4),
+                    round(float(f1[o, d, l]), 4), round(float(precisao_alerta[o, d, l]), 4),
+                    round(float(recall_alerta[o, d, l]), 4), round(float(legitimos_alertados[o, d, l]), 4)
+                ])
+        print(f"Resultados gravados em {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Benchmark de Inicialização dos Serviços de IA
+
+Mede, em processos Python isolados, o tempo de importação dos serviços de
+verificação e a memória residente de cada worker, comparando o carregamento
+sob demanda do registro de serviços com o carregamento antecipado das
+bibliotecas pesadas e com várias instâncias de AIService (modelo antigo).
+
+Uso:
+    python utils_project/benchmark_inicializacao.py [--repeticoes N] [--raiz CAMINHO]
+
+--raiz mede outra cópia do projeto (por exemplo um git worktree da versão
+anterior); cenários que dependem de módulos ausentes nela aparecem como erro.
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Any
+
+RAIZ_PROJETO = Path(__file__).resolve().parent.parent
+
+# Código executado em cada processo medido
+CENARIOS = {
+    "importacao_sob_demanda": """
+import app.services.ai_service
+""",
+    "importacao_antecipada": """
+for nome in ("numpy", "cv2", "PIL.Image", "pytesseract", "groq"):
+    try:
+        __import__(nome)
+    except ImportError:
+        pass
+import app.services.ai_service
+""",
+    "servico_compartilhado": """
+from app.services.registro_servicos import obter_ai_service
+for _ in range(4):
+    obter_ai_service()
+""",
+    "servicos_independentes": """
+from app.services.ai_service import AIService
+from app.services.registro_servicos import importar_modulo
+for nome in ("numpy", "cv2", "PIL.Image", "pytesseract", "groq"):
+    try:
+        importar_modulo(nome)
+    except ImportError:
+        pass
+servicos = [AIService() for _ in range(4)]
+clientes = [importar_modulo("groq").Groq(api_key="benchmark") for _ in range(4 * 5)]
+""",
+}
+
+MEDIDOR = """
+import time, resource, json, sys, os
+sys.path.insert(0, os.getcwd())
+inicio = time.perf_counter()
+exec(compile(sys.argv[1], "<cenario>", "exec"))
+duracao = (time.perf_counter() - inicio) * 1000
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"tempo_ms": duracao, "rss_mb": rss_kb / 1024}))
+"""
+
+
+def medir(cenario: str, repeticoes: int, raiz: Path = RAIZ_PROJETO) -> Dict[str, Any]:
+    """Executa o cenário em processos novos (na raiz indicada) e agrega tempo e memória"""
+    tempos: List[float] = []
+    memorias: List[float] = []
+    erro = None
+
+    for _ in range(repeticoes):
+        processo = subprocess.run(
+            [sys.executable, "-c", MEDIDOR, CENARIOS[cenario]],
+            cwd=raiz,
+            capture_output=True,
+            text=True,
+            env={**os.environ, "GROQ_API_KEY": os.getenv("GROQ_API_KEY", "benchmark")}
+        )
+        if processo.returncode != 0:
+            erro = processo.stderr.strip().splitlines()[-1] if processo.stderr else "falha desconhecida"
+            break
+        resultado = json.loads(processo.stdout.strip().splitlines()[-1])
+        tempos.append(resultado["tempo_ms"])
+        memorias.append(resultado["rss_mb"])
+
+    if erro:
+        return {"erro": erro}
+
+    return {
+        "tempo_ms_mediana": round(statistics.median(tempos), 1),
+        "tempo_ms_min": round(min(tempos), 1),
+        "rss_mb_mediana": round(statistics.median(memorias), 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de inicialização dos serviços de IA")
+    parser.add_argument("--repeticoes", type=int, default=5, help="Processos por cenário (padrão: 5)")
+    parser.add_argument("--raiz", type=Path, default=RAIZ_PROJETO,
+                        help=f"Cópia do projeto a medir (padrão: {RAIZ_PROJETO})")
+    args = parser.parse_args()
+
+    resultados = {cenario: medir(cenario, args.repeticoes, args.raiz) for cenario in CENARIOS}
+
+    print(f"{'Cenário':<26} {'Tempo (ms)':>12} {'Mínimo (ms)':>12} {'RSS (MB)':>10}")
+    print("-" * 64)
+    for cenario, resultado in resultados.items():
+        if "erro" in resultado:
+            print(f"{cenario:<26} erro: {resultado['erro']}")
+            continue
+        print(
+            f"{cenario:<26} {resultado['tempo_ms_mediana']:>12} "
+            f"{resultado['tempo_ms_min']:>12} {resultado['rss_mb_mediana']:>10}"
+        )
+
+    sob_demanda = resultados["importacao_sob_demanda"]
+    antecipada = resultados["importacao_antecipada"]
+    if "erro" not in sob_demanda and "erro" not in antecipada:
+        print()
+        print(f"Cold start economizado: {antecipada['tempo_ms_mediana'] - sob_demanda['tempo_ms_mediana']:.1f} ms")
+        print(f"Memória economizada por worker: {antecipada['rss_mb_mediana'] - sob_demanda['rss_mb_mediana']:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
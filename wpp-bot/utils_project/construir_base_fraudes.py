@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Construtor da Base de Fraudes
+
+Gera um snapshot SQLite da base de fraudes a partir de um arquivo CSV ou
+NDJSON e o publica atomicamente; os processos em execução passam a usá-lo
+na próxima verificação periódica (BASE_FRAUDES_INTERVALO_VERIFICACAO).
+
+Cada registro precisa de "categoria" (beneficiario ou reclamacao) e "nome";
+as demais colunas/campos (cnpj, cpf, motivo, relatos, fonte...) vão para os
+dados do registro.
+
+Uso:
+    python utils_project/construir_base_fraudes.py --entrada suspeitos.csv [--saida data/base_fraudes.db]
+    python utils_project/construir_base_fraudes.py --exemplo
+    python utils_project/construir_base_fraudes.py --sintetico 1000000 --benchmark
+"""
+
+import sys
+import csv
+import json
+import time
+import random
+import argparse
+import statistics
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional
+
+RAIZ_PROJETO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ_PROJETO))
+
+# Import direto do módulo: o construtor não precisa das dependências da API
+import types
+
+_pacote = types.ModuleType("app.services")
+_pacote.__path__ = [str(RAIZ_PROJETO / "app" / "services")]
+sys.modules.setdefault("app.services", _pacote)
+
+from app.services.base_fraudes import (  # noqa: E402
+    BaseFraudes, criar_snapshot, registros_exemplo, CAMINHO_PADRAO,
+    CATEGORIA_BENEFICIARIO, CATEGORIA_RECLAMACAO
+)
+
+PALAVRAS_SINTETICAS = [
+    "comercio", "servicos", "pagamentos", "digital", "brasil", "tecnologia", "solucoes",
+    "cobranca", "financeira", "investimentos", "telecom", "streaming", "energia", "seguros",
+    "norte", "sul", "central", "nacional", "express", "prime", "global", "rapido"
+]
+SUFIXOS = ["ltda", "me", "eireli", "sa", "epp"]
+
+
+def ler_registros(caminho: Path) -> Iterator[Dict[str, Any]]:
+    """Registros de um CSV (com cabeçalho) ou NDJSON"""
+    with open(caminho, encoding="utf-8", newline="") as arquivo:
+        if caminho.suffix.lower() == ".csv":
+            linhas = csv.DictReader(arquivo)
+        else:
+            linhas = (json.loads(linha) for linha in arquivo if linha.strip())
+        for linha in linhas:
+            linha = {chave: valor for chave, valor in linha.items() if valor not in (None, "")}
+            categoria = linha.pop("categoria", None)
+            nome = linha.pop("nome", "")
+            if categoria == CATEGORIA_RECLAMACAO:
+                linha.setdefault("empresa", nome)
+                if "reclamacoes" in linha:
+                    linha["reclamacoes"] = int(linha["reclamacoes"])
+            if "relatos" in linha:
+                linha["relatos"] = int(linha["relatos"])
+            yield {"categoria": categoria, "nome": nome, "dados": linha}
+
+
+def registros_sinteticos(total: int, semente: int = 42) -> Iterator[Dict[str, Any]]:
+    """Nomes aleatórios de 2 a 4 palavras, para medir carga e consulta em escala"""
+    aleatorio = random.Random(semente)
+    for indice in range(total):
+        palavras = aleatorio.sample(PALAVRAS_SINTETICAS, aleatorio.randint(1, 3))
+        nome = " ".join([f"empresa{indice}", *palavras, aleatorio.choice(SUFIXOS)])
+        categoria = CATEGORIA_BENEFICIARIO if indice % 4 else CATEGORIA_RECLAMACAO
+        dados = {"motivo": "sintetico", "relatos": aleatorio.randint(1, 50)}
+        if categoria == CATEGORIA_RECLAMACAO:
+            dados.update({"fonte": "procon", "empresa": nome, "reclamacoes": aleatorio.randint(1, 100)})
+        yield {"categoria": categoria, "nome": nome, "dados": dados}
+
+
+def medir_consultas(caminho: Path, consultas: int = 2000, cadastrados: Optional[List[str]] = None):
+    """Carrega o snapshot e mede o tempo de consulta por nome (metade com nomes cadastrados)"""
+    base = BaseFraudes(str(caminho))
+    carga = base.carregar()
+    print(f"Carga: {carga['total_nomes']} nomes em {carga['tempo_carga_ms']}ms")
+
+    aleatorio = random.Random(7)
+    nomes = [
+        f"PAGTO {' '.join(aleatorio.sample(PALAVRAS_SINTETICAS, 3))} empresa{aleatorio.randint(0, 10 ** 7)} LTDA"
+        for _ in range(consultas)
+    ]
+    if cadastrados:
+        for i in range(0, consultas, 2):
+            nomes[i] = f"Pagamento {aleatorio.choice(cadastrados).upper()} ref. 12/2024"
+    tempos = []
+    acertos = 0
+    for nome in nomes:
+        inicio = time.perf_counter()
+        acertos += bool(base.buscar_nome(CATEGORIA_BENEFICIARIO, nome))
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    tempos.sort()
+    print(f"Consultas: {consultas} ({acertos} com suspeito) - "
+          f"média {statistics.mean(tempos):.3f}ms, p50 {tempos[len(tempos) // 2]:.3f}ms, "
+          f"p99 {tempos[int(len(tempos) * 0.99)]:.3f}ms")
+
+    if not cadastrados or not base.obter_estatisticas()["nomes_similaridade"]:
+        return
+    # Nomes cadastrados com um erro de digitação: mede a busca por nomes parecidos
+    variantes = []
+    for nome in aleatorio.sample(cadastrados, min(len(cadastrados), 500)):
+        posicao = aleatorio.randrange(len(nome))
+        variantes.append(nome[:posicao] + aleatorio.choice("aeiou0") + nome[posicao + 1:])
+    tempos = []
+    acertos = 0
+    for nome in variantes:
+        inicio = time.perf_counter()
+        acertos += bool(base.buscar_similares(nome))
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    tempos.sort()
+    print(f"Nomes parecidos: {len(variantes)} ({acertos} encontrados) - "
+          f"média {statistics.mean(tempos):.3f}ms, p99 {tempos[int(len(tempos) * 0.99)]:.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera e publica o snapshot da base de fraudes")
+    origem = parser.add_mutually_exclusive_group(required=True)
+    origem.add_argument("--entrada", type=Path, help="Arquivo CSV ou NDJSON com os registros")
+    origem.add_argument("--exemplo", action="store_true", help="Publica os dados de exemplo")
+    origem.add_argument("--sintetico", type=int, metavar="N", help="Gera N registros aleatórios")
+    parser.add_argument("--saida", type=Path, default=CAMINHO_PADRAO, help=f"Destino (padrão: {CAMINHO_PADRAO})")
+    parser.add_argument("--versao", help="Identificador do snapshot")
+    parser.add_argument("--benchmark", action="store_true", help="Mede carga e consultas após publicar")
+    args = parser.parse_args()
+
+    if args.entrada:
+        registros = ler_registros(args.entrada)
+    elif args.exemplo:
+        registros = registros_exemplo()
+    else:
+        registros = registros_sinteticos(args.sintetico)
+
+    # Amostra de nomes cadastrados para que o benchmark também meça acertos
+    amostra: List[str] = []
+
+    def amostrar(registros):
+        for registro in registros:
+            if registro["categoria"] == CATEGORIA_BENEFICIARIO and len(amostra) < 1000 and registro["nome"]:
+                amostra.append(registro["nome"])
+            yield registro
+
+    inicio = time.perf_counter()
+    total = criar_snapshot(str(args.saida), amostrar(registros), versao=args.versao)
+    print(f"Snapshot publicado em {args.saida}: {total} registros em {time.perf_counter() - inicio:.1f}s")
+
+    if args.benchmark:
+        medir_consultas(args.saida, cadastrados=amostra)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Construtor da Lista de Bloqueio
+
+Compila listas externas de chaves PIX, códigos de barras e CNPJs/CPFs de
+golpe num arquivo mapeado em memória (filtro de Bloom + hashes ordenados) e o
+publica atomicamente; os processos em execução passam a usá-lo na próxima
+verificação periódica (LISTA_BLOQUEIO_INTERVALO_VERIFICACAO).
+
+Cada arquivo de entrada tem um identificador por linha; CSVs usam a coluna
+"valor" (ou a primeira) e, se existir, a coluna "tipo" para o tipo de cada linha.
+
+Uso:
+    python utils_project/construir_lista_bloqueio.py --pix chaves.txt --barras boletos.txt --documento cnpjs.csv
+    python utils_project/construir_lista_bloqueio.py --sintetico 10000000 --benchmark
+"""
+
+import sys
+import csv
+import time
+import random
+import argparse
+import statistics
+from pathlib import Path
+from typing import Iterator, List, Tuple
+
+RAIZ_PROJETO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ_PROJETO))
+
+# Import direto do módulo: o construtor não precisa das dependências da API
+import types
+
+_pacote = types.ModuleType("app.services")
+_pacote.__path__ = [str(RAIZ_PROJETO / "app" / "services")]
+sys.modules.setdefault("app.services", _pacote)
+
+from app.services.lista_bloqueio import ListaBloqueio, gravar_lista, hash_identificador, CAMINHO_PADRAO  # noqa: E402
+from app.services.registros_verificacao import chave_identificador, PREFIXOS_IDENTIFICADOR  # noqa: E402
+
+
+def ler_identificadores(caminho: Path, tipo: str) -> Iterator[Tuple[str, str]]:
+    """Pares (tipo, valor) de um arquivo texto (um por linha) ou CSV"""
+    with open(caminho, encoding="utf-8", newline="") as arquivo:
+        if caminho.suffix.lower() == ".csv":
+            for linha in csv.DictReader(arquivo):
+                valor = linha.get("valor") or next(iter(linha.values()), "")
+                yield linha.get("tipo") or tipo, valor
+        else:
+            for linha in arquivo:
+                if linha.strip():
+                    yield tipo, linha.strip()
+
+
+def identificadores_sinteticos(total: int, semente: int = 42) -> Iterator[Tuple[str, str]]:
+    """Chaves PIX, códigos de barras e CNPJs aleatórios, para medir em escala"""
+    aleatorio = random.Random(semente)
+    for indice in range(total):
+        escolha = indice % 3
+        if escolha == 0:
+            yield "chave_pix", f"golpe{aleatorio.getrandbits(40)}@email.com"
+        elif escolha == 1:
+            yield "codigo_barras", "".join(str(aleatorio.randrange(10)) for _ in range(47))
+        else:
+            yield "documento", f"{aleatorio.randrange(10 ** 14):014d}"
+
+
+def hashes(pares: Iterator[Tuple[str, str]], amostra: List[str]) -> Iterator[int]:
+    ignorados = 0
+    for tipo, valor in pares:
+        if tipo not in PREFIXOS_IDENTIFICADOR:
+            ignorados += 1
+            continue
+        chave = chave_identificador(tipo, valor)
+        if chave:
+            if len(amostra) < 1000:
+                amostra.append(chave)
+            yield hash_identificador(chave)
+    if ignorados:
+        print(f"{ignorados} linhas com tipo desconhecido ignoradas")
+
+
+def medir_consultas(caminho: Path, cadastrados: List[str], consultas: int = 20000):
+    """Mede a consulta com identificadores ausentes e presentes"""
+    lista = ListaBloqueio(str(caminho))
+    aleatorio = random.Random(7)
+    ausentes = [chave_identificador("chave_pix", f"ausente{aleatorio.getrandbits(48)}@email.com")
+                for _ in range(consultas)]
+    presentes = [aleatorio.choice(cadastrados) for _ in range(min(consultas, 5000))] if cadastrados else []
+    lista.contem(ausentes[0])
+
+    for nome, chaves in (("ausentes", ausentes), ("presentes", presentes)):
+        if not chaves:
+            continue
+        tempos = []
+        encontrados = 0
+        for chave in chaves:
+            inicio = time.perf_counter()
+            encontrados += lista.contem(chave)
+            tempos.append((time.perf_counter() - inicio) * 1e6)
+        tempos.sort()
+        print(f"Consultas {nome}: {len(chaves)} ({encontrados} encontrados) - "
+              f"média {statistics.mean(tempos):.1f}µs, p99 {tempos[int(len(tempos) * 0.99)]:.1f}µs")
+    print(f"Estatísticas: {lista.obter_estatisticas()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera e publica a lista de bloqueio mapeada em memória")
+    parser.add_argument("--pix", type=Path, action="append", default=[], help="Arquivo de chaves PIX")
+    parser.add_argument("--barras", type=Path, action="append", default=[], help="Arquivo de códigos de barras")
+    parser.add_argument("--documento", type=Path, action="append", default=[], help="Arquivo de CNPJs/CPFs")
+    parser.add_argument("--sintetico", type=int, metavar="N", help="Gera N identificadores aleatórios")
+    parser.add_argument("--saida", type=Path, default=CAMINHO_PADRAO, help=f"Destino (padrão: {CAMINHO_PADRAO})")
+    parser.add_argument("--bits-por-item", type=int, default=10, help="Tamanho do filtro de Bloom por identificador")
+    parser.add_argument("--benchmark", action="store_true", help="Mede as consultas após publicar")
+    args = parser.parse_args()
+
+    def pares() -> Iterator[Tuple[str, str]]:
+        for tipo, arquivos in (("chave_pix", args.pix), ("codigo_barras", args.barras), ("documento", args.documento)):
+            for caminho in arquivos:
+                yield from ler_identificadores(caminho, tipo)
+        if args.sintetico:
+            yield from identificadores_sinteticos(args.sintetico)
+
+    if not (args.pix or args.barras or args.documento or args.sintetico):
+        parser.error("informe ao menos um arquivo (--pix, --barras, --documento) ou --sintetico")
+
+    amostra: List[str] = []
+    inicio = time.perf_counter()
+    resumo = gravar_lista(str(args.saida), hashes(pares(), amostra), bits_por_item=args.bits_por_item)
+    print(f"Lista publicada em {args.saida}: {resumo['itens']} identificadores, "
+          f"{resumo['tamanho_bytes'] / 2 ** 20:.1f} MiB em {time.perf_counter() - inicio:.1f}s")
+
+    if args.benchmark:
+        medir_consultas(args.saida, amostra)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Servidor Bemobi Simulado
+
+Responde à API usada pelo adaptador HTTP dos sistemas Bemobi
+(app/services/sistemas_bemobi.py) com os dados de exemplo e, opcionalmente,
+milhares de clientes sintéticos, para testar o Agente Consultor contra um
+serviço de rede sem depender da API real. A latência e a taxa de erros podem
+ser simuladas.
+
+Uso:
+    python utils_project/servidor_bemobi_simulado.py --porta 8081 --latencia-ms 40
+    BEMOBI_API_URL=http://127.0.0.1:8081 uvicorn main:app
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Any
+
+RAIZ_PROJETO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ_PROJETO))
+
+# Import direto do módulo: o servidor não precisa das dependências da API
+import types
+
+_pacote = types.ModuleType("app.services")
+_pacote.__path__ = [str(RAIZ_PROJETO / "app" / "services")]
+sys.modules.setdefault("app.services", _pacote)
+
+from app.services.sistemas_bemobi import DADOS_EXEMPLO, marcar_paga  # noqa: E402
+
+
+def gerar_dados(clientes_sinteticos: int, semente: int = 42) -> Dict[str, Any]:
+    """Dados de exemplo acrescidos de clientes sintéticos com ids numéricos de 11 dígitos"""
+    aleatorio = random.Random(semente)
+    clientes = json.loads(json.dumps(DADOS_EXEMPLO["clientes"]))
+    for indice in range(clientes_sinteticos):
+        id_cliente = f"{10_000_000_000 + indice:011d}"
+        valor = round(aleatorio.choice((49.90, 89.90, 119.90, 149.90)), 2)
+        clientes[id_cliente] = {
+            "cliente": {
+                "nome": f"Cliente {indice}",
+                "servicos": ["streaming"],
+                "status": "ativo",
+                "ultimo_pagamento": f"2024-11-{aleatorio.randint(1, 28):02d}"
+            },
+            "cobrancas": [
+                {"valor": valor, "servico": "streaming", "vencimento": "2024-12-15", "status": "pendente"}
+            ]
+        }
+    return {"clientes": clientes, "beneficiarios": DADOS_EXEMPLO["beneficiarios"]}
+
+
+def criar_manipulador(dados: Dict[str, Any], latencia: float, taxa_erro: float):
+    class Manipulador(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _responder(self, status: int, corpo: Dict[str, Any]):
+            conteudo = json.dumps(corpo, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(conteudo)))
+            self.end_headers()
+            self.wfile.write(conteudo)
+
+        def _simular_rede(self) -> bool:
+            """Aplica a latência; False se a requisição deve falhar"""
+            if latencia:
+                time.sleep(latencia)
+            if taxa_erro and random.random() < taxa_erro:
+                self._responder(503, {"erro": "indisponível (simulado)"})
+                return False
+            return True
+
+        def do_GET(self):
+            if not self._simular_rede():
+                return
+            if self.path.rstrip("/") == "/beneficiarios":
+                self._responder(200, {"beneficiarios": dados["beneficiarios"]})
+            else:
+                self._responder(404, {"erro": "rota não encontrada"})
+
+        def do_POST(self):
+            tamanho = int(self.headers.get("Content-Length") or 0)
+            corpo = json.loads(self.rfile.read(tamanho) or b"{}")
+            if not self._simular_rede():
+                return
+            partes = self.path.strip("/").split("/")
+            if self.path.rstrip("/") == "/clientes/consulta":
+                ids = [str(i) for i in corpo.get("ids", [])]
+                self._responder(200, {"clientes": {i: dados["clientes"].get(i) for i in ids}})
+            elif len(partes) == 3 and partes[0] == "clientes" and partes[2] == "pagamentos":
+                registrado = marcar_paga(dados["clientes"].get(partes[1]), corpo.get("cobranca") or {})
+                self._responder(200, {"registrado": registrado})
+            else:
+                self._responder(404, {"erro": "rota não encontrada"})
+
+        def log_message(self, formato, *args):
+            pass
+
+    return Manipulador
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor simulado da API Bemobi")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8081)
+    parser.add_argument("--latencia-ms", type=float, default=0, help="Atraso de cada resposta")
+    parser.add_argument("--taxa-erro", type=float, default=0, help="Fração de respostas 503 (0-1)")
+    parser.add_argument("--clientes-sinteticos", type=int, default=0, help="Clientes extras gerados")
+    args = parser.parse_args()
+
+    dados = gerar_dados(args.clientes_sinteticos)
+    servidor = ThreadingHTTPServer(
+        (args.host, args.porta), criar_manipulador(dados, args.latencia_ms / 1000, args.taxa_erro)
+    )
+    print(f"🛰️  API Bemobi simulada em http://{args.host}:{args.porta} "
+          f"({len(dados['clientes'])} clientes, latência {args.latencia_ms:.0f}ms)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Worker de Verificação - Consome a fila durável de jobs de verificação
+Roda fora do processo web: cada processo executa vários jobs concorrentes e
+vários processos podem rodar em paralelo no mesmo host da API (a fila SQLite
+não pode ficar em sistema de arquivos de rede)
+
+Uso:
+    python worker_verificacao.py [--processos N] [--concorrencia N]
+"""
+
+import os
+import sys
+import time
+import socket
+import signal
+import asyncio
+import argparse
+import logging
+import multiprocessing
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+import httpx
+
+from config.settings import settings
+from app.core.exceptions import SecurityException
+from app.services.logger import setup_logging
+from app.services.registro_servicos import obter_ai_service
+from app.services.fila_verificacoes import (
+    fila_verificacoes, validar_callback_url, STATUS_CONCLUIDO, STATUS_ERRO
+)
+
+logger = logging.getLogger(__name__)
+
+# Tentativas de entrega do callback (espera dobra a cada tentativa)
+TENTATIVAS_CALLBACK = 3
+ESPERA_CALLBACK_SEGUNDOS = 1.0
+
+
+class WorkerVerificacao:
+    def __init__(self, concorrencia: int = 4, intervalo_ociosidade: float = 1.0):
+        self.concorrencia = concorrencia
+        self.intervalo_ociosidade = intervalo_ociosidade
+        self.nome = f"{socket.gethostname()}:{os.getpid()}"
+        self._parar: Optional[asyncio.Event] = None
+
+    def parar(self):
+        """Termina após concluir os jobs em andamento"""
+        logger.info(f"Worker {self.nome} encerrando")
+        self._parar.set()
+
+    async def executar(self):
+        """Executa os laços de consumo até receber o sinal de parada"""
+        self._parar = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sinal in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sinal, self.parar)
+            except NotImplementedError:
+                pass
+
+        logger.info(f"Worker {self.nome} iniciado com concorrência {self.concorrencia}")
+        await asyncio.gather(*(self._consumir(i) for i in range(self.concorrencia)))
+
+    async def _consumir(self, indice: int):
+        loop = asyncio.get_running_loop()
+        nome = f"{self.nome}/{indice}"
+
+        while not self._parar.is_set():
+            try:
+                job = await loop.run_in_executor(None, fila_verificacoes.reservar, nome)
+            except Exception as e:
+                logger.error(f"Erro ao reservar job: {e}")
+                job = None
+
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._parar.wait(), timeout=self.intervalo_ociosidade)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self.processar(job)
+
+    async def processar(self, job: Dict[str, Any]):
+        """Executa a verificação de um job e registra o resultado"""
+        loop = asyncio.get_running_loop()
+        job_id = job["id"]
+        payload = job["payload"]
+        inicio = time.perf_counter()
+
+        if job["tentativas"] > fila_verificacoes.max_tentativas:
+            await loop.run_in_executor(
+                None, fila_verificacoes.falhar, job_id, "Tentativas esgotadas", job["tentativas"], True
+            )
+            await self._notificar(job, STATUS_ERRO, erro="Tentativas esgotadas")
+            return
+
+        logger.info(f"Processando job {job_id} (tentativa {job['tentativas']})")
+        try:
+            resultado = await obter_ai_service().verificar_cobranca_completa(
+                image_url=payload.get("image_url"),
+                texto_pix=payload.get("texto_pix"),
+                user_id=payload.get("user_id"),
+                modo_rapido=payload.get("modo_rapido")
+            )
+        except Exception as e:
+            logger.error(f"Erro no job {job_id}: {e}")
+            reprocessar = await loop.run_in_executor(
+                None, fila_verificacoes.falhar, job_id, str(e), job["tentativas"]
+            )
+            if not reprocessar:
+                await self._notificar(job, STATUS_ERRO, erro=str(e))
+            return
+
+        if not resultado.get("sucesso", True):
+            # Falhas do pipeline (documento ilegível, sem dados) não melhoram com nova tentativa
+            erro = resultado.get("erro", "Erro na verificação")
+            await loop.run_in_executor(
+                None, fila_verificacoes.falhar, job_id, erro, job["tentativas"], True
+            )
+            await self._notificar(job, STATUS_ERRO, erro=erro)
+            return
+
+        await loop.run_in_executor(None, fila_verificacoes.concluir, job_id, resultado)
+        logger.info(f"Job {job_id} concluído em {time.perf_counter() - inicio:.1f}s "
+                   f"- Status: {resultado.get('status_verificacao')}")
+        await self._notificar(job, STATUS_CONCLUIDO, resultado=resultado)
+
+    async def _notificar(self,
+                         job: Dict[str, Any],
+                         status: str,
+                         resultado: Optional[Dict[str, Any]] = None,
+                         erro: Optional[str] = None):
+        """Entrega o resultado ao callback_url do job, com novas tentativas"""
+        if not job.get("callback_url"):
+            return
+        try:
+            # Revalidado na entrega: a lista de hosts pode ter mudado desde o enfileiramento
+            validar_callback_url(job["callback_url"])
+        except SecurityException as e:
+            logger.warning(f"Callback do job {job['id']} recusado: {e.message}")
+            await asyncio.get_running_loop().run_in_executor(
+                None, fila_verificacoes.registrar_callback, job["id"], "recusado"
+            )
+            return
+
+        corpo = {"job_id": job["id"], "status": status, "resultado": resultado, "erro": erro}
+        espera = ESPERA_CALLBACK_SEGUNDOS
+        status_callback = "falhou"
+
+        async with httpx.AsyncClient(timeout=10) as client:
+            for tentativa in range(1, TENTATIVAS_CALLBACK + 1):
+                try:
+                    response = await client.post(job["callback_url"], json=corpo)
+                    if response.status_code < 400:
+                        status_callback = "entregue"
+                        break
+                    logger.warning(f"Callback do job {job['id']} respondeu {response.status_code}")
+                except httpx.HTTPError as e:
+                    logger.warning(f"Falha no callback do job {job['id']} (tentativa {tentativa}): {e}")
+                if tentativa < TENTATIVAS_CALLBACK:
+                    await asyncio.sleep(espera)
+                    espera *= 2
+
+        await asyncio.get_running_loop().run_in_executor(
+            None, fila_verificacoes.registrar_callback, job["id"], status_callback
+        )
+
+
+def iniciar_processo(concorrencia: int, intervalo_ociosidade: float):
+    """Ponto de entrada de cada processo worker"""
+    setup_logging(
+        log_level=settings.LOG_LEVEL,
+        log_file=Path(settings.LOG_PATH) / "worker_verificacao.log"
+    )
+    worker = WorkerVerificacao(concorrencia=concorrencia, intervalo_ociosidade=intervalo_ociosidade)
+    asyncio.run(worker.executar())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker da fila de verificações")
+    parser.add_argument("--processos", type=int,
+                        default=int(os.getenv("VERIFICACAO_WORKER_PROCESSOS", "1")),
+                        help="Processos worker (padrão: 1; use o número de núcleos para escalar)")
+    parser.add_argument("--concorrencia", type=int,
+                        default=int(os.getenv("VERIFICACAO_WORKER_CONCORRENCIA", "4")),
+                        help="Jobs simultâneos por processo (padrão: 4)")
+    parser.add_argument("--intervalo", type=float, default=1.0,
+                        help="Espera em segundos quando a fila está vazia (padrão: 1.0)")
+    args = parser.parse_args()
+
+    if args.processos <= 1:
+        iniciar_processo(args.concorrencia, args.intervalo)
+        return
+
+    processos = [
+        multiprocessing.Process(
+            target=iniciar_processo,
+            args=(args.concorrencia, args.intervalo),
+            name=f"worker-verificacao-{i}"
+        )
+        for i in range(args.processos)
+    ]
+    for processo in processos:
+        processo.start()
+
+    def encerrar(*_):
+        for processo in processos:
+            if processo.is_alive():
+                processo.terminate()
+
+    signal.signal(signal.SIGTERM, encerrar)
+    try:
+        for processo in processos:
+            processo.join()
+    except KeyboardInterrupt:
+        encerrar()
+        for processo in processos:
+            processo.join()
+
+
+if __name__ == "__main__":
+    sys.exit(main())